@@ -0,0 +1,114 @@
+"""File: backend/scripts/bench_callers.py
+Purpose: Benchmark what-calls latency with callee postings against a scan of every call record.
+Product/business importance: What-calls must stay interactive on repositories with millions of call sites; this shows
+the latency of each lookup mode at that scale before changes ship.
+
+Usage:
+    python scripts/bench_callers.py [--calls N] [--queries N]
+
+A synthetic snapshot is written to a temporary directory; the scan baseline decodes the calls section once and then
+tests every call record per query, as query helpers did before the index existed.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+_SRC = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(_SRC))
+
+from codeknowl.callee_index import CalleeIndex, callee_matches, callee_segment  # noqa: E402
+from codeknowl.query import find_callers_best_effort  # noqa: E402
+from codeknowl.snapshot_format import LazySnapshotArtifacts, SnapshotReader, write_snapshot_file  # noqa: E402
+
+
+def _synthetic_calls(count: int, seed: int) -> list[dict]:
+    rng = random.Random(seed)
+    shapes = ("helper_{n}", "self.method_{n}", "obj_{m}.method_{n}", "mod_{m}::fn_{n}", "pkg_{m}/op_{n}")
+    calls = []
+    for i in range(count):
+        callee = rng.choice(shapes).format(n=rng.randrange(count // 40 + 1), m=rng.randrange(500))
+        line = i % 2000 + 1
+        calls.append(
+            {
+                "caller_symbol_id": "",
+                "callee_name": callee,
+                "file_path": f"src/file_{i // 2000}.py",
+                "range": {"start_line": line, "start_col": 5, "end_line": line, "end_col": 30},
+            }
+        )
+    return calls
+
+
+def _scan(calls: list[dict], requested: str) -> int:
+    # The pre-index matcher: trailing-segment checks plus a plain substring test, applied to every call record.
+    return sum(1 for c in calls if callee_matches(c["callee_name"], requested) or requested in c["callee_name"])
+
+
+def _timed(fn, queries: list[str]) -> tuple[float, float, int]:
+    samples: list[float] = []
+    hits = 0
+    for q in queries:
+        start = time.perf_counter()
+        hits += fn(q)
+        samples.append(time.perf_counter() - start)
+    samples.sort()
+    return statistics.median(samples) * 1000, samples[int(len(samples) * 0.95) - 1] * 1000, hits
+
+
+def main() -> int:
+    """Write a synthetic snapshot and print per-query latency for each what-calls mode."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--calls", type=int, default=2_000_000, help="Synthetic call sites")
+    parser.add_argument("--queries", type=int, default=200, help="Queries per mode")
+    parser.add_argument("--scan-queries", type=int, default=10, help="Queries for the (slow) scan baseline")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    calls = _synthetic_calls(args.calls, args.seed)
+    rng = random.Random(args.seed + 1)
+    queries = [callee_segment(calls[rng.randrange(len(calls))]["callee_name"]) for _ in range(args.queries)]
+
+    with TemporaryDirectory(prefix="codeknowl-bench-callers-") as tmp:
+        path = Path(tmp) / "snapshot.cks"
+        start = time.perf_counter()
+        index = CalleeIndex.from_calls(calls)
+        build_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        write_snapshot_file(path, {"calls": calls, **index.to_tables()})
+        write_seconds = time.perf_counter() - start
+        print(
+            f"calls: {len(calls)}  distinct callees: {len(index.names)}  index build: {build_seconds:.2f}s  "
+            f"snapshot write: {write_seconds:.2f}s  size: {path.stat().st_size / 1_000_000:.1f} MB"
+        )
+
+        artifacts = LazySnapshotArtifacts(SnapshotReader(path))
+        start = time.perf_counter()
+        find_callers_best_effort(artifacts, queries[0])
+        print(f"first query on a freshly opened snapshot: {(time.perf_counter() - start) * 1000:.2f} ms")
+
+        modes = {
+            "scan (all call records)": (lambda q: _scan(calls, q), queries[: args.scan_queries]),
+            "postings (segment)": (lambda q: len(find_callers_best_effort(artifacts, q)), queries),
+            "trigram (substring)": (
+                lambda q: len(find_callers_best_effort(artifacts, q[:-1], substring=True)),
+                queries[: max(1, args.queries // 4)],
+            ),
+        }
+        for label, (fn, mode_queries) in modes.items():
+            p50, p95, hits = _timed(fn, mode_queries)
+            print(f"{label:>24}: p50 {p50:9.3f} ms  p95 {p95:9.3f} ms  ({len(mode_queries)} queries, {hits} hits)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,121 @@
+"""File: backend/scripts/bench_extraction.py
+Purpose: Microbenchmark the compiled Tree-sitter query extractor against the Python node walker.
+Product/business importance: Extraction dominates indexing CPU time; this shows the effect of engine changes on
+real repositories before they ship.
+
+Usage:
+    python scripts/bench_extraction.py [REPO_PATH] [--repeat N]
+
+Without REPO_PATH, a synthetic corpus covering python, javascript, typescript, and java is generated in memory.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+_SRC = Path(__file__).resolve().parents[1] / "src"
+sys.path.insert(0, str(_SRC))
+
+from codeknowl.indexing import (  # noqa: E402
+    EXTRACTABLE_LANGUAGES,
+    extract_file_symbols_and_calls,
+    file_language,
+    should_ignore_path,
+)
+
+_SYNTHETIC: dict[str, tuple[str, str]] = {
+    "python": (
+        ".py",
+        "class Widget{i}:\n    def run(self, x):\n        return helper_{i}(self.load(x), [f(y) for y in x])\n\n\n"
+        "def helper_{i}(a, b):\n    print(a)\n    return sorted(b, key=len)\n",
+    ),
+    "javascript": (
+        ".js",
+        "function render{i}(el) {{\n  return el.appendChild(make{i}(el.dataset.items.map((x) => wrap(x))));\n}}\n"
+        "class View{i} {{ update() {{ return this.render(state.get()); }} }}\n",
+    ),
+    "typescript": (
+        ".ts",
+        "export function parse{i}(raw: string): number {{\n  return Number.parseInt(raw.trim(), 10);\n}}\n"
+        "class Store{i}<T> {{ get(): T {{ return this.load<T>(key()); }} }}\n",
+    ),
+    "java": (
+        ".java",
+        "class Service{i} {{\n  int handle(int x) {{ return repo.find(x).map(this::convert).orElse(fallback()); }}\n"
+        "  void log() {{ logger.info(String.valueOf(count())); }}\n}}\n",
+    ),
+}
+
+
+def _synthetic_corpus(files_per_language: int, units_per_file: int) -> list[tuple[str, bytes, str]]:
+    corpus: list[tuple[str, bytes, str]] = []
+    for lang, (ext, template) in _SYNTHETIC.items():
+        for n in range(files_per_language):
+            text = "".join(template.format(i=f"{n}_{u}") for u in range(units_per_file))
+            corpus.append((f"synthetic/{lang}_{n}{ext}", text.encode("utf-8"), lang))
+    return corpus
+
+
+def _repo_corpus(repo_path: Path) -> list[tuple[str, bytes, str]]:
+    corpus: list[tuple[str, bytes, str]] = []
+    for p in sorted(repo_path.rglob("*")):
+        if not p.is_file() or should_ignore_path(p.relative_to(repo_path)):
+            continue
+        lang = file_language(p)
+        if lang in EXTRACTABLE_LANGUAGES:
+            corpus.append((str(p.relative_to(repo_path)), p.read_bytes(), lang))
+    return corpus
+
+
+def _run(corpus: list[tuple[str, bytes, str]], engine: str) -> tuple[float, int, int]:
+    symbol_count = 0
+    call_count = 0
+    start = time.perf_counter()
+    for rel, code, lang in corpus:
+        symbols, calls = extract_file_symbols_and_calls(rel, code, lang, engine=engine)
+        symbol_count += len(symbols)
+        call_count += len(calls)
+    return time.perf_counter() - start, symbol_count, call_count
+
+
+def main() -> int:
+    """Run both engines over the corpus and print timings and speedup."""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("repo_path", nargs="?", type=Path, help="Repository to benchmark (default: synthetic corpus)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per engine; the best run is reported")
+    parser.add_argument("--files", type=int, default=50, help="Synthetic files per language")
+    parser.add_argument("--units", type=int, default=40, help="Synthetic definitions per file")
+    args = parser.parse_args()
+
+    corpus = _repo_corpus(args.repo_path) if args.repo_path else _synthetic_corpus(args.files, args.units)
+    total_bytes = sum(len(code) for _, code, _ in corpus)
+    print(f"corpus: {len(corpus)} files, {total_bytes / 1_000_000:.2f} MB")
+
+    # Warm up parsers and compiled queries so neither engine pays one-time setup inside the timed runs.
+    for engine in ("walker", "query"):
+        _run(corpus[:4], engine)
+
+    results: dict[str, float] = {}
+    for engine in ("walker", "query"):
+        best = float("inf")
+        for _ in range(max(1, args.repeat)):
+            elapsed, symbol_count, call_count = _run(corpus, engine)
+            best = min(best, elapsed)
+        results[engine] = best
+        print(
+            f"{engine:>7}: {best:.3f}s  ({total_bytes / best / 1_000_000:.1f} MB/s, "
+            f"{symbol_count} symbols, {call_count} calls)"
+        )
+
+    print(f"speedup: {results['walker'] / results['query']:.2f}x")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
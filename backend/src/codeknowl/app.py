@@ -9,11 +9,14 @@ License: MIT (see LICENSE)
 
 from __future__ import annotations
 
+import asyncio
 import json
 import os
+from collections.abc import AsyncIterator
 from pathlib import Path
 
 from blacksheep import Application, Content, Response
+from blacksheep.server.sse import ServerSentEvent, ServerSentEventsResponse
 
 from codeknowl.async_service import AsyncCodeKnowlService, create_async_service
 from codeknowl.audit import (
@@ -31,8 +34,10 @@ from codeknowl.auth import (
     parse_bearer_token,
 )
 from codeknowl.config import AppConfig
+from codeknowl.http_pool import http_pool
 from codeknowl.metrics import METRICS
-from codeknowl.poller import start_repo_poller
+from codeknowl.poller import start_repo_poller, start_snapshot_gc
+from codeknowl.retention import RetentionConfig
 from codeknowl.service import CodeKnowlService
 from codeknowl.structured_logging import setup_structured_logging
 
@@ -570,7 +575,7 @@ def _register_qa_ask(app: Application, service: CodeKnowlService, *, group_confi
         audit().log("qa.ask.started", fields=audit_fields)
 
         try:
-            response = service.qa_ask_llm(repo_id, question)
+            response = await service.qa_ask_llm(repo_id, question)
             audit().log(
                 "qa.ask.succeeded",
                 fields={
@@ -590,6 +595,130 @@ def _register_qa_ask(app: Application, service: CodeKnowlService, *, group_confi
     app.router.add_post("/repos/{repo_id}/qa/ask", qa_ask)
 
 
+# How often a streaming ask checks whether its client went away while waiting on the next event.
+_STREAM_DISCONNECT_POLL_SECONDS = 0.5
+
+
+class _ClientDisconnected(Exception):
+    """Raised by `_until_disconnected` once the client of a streaming response has gone away."""
+
+
+async def _client_disconnected(request) -> bool:
+    try:
+        return await request.is_disconnected()
+    except TypeError:
+        # Only requests bound to an ASGI request/response cycle can report disconnects.
+        return False
+
+
+async def _until_disconnected(request, stream: AsyncIterator, *, poll_seconds: float = _STREAM_DISCONNECT_POLL_SECONDS):
+    """Relay `stream` until it ends; if the client disconnects first, cancel the pending step and raise.
+
+    The client is checked at most every `poll_seconds`, both between events and while waiting for the next one.
+
+    Why this exists:
+    - LLM generation nobody will read must stop as soon as the IDE closes the stream, even while no token is due.
+    """
+    loop = asyncio.get_running_loop()
+    next_check = loop.time() + poll_seconds
+    step: asyncio.Future | None = None
+    try:
+        while True:
+            step = asyncio.ensure_future(anext(stream))
+            while True:
+                await asyncio.wait({step}, timeout=max(0.0, next_check - loop.time()))
+                if loop.time() >= next_check:
+                    next_check = loop.time() + poll_seconds
+                    if await _client_disconnected(request):
+                        raise _ClientDisconnected
+                if step.done():
+                    break
+            try:
+                item = step.result()
+            except StopAsyncIteration:
+                return
+            yield item
+    finally:
+        if step is not None:
+            step.cancel()
+            await asyncio.gather(step, return_exceptions=True)
+        await stream.aclose()
+
+
+async def _ask_stream_events(
+    request, first: tuple[str, dict], stream: AsyncIterator, *, audit_fields: dict
+) -> AsyncIterator[ServerSentEvent]:
+    """Turn ask stream events into Server-Sent Events, ending with `error` if the pipeline fails mid-stream.
+
+    Why this exists:
+    - Every streaming ask is counted and audited once with its outcome (succeeded, cancelled, failed).
+    """
+    relay = _until_disconnected(request, stream)
+    status = "cancelled"
+    try:
+        yield ServerSentEvent(first[1], event=first[0])
+        async for event, data in relay:
+            yield ServerSentEvent(data, event=event)
+        status = "succeeded"
+    except _ClientDisconnected:
+        status = "cancelled"
+    except Exception as exc:  # noqa: BLE001
+        status = "failed"
+        yield ServerSentEvent({"error": str(exc)}, event="error")
+    finally:
+        await relay.aclose()
+        await stream.aclose()
+        METRICS.inc_qa_stream(status)
+        audit().log(f"qa.ask_stream.{status}", fields=audit_fields)
+
+
+def _register_qa_ask_stream(
+    app: Application, service: AsyncCodeKnowlService, *, group_config: GroupAuthzConfig
+) -> None:
+    """Register the streaming QA ask endpoint (Server-Sent Events).
+
+    Events: `evidence` (citations and evidence bundle), `candidates`, one `token` per answer delta, then `done`
+    with the stage latency breakdown, or `error`. Errors before the first event are plain JSON responses.
+
+    Why this exists:
+    - The IDE shows citations immediately and renders the answer as it is generated.
+    """
+
+    async def qa_ask_stream(repo_id: str, request) -> Response:
+        forbidden = _require_repo_access(request, group_config=group_config, repo_id=repo_id, op="read")
+        audit_fields = {
+            **audit_fields_from_request(request),
+            **audit_fields_from_auth_context(_get_auth_context(request)),
+            "request.id": _get_request_id(request),
+            "repo.id": repo_id,
+        }
+        if forbidden is not None:
+            audit().log("qa.ask_stream.forbidden", fields=audit_fields)
+            return forbidden
+
+        payload = await request.json()
+        question = payload.get("question")
+        if not question:
+            return _json_response({"error": "question is required"}, status=400)
+
+        audit_fields["qa.question.sha256_16"] = hash_text(str(question))
+        if audit().include_query_text():
+            audit_fields["qa.question"] = str(question)
+        audit().log("qa.ask_stream.started", fields=audit_fields)
+
+        stream = service.stream_qa_ask_llm(repo_id, question)
+        try:
+            first = await anext(stream)
+        except KeyError:
+            return _json_response({"error": "repo not found"}, status=404)
+        except ValueError as exc:
+            return _json_response({"error": str(exc)}, status=400)
+
+        return ServerSentEventsResponse(lambda: _ask_stream_events(request, first, stream, audit_fields=audit_fields))
+
+    app.router.add_post("/repos/{repo_id}/qa/ask/stream", qa_ask_stream)
+
+
 def _register_qa_routes(app: Application, service: CodeKnowlService, *, group_config: GroupAuthzConfig) -> None:
     """Register all QA routes.
 
@@ -601,6 +730,7 @@ def _register_qa_routes(app: Application, service: CodeKnowlService, *, group_co
     _register_qa_explain_file(app, service, group_config=group_config)
     _register_qa_find_occurrences(app, service, group_config=group_config)
     _register_qa_ask(app, service, group_config=group_config)
+    _register_qa_ask_stream(app, service, group_config=group_config)
 
 
 def _maybe_get_oidc_auth_context(
@@ -742,15 +872,24 @@ async def create_app(config: AppConfig | None = None) -> Application:
         else:
             start_repo_poller(data_dir=configuration.data_dir, interval_seconds=interval)
 
+    gc_interval = RetentionConfig.from_env().gc_interval_seconds
+    if gc_interval > 0:
+        start_snapshot_gc(data_dir=configuration.data_dir, interval_seconds=gc_interval)
+
     _register_health_routes(app, async_service, auth_enabled=auth_enabled, poll_interval_seconds=interval)
     _register_metrics_routes(app)
     _register_repo_routes(app, async_service, group_config=group_config)
     _register_qa_routes(app, async_service, group_config=group_config)
     _register_findings_routes(app, async_service, group_config=group_config)
+    app.on_stop += _close_http_pool
 
     return app
 
 
+async def _close_http_pool(application: Application) -> None:
+    await http_pool().aclose()
+
+
 def _register_findings_routes(app: Application, service: AsyncCodeKnowlService, *, group_config: GroupAuthzConfig) -> None:
     """Register findings ingestion and query routes.
 
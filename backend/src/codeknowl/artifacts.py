@@ -47,11 +47,13 @@ class FileRecord:
 
     Why this exists:
     - Indexing and QA need file metadata (path, language, size) without scanning the filesystem repeatedly.
+    - `blob_sha` is the git blob id when the inventory came from the commit tree.
     """
 
     path: str
     language: str
     size_bytes: int
+    blob_sha: str | None = None
 
 
 @dataclass(frozen=True)
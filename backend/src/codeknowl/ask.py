@@ -8,15 +8,27 @@ License: MIT (see LICENSE)
 
 from __future__ import annotations
 
+import asyncio
 import json
+import logging
 import os
 import re
-from dataclasses import dataclass
+import time
+from collections.abc import AsyncIterator, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from typing import Any
 
+import httpx
+
 from codeknowl.llm import OpenAiCompatibleClient
+from codeknowl.metrics import METRICS
 from codeknowl.query import explain_file_stub, find_callers_best_effort, where_is_symbol_defined
 
+logger = logging.getLogger(__name__)
+
 
 @dataclass(frozen=True)
 class AskResult:
@@ -29,6 +41,34 @@ class AskResult:
     answer: str
     citations: list[dict[str, Any]]
     evidence: dict[str, Any]
+    stage_seconds: dict[str, float] = field(default_factory=dict)
+    candidates: dict[str, str] = field(default_factory=dict)
+
+
+class StageTimings:
+    """Per-stage latency of one ask, recorded into the response metadata and the stage histogram.
+
+    Why this exists:
+    - Operators need to see which stage of an ask (retrieval, a candidate model, synthesis) was slow.
+    """
+
+    def __init__(self) -> None:
+        self.seconds: dict[str, float] = {}
+
+    def record(self, stage: str, seconds: float) -> None:
+        self.seconds[stage] = seconds
+        METRICS.observe_qa_stage(stage, seconds)
+
+    @contextmanager
+    def stage(self, stage: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - started)
+
+    def metadata(self) -> dict[str, float]:
+        return {stage: round(seconds, 4) for stage, seconds in self.seconds.items()}
 
 
 def _limit_text(text: str, *, max_chars: int) -> str:
@@ -203,9 +243,6 @@ def _maybe_add_file_stub(
     if not file_path:
         return
 
-    if not any(f.get("path") == file_path for f in artifacts.get("files", [])):
-        return
-
     try:
         stub = explain_file_stub(artifacts, file_path)
     except KeyError:
@@ -336,33 +373,25 @@ def answer_with_llm(
     return AskResult(answer=answer, citations=citations, evidence=evidence)
 
 
-def answer_with_llm_synthesis(
-    *,
-    coding_llm: OpenAiCompatibleClient,
-    general_llm: OpenAiCompatibleClient,
-    synth_llm: OpenAiCompatibleClient,
-    artifacts: dict[str, Any],
-    question: str,
-    semantic_hits: list[dict[str, Any]] | None = None,
-) -> AskResult:
-    """Generate a multi-model synthesized answer from three LLM profiles.
+_RESPONDER_SYSTEM = (
+    "You are CodeKnowl, an on-prem codebase analyst. "
+    "You must only use the provided evidence bundle. "
+    "If the evidence is insufficient, say so and ask for a file path or symbol name. "
+    "Do not invent file names or line numbers. "
+    "Return a short answer with citations (file paths + line ranges) where applicable."
+)
 
-    Why this exists:
-    - Multi-model QA improves answer quality by synthesizing specialized model outputs.
-    """
-    evidence, citations = build_evidence_bundle(artifacts, question, semantic_hits=semantic_hits)
-    *_, max_evidence_json_chars = _qa_limits_from_env()
-    evidence_json = _evidence_json_with_cap(evidence, max_chars=max_evidence_json_chars)
+_SYNTH_SYSTEM = (
+    "You are CodeKnowl Synthesizer. "
+    "You must only use the provided evidence bundle and the two candidate answers. "
+    "Produce a single coherent final answer. "
+    "If the candidates conflict, resolve the conflict explicitly and prefer claims supported by evidence. "
+    "Do not invent file names or line numbers; preserve citations where applicable."
+)
 
-    responder_system = (
-        "You are CodeKnowl, an on-prem codebase analyst. "
-        "You must only use the provided evidence bundle. "
-        "If the evidence is insufficient, say so and ask for a file path or symbol name. "
-        "Do not invent file names or line numbers. "
-        "Return a short answer with citations (file paths + line ranges) where applicable."
-    )
 
-    responder_user = (
+def _responder_user(question: str, evidence_json: str) -> str:
+    return (
         "Question:\n"
         f"{question}\n\n"
         "Evidence bundle (JSON):\n"
@@ -370,18 +399,9 @@ def answer_with_llm_synthesis(
         "Return an answer grounded only in the evidence bundle."
     )
 
-    coding_answer = coding_llm.chat(system=responder_system, user=responder_user)
-    general_answer = general_llm.chat(system=responder_system, user=responder_user)
-
-    synth_system = (
-        "You are CodeKnowl Synthesizer. "
-        "You must only use the provided evidence bundle and the two candidate answers. "
-        "Produce a single coherent final answer. "
-        "If the candidates conflict, resolve the conflict explicitly and prefer claims supported by evidence. "
-        "Do not invent file names or line numbers; preserve citations where applicable."
-    )
 
-    synth_user = (
+def _synth_user(question: str, evidence_json: str, *, coding_answer: str, general_answer: str) -> str:
+    return (
         "Question:\n"
         f"{question}\n\n"
         "Evidence bundle (JSON):\n"
@@ -393,5 +413,227 @@ def answer_with_llm_synthesis(
         "Return the final synthesized answer."
     )
 
-    final_answer = synth_llm.chat(system=synth_system, user=synth_user)
-    return AskResult(answer=final_answer, citations=citations, evidence=evidence)
+
+def _synthesis_evidence(
+    artifacts: dict[str, Any], question: str, semantic_hits: list[dict[str, Any]] | None
+) -> tuple[dict[str, Any], list[dict[str, Any]], str]:
+    evidence, citations = build_evidence_bundle(artifacts, question, semantic_hits=semantic_hits)
+    *_, max_evidence_json_chars = _qa_limits_from_env()
+    return evidence, citations, _evidence_json_with_cap(evidence, max_chars=max_evidence_json_chars)
+
+
+@dataclass(frozen=True)
+class _Candidate:
+    answer: str | None
+    status: str
+    seconds: float
+
+
+def _candidate_deadline(profile: str) -> float | None:
+    """Seconds the `profile` candidate may take before synthesis proceeds without it; 0 disables the deadline.
+
+    `CODEKNOWL_ASK_<PROFILE>_CANDIDATE_DEADLINE_SECONDS` overrides `CODEKNOWL_ASK_CANDIDATE_DEADLINE_SECONDS`. The
+    deadline is independent of the profile's HTTP timeout, which still bounds each request on its own.
+    """
+    default = os.environ.get("CODEKNOWL_ASK_CANDIDATE_DEADLINE_SECONDS", "30")
+    seconds = float(os.environ.get(f"CODEKNOWL_ASK_{profile.upper()}_CANDIDATE_DEADLINE_SECONDS", default))
+    return seconds if seconds > 0 else None
+
+
+def _failed_candidate(profile: str, exc: BaseException, started: float) -> _Candidate:
+    status = "timeout" if isinstance(exc, (TimeoutError, httpx.TimeoutException)) else "failed"
+    logger.warning("Candidate answer from the %s profile %s: %s", profile, status, exc)
+    return _Candidate(answer=None, status=status, seconds=time.perf_counter() - started)
+
+
+def _chat_candidate(profile: str, llm: Any, user: str) -> _Candidate:
+    started = time.perf_counter()
+    try:
+        answer = llm.chat(system=_RESPONDER_SYSTEM, user=user)
+    except Exception as exc:  # noqa: BLE001
+        return _failed_candidate(profile, exc, started)
+    return _Candidate(answer=answer, status="ok", seconds=time.perf_counter() - started)
+
+
+async def _achat_candidate(profile: str, llm: Any, user: str) -> _Candidate:
+    started = time.perf_counter()
+    try:
+        answer = await asyncio.wait_for(llm.achat(system=_RESPONDER_SYSTEM, user=user), _candidate_deadline(profile))
+    except Exception as exc:  # noqa: BLE001
+        return _failed_candidate(profile, exc, started)
+    return _Candidate(answer=answer, status="ok", seconds=time.perf_counter() - started)
+
+
+def _chat_candidates(llms: dict[str, Any], user: str) -> dict[str, _Candidate]:
+    """Ask every profile concurrently; a profile that misses its deadline is reported as timed out."""
+    started = time.perf_counter()
+    executor = ThreadPoolExecutor(max_workers=len(llms), thread_name_prefix="codeknowl-candidate")
+    futures = {profile: executor.submit(_chat_candidate, profile, llm, user) for profile, llm in llms.items()}
+    out: dict[str, _Candidate] = {}
+    try:
+        for profile, future in futures.items():
+            deadline = _candidate_deadline(profile)
+            remaining = None if deadline is None else max(0.0, started + deadline - time.perf_counter())
+            try:
+                out[profile] = future.result(timeout=remaining)
+            except FutureTimeoutError as exc:
+                out[profile] = _failed_candidate(profile, exc, started)
+    finally:
+        # A timed-out call keeps its worker thread until the HTTP timeout fires; never wait for it here.
+        executor.shutdown(wait=False, cancel_futures=True)
+    return out
+
+
+def _candidate_text(profile: str, candidate: _Candidate) -> str:
+    if candidate.answer is not None:
+        return candidate.answer
+    reason = "timed out" if candidate.status == "timeout" else "failed"
+    return f"(no candidate answer: the {profile} model {reason}; rely on the evidence and the other candidate)"
+
+
+def _record_candidates(candidates: dict[str, _Candidate], timings: StageTimings) -> dict[str, str]:
+    for profile, candidate in candidates.items():
+        timings.record(f"candidate_{profile}", candidate.seconds)
+        METRICS.inc_qa_candidate(profile, candidate.status)
+    return {profile: candidate.status for profile, candidate in candidates.items()}
+
+
+def answer_with_llm_synthesis(
+    *,
+    coding_llm: OpenAiCompatibleClient,
+    general_llm: OpenAiCompatibleClient,
+    synth_llm: OpenAiCompatibleClient,
+    artifacts: dict[str, Any],
+    question: str,
+    semantic_hits: list[dict[str, Any]] | None = None,
+) -> AskResult:
+    """Generate a multi-model synthesized answer from three LLM profiles.
+
+    The coding and general candidates are requested concurrently, each bounded by its profile's candidate deadline. The
+    synthesizer still runs when a candidate fails or times out; `AskResult.candidates` reports each outcome.
+
+    Why this exists:
+    - Multi-model QA improves answer quality by synthesizing specialized model outputs.
+    """
+    timings = StageTimings()
+    with timings.stage("evidence"):
+        evidence, citations, evidence_json = _synthesis_evidence(artifacts, question, semantic_hits)
+    responder_user = _responder_user(question, evidence_json)
+
+    with timings.stage("candidates"):
+        candidates = _chat_candidates({"coding": coding_llm, "general": general_llm}, responder_user)
+    statuses = _record_candidates(candidates, timings)
+
+    synth_user = _synth_user(
+        question,
+        evidence_json,
+        coding_answer=_candidate_text("coding", candidates["coding"]),
+        general_answer=_candidate_text("general", candidates["general"]),
+    )
+    with timings.stage("synth"):
+        final_answer = synth_llm.chat(system=_SYNTH_SYSTEM, user=synth_user)
+    return AskResult(
+        answer=final_answer,
+        citations=citations,
+        evidence=evidence,
+        stage_seconds=timings.seconds,
+        candidates=statuses,
+    )
+
+
+async def aanswer_with_llm_synthesis(
+    *,
+    coding_llm: OpenAiCompatibleClient,
+    general_llm: OpenAiCompatibleClient,
+    synth_llm: OpenAiCompatibleClient,
+    artifacts: dict[str, Any],
+    question: str,
+    semantic_hits: list[dict[str, Any]] | None = None,
+) -> AskResult:
+    """Async variant of `answer_with_llm_synthesis`.
+
+    Evidence bundling walks the snapshot artifacts and runs in a worker thread; LLM calls use `achat`.
+
+    Why this exists:
+    - The API server must keep serving other requests while LLM calls are in flight.
+    """
+    timings = StageTimings()
+    with timings.stage("evidence"):
+        evidence, citations, evidence_json = await asyncio.to_thread(
+            _synthesis_evidence, artifacts, question, semantic_hits
+        )
+    responder_user = _responder_user(question, evidence_json)
+
+    with timings.stage("candidates"):
+        coding, general = await asyncio.gather(
+            _achat_candidate("coding", coding_llm, responder_user),
+            _achat_candidate("general", general_llm, responder_user),
+        )
+    statuses = _record_candidates({"coding": coding, "general": general}, timings)
+
+    synth_user = _synth_user(
+        question,
+        evidence_json,
+        coding_answer=_candidate_text("coding", coding),
+        general_answer=_candidate_text("general", general),
+    )
+    with timings.stage("synth"):
+        final_answer = await synth_llm.achat(system=_SYNTH_SYSTEM, user=synth_user)
+    return AskResult(
+        answer=final_answer,
+        citations=citations,
+        evidence=evidence,
+        stage_seconds=timings.seconds,
+        candidates=statuses,
+    )
+
+
+async def astream_answer_with_llm_synthesis(
+    *,
+    coding_llm: OpenAiCompatibleClient,
+    general_llm: OpenAiCompatibleClient,
+    synth_llm: OpenAiCompatibleClient,
+    artifacts: dict[str, Any],
+    question: str,
+    semantic_hits: list[dict[str, Any]] | None = None,
+    timings: StageTimings | None = None,
+) -> AsyncIterator[tuple[str, dict[str, Any]]]:
+    """Stream a synthesized answer as `(event, data)` pairs.
+
+    Events, in order: `evidence` (evidence bundle and citations), `candidates` (outcome per candidate profile), then
+    one `token` per content delta of the synthesizer. Closing the iterator cancels whichever LLM call is in flight.
+
+    Why this exists:
+    - The IDE shows citations right away and renders the answer while it is generated.
+    """
+    timings = timings or StageTimings()
+    with timings.stage("evidence"):
+        evidence, citations, evidence_json = await asyncio.to_thread(
+            _synthesis_evidence, artifacts, question, semantic_hits
+        )
+    yield "evidence", {"citations": citations, "evidence": evidence}
+
+    responder_user = _responder_user(question, evidence_json)
+    with timings.stage("candidates"):
+        coding, general = await asyncio.gather(
+            _achat_candidate("coding", coding_llm, responder_user),
+            _achat_candidate("general", general_llm, responder_user),
+        )
+    yield "candidates", _record_candidates({"coding": coding, "general": general}, timings)
+
+    synth_user = _synth_user(
+        question,
+        evidence_json,
+        coding_answer=_candidate_text("coding", coding),
+        general_answer=_candidate_text("general", general),
+    )
+    started = time.perf_counter()
+    first_token = True
+    try:
+        async for token in synth_llm.astream_chat(system=_SYNTH_SYSTEM, user=synth_user):
+            if first_token:
+                timings.record("synth_first_token", time.perf_counter() - started)
+                first_token = False
+            yield "token", {"text": token}
+    finally:
+        timings.record("synth", time.perf_counter() - started)
@@ -10,7 +10,9 @@ License: MIT (see LICENSE)
 from __future__ import annotations
 
 import logging
+from collections.abc import AsyncIterator
 from pathlib import Path
+from typing import Any
 
 from codeknowl.queue import JobQueue, create_queue
 from codeknowl.service import CodeKnowlService
@@ -157,8 +159,15 @@ class AsyncCodeKnowlService:
         Why this exists:
         - The IDE needs natural language Q&A with LLM-generated answers.
         """
-        # This remains synchronous for now but could be made async later
-        return self._sync_service.qa_ask_llm(repo_id, question)
+        return await self._sync_service.aqa_ask_llm(repo_id, question)
+
+    def stream_qa_ask_llm(self, repo_id: str, question: str) -> AsyncIterator[tuple[str, dict[str, Any]]]:
+        """Stream an LLM-backed answer as `(event, data)` pairs.
+
+        Why this exists:
+        - The IDE renders citations first and then the answer as it is generated.
+        """
+        return self._sync_service.astream_qa_ask_llm(repo_id, question)
 
 
 async def create_async_service(data_dir: Path) -> AsyncCodeKnowlService:
@@ -13,9 +13,10 @@ import time
 from dataclasses import dataclass
 from typing import Any
 
-import httpx
 import jwt
 
+from codeknowl.http_pool import http_pool
+
 
 @dataclass(frozen=True)
 class AuthContext:
@@ -122,7 +123,7 @@ class OidcVerifier:
         return time.time()
 
     def _http_get_json(self, url: str) -> dict[str, Any]:
-        response = httpx.get(url, timeout=self._http_timeout_seconds)
+        response = http_pool().sync_client(url).get(url, timeout=self._http_timeout_seconds)
         response.raise_for_status()
         data = response.json()
         if not isinstance(data, dict):
@@ -0,0 +1,168 @@
+"""File: backend/src/codeknowl/callee_index.py
+Purpose: Call-site postings keyed by the last identifier segment of each callee expression, with an optional trigram
+index over distinct callee expressions for substring queries.
+Product/business importance: What-calls navigation must answer from postings instead of testing every call record,
+which does not scale to repositories with millions of call sites.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from array import array
+from collections.abc import Iterable, Mapping, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from codeknowl.snapshot_format import LazySnapshotArtifacts, SnapshotReader, postings_columns
+
+# Binary snapshot tables: segment postings into calls, distinct callee expressions, and trigram postings into those.
+CALLEE_SEGMENTS_TABLE = "call_segments"
+CALLEE_NAMES_TABLE = "call_callee_names"
+CALLEE_TRIGRAMS_TABLE = "call_callee_trigrams"
+
+_SEGMENT_SEPARATORS = (".", "::", "/")
+_SEGMENT_SPLIT = re.compile(r"\.|::|/")
+
+
+def callee_segment(callee_expr: str) -> str:
+    """Return the last identifier segment of a callee expression (`a.b::c/d` -> `d`)."""
+    return _SEGMENT_SPLIT.split(callee_expr)[-1]
+
+
+def callee_matches(callee_expr: str, requested: str) -> bool:
+    """Return True if a callee expression is `requested` or ends with it as whole trailing segments.
+
+    Why this exists:
+    - `greet` should match `self.greet` and `mod::greet`, but not `greeting` or `regreet`.
+    """
+    if callee_expr == requested:
+        return True
+    return any(callee_expr.endswith(f"{sep}{requested}") for sep in _SEGMENT_SEPARATORS)
+
+
+def _trigrams(text: str) -> set[str]:
+    return {text[i : i + 3] for i in range(len(text) - 2)}
+
+
+def callee_trigrams_from_env() -> bool:
+    """Return True if snapshots should include the trigram index for substring what-calls queries (default on).
+
+    Why this exists:
+    - The trigram tables are only needed for substring search; very large deployments may skip writing them.
+    """
+    return os.environ.get("CODEKNOWL_SNAPSHOT_CALLEE_TRIGRAMS", "on").strip().lower() not in {"0", "off", "false", "no"}
+
+
+@dataclass(frozen=True)
+class CalleeIndex:
+    """In-memory callee postings for a snapshot's calls section.
+
+    `segments` maps a last segment to call row numbers; `names` lists the distinct callee expressions in sorted
+    order, and `trigrams` maps each trigram to positions in `names` (None when the trigram index is disabled).
+    Postings are compact `array("q")` values, since a large repository has tens of millions of entries.
+
+    Why this exists:
+    - Both what-calls modes (whole-segment and substring) resolve candidate rows without touching unrelated calls.
+    """
+
+    segments: dict[str, array]
+    names: list[str]
+    trigrams: dict[str, array] | None
+
+    @staticmethod
+    def from_calls(calls: Iterable[Mapping[str, Any]], *, trigrams: bool = True) -> "CalleeIndex":
+        """Build the index from call dicts in snapshot order."""
+        segments: dict[str, array] = {}
+        distinct: set[str] = set()
+        for row, call in enumerate(calls):
+            callee_expr = call.get("callee_name") or ""
+            segment = callee_segment(callee_expr)
+            postings = segments.get(segment)
+            if postings is None:
+                postings = segments[segment] = array("q")
+            postings.append(row)
+            distinct.add(callee_expr)
+        names = sorted(distinct)
+        trigram_postings: dict[str, array] | None = None
+        if trigrams:
+            trigram_postings = {}
+            for position, name in enumerate(names):
+                for gram in _trigrams(name):
+                    postings = trigram_postings.get(gram)
+                    if postings is None:
+                        postings = trigram_postings[gram] = array("q")
+                    postings.append(position)
+        return CalleeIndex(segments=segments, names=names, trigrams=trigram_postings)
+
+    def segment_rows(self, segment: str) -> list[int]:
+        return list(self.segments.get(segment, ()))
+
+    def names_containing(self, text: str) -> list[str]:
+        if self.trigrams is None or len(text) < 3:
+            return [name for name in self.names if text in name]
+        positions = _intersect(self.trigrams.get(gram, ()) for gram in _trigrams(text))
+        return [name for name in (self.names[p] for p in positions) if text in name]
+
+    def to_tables(self) -> dict[str, dict[str, Sequence[Any]]]:
+        """Return the binary snapshot tables in columnar form."""
+        tables = {
+            CALLEE_SEGMENTS_TABLE: postings_columns(self.segments),
+            CALLEE_NAMES_TABLE: {"name": self.names},
+        }
+        if self.trigrams is not None:
+            tables[CALLEE_TRIGRAMS_TABLE] = postings_columns(self.trigrams)
+        return tables
+
+
+class SnapshotCalleeIndex:
+    """Callee postings answered in place from a memory-mapped snapshot.
+
+    Why this exists:
+    - The first what-calls query on a large snapshot should not decode millions of postings.
+    """
+
+    def __init__(self, reader: SnapshotReader) -> None:
+        self._segments = reader.table(CALLEE_SEGMENTS_TABLE)
+        self._names = reader.table(CALLEE_NAMES_TABLE)
+        self._trigrams = reader.table(CALLEE_TRIGRAMS_TABLE) if reader.has_section(CALLEE_TRIGRAMS_TABLE) else None
+
+    def segment_rows(self, segment: str) -> list[int]:
+        return self._segments.postings(segment)
+
+    def names_containing(self, text: str) -> list[str]:
+        if self._trigrams is None or len(text) < 3:
+            return [name for name in self._names.column("name") if text in name]
+        positions = _intersect(self._trigrams.postings(gram) for gram in _trigrams(text))
+        return [name for name in (self._names.row(p)["name"] for p in positions) if text in name]
+
+
+def _intersect(postings: Iterable[Sequence[int]]) -> list[int]:
+    ordered = sorted(postings, key=len)
+    if not ordered:
+        return []
+    result = set(ordered[0])
+    for other in ordered[1:]:
+        if not result:
+            break
+        result.intersection_update(other)
+    return sorted(result)
+
+
+def callee_index_from_artifacts(artifacts: Mapping[str, Any]) -> CalleeIndex | SnapshotCalleeIndex:
+    """Return the persisted callee index of a loaded snapshot, rebuilding it from calls for older snapshots.
+
+    Why this exists:
+    - Snapshots written before the index existed must still answer what-calls queries.
+    """
+    if isinstance(artifacts, LazySnapshotArtifacts):
+        reader = artifacts.reader
+        if reader.has_section(CALLEE_SEGMENTS_TABLE) and reader.has_section(CALLEE_NAMES_TABLE):
+            return SnapshotCalleeIndex(reader)
+    cached = artifacts.get("callee_index")
+    if isinstance(cached, CalleeIndex):
+        return cached
+    return CalleeIndex.from_calls(artifacts.get("calls") or [])
@@ -0,0 +1,91 @@
+"""File: backend/src/codeknowl/chunk_text.py
+Purpose: Store chunk text once per repository, keyed by the sha256 of the text, and reference it from snapshot
+artifacts and vector payloads.
+Product/business importance: Overlapping chunks used to be stored in full in every snapshot, in the vector store,
+and in the JSON export; storing references keeps snapshots and vector payloads small.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+import hashlib
+from collections.abc import Iterable, Mapping
+from pathlib import Path
+from typing import Any
+
+from codeknowl.artifacts import artifacts_root
+from codeknowl.record_store import ContentStore
+
+CHUNK_TEXT_STORE_FILENAME = "chunk_text.sqlite"
+
+
+def chunk_text_ref(text: str) -> str:
+    """Return the reference under which a chunk's text is stored.
+
+    Why this exists:
+    - Vector payloads and snapshot artifacts compute the same reference without consulting the store.
+    """
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ChunkTextStore(ContentStore):
+    """Content-addressed chunk text for one repository.
+
+    Why this exists:
+    - Identical chunk text (unchanged files across snapshots, repeated boilerplate) is stored exactly once.
+    """
+
+    table = "chunk_texts"
+
+    @staticmethod
+    def for_repo(data_dir: Path, repo_id: str) -> "ChunkTextStore":
+        """Return the chunk text store of a repository (it lives next to the repo's snapshot directories)."""
+        return ChunkTextStore(artifacts_root(data_dir) / repo_id / CHUNK_TEXT_STORE_FILENAME)
+
+    def put_texts(self, texts: Iterable[str]) -> None:
+        """Store chunk texts; texts already present are only marked as recently used."""
+        self.put_payloads({chunk_text_ref(text): text.encode("utf-8") for text in texts})
+
+    def get_texts(self, refs: Iterable[str]) -> dict[str, str]:
+        """Return the texts for `refs` in one batch; unknown refs are absent from the result."""
+        return {ref: payload.decode("utf-8") for ref, payload in self.get_payloads(refs).items()}
+
+
+def dehydrate_chunks(store: ChunkTextStore, chunks: Iterable[Mapping[str, Any]]) -> list[dict[str, Any]]:
+    """Return chunk dicts with inline `text` replaced by `text_ref`, storing any text not stored yet.
+
+    Chunks that already carry a `text_ref` (carried over from an earlier snapshot) are kept as they are.
+
+    Why this exists:
+    - Snapshot artifacts and per-file records hold references only; the text lives in the store.
+    """
+    out: list[dict[str, Any]] = []
+    texts: list[str] = []
+    for chunk in chunks:
+        item = dict(chunk)
+        if "text" in item:
+            text = str(item.pop("text") or "")
+            item["text_ref"] = chunk_text_ref(text)
+            texts.append(text)
+        out.append(item)
+    if texts:
+        store.put_texts(texts)
+    return out
+
+
+def resolve_chunk_texts(store: ChunkTextStore, items: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Fill `text` for items that only carry a `text_ref`, with one store lookup for the whole batch.
+
+    Items whose text cannot be resolved get an empty `text`.
+
+    Why this exists:
+    - Evidence building and reranking need the text of a handful of hits, never of the whole snapshot.
+    """
+    refs = {item["text_ref"] for item in items if not item.get("text") and item.get("text_ref")}
+    texts = store.get_texts(refs) if refs else {}
+    for item in items:
+        if not item.get("text"):
+            item["text"] = texts.get(item.get("text_ref") or "", "")
+    return items
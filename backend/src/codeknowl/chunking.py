@@ -9,9 +9,61 @@ License: MIT (see LICENSE)
 from __future__ import annotations
 
 import hashlib
+import os
 from dataclasses import asdict, dataclass
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
+
+from codeknowl.repo import git_blob_sha
+
+if TYPE_CHECKING:
+    from codeknowl.extraction_cache import ExtractionCache
+
+
+CHUNK_MODES: tuple[str, ...] = ("fixed", "content", "symbol")
+
+# Lines hashed together to decide whether a content-defined boundary falls after a line. A boundary depends only on
+# this window, so boundaries downstream of an edit are found again once the window has moved past it.
+_CDC_WINDOW_LINES = 3
+
+
+@dataclass(frozen=True)
+class ChunkingConfig:
+    """How files are split into chunks.
+
+    `fixed` cuts 200-line windows with 20 lines of overlap. `content` cuts where a rolling hash over the last few
+    lines matches, between `min_lines` and `max_lines` lines per chunk (about `target_lines` on average), and derives
+    chunk IDs from the chunk text instead of its line numbers. `symbol` aligns chunks to the function/class ranges
+    found by extraction, packing neighbours together up to `max_tokens` and splitting larger definitions (files
+    without symbols are chunked like `content`); it uses text-derived IDs as well.
+
+    Why this exists:
+    - Operators choose between the long-standing fixed windows and boundaries that stay put when lines are inserted.
+    """
+
+    mode: str = "fixed"
+    min_lines: int = 32
+    target_lines: int = 96
+    max_lines: int = 200
+    max_tokens: int = 2048
+
+    @staticmethod
+    def from_env(prefix: str = "CODEKNOWL_CHUNK_") -> "ChunkingConfig":
+        """Load chunking settings from environment variables.
+
+        Why this exists:
+        - The backend should be configurable via environment without code changes.
+        """
+        mode = os.environ.get(f"{prefix}MODE", "fixed").strip().lower()
+        if mode not in CHUNK_MODES:
+            raise ValueError(f"{prefix}MODE must be one of {', '.join(CHUNK_MODES)}")
+        min_lines = max(1, int(os.environ.get(f"{prefix}MIN_LINES", "32")))
+        max_lines = max(min_lines, int(os.environ.get(f"{prefix}MAX_LINES", "200")))
+        target_lines = min(max_lines, max(min_lines, int(os.environ.get(f"{prefix}TARGET_LINES", "96"))))
+        max_tokens = max(16, int(os.environ.get(f"{prefix}MAX_TOKENS", "2048")))
+        return ChunkingConfig(
+            mode=mode, min_lines=min_lines, target_lines=target_lines, max_lines=max_lines, max_tokens=max_tokens
+        )
 
 
 @dataclass(frozen=True)
@@ -48,6 +100,186 @@ def _hash_chunk_id(*, repo_id: str, file_path: str, start_line: int, end_line: i
     return hashlib.sha256(raw).hexdigest()
 
 
+def _content_chunk_id(*, repo_id: str, file_path: str, text: str, occurrence: int) -> str:
+    """Generate a chunk ID from the chunk's text, so it survives edits elsewhere in the file.
+
+    Why this exists:
+    - Content-defined chunks keep their text when lines above them move; their IDs must not move either.
+    """
+    digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+    return hashlib.sha256(f"{repo_id}:{file_path}:{digest}:{occurrence}".encode("utf-8")).hexdigest()
+
+
+def chunk_records_from_spans(
+    *,
+    repo_id: str,
+    file_path: str,
+    spans: list[tuple[int, int, str]],
+    content_ids: bool = False,
+) -> list[ChunkRecord]:
+    """Build chunk records for `(start_line, end_line, text)` spans of one file.
+
+    With `content_ids`, IDs hash the chunk text (plus its occurrence number among identical chunks of the file)
+    instead of its line range.
+
+    Why this exists:
+    - Chunk spans cached per blob must be rebound to the repo/path they are reused for with the same stable IDs.
+    """
+    seen: dict[str, int] = {}
+    records: list[ChunkRecord] = []
+    for start_line, end_line, text in spans:
+        if content_ids:
+            occurrence = seen.get(text, 0)
+            seen[text] = occurrence + 1
+            chunk_id = _content_chunk_id(repo_id=repo_id, file_path=file_path, text=text, occurrence=occurrence)
+        else:
+            chunk_id = _hash_chunk_id(repo_id=repo_id, file_path=file_path, start_line=start_line, end_line=end_line)
+        records.append(
+            ChunkRecord(chunk_id=chunk_id, file_path=file_path, start_line=start_line, end_line=end_line, text=text)
+        )
+    return records
+
+
+def _line_hash(line: str) -> int:
+    return int.from_bytes(hashlib.blake2b(line.strip().encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def content_defined_spans(
+    lines: list[str], *, min_lines: int, target_lines: int, max_lines: int
+) -> list[tuple[int, int, str]]:
+    """Split lines where a hash of the last few lines selects a boundary.
+
+    A chunk ends after line `i` once it has `min_lines` lines and the hash of lines `i - 2 .. i` is divisible by
+    `target_lines - min_lines + 1` (so chunks average about `target_lines`), or when it reaches `max_lines`.
+    Leading and trailing whitespace is ignored when hashing, so re-indenting does not move boundaries.
+
+    Why this exists:
+    - An inserted line only changes the chunk it lands in (and rarely the next); later boundaries line up again.
+    """
+    hashes = [_line_hash(line) for line in lines]
+    divisor = max(1, target_lines - min_lines + 1)
+    spans: list[tuple[int, int, str]] = []
+    start = 0
+    for i in range(len(lines)):
+        size = i - start + 1
+        cut = i == len(lines) - 1 or size >= max_lines
+        if not cut and size >= min_lines:
+            window = 0
+            for h in hashes[max(0, i - _CDC_WINDOW_LINES + 1) : i + 1]:
+                window = ((window * 0x100000001B3) ^ h) & 0xFFFFFFFFFFFFFFFF
+            cut = window % divisor == 0
+        if cut:
+            text = "\n".join(lines[start : i + 1]).strip()
+            if text:
+                spans.append((start + 1, i + 1, text))
+            start = i + 1
+    return spans
+
+
+def estimate_tokens(text: str) -> int:
+    """Approximate the token count of `text` (about four characters per token for code and English).
+
+    Why this exists:
+    - Chunk budgets must hold for any embedding model without depending on that model's tokenizer.
+    """
+    return (len(text) + 3) // 4
+
+
+class _LineBudget:
+    """Token estimates for line ranges of one file (1-based, inclusive)."""
+
+    def __init__(self, lines: list[str]) -> None:
+        self._prefix = [0]
+        for line in lines:
+            self._prefix.append(self._prefix[-1] + len(line) + 1)
+
+    def tokens(self, start: int, end: int) -> int:
+        return (self._prefix[end] - self._prefix[start - 1] + 3) // 4
+
+
+def _outermost(ranges: list[tuple[int, int]], start: int, end: int) -> list[tuple[int, int]]:
+    """Return the ranges within `start..end` (excluding that exact range) that no other such range contains."""
+    clipped = {(max(s, start), min(e, end)) for s, e in ranges if s <= end and e >= start}
+    inside = sorted(clipped - {(start, end)}, key=lambda r: (r[0], -r[1]))
+    out: list[tuple[int, int]] = []
+    for s, e in inside:
+        if s > e or (out and s <= out[-1][1]):
+            continue
+        out.append((s, e))
+    return out
+
+
+def _split_lines(budget: _LineBudget, start: int, end: int, max_tokens: int) -> list[tuple[int, int]]:
+    pieces: list[tuple[int, int]] = []
+    piece_start = start
+    for line in range(start, end + 1):
+        if line > piece_start and budget.tokens(piece_start, line) > max_tokens:
+            pieces.append((piece_start, line - 1))
+            piece_start = line
+    pieces.append((piece_start, end))
+    return pieces
+
+
+def _pack(budget: _LineBudget, units: list[tuple[int, int]], max_tokens: int) -> list[tuple[int, int]]:
+    packed: list[tuple[int, int]] = []
+    for start, end in units:
+        if packed and budget.tokens(packed[-1][0], end) <= max_tokens:
+            packed[-1] = (packed[-1][0], end)
+        else:
+            packed.append((start, end))
+    return packed
+
+
+def _symbol_units(
+    budget: _LineBudget, ranges: list[tuple[int, int]], start: int, end: int, max_tokens: int
+) -> list[tuple[int, int]]:
+    """Cover `start..end` with definitions (split when over budget) and the code between them."""
+    units: list[tuple[int, int]] = []
+    cursor = start
+    for s, e in _outermost(ranges, start, end):
+        if s > cursor:
+            units.extend(_split_lines(budget, cursor, s - 1, max_tokens))
+        if budget.tokens(s, e) <= max_tokens:
+            units.append((s, e))
+        elif _outermost(ranges, s, e):
+            # A large class splits along its methods; its header packs with the first of them.
+            units.extend(_pack(budget, _symbol_units(budget, ranges, s, e, max_tokens), max_tokens))
+        else:
+            units.extend(_split_lines(budget, s, e, max_tokens))
+        cursor = e + 1
+    if cursor <= end:
+        units.extend(_split_lines(budget, cursor, end, max_tokens))
+    return units
+
+
+def symbol_aligned_spans(
+    lines: list[str], symbol_ranges: list[tuple[int, int]], *, max_tokens: int
+) -> list[tuple[int, int, str]]:
+    """Split lines along definition boundaries, packing small definitions together within a token budget.
+
+    `symbol_ranges` are 1-based inclusive `(start_line, end_line)` ranges of extracted definitions. Chunks never
+    overlap and only cut through a definition when it alone exceeds `max_tokens`: a class is then split along its
+    methods, anything else along lines. A single line longer than the budget becomes its own chunk.
+
+    Why this exists:
+    - Fixed windows cut functions in half and repeat overlap text; whole definitions give denser chunks and evidence.
+    """
+    if not lines:
+        return []
+    budget = _LineBudget(lines)
+    units = _symbol_units(budget, symbol_ranges, 1, len(lines), max_tokens)
+    spans: list[tuple[int, int, str]] = []
+    for start, end in _pack(budget, units, max_tokens):
+        # Citations point at code, not at the blank lines a chunk was packed with.
+        while start <= end and not lines[start - 1].strip():
+            start += 1
+        while end >= start and not lines[end - 1].strip():
+            end -= 1
+        if start <= end:
+            spans.append((start, end, "\n".join(lines[start - 1 : end]).strip()))
+    return spans
+
+
 def chunk_file_text(
     *,
     repo_id: str,
@@ -56,9 +288,14 @@ def chunk_file_text(
     text: str,
     max_lines: int = 200,
     overlap_lines: int = 20,
+    config: ChunkingConfig | None = None,
+    symbol_ranges: list[tuple[int, int]] | None = None,
 ) -> list[ChunkRecord]:
     """Split a file’s text into overlapping, line-based chunks.
 
+    With a `content` mode `config`, boundaries are content-defined instead (see `content_defined_spans`). With a
+    `symbol` mode `config` and the file's definition ranges, chunks follow definitions (see `symbol_aligned_spans`).
+
     Why this exists:
     - Semantic indexing needs reasonably sized chunks that preserve context across boundaries.
     """
@@ -66,6 +303,15 @@ def chunk_file_text(
     if not lines:
         return []
 
+    if config is not None and config.mode == "symbol" and symbol_ranges:
+        spans = symbol_aligned_spans(lines, symbol_ranges, max_tokens=config.max_tokens)
+        return chunk_records_from_spans(repo_id=repo_id, file_path=file_path, spans=spans, content_ids=True)
+    if config is not None and config.mode in {"content", "symbol"}:
+        spans = content_defined_spans(
+            lines, min_lines=config.min_lines, target_lines=config.target_lines, max_lines=config.max_lines
+        )
+        return chunk_records_from_spans(repo_id=repo_id, file_path=file_path, spans=spans, content_ids=True)
+
     if max_lines <= 0:
         raise ValueError("max_lines must be > 0")
     if overlap_lines < 0:
@@ -73,36 +319,20 @@ def chunk_file_text(
     if overlap_lines >= max_lines:
         raise ValueError("overlap_lines must be < max_lines")
 
-    chunks: list[ChunkRecord] = []
+    spans: list[tuple[int, int, str]] = []
     i = 0
     while i < len(lines):
         start = i
         end = min(i + max_lines, len(lines))
-        start_line = start + 1
-        end_line = end
         chunk_text = "\n".join(lines[start:end]).strip()
         if chunk_text:
-            chunk_id = _hash_chunk_id(
-                repo_id=repo_id,
-                file_path=file_path,
-                start_line=start_line,
-                end_line=end_line,
-            )
-            chunks.append(
-                ChunkRecord(
-                    chunk_id=chunk_id,
-                    file_path=file_path,
-                    start_line=start_line,
-                    end_line=end_line,
-                    text=chunk_text,
-                )
-            )
+            spans.append((start + 1, end, chunk_text))
 
         if end >= len(lines):
             break
         i = end - overlap_lines
 
-    return chunks
+    return chunk_records_from_spans(repo_id=repo_id, file_path=file_path, spans=spans)
 
 
 def chunk_repo_files(
@@ -112,13 +342,18 @@ def chunk_repo_files(
     repo_path: Path,
     file_paths: list[str],
     max_bytes_per_file: int = 512_000,
+    cache: ExtractionCache | None = None,
+    config: ChunkingConfig | None = None,
 ) -> list[ChunkRecord]:
     """Chunk a list of repo files, skipping very large files.
 
+    When `cache` is given, files whose blob was chunked before are rebound from the cache instead of re-chunked.
+
     Why this exists:
     - Indexing needs to chunk many files while avoiding memory pressure from huge files.
     """
     chunks: list[ChunkRecord] = []
+    misses: list[tuple[str, None, list[ChunkRecord]]] = []
 
     for rel in file_paths:
         abs_path = repo_path / rel
@@ -127,17 +362,28 @@ def chunk_repo_files(
                 continue
             if abs_path.stat().st_size > max_bytes_per_file:
                 continue
-            text = abs_path.read_text(encoding="utf-8", errors="ignore")
+            data = abs_path.read_bytes()
         except OSError:
             continue
 
-        chunks.extend(
-            chunk_file_text(
-                repo_id=repo_id,
-                head_commit=head_commit,
-                file_path=rel,
-                text=text,
-            )
+        blob_sha = git_blob_sha(data) if cache is not None else ""
+        cached = cache.get_chunks(blob_sha, config) if cache is not None else None
+        if cached is not None:
+            chunks.extend(cached.bind(repo_id=repo_id, rel_path=rel))
+            continue
+
+        file_chunks = chunk_file_text(
+            repo_id=repo_id,
+            head_commit=head_commit,
+            file_path=rel,
+            text=data.decode("utf-8", errors="ignore"),
+            config=config,
         )
+        if cache is not None:
+            # No definition ranges here: symbol mode falls back to content-defined chunks, cached under that key.
+            misses.append((blob_sha, None, file_chunks))
+        chunks.extend(file_chunks)
 
+    if cache is not None:
+        cache.put_chunk_records(misses, config)
     return chunks
@@ -15,6 +15,7 @@ import sys
 from pathlib import Path
 
 from codeknowl.config import AppConfig
+from codeknowl.http_pool import http_pool
 from codeknowl.service import CodeKnowlService
 
 
@@ -100,12 +101,36 @@ def _cmd_repo_status(service: CodeKnowlService, args) -> None:
     _print(service.repo_status(args.repo_id))
 
 
+def _cmd_snapshot_export_json(service: CodeKnowlService, args) -> None:
+    _print(service.export_snapshot_json(args.repo_id, args.head_commit))
+
+
+def _cmd_snapshot_pin(service: CodeKnowlService, args) -> None:
+    _print(service.pin_snapshot(args.repo_id, args.head_commit))
+
+
+def _cmd_snapshot_unpin(service: CodeKnowlService, args) -> None:
+    _print(service.unpin_snapshot(args.repo_id, args.head_commit))
+
+
+def _cmd_snapshot_gc(service: CodeKnowlService, args) -> None:
+    _print(service.collect_garbage(args.repo_id, dry_run=args.dry_run))
+
+
 def _cmd_qa_where_defined(service: CodeKnowlService, args) -> None:
-    _print(service.qa_where_is_symbol_defined(args.repo_id, args.symbol_name))
+    _print(
+        service.qa_where_is_symbol_defined(
+            args.repo_id, args.symbol_name, kinds=args.kind or None, ignore_case=args.ignore_case
+        )
+    )
 
 
 def _cmd_qa_what_calls(service: CodeKnowlService, args) -> None:
-    _print(service.qa_what_calls_symbol_best_effort(args.repo_id, args.callee_name))
+    _print(service.qa_what_calls_symbol_best_effort(args.repo_id, args.callee_name, substring=args.substring))
+
+
+def _cmd_qa_symbol_at_line(service: CodeKnowlService, args) -> None:
+    _print(service.qa_symbol_at_line(args.repo_id, args.file_path, args.line))
 
 
 def _cmd_qa_explain_file(service: CodeKnowlService, args) -> None:
@@ -162,13 +187,39 @@ def main() -> None:
     p_status = sub.add_parser("repo-status", help="Show repo status and latest index run")
     p_status.add_argument("repo_id")
 
+    p_export = sub.add_parser("snapshot-export-json", help="Write the JSON export of an indexed snapshot")
+    p_export.add_argument("repo_id")
+    p_export.add_argument("--head-commit", default=None, help="Snapshot commit (default: latest indexed head)")
+
+    p_pin = sub.add_parser("snapshot-pin", help="Keep a snapshot regardless of the retention policy")
+    p_pin.add_argument("repo_id")
+    p_pin.add_argument("head_commit")
+
+    p_unpin = sub.add_parser("snapshot-unpin", help="Return a pinned snapshot to the retention policy")
+    p_unpin.add_argument("repo_id")
+    p_unpin.add_argument("head_commit")
+
+    p_gc = sub.add_parser("snapshot-gc", help="Delete snapshots and run history outside the retention policy")
+    p_gc.add_argument("--repo-id", default=None, help="Only collect this repo (default: all repos)")
+    p_gc.add_argument("--dry-run", action="store_true", help="Report what would be removed without deleting")
+
     p_where = sub.add_parser("qa-where-defined", help="Where is a symbol defined? (artifact-backed)")
     p_where.add_argument("repo_id")
-    p_where.add_argument("symbol_name")
+    p_where.add_argument("symbol_name", help="Symbol name, optionally qualified as path/to/file.py:name")
+    p_where.add_argument("--kind", action="append", help="Only return symbols of this kind (repeatable)")
+    p_where.add_argument("--ignore-case", action="store_true", help="Match the name case-insensitively")
 
     p_calls = sub.add_parser("qa-what-calls", help="What calls a symbol? (best-effort heuristic)")
     p_calls.add_argument("repo_id")
     p_calls.add_argument("callee_name")
+    p_calls.add_argument(
+        "--substring", action="store_true", help="Match callee expressions containing the name anywhere"
+    )
+
+    p_at_line = sub.add_parser("qa-symbol-at-line", help="Which symbol contains a file line? (artifact-backed)")
+    p_at_line.add_argument("repo_id")
+    p_at_line.add_argument("file_path", help="Repo-relative file path")
+    p_at_line.add_argument("line", type=int, help="1-based line number")
 
     p_explain = sub.add_parser("qa-explain-file", help="Explain a file/module (deterministic stub)")
     p_explain.add_argument("repo_id")
@@ -194,8 +245,13 @@ def main() -> None:
         "repo-index": _cmd_repo_index,
         "repo-update": _cmd_repo_update,
         "repo-status": _cmd_repo_status,
+        "snapshot-export-json": _cmd_snapshot_export_json,
+        "snapshot-pin": _cmd_snapshot_pin,
+        "snapshot-unpin": _cmd_snapshot_unpin,
+        "snapshot-gc": _cmd_snapshot_gc,
         "qa-where-defined": _cmd_qa_where_defined,
         "qa-what-calls": _cmd_qa_what_calls,
+        "qa-symbol-at-line": _cmd_qa_symbol_at_line,
         "qa-explain-file": _cmd_qa_explain_file,
         "qa-find-occurrences": _cmd_qa_find_occurrences,
         "qa-ask": _cmd_qa_ask,
@@ -204,4 +260,7 @@ def main() -> None:
     handler = dispatch.get(args.cmd)
     if handler is None:
         raise RuntimeError(f"Unhandled command: {args.cmd}")
-    handler(service, args)
+    try:
+        handler(service, args)
+    finally:
+        http_pool().close()
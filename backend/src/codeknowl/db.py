@@ -81,4 +81,16 @@ def init_schema(conn: sqlite3.Connection) -> None:
         """
     )
 
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS snapshot_pins (
+            repo_id TEXT NOT NULL,
+            head_commit TEXT NOT NULL,
+            pinned_at_utc TEXT NOT NULL,
+            PRIMARY KEY(repo_id, head_commit),
+            FOREIGN KEY(repo_id) REFERENCES repos(repo_id)
+        )
+        """
+    )
+
     conn.commit()
@@ -0,0 +1,180 @@
+"""File: backend/src/codeknowl/embedding_cache.py
+Purpose: Persist chunk embeddings keyed by embedding model and the sha256 of the chunk text.
+Product/business importance: Embedding calls are the most expensive indexing stage; an edited file usually changes
+one chunk, so updates should only pay for the chunks whose text actually changed.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+import os
+import sqlite3
+import threading
+from array import array
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Protocol
+
+from codeknowl.chunk_text import chunk_text_ref
+
+# Look up at most this many digests per SELECT to stay under SQLite's default bound-parameter limit.
+_SELECT_BATCH = 500
+
+
+class EmbeddingsClient(Protocol):
+    def embed_texts(self, texts: list[str]) -> list[list[float]]: ...
+
+
+def embedding_model_id(client: object) -> str:
+    """Return the identity under which a client's vectors are cached.
+
+    Why this exists:
+    - Vectors from different models (or hash dimensions) must never be mixed up in the cache.
+    """
+    return str(getattr(client, "model_id", "") or type(client).__name__)
+
+
+def _encode(vector: list[float]) -> bytes:
+    # Doubles keep cached vectors bit-identical to the ones the client returned.
+    return array("d", vector).tobytes()
+
+
+def _decode(raw: bytes) -> list[float]:
+    values = array("d")
+    values.frombytes(raw)
+    return values.tolist()
+
+
+class EmbeddingCache:
+    """SQLite-backed cache of embedding vectors keyed by `(model, sha256(text))`.
+
+    Why this exists:
+    - Identical chunk text is embedded once per model, across files, snapshots, and repositories.
+    """
+
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = db_path
+        self._local = threading.local()
+
+    @staticmethod
+    def for_data_dir(data_dir: Path) -> "EmbeddingCache":
+        """Return the cache stored under a CodeKnowl data directory.
+
+        Why this exists:
+        - All services sharing a data dir share one cache.
+        """
+        return EmbeddingCache(data_dir / "cache" / "embeddings.sqlite")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS embedding_cache (
+                    model TEXT NOT NULL,
+                    text_sha TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    PRIMARY KEY (model, text_sha)
+                )
+                """
+            )
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def get_many(self, model: str, digests: Iterable[str]) -> dict[str, list[float]]:
+        """Return cached vectors for the given text digests; misses are absent from the result.
+
+        Why this exists:
+        - A run looks up all of its chunks in a few batched queries before calling the embeddings service.
+        """
+        wanted = list(dict.fromkeys(digests))
+        conn = self._connection()
+        out: dict[str, list[float]] = {}
+        for i in range(0, len(wanted), _SELECT_BATCH):
+            batch = wanted[i : i + _SELECT_BATCH]
+            marks = ",".join("?" * len(batch))
+            rows = conn.execute(
+                f"SELECT text_sha, vector FROM embedding_cache WHERE model = ? AND text_sha IN ({marks})",
+                (model, *batch),
+            )
+            out.update((sha, _decode(raw)) for sha, raw in rows)
+        return out
+
+    def put_many(self, model: str, vectors: Mapping[str, list[float]]) -> None:
+        """Store vectors for text digests in one transaction.
+
+        Why this exists:
+        - Misses from a run are written back together once the embeddings service answered.
+        """
+        if not vectors:
+            return
+        conn = self._connection()
+        conn.executemany(
+            "INSERT OR REPLACE INTO embedding_cache (model, text_sha, vector) VALUES (?, ?, ?)",
+            ((model, sha, _encode(v)) for sha, v in vectors.items()),
+        )
+        conn.commit()
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+
+@dataclass(frozen=True)
+class CachedEmbeddings:
+    """Vectors for a batch of texts plus how many were served from the cache.
+
+    `hits` and `misses` count distinct texts; duplicates within a batch are embedded once.
+
+    Why this exists:
+    - The run report shows how many embedding calls the cache saved.
+    """
+
+    vectors: list[list[float]]
+    hits: int
+    misses: int
+
+
+def embed_with_cache(client: EmbeddingsClient, texts: list[str], *, cache: EmbeddingCache | None) -> CachedEmbeddings:
+    """Embed `texts`, calling the client only for texts the cache has no vector for.
+
+    Why this exists:
+    - Updates delete and re-upsert every chunk of a changed file; unchanged chunks are copied forward from the cache.
+    """
+    if cache is None:
+        vectors = client.embed_texts(texts) if texts else []
+        return CachedEmbeddings(vectors=vectors, hits=0, misses=len(set(texts)))
+    model = embedding_model_id(client)
+    digests = [chunk_text_ref(t) for t in texts]
+    found = cache.get_many(model, digests)
+    missing = {d: t for d, t in zip(digests, texts, strict=True) if d not in found}
+    if missing:
+        fresh = client.embed_texts(list(missing.values()))
+        if len(fresh) != len(missing):
+            raise RuntimeError("Embeddings response size mismatch")
+        new_vectors = dict(zip(missing, fresh, strict=True))
+        cache.put_many(model, new_vectors)
+        found.update(new_vectors)
+    hits = len(set(digests)) - len(missing)
+    return CachedEmbeddings(vectors=[found[d] for d in digests], hits=hits, misses=len(missing))
+
+
+def embedding_cache_from_env(data_dir: Path) -> EmbeddingCache | None:
+    """Return the data-dir embedding cache unless disabled via environment.
+
+    Why this exists:
+    - Operators can turn the cache off (e.g., while evaluating a model that is served under a reused name).
+    """
+    mode = os.environ.get("CODEKNOWL_EMBED_CACHE", "on").strip().lower()
+    if mode in {"off", "false", "0", "disabled", "none"}:
+        return None
+    return EmbeddingCache.for_data_dir(data_dir)
@@ -8,12 +8,25 @@ License: MIT (see LICENSE)
 
 from __future__ import annotations
 
+import asyncio
 import hashlib
+import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 
 import httpx
 
+from codeknowl.chunking import estimate_tokens
+from codeknowl.http_pool import HttpPool, http_pool
+from codeknowl.metrics import METRICS
+
+logger = logging.getLogger(__name__)
+
+# Transient statuses worth retrying; any other HTTP error fails the batch immediately.
+_RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
 
 @dataclass(frozen=True)
 class EmbeddingsConfig:
@@ -28,6 +41,11 @@ class EmbeddingsConfig:
     api_key: str | None
     timeout_seconds: float
     embeddings_path: str
+    batch_size: int = 64
+    batch_max_tokens: int = 16_384
+    max_concurrency: int = 4
+    max_retries: int = 3
+    retry_backoff_seconds: float = 0.5
 
     @staticmethod
     def from_env(prefix: str = "CODEKNOWL_EMBED_") -> "EmbeddingsConfig":
@@ -51,9 +69,36 @@ class EmbeddingsConfig:
             api_key=api_key,
             timeout_seconds=timeout_seconds,
             embeddings_path=embeddings_path,
+            batch_size=max(1, int(os.environ.get(f"{prefix}BATCH_SIZE", "64"))),
+            batch_max_tokens=max(1, int(os.environ.get(f"{prefix}BATCH_MAX_TOKENS", "16384"))),
+            max_concurrency=max(1, int(os.environ.get(f"{prefix}MAX_CONCURRENCY", "4"))),
+            max_retries=max(0, int(os.environ.get(f"{prefix}MAX_RETRIES", "3"))),
+            retry_backoff_seconds=max(0.0, float(os.environ.get(f"{prefix}RETRY_BACKOFF_SECONDS", "0.5"))),
         )
 
 
+def plan_batches(texts: list[str], *, max_items: int, max_tokens: int) -> list[tuple[int, int]]:
+    """Split `texts` into consecutive `[start, end)` batches bounded by count and estimated tokens.
+
+    A text larger than `max_tokens` on its own gets a batch of its own (the server decides whether to truncate it).
+
+    Why this exists:
+    - Embedding servers reject or time out on oversized requests; batches must respect both limits.
+    """
+    batches: list[tuple[int, int]] = []
+    start = 0
+    tokens = 0
+    for i, text in enumerate(texts):
+        cost = estimate_tokens(text)
+        if i > start and (i - start >= max_items or tokens + cost > max_tokens):
+            batches.append((start, i))
+            start, tokens = i, 0
+        tokens += cost
+    if start < len(texts):
+        batches.append((start, len(texts)))
+    return batches
+
+
 class OpenAiCompatibleEmbeddingsClient:
     """HTTP client for OpenAI-compatible embeddings endpoints.
 
@@ -61,47 +106,148 @@ class OpenAiCompatibleEmbeddingsClient:
     - The backend needs to generate embeddings for semantic indexing using an external service.
     """
 
-    def __init__(self, config: EmbeddingsConfig):
+    def __init__(self, config: EmbeddingsConfig, *, pool: HttpPool | None = None):
         self._config = config
+        self._pool = pool
+
+    @property
+    def model_id(self) -> str:
+        """Identity of the vectors this client produces (used to key the embedding cache)."""
+        return self._config.model
 
     def embed_texts(self, texts: list[str]) -> list[list[float]]:
         """Generate embeddings for a list of texts.
 
+        Texts are sent in batches bounded by `batch_size` and `batch_max_tokens`, with up to `max_concurrency`
+        batches in flight. A failed batch is retried on its own with exponential backoff; vectors are returned in
+        the order of `texts`.
+
         Why this exists:
         - Indexing needs to turn chunks into vectors for storage and later retrieval.
         """
         if not texts:
             return []
 
+        cfg = self._config
+        batches = plan_batches(texts, max_items=cfg.batch_size, max_tokens=cfg.batch_max_tokens)
+        if len(batches) == 1 or cfg.max_concurrency <= 1:
+            results = [self._embed_batch(texts[start:end]) for start, end in batches]
+        else:
+            with ThreadPoolExecutor(max_workers=min(cfg.max_concurrency, len(batches))) as pool:
+                results = list(pool.map(lambda b: self._embed_batch(texts[b[0] : b[1]]), batches))
+        return [vector for batch in results for vector in batch]
+
+    async def aembed_texts(self, texts: list[str]) -> list[list[float]]:
+        """Async variant of `embed_texts` on the shared async connection pool.
+
+        Why this exists:
+        - The API server embeds questions without blocking its event loop.
+        """
+        if not texts:
+            return []
+
+        cfg = self._config
+        batches = plan_batches(texts, max_items=cfg.batch_size, max_tokens=cfg.batch_max_tokens)
+        limit = asyncio.Semaphore(cfg.max_concurrency)
+
+        async def run(start: int, end: int) -> list[list[float]]:
+            async with limit:
+                return await self._aembed_batch(texts[start:end])
+
+        results = await asyncio.gather(*(run(start, end) for start, end in batches))
+        return [vector for batch in results for vector in batch]
+
+    def _retry_delay(self, exc: Exception, *, attempt: int, texts: list[str], tokens: int, elapsed: float) -> float:
+        """Return the backoff before retrying a failed batch, or re-raise when it must not be retried."""
+        retryable = not isinstance(exc, httpx.HTTPStatusError) or exc.response.status_code in _RETRYABLE_STATUS
+        if not retryable or attempt >= self._config.max_retries:
+            METRICS.observe_embedding_batch("failed", seconds=elapsed, items=len(texts), tokens=tokens)
+            raise exc
+        METRICS.observe_embedding_batch("retried", seconds=elapsed, items=len(texts), tokens=tokens)
+        delay = self._config.retry_backoff_seconds * (2**attempt)
+        logger.warning("Embeddings batch of %d texts failed (%s); retrying in %.2fs", len(texts), exc, delay)
+        return delay
+
+    def _succeeded(self, texts: list[str], *, tokens: int, elapsed: float) -> None:
+        METRICS.observe_embedding_batch("succeeded", seconds=elapsed, items=len(texts), tokens=tokens)
+        logger.debug("Embedded %d texts (~%d tokens) in %.3fs", len(texts), tokens, elapsed)
+
+    def _embed_batch(self, texts: list[str]) -> list[list[float]]:
+        tokens = sum(estimate_tokens(t) for t in texts)
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                vectors = self._post(texts)
+            except (httpx.TransportError, httpx.HTTPStatusError) as exc:
+                elapsed = time.perf_counter() - started
+                delay = self._retry_delay(exc, attempt=attempt, texts=texts, tokens=tokens, elapsed=elapsed)
+                time.sleep(delay)
+                attempt += 1
+                continue
+            self._succeeded(texts, tokens=tokens, elapsed=time.perf_counter() - started)
+            return vectors
+
+    async def _aembed_batch(self, texts: list[str]) -> list[list[float]]:
+        tokens = sum(estimate_tokens(t) for t in texts)
+        attempt = 0
+        while True:
+            started = time.perf_counter()
+            try:
+                vectors = await self._apost(texts)
+            except (httpx.TransportError, httpx.HTTPStatusError) as exc:
+                elapsed = time.perf_counter() - started
+                delay = self._retry_delay(exc, attempt=attempt, texts=texts, tokens=tokens, elapsed=elapsed)
+                await asyncio.sleep(delay)
+                attempt += 1
+                continue
+            self._succeeded(texts, tokens=tokens, elapsed=time.perf_counter() - started)
+            return vectors
+
+    def _request(self, texts: list[str]) -> tuple[str, dict[str, str], dict[str, object]]:
         headers: dict[str, str] = {"Content-Type": "application/json"}
         if self._config.api_key:
             headers["Authorization"] = f"Bearer {self._config.api_key}"
 
         url = f"{self._config.base_url}{self._config.embeddings_path}"
-        payload = {"model": self._config.model, "input": texts}
+        return url, headers, {"model": self._config.model, "input": texts}
 
-        with httpx.Client(timeout=self._config.timeout_seconds) as client:
-            response = client.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            data = response.json()
+    def _post(self, texts: list[str]) -> list[list[float]]:
+        url, headers, payload = self._request(texts)
+        client = (self._pool or http_pool()).sync_client(url)
+        response = client.post(url, headers=headers, json=payload, timeout=self._config.timeout_seconds)
+        response.raise_for_status()
+        return _parse_vectors(response.json(), expected=len(texts))
 
-        items = data.get("data")
-        if not isinstance(items, list):
-            raise RuntimeError("Embeddings response missing data list")
+    async def _apost(self, texts: list[str]) -> list[list[float]]:
+        url, headers, payload = self._request(texts)
+        client = (self._pool or http_pool()).async_client(url)
+        response = await client.post(url, headers=headers, json=payload, timeout=self._config.timeout_seconds)
+        response.raise_for_status()
+        return _parse_vectors(response.json(), expected=len(texts))
 
-        vectors: list[list[float]] = []
-        for item in items:
-            if not isinstance(item, dict):
-                continue
-            emb = item.get("embedding")
-            if not isinstance(emb, list):
-                raise RuntimeError("Embeddings response item missing embedding")
-            vectors.append([float(x) for x in emb])
 
-        if len(vectors) != len(texts):
-            raise RuntimeError("Embeddings response size mismatch")
+def _parse_vectors(data: dict[str, object], *, expected: int) -> list[list[float]]:
+    items = data.get("data")
+    if not isinstance(items, list):
+        raise RuntimeError("Embeddings response missing data list")
 
-        return vectors
+    items = [item for item in items if isinstance(item, dict)]
+    # Servers may answer out of order; `index` (when present) says which input each vector belongs to.
+    if all(isinstance(item.get("index"), int) for item in items):
+        items.sort(key=lambda item: item["index"])
+
+    vectors: list[list[float]] = []
+    for item in items:
+        emb = item.get("embedding")
+        if not isinstance(emb, list):
+            raise RuntimeError("Embeddings response item missing embedding")
+        vectors.append([float(x) for x in emb])
+
+    if len(vectors) != expected:
+        raise RuntimeError("Embeddings response size mismatch")
+
+    return vectors
 
 
 class HashEmbeddingsClient:
@@ -114,6 +260,11 @@ class HashEmbeddingsClient:
     def __init__(self, *, dim: int = 384):
         self._dim = dim
 
+    @property
+    def model_id(self) -> str:
+        """Identity of the vectors this client produces (used to key the embedding cache)."""
+        return f"hash-{self._dim}"
+
     def embed_texts(self, texts: list[str]) -> list[list[float]]:
         """Generate deterministic hash-based embeddings for texts.
 
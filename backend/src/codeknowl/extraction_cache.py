@@ -0,0 +1,345 @@
+"""File: backend/src/codeknowl/extraction_cache.py
+Purpose: Persist per-blob extraction results (symbols, calls, chunks) keyed by git blob SHA and extractor version.
+Product/business importance: Re-indexing a branch, re-registering the same code, or applying an update only parses
+file contents CodeKnowl has never seen, so indexing cost tracks what changed instead of repository size.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import zlib
+from collections.abc import Iterable
+from dataclasses import dataclass
+from pathlib import Path
+
+from codeknowl.artifacts import CallRecord, SourceRange, SymbolRecord
+from codeknowl.chunking import ChunkingConfig, ChunkRecord, chunk_records_from_spans
+from codeknowl.indexing import stable_symbol_id
+
+# Bump when symbol/call extraction output changes for the same file bytes.
+EXTRACTOR_VERSION = "2"
+
+# Bump when chunk boundaries or chunk text change for the same file bytes.
+CHUNKER_VERSION = "fixed-200-20.1"
+
+# Bump when content-defined boundaries change for the same file bytes and settings.
+CONTENT_CHUNKER_VERSION = "1"
+
+_EXTRACT_NAMESPACE = "extract"
+_CHUNKS_NAMESPACE = "chunks"
+
+
+def _symbol_ranges_key(symbol_ranges: list[tuple[int, int]] | None) -> str:
+    if not symbol_ranges:
+        return "none"
+    # Symbol-aligned spans depend on the set of ranges, not on their order.
+    encoded = json.dumps(sorted({(int(s), int(e)) for s, e in symbol_ranges}), separators=(",", ":"))
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+def _chunks_variant(config: ChunkingConfig | None, symbol_ranges: list[tuple[int, int]] | None = None) -> str:
+    if config is None or config.mode == "fixed":
+        return CHUNKER_VERSION
+    variant = f"{config.mode}-{config.min_lines}-{config.target_lines}-{config.max_lines}"
+    if config.mode == "symbol":
+        # The same blob chunks differently per path: along its definitions when it was extracted, content-defined
+        # otherwise (non-extractable language, skipped extraction). The definition ranges are part of the key.
+        variant += f"-{config.max_tokens}-r{_symbol_ranges_key(symbol_ranges)}"
+    return f"{variant}.{CONTENT_CHUNKER_VERSION}"
+
+
+def _range_to_list(r: SourceRange) -> list[int]:
+    return [r.start_line, r.start_col, r.end_line, r.end_col]
+
+
+def _range_from_list(values: list[int]) -> SourceRange:
+    return SourceRange(start_line=values[0], start_col=values[1], end_line=values[2], end_col=values[3])
+
+
+@dataclass(frozen=True)
+class CachedExtraction:
+    """Path-independent symbols and calls for one blob.
+
+    Symbol IDs embed the repo-relative path, so the cache stores only kind/name/range and rebinds IDs and paths
+    when a cached entry is used for a specific file. Each call keeps its enclosing symbol as an index into
+    `symbols` (-1 at top level).
+
+    Why this exists:
+    - The same blob can appear under different paths, repos, and snapshots; one entry must serve all of them.
+    """
+
+    symbols: list[tuple[str, str, list[int]]]
+    calls: list[tuple[str, list[int], int]]
+
+    @staticmethod
+    def from_records(symbols: list[SymbolRecord], calls: list[CallRecord]) -> "CachedExtraction":
+        """Strip path-specific fields from freshly extracted records.
+
+        Why this exists:
+        - Cache entries are written from the output of a normal extraction.
+        """
+        positions = {s.symbol_id: i for i, s in enumerate(symbols)}
+        return CachedExtraction(
+            symbols=[(s.kind, s.name, _range_to_list(s.range)) for s in symbols],
+            calls=[(c.callee_name, _range_to_list(c.range), positions.get(c.caller_symbol_id, -1)) for c in calls],
+        )
+
+    def bind(self, rel_path: str) -> tuple[list[SymbolRecord], list[CallRecord]]:
+        """Materialize records for a specific repo-relative path.
+
+        Why this exists:
+        - A cache hit must produce exactly what a fresh extraction of that path would produce.
+        """
+        symbols: list[SymbolRecord] = []
+        for kind, name, values in self.symbols:
+            r = _range_from_list(values)
+            symbols.append(
+                SymbolRecord(
+                    symbol_id=stable_symbol_id(rel_path, kind, name, r.start_line),
+                    kind=kind,
+                    name=name,
+                    file_path=rel_path,
+                    range=r,
+                )
+            )
+        calls = [
+            CallRecord(
+                caller_symbol_id=symbols[caller].symbol_id if caller >= 0 else "",
+                callee_name=callee,
+                file_path=rel_path,
+                range=_range_from_list(values),
+            )
+            for callee, values, caller in self.calls
+        ]
+        return symbols, calls
+
+    def symbol_ranges(self) -> list[tuple[int, int]]:
+        """Return the `(start_line, end_line)` definition ranges, as symbol-aligned chunking consumes them.
+
+        Why this exists:
+        - On an extraction hit the symbol-mode chunk cache key is known without reading or parsing the blob.
+        """
+        return [(values[0], values[2]) for _, _, values in self.symbols]
+
+
+@dataclass(frozen=True)
+class CachedChunks:
+    """Path-independent chunk spans for one blob.
+
+    Why this exists:
+    - Chunk IDs embed repo ID and path, so only `(start_line, end_line, text)` spans are cached.
+    """
+
+    spans: list[tuple[int, int, str]]
+    content_ids: bool = False
+
+    @staticmethod
+    def from_records(chunks: list[ChunkRecord]) -> "CachedChunks":
+        """Strip path-specific fields from freshly produced chunks.
+
+        Why this exists:
+        - Cache entries are written from the output of a normal chunking pass.
+        """
+        return CachedChunks(spans=[(c.start_line, c.end_line, c.text) for c in chunks])
+
+    def bind(self, *, repo_id: str, rel_path: str) -> list[ChunkRecord]:
+        """Materialize chunk records for a specific repo and path.
+
+        Why this exists:
+        - A cache hit must produce exactly what a fresh chunking pass over that path would produce.
+        """
+        return chunk_records_from_spans(
+            repo_id=repo_id, file_path=rel_path, spans=self.spans, content_ids=self.content_ids
+        )
+
+
+def _encode(payload: object) -> bytes:
+    return zlib.compress(json.dumps(payload, separators=(",", ":")).encode("utf-8"))
+
+
+def _decode(raw: bytes) -> object:
+    return json.loads(zlib.decompress(raw).decode("utf-8"))
+
+
+class ExtractionCache:
+    """SQLite-backed cache of per-blob extraction and chunking results.
+
+    Reads are safe from any thread or pool worker (each gets its own connection); writes are batched by the
+    coordinating process after a run.
+
+    Why this exists:
+    - Index runs need a durable, shareable memory of what has already been parsed.
+    """
+
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = db_path
+        self._local = threading.local()
+
+    @staticmethod
+    def for_data_dir(data_dir: Path) -> "ExtractionCache":
+        """Return the cache stored under a CodeKnowl data directory.
+
+        Why this exists:
+        - All services sharing a data dir share one cache.
+        """
+        return ExtractionCache(data_dir / "cache" / "extraction.sqlite")
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS extraction_cache (
+                    namespace TEXT NOT NULL,
+                    blob_sha TEXT NOT NULL,
+                    variant TEXT NOT NULL,
+                    payload BLOB NOT NULL,
+                    PRIMARY KEY (namespace, blob_sha, variant)
+                )
+                """
+            )
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def __getstate__(self) -> dict[str, object]:
+        return {"db_path": self.db_path}
+
+    def __setstate__(self, state: dict[str, object]) -> None:
+        self.db_path = Path(str(state["db_path"]))
+        self._local = threading.local()
+
+    def _get(self, namespace: str, blob_sha: str, variant: str) -> object | None:
+        row = (
+            self._connection()
+            .execute(
+                "SELECT payload FROM extraction_cache WHERE namespace = ? AND blob_sha = ? AND variant = ?",
+                (namespace, blob_sha, variant),
+            )
+            .fetchone()
+        )
+        return None if row is None else _decode(row[0])
+
+    def _put_many(self, namespace: str, rows: Iterable[tuple[str, str, object]]) -> None:
+        encoded = [(namespace, blob_sha, variant, _encode(payload)) for blob_sha, variant, payload in rows]
+        if not encoded:
+            return
+        conn = self._connection()
+        conn.executemany(
+            "INSERT OR REPLACE INTO extraction_cache (namespace, blob_sha, variant, payload) VALUES (?, ?, ?, ?)",
+            encoded,
+        )
+        conn.commit()
+
+    def get_extraction(self, blob_sha: str, language: str) -> CachedExtraction | None:
+        """Return cached symbols/calls for a blob parsed as `language`, if present.
+
+        Why this exists:
+        - Extraction can be skipped entirely for blobs seen in any earlier run.
+        """
+        payload = self._get(_EXTRACT_NAMESPACE, blob_sha, f"{language}@{EXTRACTOR_VERSION}")
+        if not isinstance(payload, dict):
+            return None
+        return CachedExtraction(
+            symbols=[(str(k), str(n), list(r)) for k, n, r in payload.get("symbols", [])],
+            calls=[(str(c), list(r), int(caller)) for c, r, caller in payload.get("calls", [])],
+        )
+
+    def put_extractions(self, entries: Iterable[tuple[str, str, CachedExtraction]]) -> None:
+        """Store `(blob_sha, language, extraction)` entries.
+
+        Why this exists:
+        - Misses from a run are written back in one transaction.
+        """
+        self._put_many(
+            _EXTRACT_NAMESPACE,
+            (
+                (blob_sha, f"{language}@{EXTRACTOR_VERSION}", {"symbols": e.symbols, "calls": e.calls})
+                for blob_sha, language, e in entries
+            ),
+        )
+
+    def put_extraction_records(self, entries: Iterable[tuple[str, str, list[SymbolRecord], list[CallRecord]]]) -> None:
+        """Store freshly extracted `(blob_sha, language, symbols, calls)` entries.
+
+        Why this exists:
+        - Extractors write back their misses without building cache payloads themselves.
+        """
+        self.put_extractions(
+            (blob_sha, language, CachedExtraction.from_records(symbols, calls))
+            for blob_sha, language, symbols, calls in entries
+        )
+
+    def get_chunks(
+        self,
+        blob_sha: str,
+        config: ChunkingConfig | None = None,
+        *,
+        symbol_ranges: list[tuple[int, int]] | None = None,
+    ) -> CachedChunks | None:
+        """Return cached chunk spans for a blob chunked with `config` (fixed windows by default), if present.
+
+        In `symbol` mode, `symbol_ranges` are the definition ranges the blob is chunked along (None or empty when the
+        file was not extracted); other modes ignore them.
+
+        Why this exists:
+        - Chunking can be skipped for blobs seen in any earlier run.
+        """
+        payload = self._get(_CHUNKS_NAMESPACE, blob_sha, _chunks_variant(config, symbol_ranges))
+        if not isinstance(payload, list):
+            return None
+        return CachedChunks(
+            spans=[(int(s), int(e), str(t)) for s, e, t in payload],
+            content_ids=config is not None and config.mode != "fixed",
+        )
+
+    def put_chunks(
+        self,
+        entries: Iterable[tuple[str, list[tuple[int, int]] | None, CachedChunks]],
+        config: ChunkingConfig | None = None,
+    ) -> None:
+        """Store `(blob_sha, symbol_ranges, chunks)` entries produced with `config`.
+
+        Why this exists:
+        - Misses from a run are written back in one transaction.
+        """
+        self._put_many(
+            _CHUNKS_NAMESPACE,
+            ((blob_sha, _chunks_variant(config, ranges), c.spans) for blob_sha, ranges, c in entries),
+        )
+
+    def put_chunk_records(
+        self,
+        entries: Iterable[tuple[str, list[tuple[int, int]] | None, list[ChunkRecord]]],
+        config: ChunkingConfig | None = None,
+    ) -> None:
+        """Store freshly produced `(blob_sha, symbol_ranges, chunks)` entries.
+
+        Why this exists:
+        - Chunkers write back their misses without building cache payloads themselves.
+        """
+        self.put_chunks(
+            ((blob_sha, ranges, CachedChunks.from_records(chunks)) for blob_sha, ranges, chunks in entries), config
+        )
+
+
+def extraction_cache_from_env(data_dir: Path) -> ExtractionCache | None:
+    """Return the data-dir extraction cache unless disabled via environment.
+
+    Why this exists:
+    - Operators can turn the cache off (e.g., while debugging extraction) without code changes.
+    """
+    mode = os.environ.get("CODEKNOWL_EXTRACTION_CACHE", "on").strip().lower()
+    if mode in {"off", "false", "0", "disabled", "none"}:
+        return None
+    return ExtractionCache.for_data_dir(data_dir)
@@ -0,0 +1,175 @@
+"""File: backend/src/codeknowl/file_outline.py
+Purpose: Per-file outlines (symbols in source order with nesting depth, plus counts by kind) precomputed at index
+time and stored as keyed snapshot sections.
+Product/business importance: Explain-file is an IDE workflow; answering it with one keyed read keeps it instant on
+repositories with hundreds of thousands of files and symbols.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+from array import array
+from collections.abc import Iterable, Mapping, Sequence
+from dataclasses import dataclass
+from typing import Any
+
+from codeknowl.snapshot_format import LazySnapshotArtifacts, SnapshotReader, postings_columns
+
+# Binary snapshot tables, each sorted by its `key` column (the repo-relative file path).
+OUTLINE_TABLE = "file_outlines"
+KIND_COUNTS_TABLE = "file_kind_counts"
+FILE_ROWS_TABLE = "file_paths"
+
+_OUTLINE_FIELDS = ("symbol_id", "kind", "name", "depth", "start_line", "end_line")
+
+
+@dataclass(frozen=True)
+class FileOutline:
+    """Outline of one file.
+
+    `symbols` holds `{symbol_id, kind, name, depth, start_line, end_line}` entries ordered by start position, with
+    enclosing definitions before the definitions nested inside them.
+
+    Why this exists:
+    - Explain-file needs the file record, its symbols in reading order, and a kind summary in one value.
+    """
+
+    file: dict[str, Any]
+    symbols: list[dict[str, Any]]
+    kind_counts: dict[str, int]
+
+
+def _position(sym: Mapping[str, Any], prefix: str) -> tuple[int, int]:
+    r = sym.get("range") or {}
+    return (r.get(f"{prefix}_line") or 0, r.get(f"{prefix}_col") or 0)
+
+
+def outline_entries(symbols: Iterable[Mapping[str, Any]]) -> list[dict[str, Any]]:
+    """Order one file's symbols by start position and annotate each with its nesting depth.
+
+    Why this exists:
+    - Depth is a property of the whole file's definitions; computing it once at index time keeps queries to a read.
+    """
+    ordered = sorted(symbols, key=lambda s: (_position(s, "start"), tuple(-x for x in _position(s, "end"))))
+    open_ends: list[tuple[int, int]] = []
+    entries: list[dict[str, Any]] = []
+    for sym in ordered:
+        start, end = _position(sym, "start"), _position(sym, "end")
+        while open_ends and open_ends[-1] <= start:
+            open_ends.pop()
+        entries.append(
+            {
+                "symbol_id": sym.get("symbol_id") or "",
+                "kind": sym.get("kind") or "",
+                "name": sym.get("name") or "",
+                "depth": len(open_ends),
+                "start_line": start[0],
+                "end_line": end[0],
+            }
+        )
+        open_ends.append(end)
+    return entries
+
+
+@dataclass(frozen=True)
+class FileOutlineIndex:
+    """In-memory outlines for every file of a snapshot, keyed by path.
+
+    Why this exists:
+    - Snapshot writers build the keyed tables from it, and JSON-backed snapshots answer explain-file with it.
+    """
+
+    files: dict[str, dict[str, Any]]
+    outlines: dict[str, list[dict[str, Any]]]
+    file_rows: dict[str, list[int]]
+
+    @staticmethod
+    def from_records(files: Sequence[Mapping[str, Any]], symbols: Iterable[Mapping[str, Any]]) -> "FileOutlineIndex":
+        """Build outlines from snapshot file and symbol dicts."""
+        by_file: dict[str, list[Mapping[str, Any]]] = {}
+        for sym in symbols:
+            by_file.setdefault(sym.get("file_path") or "", []).append(sym)
+        file_rows: dict[str, list[int]] = {}
+        for row, file_rec in enumerate(files):
+            file_rows.setdefault(file_rec.get("path") or "", []).append(row)
+        return FileOutlineIndex(
+            files={path: dict(files[rows[0]]) for path, rows in file_rows.items()},
+            outlines={path: outline_entries(syms) for path, syms in by_file.items()},
+            file_rows=file_rows,
+        )
+
+    def outline(self, file_path: str) -> FileOutline | None:
+        file_rec = self.files.get(file_path)
+        if file_rec is None:
+            return None
+        entries = self.outlines.get(file_path) or []
+        return FileOutline(file=file_rec, symbols=[dict(e) for e in entries], kind_counts=_count_kinds(entries))
+
+    def to_tables(self) -> dict[str, dict[str, Sequence[Any]]]:
+        """Return the keyed outline, kind-count, and file-row tables in columnar form."""
+        outline_columns: dict[str, Any] = {"key": []}
+        outline_columns.update({field: [] for field in _OUTLINE_FIELDS})
+        counts: dict[str, Any] = {"key": [], "kind": [], "count": array("q")}
+        for path in sorted(self.outlines):
+            entries = self.outlines[path]
+            outline_columns["key"].extend([path] * len(entries))
+            for field in _OUTLINE_FIELDS:
+                outline_columns[field].extend(e[field] for e in entries)
+            for kind, count in sorted(_count_kinds(entries).items()):
+                counts["key"].append(path)
+                counts["kind"].append(kind)
+                counts["count"].append(count)
+        return {
+            OUTLINE_TABLE: outline_columns,
+            KIND_COUNTS_TABLE: counts,
+            FILE_ROWS_TABLE: postings_columns(self.file_rows),
+        }
+
+
+def _count_kinds(entries: Iterable[Mapping[str, Any]]) -> dict[str, int]:
+    counts: dict[str, int] = {}
+    for e in entries:
+        counts[e["kind"]] = counts.get(e["kind"], 0) + 1
+    return counts
+
+
+class SnapshotFileOutlines:
+    """Outlines read in place from a memory-mapped snapshot's keyed tables.
+
+    Why this exists:
+    - Explain-file decodes only the requested file's outline rows, never the files or symbols sections.
+    """
+
+    def __init__(self, reader: SnapshotReader) -> None:
+        self._outlines = reader.table(OUTLINE_TABLE)
+        self._counts = reader.table(KIND_COUNTS_TABLE)
+        self._file_rows = reader.table(FILE_ROWS_TABLE)
+        self._files = reader.table("files")
+
+    def outline(self, file_path: str) -> FileOutline | None:
+        rows = self._file_rows.postings(file_path)
+        if not rows:
+            return None
+        symbols = self._outlines.rows_for_key(file_path)
+        for entry in symbols:
+            del entry["key"]
+        counts = {row["kind"]: row["count"] for row in self._counts.rows_for_key(file_path)}
+        return FileOutline(file=self._files.row(rows[0]), symbols=symbols, kind_counts=counts)
+
+
+def file_outlines_from_artifacts(artifacts: Mapping[str, Any]) -> FileOutlineIndex | SnapshotFileOutlines:
+    """Return the persisted file outlines of a loaded snapshot, rebuilding them for older snapshots.
+
+    Why this exists:
+    - Snapshots written before outlines existed must still answer explain-file queries.
+    """
+    if isinstance(artifacts, LazySnapshotArtifacts):
+        reader = artifacts.reader
+        if all(reader.has_section(name) for name in (OUTLINE_TABLE, KIND_COUNTS_TABLE, FILE_ROWS_TABLE)):
+            return SnapshotFileOutlines(reader)
+    cached = artifacts.get("file_outlines")
+    if isinstance(cached, FileOutlineIndex):
+        return cached
+    return FileOutlineIndex.from_records(artifacts.get("files") or [], artifacts.get("symbols") or [])
@@ -413,25 +413,46 @@ class CodeGraphExtractor:
                         "type": "require",
                     })
 
-    def _extract_calls(self, node: Node, file_path: Path, calls: List[Dict[str, Any]]) -> None:
+    def _is_function_node(self, node: Node) -> bool:
+        """Return True if the node is a function definition recorded by `_extract_functions`.
+
+        Why this exists:
+        - Call extraction must track the same enclosing functions that become graph vertices.
+        """
+        if self.language == "python":
+            return node.type == "function_definition"
+        if self.language in ["javascript", "typescript"]:
+            return node.type in ["function_declaration", "function_expression", "method_definition"]
+        return node.type in ["function_definition", "function_declaration"]
+
+    def _extract_calls(
+        self, node: Node, file_path: Path, calls: List[Dict[str, Any]], caller_id: str | None = None
+    ) -> None:
         """Extract function calls.
 
         Why this exists:
         - Finds function calls for call graph analysis.
+        - Tracks the innermost enclosing function so each call carries its caller.
         
         Args:
             node: AST node to analyze
             file_path: Source file path
             calls: List to append call data to
+            caller_id: ID of the innermost enclosing function, if any
         """
-        if node.type == "call_expression":
+        if node.type in ["call_expression", "call"]:
             call_data = self._extract_call_data(node, file_path)
             if call_data:
+                call_data["caller_id"] = caller_id
                 calls.append(call_data)
+        elif self._is_function_node(node):
+            func_data = self._extract_function_data(node, file_path)
+            if func_data:
+                caller_id = func_data["id"]
 
         # Recursively check child nodes
         for child in node.children:
-            self._extract_calls(child, file_path, calls)
+            self._extract_calls(child, file_path, calls, caller_id)
 
     def _extract_call_data(self, node: Node, file_path: Path) -> Dict[str, Any] | None:
         """Extract call metadata from AST node.
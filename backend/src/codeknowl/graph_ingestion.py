@@ -15,6 +15,7 @@ from typing import Any, Dict, List, Optional
 
 from codeknowl.graph_extractor import create_extractor
 from codeknowl.graph_store import NebulaGraphStore
+from codeknowl.indexing import git_tree_entries, inventory_mode_from_env
 from codeknowl.symbol_resolver import create_symbol_resolver
 
 logger = logging.getLogger(__name__)
@@ -115,6 +116,8 @@ class GraphIngestionService:
 
         Why this exists:
         - Identifies files to process for graph extraction.
+        - In git inventory mode, files come from `git ls-tree` of HEAD (committed, non-ignored files only) instead
+          of a recursive filesystem walk.
         
         Args:
             repo_path: Repository root path
@@ -137,6 +140,14 @@ class GraphIngestionService:
             ".hpp": "cpp",
         }
 
+        entries = git_tree_entries(repo_path, "HEAD") if inventory_mode_from_env() == "git" else None
+        if entries is not None:
+            return [
+                repo_path / e.path
+                for e in entries
+                if Path(e.path).suffix in source_extensions and (repo_path / e.path).is_file()
+            ]
+
         source_files = []
         for file_path in repo_path.rglob("*"):
             if file_path.is_file() and file_path.suffix in source_extensions:
@@ -189,7 +200,7 @@ class GraphIngestionService:
                 func["line_start"],
                 func["line_end"],
             )
-            resolver.add_function(func_id, func["name"], file_id)
+            resolver.add_function(func_id, func["name"], file_id, func["line_start"], func["line_end"])
             stats["functions"] += 1
 
         # Insert classes and register in resolver
@@ -251,8 +262,10 @@ class GraphIngestionService:
             # Try to resolve called function
             target_func_id = resolver.resolve_function(call["function"], file_id)
             if target_func_id:
-                # Find calling function (simplified - assumes function context)
-                calling_func_id = self._find_calling_function(call["line"], file_id, resolver)
+                # Prefer the enclosing function tracked during extraction; fall back to the interval index
+                calling_func_id = call.get("caller_id") or self._find_calling_function(
+                    call["line"], file_id, resolver
+                )
                 if calling_func_id:
                     self.graph_store.add_call_relationship(
                         calling_func_id, target_func_id, file_id, call["line"]
@@ -277,6 +290,7 @@ class GraphIngestionService:
 
         Why this exists:
         - Determines which function makes a call for relationship creation.
+        - Module-level calls have no calling function and produce no call edge.
         
         Args:
             line: Line number of call
@@ -286,12 +300,7 @@ class GraphIngestionService:
         Returns:
             Function ID or None if not found
         """
-        # This is a simplified implementation
-        # In practice, would need to track line ranges during extraction
-        functions = resolver.get_all_functions_in_file(file_id)
-        
-        # Return the first function (simplified - should check line ranges)
-        return functions[0] if functions else None
+        return resolver.function_at_line(file_id, line)
 
     def _detect_language(self, file_path: Path) -> str:
         """Detect programming language from file extension.
@@ -0,0 +1,236 @@
+"""File: backend/src/codeknowl/http_pool.py
+Purpose: Share pooled, keep-alive HTTP clients per endpoint across the process (sync and async).
+Product/business importance: LLM, embeddings, reranker, Qdrant, and OIDC calls used to open a new connection per
+request; reusing connections removes a TCP (and TLS) handshake from every call on the QA and indexing hot paths.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import os
+import threading
+import weakref
+from dataclasses import dataclass
+from typing import Any
+
+import httpx
+
+from codeknowl.metrics import METRICS
+
+try:
+    import h2
+except ImportError:
+    h2 = None
+
+
+@dataclass(frozen=True)
+class HttpPoolConfig:
+    """Connection pool limits shared by every outbound HTTP client.
+
+    Why this exists:
+    - Operators size the pools to the upstream services without code changes.
+    """
+
+    max_connections: int = 100
+    max_keepalive_connections: int = 20
+    keepalive_expiry_seconds: float = 30.0
+    http2: bool = True
+
+    @staticmethod
+    def from_env(prefix: str = "CODEKNOWL_HTTP_") -> "HttpPoolConfig":
+        """Load pool limits from environment variables.
+
+        Why this exists:
+        - The backend should be configurable via environment without code changes.
+        """
+        http2 = os.environ.get(f"{prefix}HTTP2", "on").strip().lower()
+        return HttpPoolConfig(
+            max_connections=max(1, int(os.environ.get(f"{prefix}MAX_CONNECTIONS", "100"))),
+            max_keepalive_connections=max(0, int(os.environ.get(f"{prefix}MAX_KEEPALIVE_CONNECTIONS", "20"))),
+            keepalive_expiry_seconds=max(0.0, float(os.environ.get(f"{prefix}KEEPALIVE_EXPIRY_SECONDS", "30"))),
+            http2=http2 not in {"off", "false", "0", "disabled", "none"},
+        )
+
+    def limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_keepalive_connections,
+            keepalive_expiry=self.keepalive_expiry_seconds,
+        )
+
+
+def endpoint_key(url: str | httpx.URL) -> str:
+    """Return the `scheme://host:port` a URL's connections are pooled under.
+
+    Why this exists:
+    - Clients are shared per endpoint, and metrics are labelled by endpoint rather than by full URL.
+    """
+    parsed = httpx.URL(url)
+    port = parsed.port or (443 if parsed.scheme == "https" else 80)
+    return f"{parsed.scheme}://{parsed.host}:{port}"
+
+
+def _opened_connection(event_name: str) -> bool:
+    return event_name in {"connection.connect_tcp.complete", "connection.connect_unix_socket.complete"}
+
+
+class _Tracer:
+    def __init__(self) -> None:
+        self.opened = False
+
+    def __call__(self, event_name: str, info: dict[str, Any]) -> None:
+        self.opened = self.opened or _opened_connection(event_name)
+
+
+class _AsyncTracer(_Tracer):
+    async def __call__(self, event_name: str, info: dict[str, Any]) -> None:  # type: ignore[override]
+        self.opened = self.opened or _opened_connection(event_name)
+
+
+def _record(endpoint: str, response: httpx.Response) -> None:
+    tracer = response.request.extensions.get("trace")
+    if isinstance(tracer, _Tracer):
+        METRICS.inc_http_client_request(endpoint, reused=not tracer.opened, http_version=response.http_version)
+
+
+class HttpPool:
+    """Process-wide registry of pooled `httpx.Client`/`httpx.AsyncClient` instances, one per endpoint.
+
+    Clients carry no timeout or headers of their own; callers pass both per request. Async clients are kept per
+    event loop because their connections cannot be shared across loops.
+
+    Why this exists:
+    - Every outbound client reuses keep-alive (and, over TLS, HTTP/2) connections to the same endpoint.
+    """
+
+    def __init__(
+        self,
+        config: HttpPoolConfig | None = None,
+        *,
+        transport: httpx.BaseTransport | None = None,
+        async_transport: httpx.AsyncBaseTransport | None = None,
+    ) -> None:
+        self.config = config or HttpPoolConfig()
+        self._transport = transport
+        self._async_transport = async_transport
+        self._lock = threading.Lock()
+        self._sync: dict[str, httpx.Client] = {}
+        self._async: weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, dict[str, httpx.AsyncClient]] = (
+            weakref.WeakKeyDictionary()
+        )
+
+    @property
+    def http2(self) -> bool:
+        """Whether clients negotiate HTTP/2 (requires the optional `h2` package)."""
+        return self.config.http2 and h2 is not None
+
+    def sync_client(self, url: str) -> httpx.Client:
+        """Return the shared client for the endpoint of `url`, creating it on first use.
+
+        Why this exists:
+        - Synchronous callers (indexing, CLI, JWKS refresh) share connections across calls and threads.
+        """
+        endpoint = endpoint_key(url)
+        with self._lock:
+            client = self._sync.get(endpoint)
+            if client is None:
+                client = self._new_sync_client(endpoint)
+                self._sync[endpoint] = client
+            return client
+
+    def async_client(self, url: str) -> httpx.AsyncClient:
+        """Return the shared async client for the endpoint of `url` on the running event loop.
+
+        Why this exists:
+        - Async request handlers fan out to several upstream services without blocking worker threads.
+        """
+        loop = asyncio.get_running_loop()
+        endpoint = endpoint_key(url)
+        with self._lock:
+            clients = self._async.setdefault(loop, {})
+            client = clients.get(endpoint)
+            if client is None:
+                client = self._new_async_client(endpoint)
+                clients[endpoint] = client
+            return client
+
+    def _new_sync_client(self, endpoint: str) -> httpx.Client:
+        def on_request(request: httpx.Request) -> None:
+            request.extensions.setdefault("trace", _Tracer())
+
+        def on_response(response: httpx.Response) -> None:
+            _record(endpoint, response)
+
+        return httpx.Client(
+            limits=self.config.limits(),
+            http2=self.http2,
+            transport=self._transport,
+            event_hooks={"request": [on_request], "response": [on_response]},
+        )
+
+    def _new_async_client(self, endpoint: str) -> httpx.AsyncClient:
+        async def on_request(request: httpx.Request) -> None:
+            request.extensions.setdefault("trace", _AsyncTracer())
+
+        async def on_response(response: httpx.Response) -> None:
+            _record(endpoint, response)
+
+        return httpx.AsyncClient(
+            limits=self.config.limits(),
+            http2=self.http2,
+            transport=self._async_transport,
+            event_hooks={"request": [on_request], "response": [on_response]},
+        )
+
+    def close(self) -> None:
+        """Close all sync clients and drop async clients (their connections close with their loop).
+
+        Why this exists:
+        - Tests and shutdown hooks release pooled sockets deterministically.
+        """
+        with self._lock:
+            clients = list(self._sync.values())
+            self._sync.clear()
+            self._async.clear()
+        for client in clients:
+            client.close()
+
+    async def aclose(self) -> None:
+        """Close all sync clients and the async clients bound to the running event loop.
+
+        Async clients of other loops are dropped (their connections closed with their loop). The pool stays usable;
+        clients are recreated on next use.
+
+        Why this exists:
+        - The API server and the worker release pooled connections on shutdown instead of leaking them.
+        """
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            sync_clients = list(self._sync.values())
+            async_clients = list(self._async.pop(loop, {}).values())
+            self._sync.clear()
+            self._async.clear()
+        for client in sync_clients:
+            client.close()
+        for client in async_clients:
+            await client.aclose()
+
+
+_POOL: HttpPool | None = None
+_POOL_LOCK = threading.Lock()
+
+
+def http_pool() -> HttpPool:
+    """Return the process-wide pool, created from environment on first use.
+
+    Why this exists:
+    - All outbound clients share one set of connections per endpoint without threading a pool through every call.
+    """
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = HttpPool(HttpPoolConfig.from_env())
+        return _POOL
@@ -10,9 +10,14 @@ License: MIT (see LICENSE)
 from __future__ import annotations
 
 import hashlib
+import os
+import subprocess
+from dataclasses import dataclass
+from functools import lru_cache
 from pathlib import Path
+from typing import TYPE_CHECKING
 
-from tree_sitter_languages import get_parser
+from tree_sitter_languages import get_language, get_parser
 
 from codeknowl.artifacts import (
     CallRecord,
@@ -20,6 +25,11 @@ from codeknowl.artifacts import (
     SourceRange,
     SymbolRecord,
 )
+from codeknowl.extraction_pool import ExtractionPoolConfig, run_sharded
+from codeknowl.repo import TreeEntry, git_blob_sha, ls_tree
+
+if TYPE_CHECKING:
+    from codeknowl.extraction_cache import ExtractionCache
 
 _EXT_LANGUAGE: dict[str, str] = {
     ".py": "python",
@@ -44,12 +54,16 @@ _IGNORED_DIR_NAMES: set[str] = {
 
 
 def _should_ignore_path(path: Path) -> bool:
-    for part in path.parts:
-        if part in _IGNORED_DIR_NAMES:
-            return True
-        if part.startswith(".codeknowl"):
-            return True
-    return False
+    return any(is_ignored_path_part(part) for part in path.parts)
+
+
+def is_ignored_path_part(name: str) -> bool:
+    """Return True if a single path component (directory or file name) excludes a path from indexing.
+
+    Why this exists:
+    - Tree walkers can prune ignored directories before descending into them instead of filtering afterwards.
+    """
+    return name in _IGNORED_DIR_NAMES or name.startswith(".codeknowl")
 
 
 def should_ignore_path(path: Path) -> bool:
@@ -86,6 +100,15 @@ def _file_language(path: Path) -> str:
     return _EXT_LANGUAGE.get(path.suffix.lower(), "unknown")
 
 
+def file_language(path: str | Path) -> str:
+    """Return the language identifier for a file path based on its extension.
+
+    Why this exists:
+    - Pipeline stages outside this module need the same language mapping used for FileRecords.
+    """
+    return _file_language(Path(path))
+
+
 def build_file_inventory(repo_path: Path) -> list[FileRecord]:
     """List all files in a repo, excluding ignored paths.
 
@@ -131,7 +154,75 @@ def build_file_records_for_paths(repo_path: Path, rel_paths: set[str]) -> list[F
     return records
 
 
-def _stable_symbol_id(repo_rel_path: str, kind: str, name: str, start_line: int) -> str:
+def _is_ignored_rel_path(rel: str) -> bool:
+    return any(is_ignored_path_part(part) for part in rel.split("/"))
+
+
+def inventory_mode_from_env() -> str:
+    """Return the configured inventory mode: `git` (default) or `filesystem`.
+
+    Why this exists:
+    - Operators can fall back to a filesystem walk (e.g., for non-git directories) without code changes.
+    """
+    mode = os.environ.get("CODEKNOWL_INDEX_INVENTORY", "git").strip().lower()
+    return mode if mode in {"git", "filesystem"} else "git"
+
+
+def git_tree_entries(repo_path: Path, commit: str, rel_paths: set[str] | None = None) -> list[TreeEntry] | None:
+    """Return indexable blobs of a commit, or None when the repo cannot be listed with git.
+
+    Why this exists:
+    - Git-mode inventory must apply the same ignore rules as the filesystem walk, and callers need a clear signal
+      to fall back to the filesystem when git is unavailable.
+    """
+    try:
+        entries = ls_tree(repo_path, commit, rel_paths)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return [e for e in entries if not _is_ignored_rel_path(e.path)]
+
+
+def file_records_from_tree(entries: list[TreeEntry]) -> list[FileRecord]:
+    """Convert tree entries into FileRecords.
+
+    Why this exists:
+    - Git-mode inventory records the blob id alongside path, language, and size.
+    """
+    return [
+        FileRecord(path=e.path, language=file_language(e.path), size_bytes=e.size_bytes, blob_sha=e.blob_sha)
+        for e in entries
+    ]
+
+
+def build_file_inventory_from_git(repo_path: Path, commit: str) -> list[FileRecord]:
+    """List all committed files of a commit, excluding ignored paths, from `git ls-tree`.
+
+    Falls back to `build_file_inventory` when the repository cannot be listed with git.
+
+    Why this exists:
+    - The inventory should reflect what is actually committed and cost one subprocess call, not a stat per path.
+    """
+    entries = git_tree_entries(repo_path, commit)
+    if entries is None:
+        return build_file_inventory(repo_path)
+    return file_records_from_tree(entries)
+
+
+def build_file_records_for_paths_from_git(repo_path: Path, commit: str, rel_paths: set[str]) -> list[FileRecord]:
+    """Build FileRecords for specific paths as they exist in a commit.
+
+    Falls back to `build_file_records_for_paths` when the repository cannot be listed with git.
+
+    Why this exists:
+    - Incremental updates need records for changed files without a checkout.
+    """
+    entries = git_tree_entries(repo_path, commit, rel_paths)
+    if entries is None:
+        return build_file_records_for_paths(repo_path, rel_paths)
+    return file_records_from_tree(entries)
+
+
+def stable_symbol_id(repo_rel_path: str, kind: str, name: str, start_line: int) -> str:
     """Generate a stable, unique identifier for a symbol.
 
     Why this exists:
@@ -157,7 +248,7 @@ def _add_python_symbols(symbols: list[SymbolRecord], *, node, code_bytes: bytes,
     name = code_bytes[name_node.start_byte : name_node.end_byte].decode("utf-8", errors="replace")
     r = _range_from_node(node)
     kind = "function" if node.type == "function_definition" else "class"
-    symbol_id = _stable_symbol_id(rel_path, kind, name, r.start_line)
+    symbol_id = stable_symbol_id(rel_path, kind, name, r.start_line)
     symbols.append(SymbolRecord(symbol_id=symbol_id, kind=kind, name=name, file_path=rel_path, range=r))
 
 
@@ -168,7 +259,7 @@ def _add_js_ts_symbols(symbols: list[SymbolRecord], *, node, code_bytes: bytes,
             return
         name = code_bytes[name_node.start_byte : name_node.end_byte].decode("utf-8", errors="replace")
         r = _range_from_node(node)
-        symbol_id = _stable_symbol_id(rel_path, "function", name, r.start_line)
+        symbol_id = stable_symbol_id(rel_path, "function", name, r.start_line)
         symbols.append(SymbolRecord(symbol_id=symbol_id, kind="function", name=name, file_path=rel_path, range=r))
         return
 
@@ -178,7 +269,7 @@ def _add_js_ts_symbols(symbols: list[SymbolRecord], *, node, code_bytes: bytes,
             return
         name = code_bytes[name_node.start_byte : name_node.end_byte].decode("utf-8", errors="replace")
         r = _range_from_node(node)
-        symbol_id = _stable_symbol_id(rel_path, "class", name, r.start_line)
+        symbol_id = stable_symbol_id(rel_path, "class", name, r.start_line)
         symbols.append(SymbolRecord(symbol_id=symbol_id, kind="class", name=name, file_path=rel_path, range=r))
 
 
@@ -193,11 +284,13 @@ def _add_java_symbols(symbols: list[SymbolRecord], *, node, code_bytes: bytes, r
     name = code_bytes[name_node.start_byte : name_node.end_byte].decode("utf-8", errors="replace")
     r = _range_from_node(node)
     kind = "method" if node.type == "method_declaration" else "class"
-    symbol_id = _stable_symbol_id(rel_path, kind, name, r.start_line)
+    symbol_id = stable_symbol_id(rel_path, kind, name, r.start_line)
     symbols.append(SymbolRecord(symbol_id=symbol_id, kind=kind, name=name, file_path=rel_path, range=r))
 
 
-def _add_python_calls(calls: list[CallRecord], *, node, code_bytes: bytes, rel_path: str) -> None:
+def _add_python_calls(
+    calls: list[CallRecord], *, node, code_bytes: bytes, rel_path: str, caller_symbol_id: str = ""
+) -> None:
     if node.type != "call":
         return
     func_node = node.child_by_field_name("function")
@@ -205,10 +298,12 @@ def _add_python_calls(calls: list[CallRecord], *, node, code_bytes: bytes, rel_p
         return
     callee = code_bytes[func_node.start_byte : func_node.end_byte].decode("utf-8", errors="replace")
     r = _range_from_node(node)
-    calls.append(CallRecord(caller_symbol_id="", callee_name=callee, file_path=rel_path, range=r))
+    calls.append(CallRecord(caller_symbol_id=caller_symbol_id, callee_name=callee, file_path=rel_path, range=r))
 
 
-def _add_js_ts_calls(calls: list[CallRecord], *, node, code_bytes: bytes, rel_path: str) -> None:
+def _add_js_ts_calls(
+    calls: list[CallRecord], *, node, code_bytes: bytes, rel_path: str, caller_symbol_id: str = ""
+) -> None:
     if node.type != "call_expression":
         return
     func_node = node.child_by_field_name("function")
@@ -216,10 +311,12 @@ def _add_js_ts_calls(calls: list[CallRecord], *, node, code_bytes: bytes, rel_pa
         return
     callee = code_bytes[func_node.start_byte : func_node.end_byte].decode("utf-8", errors="replace")
     r = _range_from_node(node)
-    calls.append(CallRecord(caller_symbol_id="", callee_name=callee, file_path=rel_path, range=r))
+    calls.append(CallRecord(caller_symbol_id=caller_symbol_id, callee_name=callee, file_path=rel_path, range=r))
 
 
-def _add_java_calls(calls: list[CallRecord], *, node, code_bytes: bytes, rel_path: str) -> None:
+def _add_java_calls(
+    calls: list[CallRecord], *, node, code_bytes: bytes, rel_path: str, caller_symbol_id: str = ""
+) -> None:
     if node.type != "method_invocation":
         return
     name_node = node.child_by_field_name("name")
@@ -227,7 +324,17 @@ def _add_java_calls(calls: list[CallRecord], *, node, code_bytes: bytes, rel_pat
         return
     callee = code_bytes[name_node.start_byte : name_node.end_byte].decode("utf-8", errors="replace")
     r = _range_from_node(node)
-    calls.append(CallRecord(caller_symbol_id="", callee_name=callee, file_path=rel_path, range=r))
+    calls.append(CallRecord(caller_symbol_id=caller_symbol_id, callee_name=callee, file_path=rel_path, range=r))
+
+
+def _pop_closed_scopes(scopes: list[tuple[int, str]], start_byte: int) -> None:
+    """Drop enclosing definitions that end before `start_byte`.
+
+    Why this exists:
+    - Nodes arrive in pre-order, so a stack of open definitions tracks the innermost enclosing symbol for each call.
+    """
+    while scopes and scopes[-1][0] <= start_byte:
+        scopes.pop()
 
 
 def _walk_tree(root) -> list:
@@ -241,91 +348,278 @@ def _walk_tree(root) -> list:
     return out
 
 
-def extract_symbols_and_calls(repo_path: Path) -> tuple[list[SymbolRecord], list[CallRecord]]:
-    """Extract symbols and call sites from all supported files in a repo.
+# Languages with Tree-sitter symbol/call extraction support.
+EXTRACTABLE_LANGUAGES: frozenset[str] = frozenset({"python", "javascript", "typescript", "java"})
+
+
+# Tree-sitter capture patterns per language. Capture names encode the record kind: `def.<kind>` for definitions
+# (name read from the node's `name` field) and `call` for call sites.
+_QUERY_SOURCES: dict[str, str] = {
+    "python": """
+        (function_definition name: (_)) @def.function
+        (class_definition name: (_)) @def.class
+        (call function: (_)) @call
+    """,
+    "javascript": """
+        (function_declaration name: (_)) @def.function
+        (class_declaration name: (_)) @def.class
+        (call_expression function: (_)) @call
+    """,
+    "typescript": """
+        (function_declaration name: (_)) @def.function
+        (class_declaration name: (_)) @def.class
+        (call_expression function: (_)) @call
+    """,
+    "java": """
+        (method_declaration name: (_)) @def.method
+        (class_declaration name: (_)) @def.class
+        (method_invocation name: (_)) @call
+    """,
+}
+
+# Field holding the callee text for a call capture.
+_CALLEE_FIELD: dict[str, str] = {
+    "python": "function",
+    "javascript": "function",
+    "typescript": "function",
+    "java": "name",
+}
+
+
+@lru_cache(maxsize=None)
+def _compiled_query(lang: str):
+    return get_language(lang).query(_QUERY_SOURCES[lang])
+
+
+def extraction_engine_from_env() -> str:
+    """Return the configured extraction engine: `query` (default) or `walker`.
 
     Why this exists:
-    - Indexing needs to populate the symbols and calls JSON artifacts for a snapshot.
+    - The Python node walker stays available as a reference implementation and fallback.
+    """
+    engine = os.environ.get("CODEKNOWL_EXTRACTION_ENGINE", "query").strip().lower()
+    return engine if engine in {"query", "walker"} else "query"
+
+
+def _node_text(node, code_bytes: bytes) -> str:
+    return code_bytes[node.start_byte : node.end_byte].decode("utf-8", errors="replace")
+
+
+def _query_captures(tree, lang: str, line_ranges: list[tuple[int, int]] | None) -> list:
+    query = _compiled_query(lang)
+    if line_ranges is None:
+        return query.captures(tree.root_node)
+    seen: set[tuple[int, int, str]] = set()
+    captures: list = []
+    for start_line, end_line in line_ranges:
+        for node, capture in query.captures(tree.root_node, start_point=(start_line - 1, 0), end_point=(end_line, 0)):
+            key = (node.start_byte, node.end_byte, capture)
+            if key not in seen:
+                seen.add(key)
+                captures.append((node, capture))
+    # Restore pre-order (outer node first) across the per-range capture lists.
+    captures.sort(key=lambda item: (item[0].start_byte, -item[0].end_byte))
+    return captures
+
+
+def extract_tree_symbols_and_calls(
+    tree,
+    code_bytes: bytes,
+    rel_path: str,
+    lang: str,
+    *,
+    line_ranges: list[tuple[int, int]] | None = None,
+) -> tuple[list[SymbolRecord], list[CallRecord]]:
+    """Match definitions and call sites in a parsed tree with a precompiled Tree-sitter query.
+
+    Node matching runs in C; Python only touches matched nodes. Captures are ordered like a pre-order walk, so the
+    output is identical to the walker's. With `line_ranges` (1-based, inclusive), only definitions and calls whose
+    nodes intersect those lines are returned.
+
+    Why this exists:
+    - Full extraction and incremental re-extraction of edited regions share one matcher.
     """
     symbols: list[SymbolRecord] = []
     calls: list[CallRecord] = []
-
-    for p in repo_path.rglob("*"):
-        if not p.is_file():
-            continue
-        if _should_ignore_path(p):
+    callee_field = _CALLEE_FIELD[lang]
+    scopes: list[tuple[int, str]] = []
+    for node, capture in _query_captures(tree, lang, line_ranges):
+        _pop_closed_scopes(scopes, node.start_byte)
+        if capture == "call":
+            callee_node = node.child_by_field_name(callee_field)
+            if callee_node is None:
+                continue
+            calls.append(
+                CallRecord(
+                    caller_symbol_id=scopes[-1][1] if scopes else "",
+                    callee_name=_node_text(callee_node, code_bytes),
+                    file_path=rel_path,
+                    range=_range_from_node(node),
+                )
+            )
             continue
 
-        lang = _file_language(p)
-        if lang not in {"python", "javascript", "typescript", "java"}:
+        name_node = node.child_by_field_name("name")
+        if name_node is None:
             continue
+        kind = capture.removeprefix("def.")
+        name = _node_text(name_node, code_bytes)
+        r = _range_from_node(node)
+        symbol_id = stable_symbol_id(rel_path, kind, name, r.start_line)
+        symbols.append(SymbolRecord(symbol_id=symbol_id, kind=kind, name=name, file_path=rel_path, range=r))
+        scopes.append((node.end_byte, symbol_id))
+    return symbols, calls
 
-        try:
-            code_bytes = p.read_bytes()
-        except OSError:
-            continue
 
-        parser = get_parser(lang)
-        tree = parser.parse(code_bytes)
-        root = tree.root_node
-        rel_path = str(p.relative_to(repo_path))
-
-        nodes = _walk_tree(root)
-        for node in nodes:
-            if lang == "python":
-                _add_python_symbols(symbols, node=node, code_bytes=code_bytes, rel_path=rel_path)
-                _add_python_calls(calls, node=node, code_bytes=code_bytes, rel_path=rel_path)
-            elif lang in {"javascript", "typescript"}:
-                _add_js_ts_symbols(symbols, node=node, code_bytes=code_bytes, rel_path=rel_path)
-                _add_js_ts_calls(calls, node=node, code_bytes=code_bytes, rel_path=rel_path)
-            elif lang == "java":
-                _add_java_symbols(symbols, node=node, code_bytes=code_bytes, rel_path=rel_path)
-                _add_java_calls(calls, node=node, code_bytes=code_bytes, rel_path=rel_path)
+_WALKER_EXTRACTORS = {
+    "python": (_add_python_symbols, _add_python_calls),
+    "javascript": (_add_js_ts_symbols, _add_js_ts_calls),
+    "typescript": (_add_js_ts_symbols, _add_js_ts_calls),
+    "java": (_add_java_symbols, _add_java_calls),
+}
+
 
+def _extract_with_walker(
+    tree, code_bytes: bytes, rel_path: str, lang: str
+) -> tuple[list[SymbolRecord], list[CallRecord]]:
+    symbols: list[SymbolRecord] = []
+    calls: list[CallRecord] = []
+    add_symbols, add_calls = _WALKER_EXTRACTORS[lang]
+    scopes: list[tuple[int, str]] = []
+    for node in _walk_tree(tree.root_node):
+        _pop_closed_scopes(scopes, node.start_byte)
+        symbol_count = len(symbols)
+        add_symbols(symbols, node=node, code_bytes=code_bytes, rel_path=rel_path)
+        caller = scopes[-1][1] if scopes else ""
+        if len(symbols) > symbol_count:
+            scopes.append((node.end_byte, symbols[-1].symbol_id))
+        add_calls(calls, node=node, code_bytes=code_bytes, rel_path=rel_path, caller_symbol_id=caller)
     return symbols, calls
 
 
-def extract_symbols_and_calls_for_paths(
-    repo_path: Path, rel_paths: set[str]
+def extract_file_symbols_and_calls(
+    rel_path: str, code_bytes: bytes, lang: str, *, engine: str | None = None
 ) -> tuple[list[SymbolRecord], list[CallRecord]]:
-    """Extract symbols and call sites for a specific set of relative paths.
+    """Extract symbols and call sites from one file's bytes.
+
+    `engine` selects compiled Tree-sitter queries (`query`, the default) or the Python node walker (`walker`); both
+    produce identical records.
 
     Why this exists:
-    - Incremental updates need to extract symbols/calls only for changed files.
+    - Serial, parallel, and incremental extraction paths must share one per-file implementation so their outputs
+      are identical.
     """
-    symbols: list[SymbolRecord] = []
-    calls: list[CallRecord] = []
+    if lang not in EXTRACTABLE_LANGUAGES:
+        return [], []
 
-    for rel in sorted(rel_paths):
-        p = repo_path / rel
-        if not p.is_file():
-            continue
-        if _should_ignore_path(p):
-            continue
+    tree = get_parser(lang).parse(code_bytes)
+    if (engine or extraction_engine_from_env()) == "walker":
+        return _extract_with_walker(tree, code_bytes, rel_path, lang)
+    return extract_tree_symbols_and_calls(tree, code_bytes, rel_path, lang)
+
+
+@dataclass(frozen=True)
+class _ExtractContext:
+    repo_path: str
+    cache: ExtractionCache | None
 
-        lang = _file_language(p)
-        if lang not in {"python", "javascript", "typescript", "java"}:
-            continue
 
+_ExtractMiss = tuple[str, str, list[SymbolRecord], list[CallRecord]]
+
+
+def _extract_shard(
+    context: _ExtractContext, rel_paths: list[str]
+) -> tuple[list[SymbolRecord], list[CallRecord], list[_ExtractMiss]]:
+    """Extract one shard of repo-relative paths (process-pool worker entrypoint).
+
+    Cache misses are returned to the caller so the cache is written once, from one process.
+    """
+    root = Path(context.repo_path)
+    symbols: list[SymbolRecord] = []
+    calls: list[CallRecord] = []
+    misses: list[_ExtractMiss] = []
+    for rel in rel_paths:
+        p = root / rel
         try:
             code_bytes = p.read_bytes()
         except OSError:
             continue
+        lang = _file_language(p)
+        blob_sha = git_blob_sha(code_bytes) if context.cache is not None else ""
+        cached = context.cache.get_extraction(blob_sha, lang) if context.cache is not None else None
+        if cached is not None:
+            file_symbols, file_calls = cached.bind(rel)
+        else:
+            file_symbols, file_calls = extract_file_symbols_and_calls(rel, code_bytes, lang)
+            if context.cache is not None:
+                misses.append((blob_sha, lang, file_symbols, file_calls))
+        symbols.extend(file_symbols)
+        calls.extend(file_calls)
+    return symbols, calls, misses
+
+
+def _extract_rel_paths(
+    repo_path: Path,
+    rel_paths: list[str],
+    pool_config: ExtractionPoolConfig | None,
+    cache: ExtractionCache | None,
+) -> tuple[list[SymbolRecord], list[CallRecord]]:
+    symbols: list[SymbolRecord] = []
+    calls: list[CallRecord] = []
+    misses: list[_ExtractMiss] = []
+    context = _ExtractContext(repo_path=str(repo_path), cache=cache)
+    for shard_symbols, shard_calls, shard_misses in run_sharded(_extract_shard, context, rel_paths, config=pool_config):
+        symbols.extend(shard_symbols)
+        calls.extend(shard_calls)
+        misses.extend(shard_misses)
+    if cache is not None:
+        cache.put_extraction_records(misses)
+    return symbols, calls
 
-        parser = get_parser(lang)
-        tree = parser.parse(code_bytes)
-        root = tree.root_node
-
-        nodes = _walk_tree(root)
-        for node in nodes:
-            if lang == "python":
-                _add_python_symbols(symbols, node=node, code_bytes=code_bytes, rel_path=rel)
-                _add_python_calls(calls, node=node, code_bytes=code_bytes, rel_path=rel)
-            elif lang in {"javascript", "typescript"}:
-                _add_js_ts_symbols(symbols, node=node, code_bytes=code_bytes, rel_path=rel)
-                _add_js_ts_calls(calls, node=node, code_bytes=code_bytes, rel_path=rel)
-            elif lang == "java":
-                _add_java_symbols(symbols, node=node, code_bytes=code_bytes, rel_path=rel)
-                _add_java_calls(calls, node=node, code_bytes=code_bytes, rel_path=rel)
 
-    return symbols, calls
+def _is_extractable(repo_path: Path, rel: str) -> bool:
+    p = repo_path / rel
+    if not p.is_file():
+        return False
+    if _should_ignore_path(p):
+        return False
+    return _file_language(p) in EXTRACTABLE_LANGUAGES
+
+
+def extract_symbols_and_calls(
+    repo_path: Path,
+    *,
+    pool_config: ExtractionPoolConfig | None = None,
+    cache: ExtractionCache | None = None,
+) -> tuple[list[SymbolRecord], list[CallRecord]]:
+    """Extract symbols and call sites from all supported files in a repo.
+
+    Files are processed in sorted path order; large repos are sharded across a process pool and merged back in that
+    same order, so the output does not depend on the worker count. With a `cache`, blobs parsed in earlier runs are
+    rebound from the cache instead of re-parsed.
+
+    Why this exists:
+    - Indexing needs to populate the symbols and calls JSON artifacts for a snapshot.
+    """
+    rel_paths = sorted(
+        str(p.relative_to(repo_path))
+        for p in repo_path.rglob("*")
+        if _is_extractable(repo_path, str(p.relative_to(repo_path)))
+    )
+    return _extract_rel_paths(repo_path, rel_paths, pool_config, cache)
+
+
+def extract_symbols_and_calls_for_paths(
+    repo_path: Path,
+    rel_paths: set[str],
+    *,
+    pool_config: ExtractionPoolConfig | None = None,
+    cache: ExtractionCache | None = None,
+) -> tuple[list[SymbolRecord], list[CallRecord]]:
+    """Extract symbols and call sites for a specific set of relative paths.
+
+    Why this exists:
+    - Incremental updates need to extract symbols/calls only for changed files.
+    """
+    selected = [rel for rel in sorted(rel_paths) if _is_extractable(repo_path, rel)]
+    return _extract_rel_paths(repo_path, selected, pool_config, cache)
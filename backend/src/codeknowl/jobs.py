@@ -15,6 +15,7 @@ from typing import Any
 
 from arq import Worker
 
+from codeknowl.http_pool import http_pool
 from codeknowl.job_status import JobStatusStore
 from codeknowl.service import CodeKnowlService
 
@@ -90,6 +91,15 @@ async def update_repo_job(
         raise
 
 
+async def close_http_pool(ctx: dict[str, Any]) -> None:
+    """Close the pooled outbound HTTP connections when the worker shuts down.
+
+    Why this exists:
+    - Embeddings, Qdrant, and LLM connections opened by jobs must not be left open past the worker's lifetime.
+    """
+    await http_pool().aclose()
+
+
 def create_worker(data_dir: Path) -> Worker:
     """Create an Arq worker for CodeKnowl jobs.
 
@@ -103,4 +113,5 @@ def create_worker(data_dir: Path) -> Worker:
         burst_mode=False,
         poll_delay=1.0,
         poll_interval=1.0,
+        on_shutdown=close_http_pool,
     )
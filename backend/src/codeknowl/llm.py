@@ -9,10 +9,13 @@ License: MIT (see LICENSE)
 
 from __future__ import annotations
 
+import json
 import os
+from collections.abc import AsyncIterator
 from dataclasses import dataclass
+from typing import Any
 
-import httpx
+from codeknowl.http_pool import http_pool
 
 
 @dataclass(frozen=True)
@@ -103,6 +106,33 @@ class LlmProfiles:
         return LlmProfiles(coding=coding, general=general, synth=synth)
 
 
+_STREAM_DONE = "[DONE]"
+
+
+def parse_stream_line(line: str) -> str | None:
+    """Return the content delta carried by one line of a streamed chat completion, or None at `[DONE]`.
+
+    Blank lines, comments, and chunks without content (role announcements, finish reasons) yield "".
+
+    Why this exists:
+    - OpenAI-compatible servers stream completions as Server-Sent Events with one JSON chunk per `data:` line.
+    """
+    if not line.startswith("data:"):
+        return ""
+    data = line[len("data:") :].strip()
+    if data == _STREAM_DONE:
+        return None
+    try:
+        chunk = json.loads(data)
+    except ValueError:
+        return ""
+    choices = chunk.get("choices") if isinstance(chunk, dict) else None
+    if not choices or not isinstance(choices[0], dict):
+        return ""
+    content = (choices[0].get("delta") or {}).get("content")
+    return content if isinstance(content, str) else ""
+
+
 class OpenAiCompatibleClient:
     """HTTP client for OpenAI-compatible chat completions and model listing.
 
@@ -113,18 +143,14 @@ class OpenAiCompatibleClient:
     def __init__(self, config: LlmConfig):
         self._config = config
 
-    def chat(self, *, system: str, user: str) -> str:
-        """Send a chat completion request and return the assistant’s message.
-
-        Why this exists:
-        - QA synthesis needs to send system/user prompts and extract the assistant’s response.
-        """
+    def _headers(self) -> dict[str, str]:
         headers: dict[str, str] = {"Content-Type": "application/json"}
         if self._config.api_key:
             headers["Authorization"] = f"Bearer {self._config.api_key}"
+        return headers
 
-        url = f"{self._config.base_url}{self._config.chat_completions_path}"
-        payload = {
+    def _chat_payload(self, *, system: str, user: str) -> dict[str, object]:
+        return {
             "model": self._config.model,
             "messages": [
                 {"role": "system", "content": system},
@@ -133,11 +159,8 @@ class OpenAiCompatibleClient:
             "temperature": 0.2,
         }
 
-        with httpx.Client(timeout=self._config.timeout_seconds) as client:
-            response = client.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            data = response.json()
-
+    @staticmethod
+    def _chat_message(data: dict[str, Any]) -> str:
         choices = data.get("choices") or []
         if not choices:
             raise RuntimeError("LLM response missing choices")
@@ -146,21 +169,74 @@ class OpenAiCompatibleClient:
             raise RuntimeError("LLM response missing message content")
         return message
 
+    def chat(self, *, system: str, user: str) -> str:
+        """Send a chat completion request and return the assistant’s message.
+
+        Why this exists:
+        - QA synthesis needs to send system/user prompts and extract the assistant’s response.
+        """
+        url = f"{self._config.base_url}{self._config.chat_completions_path}"
+        client = http_pool().sync_client(url)
+        response = client.post(
+            url,
+            headers=self._headers(),
+            json=self._chat_payload(system=system, user=user),
+            timeout=self._config.timeout_seconds,
+        )
+        response.raise_for_status()
+        return self._chat_message(response.json())
+
+    async def achat(self, *, system: str, user: str) -> str:
+        """Async variant of `chat` on the shared async connection pool.
+
+        Why this exists:
+        - The API server answers questions without blocking its event loop on LLM latency.
+        """
+        url = f"{self._config.base_url}{self._config.chat_completions_path}"
+        client = http_pool().async_client(url)
+        response = await client.post(
+            url,
+            headers=self._headers(),
+            json=self._chat_payload(system=system, user=user),
+            timeout=self._config.timeout_seconds,
+        )
+        response.raise_for_status()
+        return self._chat_message(response.json())
+
+    async def astream_chat(self, *, system: str, user: str) -> AsyncIterator[str]:
+        """Stream the assistant’s message as content deltas from a `stream: true` chat completion.
+
+        Closing the iterator early closes the upstream response, which stops generation on servers that abort on
+        disconnect.
+
+        Why this exists:
+        - The IDE renders the synthesized answer as it is generated instead of waiting for the whole message.
+        """
+        url = f"{self._config.base_url}{self._config.chat_completions_path}"
+        client = http_pool().async_client(url)
+        payload = {**self._chat_payload(system=system, user=user), "stream": True}
+        async with client.stream(
+            "POST", url, headers=self._headers(), json=payload, timeout=self._config.timeout_seconds
+        ) as response:
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                delta = parse_stream_line(line)
+                if delta is None:
+                    return
+                if delta:
+                    yield delta
+
     def list_models(self) -> list[dict[str, object]]:
         """List available models from the endpoint.
 
         Why this exists:
         - Operators and health checks need to verify that the LLM endpoint is reachable and serving models.
         """
-        headers: dict[str, str] = {"Content-Type": "application/json"}
-        if self._config.api_key:
-            headers["Authorization"] = f"Bearer {self._config.api_key}"
-
         url = f"{self._config.base_url}{self._config.models_path}"
-        with httpx.Client(timeout=self._config.timeout_seconds) as client:
-            response = client.get(url, headers=headers)
-            response.raise_for_status()
-            data = response.json()
+        client = http_pool().sync_client(url)
+        response = client.get(url, headers=self._headers(), timeout=self._config.timeout_seconds)
+        response.raise_for_status()
+        data = response.json()
 
         models = data.get("data")
         if not isinstance(models, list):
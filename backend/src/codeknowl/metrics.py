@@ -9,7 +9,7 @@ License: MIT (see LICENSE)
 
 from __future__ import annotations
 
-from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
 
 
 class PrometheusMetrics:
@@ -71,6 +71,97 @@ class PrometheusMetrics:
             ["job_type", "status"],
         )
         
+        # Index pipeline stages
+        self.index_stage_seconds_total = Counter(
+            "codeknowl_index_stage_seconds_total",
+            "Time spent in each index pipeline stage",
+            ["stage", "clock"],
+        )
+
+        self.index_stage_bytes_total = Counter(
+            "codeknowl_index_stage_bytes_total",
+            "Bytes processed by each index pipeline stage",
+            ["stage"],
+        )
+
+        self.extraction_cache_lookups_total = Counter(
+            "codeknowl_extraction_cache_lookups_total",
+            "Per-blob extraction cache lookups",
+            ["stage", "result"],
+        )
+
+        self.embedding_batch_seconds = Histogram(
+            "codeknowl_embedding_batch_seconds",
+            "Latency of embeddings requests, one observation per batch attempt",
+            ["status"],
+            buckets=(0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0),
+        )
+
+        self.embedding_batch_items_total = Counter(
+            "codeknowl_embedding_batch_items_total",
+            "Texts sent to the embeddings endpoint, by batch attempt outcome",
+            ["status"],
+        )
+
+        self.embedding_batch_tokens_total = Counter(
+            "codeknowl_embedding_batch_tokens_total",
+            "Estimated tokens sent to the embeddings endpoint, by batch attempt outcome",
+            ["status"],
+        )
+
+        self.qa_ask_stage_seconds = Histogram(
+            "codeknowl_qa_ask_stage_seconds",
+            "Latency of qa.ask pipeline stages (retrieval, rerank, candidate LLMs, synthesis)",
+            ["stage"],
+            buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0),
+        )
+
+        self.qa_candidates_total = Counter(
+            "codeknowl_qa_candidates_total",
+            "Candidate answers requested from the coding and general LLM profiles, by outcome",
+            ["profile", "status"],
+        )
+
+        self.qa_ask_streams_total = Counter(
+            "codeknowl_qa_ask_streams_total",
+            "Streaming qa.ask responses by outcome (succeeded, cancelled by client disconnect, failed)",
+            ["status"],
+        )
+
+        self.http_client_requests_total = Counter(
+            "codeknowl_http_client_requests_total",
+            "Outbound HTTP requests by endpoint, whether a pooled connection was reused, and protocol version",
+            ["endpoint", "connection", "http_version"],
+        )
+
+        self.embedding_cache_lookups_total = Counter(
+            "codeknowl_embedding_cache_lookups_total",
+            "Chunk embedding cache lookups",
+            ["result"],
+        )
+
+        self.snapshot_cache_events_total = Counter(
+            "codeknowl_snapshot_cache_events_total",
+            "In-memory snapshot cache events",
+            ["event"],
+        )
+
+        self.snapshot_cache_bytes = Gauge(
+            "codeknowl_snapshot_cache_bytes",
+            "Approximate memory held by cached snapshots",
+        )
+
+        self.snapshot_gc_runs_total = Counter(
+            "codeknowl_snapshot_gc_runs_total",
+            "Snapshot garbage collection passes",
+            ["status"],
+        )
+
+        self.snapshot_gc_reclaimed_bytes_total = Counter(
+            "codeknowl_snapshot_gc_reclaimed_bytes_total",
+            "Bytes reclaimed by snapshot garbage collection",
+        )
+
         # QA operations
         self.qa_requests_total = Counter(
             "codeknowl_qa_requests_total",
@@ -106,6 +197,103 @@ class PrometheusMetrics:
         if duration_seconds is not None:
             self.update_duration_seconds.labels(status=status).observe(duration_seconds)
 
+    def observe_index_stage(self, stage: str, *, wall_seconds: float, cpu_seconds: float, byte_count: int) -> None:
+        """Record wall-clock time, CPU time, and bytes for an index pipeline stage.
+
+        Why this exists:
+        - Distinguishes I/O-bound from CPU-bound indexing stages when tuning extraction workers.
+        """
+        self.index_stage_seconds_total.labels(stage=stage, clock="wall").inc(max(0.0, wall_seconds))
+        self.index_stage_seconds_total.labels(stage=stage, clock="cpu").inc(max(0.0, cpu_seconds))
+        self.index_stage_bytes_total.labels(stage=stage).inc(max(0, byte_count))
+
+    def inc_extraction_cache(self, stage: str, *, hits: int, misses: int) -> None:
+        """Record per-blob extraction cache hits and misses.
+
+        Why this exists:
+        - Shows how much parsing the blob cache avoids across index and update runs.
+        """
+        self.extraction_cache_lookups_total.labels(stage=stage, result="hit").inc(max(0, hits))
+        self.extraction_cache_lookups_total.labels(stage=stage, result="miss").inc(max(0, misses))
+
+    def observe_embedding_batch(self, status: str, *, seconds: float, items: int, tokens: int) -> None:
+        """Record one embeddings request (a batch attempt) and its size.
+
+        Why this exists:
+        - Batch size and concurrency are tuned against the embedding server from latency and items/tokens per second.
+        """
+        self.embedding_batch_seconds.labels(status=status).observe(max(0.0, seconds))
+        self.embedding_batch_items_total.labels(status=status).inc(max(0, items))
+        self.embedding_batch_tokens_total.labels(status=status).inc(max(0, tokens))
+
+    def observe_qa_stage(self, stage: str, seconds: float) -> None:
+        """Record the latency of one qa.ask pipeline stage.
+
+        Why this exists:
+        - Shows which stage (retrieval, a candidate model, or synthesis) dominates ask latency.
+        """
+        self.qa_ask_stage_seconds.labels(stage=stage).observe(max(0.0, seconds))
+
+    def inc_qa_candidate(self, profile: str, status: str) -> None:
+        """Record the outcome (ok, failed, timeout) of a candidate answer.
+
+        Why this exists:
+        - Operators see how often a profile misses its deadline and synthesis runs with one candidate.
+        """
+        self.qa_candidates_total.labels(profile=profile, status=status).inc()
+
+    def inc_qa_stream(self, status: str) -> None:
+        """Record how a streaming ask ended.
+
+        Why this exists:
+        - Shows how often clients abandon answers mid-generation (and generation was cancelled).
+        """
+        self.qa_ask_streams_total.labels(status=status).inc()
+
+    def inc_http_client_request(self, endpoint: str, *, reused: bool, http_version: str) -> None:
+        """Record an outbound HTTP request and whether it reused a pooled connection.
+
+        Why this exists:
+        - Pool limits and keep-alive expiry are tuned from the share of requests that opened a new connection.
+        """
+        connection = "reused" if reused else "new"
+        labels = {"endpoint": endpoint, "connection": connection, "http_version": http_version}
+        self.http_client_requests_total.labels(**labels).inc()
+
+    def inc_embedding_cache(self, *, hits: int, misses: int) -> None:
+        """Record chunk embedding cache hits and misses.
+
+        Why this exists:
+        - Shows how many embedding calls the content-hash cache avoids.
+        """
+        self.embedding_cache_lookups_total.labels(result="hit").inc(max(0, hits))
+        self.embedding_cache_lookups_total.labels(result="miss").inc(max(0, misses))
+
+    def inc_snapshot_cache(self, event: str) -> None:
+        """Record a snapshot cache hit, miss, eviction, or invalidation.
+
+        Why this exists:
+        - The hit rate shows whether the cache budget covers the working set of actively queried repos.
+        """
+        self.snapshot_cache_events_total.labels(event=event).inc()
+
+    def set_snapshot_cache_bytes(self, size_bytes: int) -> None:
+        """Record the approximate memory held by the snapshot cache.
+
+        Why this exists:
+        - Lets operators compare actual use against the configured budget.
+        """
+        self.snapshot_cache_bytes.set(max(0, size_bytes))
+
+    def observe_snapshot_gc(self, status: str, *, bytes_reclaimed: int = 0) -> None:
+        """Record a snapshot garbage collection pass and the bytes it reclaimed.
+
+        Why this exists:
+        - Shows whether retention keeps the data dir bounded.
+        """
+        self.snapshot_gc_runs_total.labels(status=status).inc()
+        self.snapshot_gc_reclaimed_bytes_total.inc(max(0, bytes_reclaimed))
+
     def inc_job_queued(self, job_type: str) -> None:
         """Record job enqueued.
 
@@ -0,0 +1,549 @@
+"""File: backend/src/codeknowl/pipeline.py
+Purpose: Build a full snapshot (files, symbols, calls, chunks) from a single walk of the repository tree.
+Product/business importance: Full indexing stats and reads every file exactly once, which keeps first-time indexing
+of large repositories bounded by one pass over the disk instead of three.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from collections.abc import Iterator, Mapping
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from codeknowl.artifacts import CallRecord, FileRecord, SymbolRecord
+from codeknowl.chunking import ChunkingConfig, ChunkRecord, chunk_file_text
+from codeknowl.extraction_cache import CachedChunks, CachedExtraction, ExtractionCache
+from codeknowl.extraction_pool import ExtractionPoolConfig, run_sharded
+from codeknowl.indexing import (
+    EXTRACTABLE_LANGUAGES,
+    extract_file_symbols_and_calls,
+    file_language,
+    git_tree_entries,
+    inventory_mode_from_env,
+    is_ignored_path_part,
+    should_ignore_path,
+)
+from codeknowl.metrics import METRICS
+from codeknowl.repo import GitBlobReader, git_blob_sha
+
+logger = logging.getLogger(__name__)
+
+PIPELINE_STAGES: tuple[str, ...] = ("walk", "read", "inventory", "extract", "chunk")
+CACHED_STAGES: tuple[str, ...] = ("extract", "chunk")
+
+# Embedding happens in the service after the build; its timing and cache counts are folded into the same report.
+EMBED_STAGE = "embed"
+
+
+@dataclass
+class StageCounters:
+    """Accumulated wall-clock, CPU, and byte counters for one pipeline stage.
+
+    Why this exists:
+    - Operators need to see whether indexing time goes to disk I/O or to parsing before tuning worker counts.
+    """
+
+    wall_seconds: float = 0.0
+    cpu_seconds: float = 0.0
+    bytes: int = 0
+    items: int = 0
+
+    def merge(self, other: "StageCounters") -> None:
+        """Add another counter's totals into this one.
+
+        Why this exists:
+        - Per-shard counters from pool workers are folded into one report per run.
+        """
+        self.wall_seconds += other.wall_seconds
+        self.cpu_seconds += other.cpu_seconds
+        self.bytes += other.bytes
+        self.items += other.items
+
+
+@dataclass
+class StageStats:
+    """Per-stage counters for a pipeline run.
+
+    Why this exists:
+    - A single object can be timed inside workers, pickled back, merged, and written into the run report.
+    """
+
+    stages: dict[str, StageCounters] = field(default_factory=lambda: {s: StageCounters() for s in PIPELINE_STAGES})
+    cache: dict[str, dict[str, int]] = field(
+        default_factory=lambda: {s: {"hits": 0, "misses": 0} for s in CACHED_STAGES}
+    )
+
+    @contextmanager
+    def measure(self, stage: str, *, byte_count: int = 0, items: int = 1) -> Iterator[StageCounters]:
+        """Time a block of work and attribute it to a stage.
+
+        Why this exists:
+        - Stage accounting must wrap exactly the work it reports, including CPU time spent in C extensions.
+        """
+        counters = self.stages.setdefault(stage, StageCounters())
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield counters
+        finally:
+            counters.wall_seconds += time.perf_counter() - wall_start
+            counters.cpu_seconds += time.process_time() - cpu_start
+            counters.bytes += byte_count
+            counters.items += items
+
+    def count_cache(self, stage: str, *, hit: bool) -> None:
+        """Record an extraction-cache lookup for a stage.
+
+        Why this exists:
+        - The run report shows how much parsing the blob cache saved.
+        """
+        self.add_cache_counts(stage, hits=int(hit), misses=int(not hit))
+
+    def add_cache_counts(self, stage: str, *, hits: int, misses: int) -> None:
+        """Record a batch of cache lookups for a stage.
+
+        Why this exists:
+        - Embedding lookups are answered for a whole batch of chunks at once.
+        """
+        counts = self.cache.setdefault(stage, {"hits": 0, "misses": 0})
+        counts["hits"] += hits
+        counts["misses"] += misses
+
+    def merge(self, other: "StageStats") -> None:
+        """Fold another run's (or shard's) counters into this one.
+
+        Why this exists:
+        - Pool workers report their own counters, which must be combined deterministically.
+        """
+        for stage, counters in other.stages.items():
+            self.stages.setdefault(stage, StageCounters()).merge(counters)
+        for stage, counts in other.cache.items():
+            mine = self.cache.setdefault(stage, {"hits": 0, "misses": 0})
+            mine["hits"] += counts["hits"]
+            mine["misses"] += counts["misses"]
+
+    def as_dict(self) -> dict[str, dict[str, float | int]]:
+        """Return a JSON-serializable view of the counters.
+
+        Why this exists:
+        - The run report is written next to the snapshot artifacts.
+        """
+        return {
+            stage: {
+                "wall_seconds": round(c.wall_seconds, 6),
+                "cpu_seconds": round(c.cpu_seconds, 6),
+                "bytes": c.bytes,
+                "items": c.items,
+            }
+            for stage, c in sorted(self.stages.items())
+        }
+
+
+@dataclass(frozen=True)
+class SnapshotBuild:
+    """All artifact records for a snapshot plus the stage counters that produced them.
+
+    Why this exists:
+    - The service layer writes artifacts, embeds chunks, and reports timings from one result object.
+    """
+
+    files: list[FileRecord]
+    symbols: list[SymbolRecord]
+    calls: list[CallRecord]
+    chunks: list[ChunkRecord]
+    stats: StageStats
+
+
+@dataclass(frozen=True)
+class _ShardContext:
+    repo_path: str
+    repo_id: str
+    head_commit: str
+    max_chunk_bytes_per_file: int
+    cache: ExtractionCache | None = None
+    read_from_git: bool = False
+    skip_extraction: frozenset[str] = frozenset()
+    chunking: ChunkingConfig = ChunkingConfig()
+    # Definition ranges of files in `skip_extraction`, for symbol-aligned chunking.
+    symbol_ranges: Mapping[str, list[tuple[int, int]]] = field(default_factory=dict)
+
+
+@dataclass
+class _ShardOutput:
+    build: SnapshotBuild
+    extract_misses: list[tuple[str, str, list[SymbolRecord], list[CallRecord]]] = field(default_factory=list)
+    chunk_misses: list[tuple[str, list[tuple[int, int]] | None, list[ChunkRecord]]] = field(default_factory=list)
+
+
+def walk_repository(repo_path: Path, stats: StageStats | None = None) -> list[tuple[str, int]]:
+    """Walk the repository once and return sorted `(relative_path, size_bytes)` pairs.
+
+    Ignored directories are pruned before descent instead of being filtered afterwards, and each file is stat'ed at
+    most once.
+
+    Why this exists:
+    - All downstream stages (inventory, extraction, chunking) share this one listing.
+    """
+    stats = stats or StageStats()
+    entries: list[tuple[str, int]] = []
+    with stats.measure("walk", items=0) as counters:
+        pending = [""]
+        while pending:
+            rel_dir = pending.pop()
+            try:
+                iterator = os.scandir(repo_path / rel_dir if rel_dir else repo_path)
+            except OSError:
+                continue
+            with iterator:
+                for entry in iterator:
+                    if is_ignored_path_part(entry.name):
+                        continue
+                    rel = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            pending.append(rel)
+                        elif entry.is_file():
+                            entries.append((rel, entry.stat().st_size))
+                    except OSError:
+                        continue
+        counters.items += len(entries)
+    entries.sort()
+    return entries
+
+
+_ListedFile = tuple[str, int, str | None]
+
+
+def _list_files(
+    repo_path: Path,
+    head_commit: str,
+    inventory_mode: str,
+    stats: StageStats,
+    rel_paths: set[str] | None = None,
+) -> tuple[list[_ListedFile], bool]:
+    """Return sorted `(relative_path, size_bytes, blob_sha)` entries and whether they came from the commit tree."""
+    if inventory_mode == "git":
+        with stats.measure("walk", items=0) as counters:
+            entries = git_tree_entries(repo_path, head_commit, rel_paths)
+            if entries is not None:
+                counters.items += len(entries)
+                return [(e.path, e.size_bytes, e.blob_sha) for e in entries], True
+    if rel_paths is None:
+        return [(rel, size_bytes, None) for rel, size_bytes in walk_repository(repo_path, stats)], False
+
+    listed: list[_ListedFile] = []
+    with stats.measure("walk", items=0) as counters:
+        for rel in sorted(rel_paths):
+            p = repo_path / rel
+            try:
+                if should_ignore_path(Path(rel)) or not p.is_file():
+                    continue
+                listed.append((rel, p.stat().st_size, None))
+            except OSError:
+                continue
+        counters.items += len(listed)
+    return listed, False
+
+
+def _lookup_cache(
+    context: _ShardContext,
+    rel: str,
+    blob_sha: str,
+    language: str,
+    *,
+    needs_extraction: bool,
+    needs_chunking: bool,
+) -> tuple[CachedExtraction | None, CachedChunks | None]:
+    if context.cache is None or not blob_sha:
+        return None, None
+    extraction = context.cache.get_extraction(blob_sha, language) if needs_extraction else None
+    if not needs_chunking:
+        return extraction, None
+    if not needs_extraction:
+        symbol_ranges = context.symbol_ranges.get(rel)
+    elif extraction is not None:
+        symbol_ranges = extraction.symbol_ranges()
+    elif context.chunking.mode == "symbol":
+        # Symbol-mode chunk entries are keyed by definition ranges, which this blob has not been extracted for yet.
+        return None, None
+    else:
+        symbol_ranges = None
+    return extraction, context.cache.get_chunks(blob_sha, context.chunking, symbol_ranges=symbol_ranges)
+
+
+def _read_file(
+    context: _ShardContext,
+    rel: str,
+    size_bytes: int,
+    blob_sha: str | None,
+    reader: GitBlobReader | None,
+    out: _ShardOutput,
+) -> bytes | None:
+    with out.build.stats.measure("read", byte_count=size_bytes):
+        if reader is not None and blob_sha:
+            return reader.read(blob_sha)
+        try:
+            return (Path(context.repo_path) / rel).read_bytes()
+        except OSError:
+            return None
+
+
+def _extract_file(
+    context: _ShardContext,
+    rel: str,
+    data: bytes,
+    language: str,
+    blob_sha: str,
+    cached: CachedExtraction | None,
+    out: _ShardOutput,
+) -> list[SymbolRecord]:
+    stats = out.build.stats
+    with stats.measure("extract", byte_count=len(data)):
+        if cached is not None:
+            symbols, calls = cached.bind(rel)
+        else:
+            symbols, calls = extract_file_symbols_and_calls(rel, data, language)
+    if context.cache is not None:
+        stats.count_cache("extract", hit=cached is not None)
+        if cached is None:
+            out.extract_misses.append((blob_sha, language, symbols, calls))
+    out.build.symbols.extend(symbols)
+    out.build.calls.extend(calls)
+    return symbols
+
+
+def _chunk_file(
+    context: _ShardContext,
+    rel: str,
+    data: bytes,
+    blob_sha: str,
+    cached: CachedChunks | None,
+    out: _ShardOutput,
+    symbol_ranges: list[tuple[int, int]] | None = None,
+) -> None:
+    stats = out.build.stats
+    with stats.measure("chunk", byte_count=len(data)):
+        if cached is not None:
+            chunks = cached.bind(repo_id=context.repo_id, rel_path=rel)
+        else:
+            chunks = chunk_file_text(
+                repo_id=context.repo_id,
+                head_commit=context.head_commit,
+                file_path=rel,
+                text=data.decode("utf-8", errors="ignore"),
+                config=context.chunking,
+                symbol_ranges=symbol_ranges,
+            )
+    if context.cache is not None:
+        stats.count_cache("chunk", hit=cached is not None)
+        if cached is None:
+            out.chunk_misses.append((blob_sha, symbol_ranges, chunks))
+    out.build.chunks.extend(chunks)
+
+
+def _process_file(
+    context: _ShardContext,
+    listed: _ListedFile,
+    reader: GitBlobReader | None,
+    out: _ShardOutput,
+) -> None:
+    rel, size_bytes, tree_blob_sha = listed
+    language = file_language(rel)
+    needs_extraction = language in EXTRACTABLE_LANGUAGES and rel not in context.skip_extraction
+    needs_chunking = size_bytes <= context.max_chunk_bytes_per_file
+
+    # Blob ids from the commit tree describe exactly the bytes that will be read, so the cache can be consulted
+    # before reading; for working-tree reads the key is computed from the bytes actually read.
+    trusted_sha = tree_blob_sha if context.read_from_git and tree_blob_sha else ""
+    cached_extraction, cached_chunks = _lookup_cache(
+        context, rel, trusted_sha, language, needs_extraction=needs_extraction, needs_chunking=needs_chunking
+    )
+    needs_read = (needs_extraction and cached_extraction is None) or (needs_chunking and cached_chunks is None)
+
+    data = b""
+    if needs_read:
+        read = _read_file(context, rel, size_bytes, tree_blob_sha, reader, out)
+        if read is None:
+            return
+        data = read
+
+    with out.build.stats.measure("inventory"):
+        out.build.files.append(FileRecord(path=rel, language=language, size_bytes=size_bytes, blob_sha=tree_blob_sha))
+
+    blob_sha = trusted_sha or (git_blob_sha(data) if context.cache is not None and data else "")
+    if blob_sha and not trusted_sha:
+        cached_extraction, cached_chunks = _lookup_cache(
+            context, rel, blob_sha, language, needs_extraction=needs_extraction, needs_chunking=needs_chunking
+        )
+    symbol_ranges = context.symbol_ranges.get(rel)
+    if needs_extraction:
+        symbols = _extract_file(context, rel, data, language, blob_sha, cached_extraction, out)
+        symbol_ranges = [(sym.range.start_line, sym.range.end_line) for sym in symbols]
+    if needs_chunking:
+        _chunk_file(context, rel, data, blob_sha, cached_chunks, out, symbol_ranges)
+
+
+def _process_shard(context: _ShardContext, items: list[_ListedFile]) -> _ShardOutput:
+    """Process one shard of listed files (process-pool worker entrypoint).
+
+    Cache misses are returned to the caller so the cache is written once, from one process.
+    """
+    out = _ShardOutput(build=SnapshotBuild(files=[], symbols=[], calls=[], chunks=[], stats=StageStats()))
+    if not context.read_from_git:
+        for listed in items:
+            _process_file(context, listed, None, out)
+        return out
+    with GitBlobReader(Path(context.repo_path)) as reader:
+        for listed in items:
+            _process_file(context, listed, reader, out)
+    return out
+
+
+def _build_from_listing(
+    context: _ShardContext,
+    listed: list[_ListedFile],
+    stats: StageStats,
+    pool_config: ExtractionPoolConfig | None,
+) -> SnapshotBuild:
+    build = SnapshotBuild(files=[], symbols=[], calls=[], chunks=[], stats=stats)
+    extract_misses: list[tuple[str, str, list[SymbolRecord], list[CallRecord]]] = []
+    chunk_misses: list[tuple[str, list[tuple[int, int]] | None, list[ChunkRecord]]] = []
+    for shard in run_sharded(_process_shard, context, listed, config=pool_config):
+        build.files.extend(shard.build.files)
+        build.symbols.extend(shard.build.symbols)
+        build.calls.extend(shard.build.calls)
+        build.chunks.extend(shard.build.chunks)
+        stats.merge(shard.build.stats)
+        extract_misses.extend(shard.extract_misses)
+        chunk_misses.extend(shard.chunk_misses)
+
+    if context.cache is not None:
+        context.cache.put_extraction_records(extract_misses)
+        context.cache.put_chunk_records(chunk_misses, context.chunking)
+    return build
+
+
+def build_snapshot_single_pass(
+    repo_path: Path,
+    *,
+    repo_id: str,
+    head_commit: str,
+    max_chunk_bytes_per_file: int = 512_000,
+    pool_config: ExtractionPoolConfig | None = None,
+    cache: ExtractionCache | None = None,
+    inventory_mode: str | None = None,
+    chunking: ChunkingConfig | None = None,
+) -> SnapshotBuild:
+    """Walk, read, inventory, extract, and chunk a repository in one streaming pass.
+
+    Each file's bytes are read once and fed to the FileRecord builder, the Tree-sitter extractor, and the chunker.
+    Work is sharded across the extraction pool and merged in sorted path order, so the result is deterministic.
+    With a `cache`, blobs extracted or chunked in any earlier run are rebound from the cache instead of re-parsed.
+
+    In `git` inventory mode (the default, see `CODEKNOWL_INDEX_INVENTORY`) the file list comes from `git ls-tree`
+    of `head_commit` and contents are streamed from the object store with `git cat-file --batch`, so the snapshot
+    reflects the commit exactly and no checkout is needed; directories git cannot list fall back to a filesystem
+    walk of `repo_path`.
+
+    Why this exists:
+    - Full indexing previously walked the tree three times and read most files twice.
+    """
+    stats = StageStats()
+    listed, from_git = _list_files(repo_path, head_commit, inventory_mode or inventory_mode_from_env(), stats)
+    context = _ShardContext(
+        repo_path=str(repo_path),
+        repo_id=repo_id,
+        head_commit=head_commit,
+        max_chunk_bytes_per_file=max_chunk_bytes_per_file,
+        cache=cache,
+        read_from_git=from_git,
+        chunking=chunking or ChunkingConfig.from_env(),
+    )
+    return _build_from_listing(context, listed, stats, pool_config)
+
+
+def _ranges_by_path(symbols: list[SymbolRecord]) -> dict[str, list[tuple[int, int]]]:
+    ranges: dict[str, list[tuple[int, int]]] = {}
+    for sym in symbols:
+        ranges.setdefault(sym.file_path, []).append((sym.range.start_line, sym.range.end_line))
+    return ranges
+
+
+def build_snapshot_for_paths(
+    repo_path: Path,
+    rel_paths: set[str],
+    *,
+    repo_id: str,
+    head_commit: str,
+    max_chunk_bytes_per_file: int = 512_000,
+    pool_config: ExtractionPoolConfig | None = None,
+    cache: ExtractionCache | None = None,
+    inventory_mode: str | None = None,
+    skip_extraction_for: set[str] | None = None,
+    chunking: ChunkingConfig | None = None,
+    skipped_symbols: list[SymbolRecord] | None = None,
+) -> SnapshotBuild:
+    """Build files, symbols, calls, and chunks for specific paths of a commit.
+
+    Paths that are missing from the commit (or ignored) are skipped. In `git` inventory mode contents are read from
+    the object store, so `repo_path` may be the registered repository itself rather than a checkout of
+    `head_commit`. Paths in `skip_extraction_for` are inventoried and chunked but not extracted (their symbols and
+    calls were produced elsewhere, e.g. by incremental re-parsing); pass those symbols as `skipped_symbols` so
+    symbol-aligned chunking still sees their definitions.
+
+    Why this exists:
+    - Incremental updates re-index only changed files, and should not need a worktree to do so.
+    """
+    stats = StageStats()
+    listed, from_git = _list_files(
+        repo_path, head_commit, inventory_mode or inventory_mode_from_env(), stats, rel_paths=rel_paths
+    )
+    context = _ShardContext(
+        repo_path=str(repo_path),
+        repo_id=repo_id,
+        head_commit=head_commit,
+        max_chunk_bytes_per_file=max_chunk_bytes_per_file,
+        cache=cache,
+        read_from_git=from_git,
+        skip_extraction=frozenset(skip_extraction_for or ()),
+        chunking=chunking or ChunkingConfig.from_env(),
+        symbol_ranges=_ranges_by_path(skipped_symbols or []),
+    )
+    return _build_from_listing(context, listed, stats, pool_config)
+
+
+def report_stage_stats(stats: StageStats, *, repo_id: str, head_commit: str) -> dict[str, Any]:
+    """Publish stage counters to metrics and logs and return the report payload.
+
+    Why this exists:
+    - The same counters feed Prometheus, structured logs, and the per-snapshot run report.
+    """
+    stages = stats.as_dict()
+    for stage, counters in stages.items():
+        METRICS.observe_index_stage(
+            stage,
+            wall_seconds=float(counters["wall_seconds"]),
+            cpu_seconds=float(counters["cpu_seconds"]),
+            byte_count=int(counters["bytes"]),
+        )
+    cache = {stage: dict(counts) for stage, counts in sorted(stats.cache.items())}
+    for stage, counts in cache.items():
+        if stage == EMBED_STAGE:
+            METRICS.inc_embedding_cache(hits=counts["hits"], misses=counts["misses"])
+        else:
+            METRICS.inc_extraction_cache(stage, hits=counts["hits"], misses=counts["misses"])
+    hit_rates = {
+        stage: round(counts["hits"] / (counts["hits"] + counts["misses"]), 4)
+        for stage, counts in cache.items()
+        if counts["hits"] + counts["misses"]
+    }
+    logger.info("Index pipeline stages for repo %s at %s: %s (cache: %s)", repo_id, head_commit, stages, cache)
+    return {"stages": stages, "cache": cache, "cache_hit_rate": hit_rates}
@@ -1,6 +1,7 @@
 """File: backend/src/codeknowl/poller.py
-Purpose: Provide a simple polling loop for accepted-branch repo updates (Milestone 3).
-Product/business importance: Enables automatic background refresh of indexes to track accepted-branch changes.
+Purpose: Provide simple background loops for accepted-branch repo updates (Milestone 3) and snapshot retention.
+Product/business importance: Enables automatic background refresh of indexes to track accepted-branch changes
+while keeping the data dir bounded.
 
 Copyright (c) 2026 John K Johansen
 License: MIT (see LICENSE)
@@ -17,6 +18,7 @@ from codeknowl.service import CodeKnowlService
 
 _START_LOCK = threading.Lock()
 _POLL_THREAD: threading.Thread | None = None
+_GC_THREAD: threading.Thread | None = None
 
 
 def start_repo_poller(*, data_dir: Path, interval_seconds: int) -> threading.Thread:
@@ -75,3 +77,29 @@ def start_repo_poller(*, data_dir: Path, interval_seconds: int) -> threading.Thr
     with _START_LOCK:
         _POLL_THREAD = t
     return t
+
+
+def start_snapshot_gc(*, data_dir: Path, interval_seconds: int) -> threading.Thread:
+    """Start a daemon thread that applies snapshot retention to all registered repos every `interval_seconds`."""
+
+    if interval_seconds <= 0:
+        raise ValueError("interval_seconds must be > 0")
+
+    global _GC_THREAD
+    with _START_LOCK:
+        if _GC_THREAD and _GC_THREAD.is_alive():
+            return _GC_THREAD
+
+    def _run() -> None:
+        while True:
+            time.sleep(interval_seconds)
+            try:
+                CodeKnowlService(data_dir=data_dir).collect_garbage()
+            except Exception:  # noqa: BLE001
+                METRICS.observe_snapshot_gc("failed")
+
+    t = threading.Thread(target=_run, name="codeknowl-snapshot-gc", daemon=True)
+    t.start()
+    with _START_LOCK:
+        _GC_THREAD = t
+    return t
@@ -9,12 +9,27 @@ License: MIT (see LICENSE)
 
 from __future__ import annotations
 
+import hashlib
 import json
+import threading
+from collections.abc import Iterable, Mapping
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Any
 
 from codeknowl.artifacts import repo_snapshot_dir
+from codeknowl.callee_index import (
+    CalleeIndex,
+    callee_index_from_artifacts,
+    callee_matches,
+    callee_segment,
+    callee_trigrams_from_env,
+)
+from codeknowl.file_outline import FileOutlineIndex, file_outlines_from_artifacts
+from codeknowl.record_store import MANIFEST_FILENAME, FileRecordStore, SnapshotManifest, materialize_manifest
+from codeknowl.scope_index import ScopeIndex, scope_index_from_artifacts
+from codeknowl.snapshot_format import SNAPSHOT_FILENAME, LazySnapshotArtifacts, SnapshotReader, write_snapshot_file
+from codeknowl.symbol_index import SymbolNameIndex, symbol_index_from_artifacts
 
 
 @dataclass(frozen=True)
@@ -40,88 +55,235 @@ def _load_json(path: Path) -> Any:
         return json.load(f)
 
 
-def load_snapshot_artifacts(data_dir: Path, repo_id: str, head_commit: str) -> dict[str, Any]:
-    """Load all JSON artifacts for a snapshot.
+def snapshot_generation(data_dir: Path, repo_id: str, head_commit: str) -> tuple[int, ...] | None:
+    """Identify the current on-disk write of a snapshot, or None if it has no files.
+
+    The manifest (or, for older snapshots, the binary or JSON artifact) is replaced whenever the commit is indexed
+    again, which changes its inode, mtime, or size.
+
+    Why this exists:
+    - In-memory snapshot caches notice a re-index of the same commit by another process (job worker, CLI) with one
+      `stat` instead of a read.
+    """
+    root = repo_snapshot_dir(data_dir, repo_id, head_commit)
+    for name in (MANIFEST_FILENAME, SNAPSHOT_FILENAME, "files.json"):
+        try:
+            st = (root / name).stat()
+        except FileNotFoundError:
+            continue
+        return (st.st_ino, st.st_mtime_ns, st.st_size)
+    return None
+
+
+def load_snapshot_artifacts(data_dir: Path, repo_id: str, head_commit: str) -> Mapping[str, Any]:
+    """Load the artifacts of a snapshot.
+
+    A snapshot written as a manifest is served from its binary file, which is derived from the manifest and the
+    repository's record store on first load. Snapshots written before manifests existed are read from their binary
+    file, or from their JSON files if they predate the binary format too. Binary snapshots are memory-mapped and each
+    section is decoded on first access.
 
     Why this exists:
     - Query helpers need a single place to load files/symbols/calls/chunks for a given snapshot.
     """
     root = repo_snapshot_dir(data_dir, repo_id, head_commit)
+    try:
+        raw_manifest = (root / MANIFEST_FILENAME).read_bytes()
+    except FileNotFoundError:
+        raw_manifest = None
+    if raw_manifest is not None:
+        return _derived_snapshot(data_dir, repo_id, root / SNAPSHOT_FILENAME, raw_manifest)
+
+    try:
+        return LazySnapshotArtifacts(SnapshotReader(root / SNAPSHOT_FILENAME))
+    except FileNotFoundError:
+        pass
+
     chunks_path = root / "chunks.json"
-    chunks = _load_json(chunks_path) if chunks_path.exists() else []
-    return {
+    scopes_path = root / "scopes.json"
+    symbol_index_path = root / "symbol_index.json"
+    sections = {
         "files": _load_json(root / "files.json"),
         "symbols": _load_json(root / "symbols.json"),
         "calls": _load_json(root / "calls.json"),
-        "chunks": chunks,
+        "chunks": _load_json(chunks_path) if chunks_path.exists() else [],
     }
+    return _with_indexes(
+        sections,
+        scopes=_load_json(scopes_path) if scopes_path.exists() else None,
+        symbol_index=_load_json(symbol_index_path) if symbol_index_path.exists() else None,
+    )
 
 
-def where_is_symbol_defined(artifacts: dict[str, Any], symbol_name: str) -> list[dict[str, Any]]:
-    """Return definition locations for a symbol name.
+# JSON section of a derived binary snapshot naming the manifest it was built from.
+_SOURCE_MANIFEST_SECTION = "source_manifest"
+
+# Serializes derivations in this process; temporary file names are only unique per process.
+_DERIVE_LOCK = threading.Lock()
+
+
+def _current_derived_snapshot(path: Path, source: str) -> LazySnapshotArtifacts | None:
+    try:
+        reader = SnapshotReader(path)
+    except FileNotFoundError:
+        return None
+    if reader.has_section(_SOURCE_MANIFEST_SECTION) and reader.read_json(_SOURCE_MANIFEST_SECTION) == source:
+        return LazySnapshotArtifacts(reader)
+    return None
+
+
+def _derived_snapshot(data_dir: Path, repo_id: str, path: Path, raw_manifest: bytes) -> LazySnapshotArtifacts:
+    """Return the binary snapshot of a manifest, deriving it from the record store if it is missing or stale.
 
     Why this exists:
-    - IDE navigation and deterministic QA need to know where symbols are defined.
+    - Index runs only write the records of changed files plus a manifest; the full query artifact is built once,
+      by the first reader of a snapshot, instead of on every update.
     """
-    matches: list[dict[str, Any]] = []
-    for sym in artifacts.get("symbols", []):
-        if sym.get("name") == symbol_name:
-            r = sym.get("range") or {}
-            matches.append(
-                {
-                    "symbol_id": sym.get("symbol_id"),
-                    "kind": sym.get("kind"),
-                    "name": sym.get("name"),
-                    "citation": {
-                        "file_path": sym.get("file_path"),
-                        "start_line": r.get("start_line"),
-                        "end_line": r.get("end_line"),
-                    },
-                }
-            )
-    return matches
-
-
-def _callee_matches(callee_expr: str, requested: str) -> bool:
-    """Best-effort matching of callee expressions to a requested name.
+    source = hashlib.sha256(raw_manifest).hexdigest()
+    current = _current_derived_snapshot(path, source)
+    if current is not None:
+        return current
+    with _DERIVE_LOCK:
+        current = _current_derived_snapshot(path, source)
+        if current is not None:
+            return current
+        manifest = SnapshotManifest.from_json(json.loads(raw_manifest))
+        store = FileRecordStore.for_repo(data_dir, repo_id)
+        try:
+            sections = materialize_manifest(store, manifest)
+        finally:
+            store.close()
+        scopes = ScopeIndex.from_symbols(sections["symbols"])
+        write_snapshot_file(
+            path, _snapshot_tables(sections), {"scopes": scopes.to_json(), _SOURCE_MANIFEST_SECTION: source}
+        )
+        return LazySnapshotArtifacts(SnapshotReader(path))
+
+
+def _snapshot_tables(sections: Mapping[str, list[dict[str, Any]]]) -> dict[str, Any]:
+    """Return the record tables of a snapshot together with the postings tables of its indexes.
 
     Why this exists:
-    - Call records store full expressions; callers may search for unqualified names.
+    - Every binary snapshot carries the same name, callee, and outline indexes, however it was produced.
     """
-    if callee_expr == requested:
-        return True
+    files, symbols, calls = sections["files"], sections["symbols"], sections["calls"]
+    return {
+        **sections,
+        **SymbolNameIndex.from_symbols(symbols).to_tables(),
+        **CalleeIndex.from_calls(calls, trigrams=callee_trigrams_from_env()).to_tables(),
+        **FileOutlineIndex.from_records(files, symbols).to_tables(),
+    }
 
-    if callee_expr.endswith(f".{requested}"):
-        return True
 
-    if callee_expr.endswith(f"::{requested}"):
-        return True
+def _with_indexes(
+    sections: Mapping[str, list[dict[str, Any]]], *, scopes: Any, symbol_index: dict[str, Any] | None
+) -> dict[str, Any]:
+    files, symbols, calls = sections["files"], sections["symbols"], sections["calls"]
+    return {
+        **sections,
+        "scopes": scopes,
+        "symbol_index": symbol_index if symbol_index is not None else SymbolNameIndex.from_symbols(symbols).to_json(),
+        "callee_index": CalleeIndex.from_calls(calls),
+        "file_outlines": FileOutlineIndex.from_records(files, symbols),
+    }
 
-    if callee_expr.endswith(f"/{requested}"):
-        return True
 
-    if requested in callee_expr:
-        return True
+def rows_where(artifacts: Mapping[str, Any], section: str, field: str, value: str) -> list[dict[str, Any]]:
+    """Return records of `section` whose `field` equals `value`.
 
-    return False
+    Why this exists:
+    - Binary snapshots answer exact-match filters from one column without decoding the whole section.
+    """
+    if isinstance(artifacts, LazySnapshotArtifacts):
+        return artifacts.rows_where(section, field, value)
+    return [r for r in artifacts.get(section) or [] if r.get(field) == value]
 
 
-def find_callers_best_effort(artifacts: dict[str, Any], callee_name: str) -> list[dict[str, Any]]:
-    """Find call sites that reference a callee name (best-effort matching).
+def rows_at(artifacts: Mapping[str, Any], section: str, indices: list[int]) -> list[dict[str, Any]]:
+    """Return records of `section` by position.
 
     Why this exists:
-    - Relationship navigation and deterministic QA need to locate callers even with complex expressions.
+    - Persisted indexes store row numbers; binary snapshots decode only the rows they point at.
     """
+    if isinstance(artifacts, LazySnapshotArtifacts):
+        return artifacts.rows_at(section, indices)
+    rows = artifacts.get(section) or []
+    return [rows[i] for i in indices]
+
+
+def _symbol_summary(sym: dict[str, Any]) -> dict[str, Any]:
+    r = sym.get("range") or {}
+    return {
+        "symbol_id": sym.get("symbol_id"),
+        "kind": sym.get("kind"),
+        "name": sym.get("name"),
+        "citation": {
+            "file_path": sym.get("file_path"),
+            "start_line": r.get("start_line"),
+            "end_line": r.get("end_line"),
+        },
+    }
+
+
+def where_is_symbol_defined(
+    artifacts: Mapping[str, Any],
+    symbol_name: str,
+    *,
+    kinds: Iterable[str] | None = None,
+    ignore_case: bool = False,
+) -> list[dict[str, Any]]:
+    """Return definition locations for a symbol name.
+
+    `symbol_name` may be qualified as `path/to/file.py:name`; `kinds` restricts results to symbol kinds such as
+    `function` or `class`.
+
+    Why this exists:
+    - IDE navigation and deterministic QA need to know where symbols are defined; the snapshot's name index answers
+      with one lookup instead of a scan over every symbol.
+    """
+    rows = symbol_index_from_artifacts(artifacts).lookup(symbol_name, ignore_case=ignore_case)
+    symbols = rows_at(artifacts, "symbols", rows)
+    if kinds is not None:
+        wanted = set(kinds)
+        symbols = [sym for sym in symbols if sym.get("kind") in wanted]
+    return [_symbol_summary(sym) for sym in symbols]
+
+
+def find_callers_best_effort(
+    artifacts: Mapping[str, Any], callee_name: str, *, substring: bool = False
+) -> list[dict[str, Any]]:
+    """Find call sites that reference a callee name.
+
+    By default a call matches when its callee expression is `callee_name` or ends with it as whole segments
+    (`obj.name`, `mod::name`, `pkg/name`). With `substring`, any callee expression containing `callee_name` matches.
+
+    Why this exists:
+    - Relationship navigation and deterministic QA need to locate callers even with complex expressions; the
+      snapshot's callee postings narrow candidates to calls sharing the requested last segment.
+    """
+    index = callee_index_from_artifacts(artifacts)
+    if substring:
+        exprs = set(index.names_containing(callee_name))
+        rows = sorted({row for expr in exprs for row in index.segment_rows(callee_segment(expr))})
+        calls = [c for c in rows_at(artifacts, "calls", rows) if (c.get("callee_name") or "") in exprs]
+    else:
+        rows = index.segment_rows(callee_segment(callee_name))
+        calls = [
+            c for c in rows_at(artifacts, "calls", rows) if callee_matches(c.get("callee_name") or "", callee_name)
+        ]
+
     results: list[dict[str, Any]] = []
-    for call in artifacts.get("calls", []):
+    caller_ids: set[str] = set()
+    for call in calls:
         callee_expr = call.get("callee_name") or ""
-        if not _callee_matches(callee_expr, callee_name):
-            continue
-
         r = call.get("range") or {}
+        caller_id = call.get("caller_symbol_id") or ""
+        if caller_id:
+            caller_ids.add(caller_id)
         results.append(
             {
                 "callee_expr_preview": (callee_expr[:200] + "…") if len(callee_expr) > 200 else callee_expr,
+                "caller_symbol_id": caller_id or None,
                 "citation": {
                     "file_path": call.get("file_path"),
                     "start_line": r.get("start_line"),
@@ -130,42 +292,64 @@ def find_callers_best_effort(artifacts: dict[str, Any], callee_name: str) -> lis
             }
         )
 
+    if caller_ids:
+        callers = _symbols_by_id(artifacts, caller_ids)
+        for item in results:
+            caller = callers.get(item["caller_symbol_id"])
+            item["caller"] = _symbol_summary(caller) if caller is not None else None
+
     return results
 
 
-def explain_file_stub(artifacts: dict[str, Any], file_path: str) -> dict[str, Any]:
+def _symbols_by_id(artifacts: Mapping[str, Any], symbol_ids: set[str]) -> dict[str, dict[str, Any]]:
+    index = symbol_index_from_artifacts(artifacts)
+    rows = sorted({row for symbol_id in symbol_ids for row in index.rows_for("id", symbol_id)})
+    return {s["symbol_id"]: s for s in rows_at(artifacts, "symbols", rows)}
+
+
+def symbol_at_line(artifacts: Mapping[str, Any], file_path: str, line: int) -> dict[str, Any] | None:
+    """Return the innermost symbol whose definition spans `line` (1-based), if any.
+
+    Why this exists:
+    - "Which function is line N in?" is answered by a binary search over the snapshot's scope index.
+    """
+    symbol_id = scope_index_from_artifacts(artifacts).symbol_at_line(file_path, line)
+    if symbol_id is None:
+        return None
+    matches = rows_where(artifacts, "symbols", "symbol_id", symbol_id)
+    return _symbol_summary(matches[0]) if matches else None
+
+
+def explain_file_stub(artifacts: Mapping[str, Any], file_path: str) -> dict[str, Any]:
     """Return a deterministic file explanation stub.
 
+    Symbols come from the file's precomputed outline: ordered by start line with enclosing definitions first, each
+    carrying its nesting depth, plus symbol counts by kind.
+
     Why this exists:
     - The IDE needs a fast, citation-backed file summary without using an LLM.
     """
-    file_rec = None
-    for f in artifacts.get("files", []):
-        if f.get("path") == file_path:
-            file_rec = f
-            break
-
-    if file_rec is None:
+    outline = file_outlines_from_artifacts(artifacts).outline(file_path)
+    if outline is None:
         raise KeyError(f"File not found in snapshot: {file_path}")
 
-    symbols = [s for s in artifacts.get("symbols", []) if s.get("file_path") == file_path]
-    symbols.sort(key=lambda s: (s.get("range", {}).get("start_line") or 0, s.get("name") or ""))
-
     return {
-        "file": file_rec,
+        "file": outline.file,
         "top_symbols": [
             {
-                "symbol_id": s.get("symbol_id"),
-                "kind": s.get("kind"),
-                "name": s.get("name"),
+                "symbol_id": s["symbol_id"],
+                "kind": s["kind"],
+                "name": s["name"],
+                "depth": s["depth"],
                 "citation": {
                     "file_path": file_path,
-                    "start_line": (s.get("range") or {}).get("start_line"),
-                    "end_line": (s.get("range") or {}).get("end_line"),
+                    "start_line": s["start_line"],
+                    "end_line": s["end_line"],
                 },
             }
-            for s in symbols[:25]
+            for s in outline.symbols[:25]
         ],
+        "symbol_counts": outline.kind_counts,
         "note": "Deterministic stub; LLM-backed explanation will be added later.",
         "citations": [
             {
@@ -0,0 +1,394 @@
+"""File: backend/src/codeknowl/record_store.py
+Purpose: Content-addressed store of per-file snapshot records (file metadata, symbols, calls, chunks) and the
+per-snapshot manifests that reference them.
+Product/business importance: Consecutive snapshots of a repository share almost every file; storing each distinct
+per-file record once keeps disk use and update cost proportional to what changed, not to commit count.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from collections.abc import Collection, Iterable, Mapping
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from codeknowl.artifacts import artifacts_root, repo_snapshot_dir
+
+MANIFEST_FILENAME = "manifest.json"
+MANIFEST_FORMAT_VERSION = 1
+
+RECORD_STORE_FILENAME = "records.sqlite"
+
+# Sections a per-file record carries, in snapshot order.
+RECORD_SECTIONS = ("symbols", "calls", "chunks")
+
+
+def _canonical(payload: object) -> bytes:
+    return json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def record_digest(record: Mapping[str, Any]) -> str:
+    """Return the content address of a per-file record.
+
+    Why this exists:
+    - Identical records (an unchanged file, or a file reverted to earlier contents) must map to one stored copy.
+    """
+    return hashlib.sha256(_canonical(record)).hexdigest()
+
+
+def group_file_records(
+    files: Iterable[Mapping[str, Any]],
+    symbols: Iterable[Mapping[str, Any]],
+    calls: Iterable[Mapping[str, Any]],
+    chunks: Iterable[Mapping[str, Any]],
+    *,
+    paths: Collection[str] | None = None,
+) -> dict[str, dict[str, Any]]:
+    """Split snapshot sections into one record per file path, optionally only for `paths`.
+
+    Why this exists:
+    - Records are the unit of sharing between snapshots; updates only build records for the files they touched.
+    """
+    records: dict[str, dict[str, Any]] = {}
+    for file_rec in files:
+        path = file_rec.get("path") or ""
+        if path and (paths is None or path in paths):
+            records[path] = {"file": dict(file_rec), **{section: [] for section in RECORD_SECTIONS}}
+    for section, rows in zip(RECORD_SECTIONS, (symbols, calls, chunks), strict=True):
+        for row in rows:
+            record = records.get(row.get("file_path") or "")
+            if record is not None:
+                record[section].append(dict(row))
+    return records
+
+
+@dataclass(frozen=True)
+class SnapshotManifest:
+    """Maps every file path of a snapshot to the digest of its per-file record.
+
+    `stats` is the stage report of the run that wrote the snapshot, when it has one.
+
+    Why this exists:
+    - A snapshot is fully described by its manifest, so unchanged files cost a digest reference instead of a copy.
+    """
+
+    repo_id: str
+    head_commit: str
+    parent_commit: str | None
+    records: dict[str, str]
+    stats: dict[str, Any] | None = None
+
+    def to_json(self) -> dict[str, Any]:
+        payload = {
+            "version": MANIFEST_FORMAT_VERSION,
+            "repo_id": self.repo_id,
+            "head_commit": self.head_commit,
+            "parent_commit": self.parent_commit,
+            "records": self.records,
+        }
+        if self.stats is not None:
+            payload["stats"] = self.stats
+        return payload
+
+    @staticmethod
+    def from_json(payload: Mapping[str, Any]) -> "SnapshotManifest":
+        if payload.get("version") != MANIFEST_FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot manifest version: {payload.get('version')}")
+        return SnapshotManifest(
+            repo_id=str(payload["repo_id"]),
+            head_commit=str(payload["head_commit"]),
+            parent_commit=payload.get("parent_commit"),
+            records=dict(payload["records"]),
+            stats=payload.get("stats"),
+        )
+
+
+def manifest_path(data_dir: Path, repo_id: str, head_commit: str) -> Path:
+    return repo_snapshot_dir(data_dir, repo_id, head_commit) / MANIFEST_FILENAME
+
+
+def load_manifest(data_dir: Path, repo_id: str, head_commit: str) -> SnapshotManifest | None:
+    """Return a snapshot's manifest, or None for snapshots written before manifests existed.
+
+    Why this exists:
+    - Updates build on the previous manifest when there is one and fall back to a full record write otherwise.
+    """
+    path = manifest_path(data_dir, repo_id, head_commit)
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            return SnapshotManifest.from_json(json.load(f))
+    except FileNotFoundError:
+        return None
+
+
+def write_manifest(data_dir: Path, manifest: SnapshotManifest) -> None:
+    """Write a snapshot's manifest under a temporary name and rename it into place.
+
+    Why this exists:
+    - The manifest is the whole snapshot; readers and other processes must never see a partially written one.
+    """
+    path = manifest_path(data_dir, manifest.repo_id, manifest.head_commit)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(manifest.to_json(), f, indent=2, sort_keys=True)
+        f.write("\n")
+    os.replace(tmp, path)
+
+
+@dataclass
+class RecordWriteStats:
+    """What one snapshot write added to the record store.
+
+    Why this exists:
+    - Operators and tests confirm that an update stored only the records of the files it changed.
+    """
+
+    written: int = 0
+    reused: int = 0
+    bytes_written: int = 0
+    carried_over: int = 0
+    digests: dict[str, str] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class PutResult:
+    """Digests and write counts of one `ContentStore.put_payloads` call."""
+
+    digests: dict[str, str]
+    written: int
+    reused: int
+    bytes_written: int
+
+
+class ContentStore:
+    """SQLite-backed store of immutable, zlib-compressed payloads keyed by the sha256 of their bytes.
+
+    Writers insert only digests they have not stored before, and readers never observe a partially written payload.
+    Each row carries the time it was last stored or reused so garbage collection can leave in-flight writes alone.
+    Each thread gets its own connection.
+
+    Why this exists:
+    - Per-file records and chunk texts are both shared between snapshots by content; one implementation serves both.
+    """
+
+    table = "payloads"
+
+    def __init__(self, db_path: Path) -> None:
+        self.db_path = db_path
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                f"""
+                CREATE TABLE IF NOT EXISTS {self.table} (
+                    digest TEXT PRIMARY KEY,
+                    payload BLOB NOT NULL,
+                    stored_at REAL NOT NULL DEFAULT 0
+                )
+                """
+            )
+            conn.commit()
+            self._local.conn = conn
+        return conn
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def _select(self, columns: str, digests: Iterable[str]) -> Iterable[tuple]:
+        wanted = list(dict.fromkeys(digests))
+        conn = self._connection()
+        # Stay under SQLite's default bound-parameter limit.
+        for start in range(0, len(wanted), 500):
+            batch = wanted[start : start + 500]
+            placeholders = ",".join("?" * len(batch))
+            yield from conn.execute(f"SELECT {columns} FROM {self.table} WHERE digest IN ({placeholders})", batch)
+
+    def existing(self, digests: Iterable[str]) -> set[str]:
+        """Return the subset of `digests` already stored."""
+        return {row[0] for row in self._select("digest", digests)}
+
+    def put_payloads(self, payloads: Mapping[str, bytes]) -> PutResult:
+        """Store payloads given by caller key and return each key's digest with write counts.
+
+        Why this exists:
+        - A snapshot write stores all new payloads in one transaction and skips every payload already present.
+        """
+        digests = {key: hashlib.sha256(payload).hexdigest() for key, payload in payloads.items()}
+        present = self.existing(digests.values())
+        now = time.time()
+        conn = self._connection()
+        # Reused payloads are refreshed in the same transaction as the inserts, so a concurrent sweep either ran
+        # first (and the payload is stored again below) or sees the fresh timestamp and keeps it.
+        for digest in list(present):
+            if conn.execute(f"UPDATE {self.table} SET stored_at = ? WHERE digest = ?", (now, digest)).rowcount == 0:
+                present.discard(digest)
+        rows: dict[str, bytes] = {}
+        reused = 0
+        for key, digest in digests.items():
+            if digest in present or digest in rows:
+                reused += 1
+                continue
+            rows[digest] = zlib.compress(payloads[key])
+        conn.executemany(
+            f"INSERT OR IGNORE INTO {self.table} (digest, payload, stored_at) VALUES (?, ?, ?)",
+            ((digest, payload, now) for digest, payload in rows.items()),
+        )
+        conn.commit()
+        return PutResult(
+            digests=digests,
+            written=len(rows),
+            reused=reused,
+            bytes_written=sum(len(payload) for payload in rows.values()),
+        )
+
+    def get_payloads(self, digests: Iterable[str]) -> dict[str, bytes]:
+        """Return decompressed payloads for `digests`; missing digests are absent from the result."""
+        return {digest: zlib.decompress(payload) for digest, payload in self._select("digest, payload", digests)}
+
+    def sweep(self, referenced: Collection[str], *, stored_before: float, dry_run: bool = False) -> tuple[int, int]:
+        """Delete payloads not in `referenced` and stored before `stored_before`; return (count, payload bytes).
+
+        Why this exists:
+        - Payloads written by an update whose snapshot is not on disk yet are younger than the cutoff and survive.
+        """
+        conn = self._connection()
+        candidates = conn.execute(
+            f"SELECT digest, length(payload) FROM {self.table} WHERE stored_at < ?", (stored_before,)
+        ).fetchall()
+        stale = [(digest, size) for digest, size in candidates if digest not in referenced]
+        if dry_run:
+            return len(stale), sum(size for _, size in stale)
+        removed, freed = 0, 0
+        for digest, size in stale:
+            # Re-check the timestamp: a writer may have reused the payload since it was selected.
+            deleted = conn.execute(
+                f"DELETE FROM {self.table} WHERE digest = ? AND stored_at < ?", (digest, stored_before)
+            ).rowcount
+            removed += deleted
+            freed += size if deleted else 0
+        conn.commit()
+        return removed, freed
+
+    def size_bytes(self) -> int:
+        """Return the on-disk size of the store, including its write-ahead log."""
+        total = 0
+        for suffix in ("", "-wal"):
+            try:
+                total += self.db_path.with_name(self.db_path.name + suffix).stat().st_size
+            except FileNotFoundError:
+                pass
+        return total
+
+    def compact(self) -> None:
+        """Return free pages to the filesystem; skipped while another connection holds a lock.
+
+        Why this exists:
+        - Deleted payloads only free pages inside the database file until it is vacuumed.
+        """
+        conn = self._connection()
+        try:
+            conn.execute("VACUUM")
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        except sqlite3.OperationalError:
+            pass
+
+
+class FileRecordStore(ContentStore):
+    """Content-addressed store of per-file records for one repository.
+
+    Why this exists:
+    - Snapshots of the same repository share one store; a record is written once however many snapshots use it.
+    """
+
+    table = "file_records"
+
+    @staticmethod
+    def for_repo(data_dir: Path, repo_id: str) -> "FileRecordStore":
+        """Return the record store of a repository (it lives next to the repo's snapshot directories)."""
+        return FileRecordStore(artifacts_root(data_dir) / repo_id / RECORD_STORE_FILENAME)
+
+    def put_many(self, records: Mapping[str, Mapping[str, Any]]) -> RecordWriteStats:
+        """Store per-file records keyed by path and return their digests with write statistics."""
+        result = self.put_payloads({path: _canonical(record) for path, record in records.items()})
+        return RecordWriteStats(
+            written=result.written,
+            reused=result.reused,
+            bytes_written=result.bytes_written,
+            digests=result.digests,
+        )
+
+    def get_many(self, digests: Iterable[str]) -> dict[str, dict[str, Any]]:
+        """Return decoded records for `digests`; missing digests are absent from the result."""
+        return {digest: json.loads(payload) for digest, payload in self.get_payloads(digests).items()}
+
+
+def write_snapshot_records(
+    store: FileRecordStore,
+    *,
+    sections: Mapping[str, Iterable[Mapping[str, Any]]],
+    base: SnapshotManifest | None,
+    changed_paths: Collection[str] | None,
+    deleted_paths: Collection[str] = (),
+) -> tuple[dict[str, str], RecordWriteStats]:
+    """Store the records a snapshot needs and return its path-to-digest map.
+
+    With a base manifest and the set of changed paths, only records for those paths are built and stored; every
+    other entry is carried over from the base. Without them, every file's record is built (and deduplicated).
+
+    Why this exists:
+    - Writing an update must cost O(changed files), whatever the size of the repository.
+    """
+    paths = None if base is None or changed_paths is None else set(changed_paths)
+    records = group_file_records(
+        sections.get("files") or [],
+        sections.get("symbols") or [],
+        sections.get("calls") or [],
+        sections.get("chunks") or [],
+        paths=paths,
+    )
+    stats = store.put_many(records)
+    if paths is None:
+        return dict(sorted(stats.digests.items())), stats
+    dropped = paths | set(deleted_paths)
+    digests = {path: digest for path, digest in base.records.items() if path not in dropped}
+    stats.carried_over = len(digests)
+    digests.update(stats.digests)
+    return dict(sorted(digests.items())), stats
+
+
+def materialize_manifest(store: FileRecordStore, manifest: SnapshotManifest) -> dict[str, list[dict[str, Any]]]:
+    """Rebuild a snapshot's files/symbols/calls/chunks sections from its manifest, in path order.
+
+    Why this exists:
+    - A manifest plus the record store is a complete snapshot; readers can rebuild any section they need from it.
+    """
+    records = store.get_many(manifest.records.values())
+    missing = sorted(path for path, digest in manifest.records.items() if digest not in records)
+    if missing:
+        raise ValueError(f"Record store is missing records for {len(missing)} files (first: {missing[0]})")
+    sections: dict[str, list[dict[str, Any]]] = {"files": [], **{section: [] for section in RECORD_SECTIONS}}
+    for path in sorted(manifest.records):
+        record = records[manifest.records[path]]
+        sections["files"].append(record["file"])
+        for section in RECORD_SECTIONS:
+            sections[section].extend(record[section])
+    return sections
@@ -8,9 +8,44 @@ License: MIT (see LICENSE)
 
 from __future__ import annotations
 
+import hashlib
+import re
+import shutil
 import subprocess
+from collections.abc import Iterable
+from dataclasses import dataclass
 from pathlib import Path
 
+# Regular and executable files; symlinks (120000) and submodules (160000) are not indexed.
+_INDEXABLE_BLOB_MODES = {"100644", "100755"}
+
+# Keep pathspec batches well below OS argument-length limits.
+_PATHSPEC_BATCH = 500
+
+
+@dataclass(frozen=True)
+class TreeEntry:
+    """A file blob listed in a commit's tree.
+
+    Why this exists:
+    - Inventory can be built from the commit itself (path, blob id, size) without touching a checkout.
+    """
+
+    path: str
+    blob_sha: str
+    size_bytes: int
+
+
+def git_blob_sha(data: bytes) -> str:
+    """Return the git blob object id for raw file bytes.
+
+    Why this exists:
+    - Per-file caches are keyed by the same ids `git ls-tree`/`git hash-object` report, so a lookup can happen
+      with or without reading the file.
+    """
+    header = f"blob {len(data)}\0".encode("ascii")
+    return hashlib.sha1(header + data, usedforsecurity=False).hexdigest()
+
 
 def rev_parse(repo_path: Path, ref: str) -> str:
     """Resolve a git ref to a commit hash.
@@ -80,6 +115,216 @@ def diff_name_status(repo_path: Path, old_commit: str, new_commit: str) -> list[
     return out
 
 
+def _parse_ls_tree(output: bytes) -> list[TreeEntry]:
+    entries: list[TreeEntry] = []
+    for record in output.split(b"\0"):
+        if not record:
+            continue
+        meta, _, raw_path = record.partition(b"\t")
+        fields = meta.split()
+        if len(fields) != 4:
+            continue
+        mode, obj_type, blob_sha, size = (f.decode("ascii") for f in fields)
+        if obj_type != "blob" or mode not in _INDEXABLE_BLOB_MODES:
+            continue
+        entries.append(
+            TreeEntry(path=raw_path.decode("utf-8", errors="surrogateescape"), blob_sha=blob_sha, size_bytes=int(size))
+        )
+    return entries
+
+
+def ls_tree(repo_path: Path, commit: str, paths: Iterable[str] | None = None) -> list[TreeEntry]:
+    """List file blobs (path, blob id, size) in a commit, optionally limited to specific paths.
+
+    Entries are sorted by path. Paths that do not exist in the commit are simply absent.
+
+    Why this exists:
+    - `git ls-tree -r -l` returns the committed inventory in one subprocess call, instead of a filesystem walk with
+      a stat per file that also descends into untracked directories.
+    """
+    base = ["git", "--literal-pathspecs", "-C", str(repo_path), "ls-tree", "-r", "-l", "-z", "--full-tree", commit]
+    if paths is None:
+        batches: list[list[str]] = [[]]
+    else:
+        selected = sorted(set(paths))
+        if not selected:
+            return []
+        batches = [selected[i : i + _PATHSPEC_BATCH] for i in range(0, len(selected), _PATHSPEC_BATCH)]
+
+    entries: list[TreeEntry] = []
+    for batch in batches:
+        result = subprocess.run(
+            [*base, "--", *batch] if batch else base,
+            capture_output=True,
+            check=True,
+        )
+        entries.extend(_parse_ls_tree(result.stdout))
+    entries.sort(key=lambda e: e.path)
+    return entries
+
+
+class GitBlobReader:
+    """Stream object contents from a long-lived `git cat-file --batch` process.
+
+    One subprocess serves every read, so reading N blobs costs N pipe round-trips instead of N process spawns or a
+    full checkout. Instances are not thread-safe; give each thread or pool worker its own reader.
+
+    Why this exists:
+    - Indexing and updates can feed committed file contents straight into extraction and chunking without creating
+      a worktree, so update cost scales with the diff instead of the repository size.
+    """
+
+    def __init__(self, repo_path: Path) -> None:
+        self.repo_path = repo_path
+        self._proc: subprocess.Popen[bytes] | None = None
+
+    def __enter__(self) -> "GitBlobReader":
+        return self
+
+    def __exit__(self, *_exc: object) -> None:
+        self.close()
+
+    def _process(self) -> subprocess.Popen[bytes]:
+        if self._proc is None or self._proc.poll() is not None:
+            self._proc = subprocess.Popen(
+                ["git", "-C", str(self.repo_path), "cat-file", "--batch"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+            )
+        return self._proc
+
+    def read(self, object_spec: str) -> bytes | None:
+        """Return the contents of a blob (by id or `<commit>:<path>`), or None if it does not exist.
+
+        Why this exists:
+        - Callers index committed contents by blob id taken from `ls_tree`.
+        """
+        if "\n" in object_spec:
+            raise ValueError("object_spec must not contain newlines")
+        proc = self._process()
+        assert proc.stdin is not None and proc.stdout is not None
+        proc.stdin.write(object_spec.encode("utf-8", errors="surrogateescape") + b"\n")
+        proc.stdin.flush()
+
+        header = proc.stdout.readline()
+        if not header:
+            raise RuntimeError(f"git cat-file exited while reading {object_spec}")
+        fields = header.split()
+        if len(fields) != 3:
+            # "<spec> missing" or "<spec> ambiguous"
+            return None
+        _, obj_type, size = fields
+        data = proc.stdout.read(int(size))
+        proc.stdout.read(1)  # trailing LF
+        if obj_type != b"blob":
+            return None
+        return data
+
+    def close(self) -> None:
+        """Terminate the cat-file process.
+
+        Why this exists:
+        - Readers are scoped to one index/update run and must not leak subprocesses.
+        """
+        proc, self._proc = self._proc, None
+        if proc is None:
+            return
+        if proc.stdin is not None:
+            proc.stdin.close()
+        try:
+            proc.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+            proc.wait()
+        if proc.stdout is not None:
+            proc.stdout.close()
+
+
+@dataclass(frozen=True)
+class DiffHunk:
+    """One `git diff -U0` hunk: line ranges replaced in the old file and inserted in the new file.
+
+    Starts are 1-based. A zero count means a pure insertion (old) or pure deletion (new) positioned after the
+    start line, following git's unified-diff convention.
+
+    Why this exists:
+    - Incremental re-parsing turns hunks into Tree-sitter edits and shifts unchanged records by whole lines.
+    """
+
+    old_start: int
+    old_count: int
+    new_start: int
+    new_count: int
+
+
+_HUNK_HEADER = re.compile(rb"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+
+
+def _parse_diff_hunks(output: bytes) -> dict[str, list[DiffHunk]]:
+    hunks: dict[str, list[DiffHunk]] = {}
+    current: list[DiffHunk] | None = None
+    in_header = False
+    for line in output.split(b"\n"):
+        if line.startswith(b"diff --git "):
+            current = None
+            in_header = True
+        elif in_header and line.startswith(b"+++ "):
+            target = line[4:]
+            if target.startswith(b"b/"):
+                current = hunks.setdefault(target[2:].decode("utf-8", errors="surrogateescape"), [])
+        elif line.startswith(b"@@"):
+            in_header = False
+            match = _HUNK_HEADER.match(line)
+            if current is not None and match:
+                old_start, old_count, new_start, new_count = match.groups()
+                current.append(
+                    DiffHunk(
+                        old_start=int(old_start),
+                        old_count=1 if old_count is None else int(old_count),
+                        new_start=int(new_start),
+                        new_count=1 if new_count is None else int(new_count),
+                    )
+                )
+    return hunks
+
+
+def diff_hunks(repo_path: Path, old_commit: str, new_commit: str, paths: Iterable[str]) -> dict[str, list[DiffHunk]]:
+    """Return zero-context diff hunks per path between two commits.
+
+    Paths without textual changes (or binary files) are absent from the result.
+
+    Why this exists:
+    - Incremental updates of modified files need to know exactly which line ranges changed.
+    """
+    selected = sorted(set(paths))
+    hunks: dict[str, list[DiffHunk]] = {}
+    for i in range(0, len(selected), _PATHSPEC_BATCH):
+        result = subprocess.run(
+            [
+                "git",
+                "--literal-pathspecs",
+                "-c",
+                "core.quotePath=false",
+                "-C",
+                str(repo_path),
+                "diff",
+                "-U0",
+                "--no-color",
+                "--no-ext-diff",
+                "--no-renames",
+                old_commit,
+                new_commit,
+                "--",
+                *selected[i : i + _PATHSPEC_BATCH],
+            ],
+            capture_output=True,
+            check=True,
+        )
+        hunks.update(_parse_diff_hunks(result.stdout))
+    return hunks
+
+
 def worktree_add_detached(repo_path: Path, worktree_path: Path, commit: str) -> None:
     """Create a detached worktree for a specific commit.
 
@@ -115,3 +360,35 @@ def worktree_remove(repo_path: Path, worktree_path: Path) -> None:
         text=True,
         check=False,
     )
+
+
+def worktree_checkout(repo_path: Path, worktree_path: Path, commit: str) -> None:
+    """Move a persistent detached worktree to `commit`, creating it on first use.
+
+    An existing worktree is advanced with `git checkout`, which rewrites only the files that differ between the two
+    commits; untracked leftovers are cleaned so the checkout matches `commit` exactly. A directory git no longer
+    recognizes as a worktree is recreated.
+
+    Why this exists:
+    - Updates reuse one checkout per repository instead of materializing a fresh worktree for every stage.
+    """
+    if (worktree_path / ".git").is_file():
+        checkout = subprocess.run(
+            ["git", "-C", str(worktree_path), "checkout", "-q", "--detach", "--force", commit],
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+        if checkout.returncode == 0:
+            subprocess.run(
+                ["git", "-C", str(worktree_path), "clean", "-q", "-ffdx"],
+                capture_output=True,
+                text=True,
+                check=True,
+            )
+            return
+    worktree_remove(repo_path, worktree_path)
+    shutil.rmtree(worktree_path, ignore_errors=True)
+    subprocess.run(["git", "-C", str(repo_path), "worktree", "prune"], capture_output=True, text=True, check=False)
+    worktree_path.parent.mkdir(parents=True, exist_ok=True)
+    worktree_add_detached(repo_path, worktree_path, commit)
@@ -14,7 +14,7 @@ import re
 from dataclasses import dataclass
 from typing import Any, Protocol
 
-import httpx
+from codeknowl.http_pool import http_pool
 
 
 class Reranker(Protocol):
@@ -103,15 +103,9 @@ class OpenAiCompatibleReranker:
     def __init__(self, config: HttpRerankerConfig):
         self._config = config
 
-    def rerank(self, *, query: str, documents: list[str], top_n: int | None = None) -> list[float]:
-        """Reorder documents by relevance to the query using the HTTP reranker.
-
-        Why this exists:
-        - QA pipelines need to rank retrieved evidence so the most relevant chunks are used for answer synthesis.
-        """
-        if not documents:
-            return []
-
+    def _request(
+        self, *, query: str, documents: list[str], top_n: int | None
+    ) -> tuple[str, dict[str, str], dict[str, Any]]:
         headers: dict[str, str] = {"Content-Type": "application/json"}
         if self._config.api_key:
             headers["Authorization"] = f"Bearer {self._config.api_key}"
@@ -124,12 +118,10 @@ class OpenAiCompatibleReranker:
         }
         if top_n is not None:
             payload["top_n"] = top_n
+        return url, headers, payload
 
-        with httpx.Client(timeout=self._config.timeout_seconds) as client:
-            response = client.post(url, headers=headers, json=payload)
-            response.raise_for_status()
-            data = response.json()
-
+    @staticmethod
+    def _scores(data: dict[str, Any], *, expected: int) -> list[float]:
         scores = data.get("scores")
         if not isinstance(scores, list):
             raise RuntimeError("Rerank response missing scores list")
@@ -138,11 +130,41 @@ class OpenAiCompatibleReranker:
         for s in scores:
             out.append(float(s))
 
-        if len(out) != len(documents):
+        if len(out) != expected:
             raise RuntimeError("Rerank response size mismatch")
 
         return out
 
+    def rerank(self, *, query: str, documents: list[str], top_n: int | None = None) -> list[float]:
+        """Reorder documents by relevance to the query using the HTTP reranker.
+
+        Why this exists:
+        - QA pipelines need to rank retrieved evidence so the most relevant chunks are used for answer synthesis.
+        """
+        if not documents:
+            return []
+
+        url, headers, payload = self._request(query=query, documents=documents, top_n=top_n)
+        client = http_pool().sync_client(url)
+        response = client.post(url, headers=headers, json=payload, timeout=self._config.timeout_seconds)
+        response.raise_for_status()
+        return self._scores(response.json(), expected=len(documents))
+
+    async def arerank(self, *, query: str, documents: list[str], top_n: int | None = None) -> list[float]:
+        """Async variant of `rerank` on the shared async connection pool.
+
+        Why this exists:
+        - The API server reranks evidence without blocking its event loop.
+        """
+        if not documents:
+            return []
+
+        url, headers, payload = self._request(query=query, documents=documents, top_n=top_n)
+        client = http_pool().async_client(url)
+        response = await client.post(url, headers=headers, json=payload, timeout=self._config.timeout_seconds)
+        response.raise_for_status()
+        return self._scores(response.json(), expected=len(documents))
+
 
 class OverlapReranker:
     """Deterministic fallback reranker based on token overlap.
@@ -0,0 +1,129 @@
+"""File: backend/src/codeknowl/retention.py
+Purpose: Decide which snapshots of a repository to keep (the last N successful ones plus pinned ones) and remove
+the data of the others.
+Product/business importance: Every index run leaves a snapshot behind; without retention the data dir grows without
+limit and operators have to clean it up by hand.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+from collections.abc import Iterable, Sequence
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Protocol
+
+
+@dataclass(frozen=True)
+class RetentionConfig:
+    """Snapshot retention settings.
+
+    Why this exists:
+    - Operators choose how much history to keep and how long superseded snapshots stay readable.
+    """
+
+    keep_last: int
+    grace_seconds: float
+    gc_interval_seconds: int
+
+    @staticmethod
+    def from_env(prefix: str = "CODEKNOWL_RETENTION_") -> "RetentionConfig":
+        """Load retention settings from environment variables.
+
+        Why this exists:
+        - The backend should be configurable via environment without code changes.
+        """
+        return RetentionConfig(
+            keep_last=max(1, int(os.environ.get(f"{prefix}KEEP_LAST", "5"))),
+            grace_seconds=max(0.0, float(os.environ.get(f"{prefix}GRACE_SECONDS", "600"))),
+            gc_interval_seconds=max(0, int(os.environ.get(f"{prefix}GC_INTERVAL_SECONDS", "0"))),
+        )
+
+
+class RunLike(Protocol):
+    run_id: str
+    status: str
+    started_at_utc: str
+    finished_at_utc: str | None
+    head_commit: str | None
+
+
+@dataclass(frozen=True)
+class RetentionPlan:
+    """What one GC pass keeps and removes for a repository.
+
+    `superseded_at` maps each non-retained commit to the time (epoch seconds) a newer snapshot replaced it; the
+    snapshot is only deleted once that is longer ago than the grace period.
+
+    Why this exists:
+    - Planning is separate from deletion so dry runs and tests see exactly what a pass would do.
+    """
+
+    keep: list[str]
+    collect: list[str]
+    stale_run_ids: list[str]
+    superseded_at: dict[str, float]
+
+
+def _epoch(iso_utc: str | None) -> float:
+    return datetime.fromisoformat(iso_utc).timestamp() if iso_utc else 0.0
+
+
+def plan_retention(runs: Sequence[RunLike], *, pinned: Iterable[str], keep_last: int) -> RetentionPlan:
+    """Choose the commits to keep and the run rows to drop from a repository's index runs.
+
+    Kept commits are the `keep_last` most recent successful heads plus pinned commits. Run rows survive if they are
+    still running, are the latest run, or are the newest successful run of a kept commit.
+
+    Why this exists:
+    - Pollers record a succeeded run on every tick, so run rows accumulate even when no new snapshot is written.
+    """
+    ordered = sorted(runs, key=lambda r: r.started_at_utc, reverse=True)
+    heads: list[str] = []
+    newest_run_for: dict[str, str] = {}
+    superseded_at: dict[str, float] = {}
+    replaced_at: float | None = None
+    for run in ordered:
+        if run.status != "succeeded" or not run.head_commit:
+            continue
+        if run.head_commit not in newest_run_for:
+            newest_run_for[run.head_commit] = run.run_id
+            heads.append(run.head_commit)
+            if replaced_at is not None:
+                superseded_at[run.head_commit] = replaced_at
+        replaced_at = _epoch(run.finished_at_utc)
+    keep = list(dict.fromkeys([*heads[:keep_last], *(c for c in pinned if c in newest_run_for)]))
+    keep_runs = {newest_run_for[c] for c in keep}
+    if ordered:
+        keep_runs.add(ordered[0].run_id)
+    stale_run_ids = [r.run_id for r in ordered if r.status != "running" and r.run_id not in keep_runs]
+    collect = [c for c in heads if c not in keep]
+    return RetentionPlan(keep=keep, collect=collect, stale_run_ids=stale_run_ids, superseded_at=superseded_at)
+
+
+def tree_bytes(path: Path) -> int:
+    """Return the total size of the regular files under `path`."""
+    if path.is_file():
+        return path.stat().st_size
+    return sum(p.stat().st_size for p in path.rglob("*") if p.is_file())
+
+
+def newest_mtime(path: Path) -> float:
+    """Return the most recent modification time of `path` or anything beneath it."""
+    times = [path.stat().st_mtime, *(p.stat().st_mtime for p in path.rglob("*"))]
+    return max(times)
+
+
+def remove_tree(path: Path) -> int:
+    """Delete a snapshot directory and return the bytes it held.
+
+    Readers that already memory-mapped a snapshot file keep their mapping after it is unlinked.
+    """
+    size = tree_bytes(path)
+    shutil.rmtree(path, ignore_errors=True)
+    return size if not path.exists() else size - tree_bytes(path)
@@ -0,0 +1,198 @@
+"""File: backend/src/codeknowl/scope_index.py
+Purpose: Per-file interval index mapping source positions to their innermost enclosing symbol.
+Product/business importance: Caller attribution and "which symbol contains line N" lookups must be correct and run
+in O(log n) per query instead of scanning every symbol in a file.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+from bisect import bisect_right
+from collections.abc import Iterable, Mapping
+from dataclasses import dataclass, replace
+from typing import Any, Generic, TypeVar
+
+from codeknowl.artifacts import CallRecord
+
+K = TypeVar("K")
+
+SCOPES_FORMAT_VERSION = 1
+
+
+@dataclass(frozen=True)
+class IntervalIndex(Generic[K]):
+    """Disjoint, sorted segments of a nested interval set, each owned by its innermost interval.
+
+    `starts[i]` is the first key of segment i, which extends to `starts[i + 1]`; `owners[i]` is the value of the
+    innermost interval covering it, or "" for gaps between top-level intervals.
+
+    Why this exists:
+    - Flattening nested definitions once at index time turns every containment query into one binary search.
+    """
+
+    starts: list[K]
+    owners: list[str]
+
+    def lookup(self, key: K) -> str | None:
+        """Return the owner of the segment containing `key`, or None outside every interval."""
+        i = bisect_right(self.starts, key) - 1
+        if i < 0:
+            return None
+        return self.owners[i] or None
+
+
+def build_interval_index(intervals: Iterable[tuple[K, K, str]]) -> IntervalIndex[K]:
+    """Flatten half-open `(start, end, value)` intervals into an `IntervalIndex`.
+
+    Where intervals overlap, the one starting last (then the shortest) wins, which is the innermost definition for
+    properly nested scopes.
+
+    Why this exists:
+    - Line-granular scopes of sibling definitions can share a line, so the sweep must not assume strict nesting.
+    """
+    ordered = sorted((iv for iv in intervals if iv[0] < iv[1]), key=lambda iv: (iv[0], _neg_order(iv[1])))
+    boundaries = sorted({iv[0] for iv in ordered} | {iv[1] for iv in ordered})
+    starts: list[K] = []
+    owners: list[str] = []
+    active: list[tuple[K, K, str]] = []
+    pending = 0
+    for boundary in boundaries:
+        active = [iv for iv in active if iv[1] > boundary]
+        while pending < len(ordered) and ordered[pending][0] == boundary:
+            active.append(ordered[pending])
+            pending += 1
+        owner = active[-1][2] if active else ""
+        if owners and owners[-1] == owner:
+            continue
+        starts.append(boundary)
+        owners.append(owner)
+    return IntervalIndex(starts=starts, owners=owners)
+
+
+def _neg_order(value: Any) -> Any:
+    return tuple(-x for x in value) if isinstance(value, tuple) else -value
+
+
+@dataclass(frozen=True)
+class FileScopes:
+    """Scope lookups for one file.
+
+    `lines` answers line-granular questions (a definition owns every line from its first to its last); `points`
+    uses exact `(line, col)` positions with tree-sitter's exclusive end, matching how extraction attributes calls.
+
+    Why this exists:
+    - A call after a one-line definition on the same line belongs to the outer scope, which lines alone cannot tell.
+    """
+
+    lines: IntervalIndex[int]
+    points: IntervalIndex[tuple[int, int]]
+
+
+class ScopeIndex:
+    """Interval index of symbol scopes for every file in a snapshot.
+
+    Why this exists:
+    - Persisted next to symbols.json so readers resolve enclosing symbols without rebuilding or scanning.
+    """
+
+    def __init__(self, files: dict[str, FileScopes]) -> None:
+        self._files = files
+
+    @classmethod
+    def from_symbols(cls, symbols: Iterable[dict[str, Any]]) -> ScopeIndex:
+        """Build an index from symbol artifact dicts (`file_path`, `symbol_id`, `range`)."""
+        by_file: dict[str, list[tuple[dict[str, Any], str]]] = {}
+        for sym in symbols:
+            file_path = sym.get("file_path")
+            symbol_id = sym.get("symbol_id")
+            r = sym.get("range")
+            if file_path and symbol_id and isinstance(r, dict):
+                by_file.setdefault(str(file_path), []).append((r, str(symbol_id)))
+
+        files: dict[str, FileScopes] = {}
+        for file_path, entries in by_file.items():
+            files[file_path] = FileScopes(
+                lines=build_interval_index((int(r["start_line"]), int(r["end_line"]) + 1, sid) for r, sid in entries),
+                points=build_interval_index(
+                    (
+                        (int(r["start_line"]), int(r["start_col"])),
+                        (int(r["end_line"]), int(r["end_col"])),
+                        sid,
+                    )
+                    for r, sid in entries
+                ),
+            )
+        return cls(files)
+
+    def file_paths(self) -> list[str]:
+        return sorted(self._files)
+
+    def symbol_at_line(self, file_path: str, line: int) -> str | None:
+        """Return the innermost symbol whose lines include `line` (1-based)."""
+        scopes = self._files.get(file_path)
+        return scopes.lines.lookup(line) if scopes is not None else None
+
+    def enclosing_symbol(self, file_path: str, line: int, col: int) -> str | None:
+        """Return the innermost symbol containing the 1-based position `(line, col)`."""
+        scopes = self._files.get(file_path)
+        return scopes.points.lookup((line, col)) if scopes is not None else None
+
+    def attribute_call(self, call: dict[str, Any]) -> dict[str, Any]:
+        """Return a call artifact dict with `caller_symbol_id` set from its start position."""
+        r = call.get("range") or {}
+        caller = self.enclosing_symbol(
+            str(call.get("file_path") or ""), int(r.get("start_line") or 0), int(r.get("start_col") or 0)
+        )
+        if (call.get("caller_symbol_id") or "") == (caller or ""):
+            return call
+        return {**call, "caller_symbol_id": caller or ""}
+
+    def attribute_call_record(self, call: CallRecord) -> CallRecord:
+        """Return `call` with `caller_symbol_id` set from its start position."""
+        caller = self.enclosing_symbol(call.file_path, call.range.start_line, call.range.start_col) or ""
+        return call if call.caller_symbol_id == caller else replace(call, caller_symbol_id=caller)
+
+    def to_json(self) -> dict[str, Any]:
+        return {
+            "version": SCOPES_FORMAT_VERSION,
+            "files": {
+                path: {
+                    "line_starts": s.lines.starts,
+                    "line_owners": s.lines.owners,
+                    "point_starts": [list(p) for p in s.points.starts],
+                    "point_owners": s.points.owners,
+                }
+                for path, s in sorted(self._files.items())
+            },
+        }
+
+    @classmethod
+    def from_json(cls, payload: dict[str, Any]) -> ScopeIndex:
+        if payload.get("version") != SCOPES_FORMAT_VERSION:
+            raise ValueError(f"Unsupported scopes format: {payload.get('version')!r}")
+        files: dict[str, FileScopes] = {}
+        for path, raw in (payload.get("files") or {}).items():
+            files[path] = FileScopes(
+                lines=IntervalIndex(starts=[int(x) for x in raw["line_starts"]], owners=list(raw["line_owners"])),
+                points=IntervalIndex(
+                    starts=[(int(p[0]), int(p[1])) for p in raw["point_starts"]], owners=list(raw["point_owners"])
+                ),
+            )
+        return cls(files)
+
+
+def scope_index_from_artifacts(artifacts: Mapping[str, Any]) -> ScopeIndex:
+    """Return the persisted scope index of a loaded snapshot, rebuilding it from symbols for older snapshots.
+
+    Why this exists:
+    - Snapshots written before scopes.json existed must still answer enclosing-symbol queries.
+    """
+    payload = artifacts.get("scopes")
+    if isinstance(payload, dict):
+        try:
+            return ScopeIndex.from_json(payload)
+        except (KeyError, TypeError, ValueError):
+            pass
+    return ScopeIndex.from_symbols(artifacts.get("symbols") or [])
@@ -9,54 +9,106 @@ License: MIT (see LICENSE)
 
 from __future__ import annotations
 
+import asyncio
+import shutil
 import threading
+import time
 import uuid
+from collections.abc import AsyncIterator, Callable, Mapping
 from dataclasses import dataclass
 from datetime import datetime, timezone
 from pathlib import Path
-from tempfile import TemporaryDirectory
 from typing import Any
 
 from codeknowl import db
 from codeknowl.artifacts import artifacts_root, dump_dataclasses, repo_snapshot_dir, write_json
-from codeknowl.ask import answer_with_llm_synthesis, build_evidence_bundle
-from codeknowl.chunking import ChunkRecord, chunk_repo_files, dump_chunks
+from codeknowl.ask import (
+    AskResult,
+    StageTimings,
+    aanswer_with_llm_synthesis,
+    answer_with_llm_synthesis,
+    astream_answer_with_llm_synthesis,
+    build_evidence_bundle,
+)
+from codeknowl.chunk_text import ChunkTextStore, dehydrate_chunks, resolve_chunk_texts
+from codeknowl.chunking import ChunkRecord, dump_chunks
+from codeknowl.embedding_cache import embed_with_cache, embedding_cache_from_env
 from codeknowl.embeddings import embeddings_client_from_env
+from codeknowl.extraction_cache import extraction_cache_from_env
 from codeknowl.findings_ingestion import create_findings_ingestion_service
 from codeknowl.graph_ingestion import create_ingestion_service
 from codeknowl.graph_store import create_graph_store
-from codeknowl.relationship_service import create_relationship_service
+from codeknowl.incremental import extract_modified_incrementally
 from codeknowl.indexing import (
-    build_file_inventory,
-    build_file_records_for_paths,
-    extract_symbols_and_calls,
-    extract_symbols_and_calls_for_paths,
+    inventory_mode_from_env,
     should_ignore_path,
 )
 from codeknowl.llm import LlmProfiles, OpenAiCompatibleClient
 from codeknowl.metrics import METRICS
+from codeknowl.pipeline import (
+    EMBED_STAGE,
+    SnapshotBuild,
+    StageStats,
+    build_snapshot_for_paths,
+    build_snapshot_single_pass,
+    report_stage_stats,
+)
 from codeknowl.query import (
     explain_file_stub,
     find_callers_best_effort,
     load_snapshot_artifacts,
+    snapshot_generation,
+    symbol_at_line,
     where_is_symbol_defined,
 )
+from codeknowl.record_store import (
+    ContentStore,
+    FileRecordStore,
+    SnapshotManifest,
+    load_manifest,
+    write_manifest,
+    write_snapshot_records,
+)
+from codeknowl.relationship_service import create_relationship_service
 from codeknowl.repo import (
     diff_name_status,
     fetch_remote,
     get_head_commit,
     rev_parse,
-    worktree_add_detached,
+    worktree_checkout,
     worktree_remove,
 )
 from codeknowl.reranker import reranker_from_env
-from codeknowl.vector_store import vector_store_from_env
+from codeknowl.retention import RetentionConfig, newest_mtime, plan_retention, remove_tree, tree_bytes
+from codeknowl.scope_index import ScopeIndex, scope_index_from_artifacts
+from codeknowl.snapshot_cache import SNAPSHOT_CACHE
+from codeknowl.snapshot_format import LazySnapshotArtifacts, snapshot_json_export_from_env
+from codeknowl.symbol_index import SymbolNameIndex
+from codeknowl.vector_store import SemanticHit, vector_store_from_env
 
 
 def _utc_now_iso() -> str:
     return datetime.now(timezone.utc).isoformat()
 
 
+def _idle_since(path: Path, cutoff: float) -> bool:
+    try:
+        return newest_mtime(path) < cutoff
+    except FileNotFoundError:
+        return False
+
+
+async def _call_async(target: Any, name: str, **kwargs: Any) -> Any:
+    """Await `target.a<name>(...)` when the client has an async variant; otherwise run `target.<name>` in a thread."""
+    native = getattr(target, f"a{name}", None)
+    if native is not None:
+        return await native(**kwargs)
+    return await asyncio.to_thread(getattr(target, name), **kwargs)
+
+
+# Persistent per-repo worktrees used by filesystem-mode updates live under `<data_dir>/worktrees/<repo_id>`.
+_WORKTREES_DIRNAME = "worktrees"
+
 _UPDATE_LOCKS_LOCK = threading.Lock()
 _UPDATE_LOCKS: dict[str, threading.Lock] = {}
 
@@ -113,7 +165,10 @@ class CodeKnowlService:
         db.init_schema(self._conn)
         self._vector_store = vector_store_from_env(data_dir=data_dir)
         self._embeddings = embeddings_client_from_env()
+        self._embedding_cache = embedding_cache_from_env(data_dir)
         self._reranker = reranker_from_env()
+        self._extraction_cache = extraction_cache_from_env(data_dir)
+        self._snapshot_json_export = snapshot_json_export_from_env()
         
         # Initialize graph store and relationship service
         try:
@@ -130,36 +185,36 @@ class CodeKnowlService:
         # Initialize findings ingestion service
         self._findings_ingestion = create_findings_ingestion_service(data_dir)
 
-    def _index_semantic_snapshot(
-        self,
-        *,
-        repo: RepoRecord,
-        head_commit: str,
-        file_paths: list[str],
+    def _embed_and_store_chunks(
+        self, *, repo_id: str, head_commit: str, chunks: list[ChunkRecord], stats: StageStats | None = None
     ) -> list[ChunkRecord]:
-        if not file_paths:
-            return []
-        with TemporaryDirectory(prefix=f"codeknowl-wt-sem-{repo.repo_id[:8]}-") as td:
-            wt = Path(td)
-            worktree_add_detached(Path(repo.local_path), wt, head_commit)
-            try:
-                chunks = chunk_repo_files(
-                    repo_id=repo.repo_id,
-                    head_commit=head_commit,
-                    repo_path=wt,
-                    file_paths=file_paths,
-                )
-            finally:
-                worktree_remove(Path(repo.local_path), wt)
-
         texts = [c.text for c in chunks]
         if not texts:
             return chunks
 
-        vectors = self._embeddings.embed_texts(texts)
-        self._vector_store.upsert(repo_id=repo.repo_id, head_commit=head_commit, chunks=chunks, vectors=vectors)
+        # Vector payloads reference chunk text, so it is stored before any point that points at it.
+        ChunkTextStore.for_repo(self._data_dir, repo_id).put_texts(texts)
+        stats = stats if stats is not None else StageStats()
+        with stats.measure(EMBED_STAGE, byte_count=sum(len(t) for t in texts), items=len(texts)):
+            embedded = embed_with_cache(self._embeddings, texts, cache=self._embedding_cache)
+        stats.add_cache_counts(EMBED_STAGE, hits=embedded.hits, misses=embedded.misses)
+        self._vector_store.upsert(repo_id=repo_id, head_commit=head_commit, chunks=chunks, vectors=embedded.vectors)
         return chunks
 
+    def _write_single_pass_snapshot(self, *, repo_id: str, head_commit: str, build: SnapshotBuild) -> None:
+        chunks = self._embed_and_store_chunks(
+            repo_id=repo_id, head_commit=head_commit, chunks=build.chunks, stats=build.stats
+        )
+        self._write_snapshot(
+            repo_id=repo_id,
+            head_commit=head_commit,
+            files=dump_dataclasses(build.files),
+            symbols=dump_dataclasses(build.symbols),
+            calls=dump_dataclasses(build.calls),
+            chunks=dump_chunks(chunks),
+            report=report_stage_stats(build.stats, repo_id=repo_id, head_commit=head_commit),
+        )
+
     def register_repo_local_path(
         self,
         local_path: Path,
@@ -210,8 +265,15 @@ class CodeKnowlService:
         """
         repo = self.get_repo(repo_id)
         self._conn.execute("DELETE FROM index_runs WHERE repo_id = ?", (repo.repo_id,))
+        self._conn.execute("DELETE FROM snapshot_pins WHERE repo_id = ?", (repo.repo_id,))
         self._conn.execute("DELETE FROM repos WHERE repo_id = ?", (repo.repo_id,))
         self._conn.commit()
+        SNAPSHOT_CACHE.invalidate_repo(repo.repo_id)
+
+        worktree = self._data_dir / _WORKTREES_DIRNAME / repo.repo_id
+        if worktree.exists():
+            worktree_remove(Path(repo.local_path), worktree)
+            shutil.rmtree(worktree, ignore_errors=True)
 
         root = artifacts_root(self._data_dir) / repo.repo_id
         if root.exists():
@@ -258,7 +320,11 @@ class CodeKnowlService:
             ("succeeded", finished_at_utc, head_commit, run_id),
         )
         self._conn.commit()
-        return self.get_index_run(run_id)
+        run = self.get_index_run(run_id)
+        # The run may have rewritten the snapshot for an already cached commit (e.g. a re-index of the same head).
+        SNAPSHOT_CACHE.invalidate_repo(run.repo_id)
+        SNAPSHOT_CACHE.set_head(run.repo_id, head_commit)
+        return run
 
     def fail_index_run(self, run_id: str, *, error: str) -> IndexRunRecord:
         """Mark a previously started index run as failed.
@@ -361,16 +427,10 @@ class CodeKnowlService:
             return self.fail_index_run(run_id, error=str(exc))
 
         try:
-            files = build_file_inventory(repo_path)
-            symbols, calls = extract_symbols_and_calls(repo_path)
-            out_dir = repo_snapshot_dir(self._data_dir, repo.repo_id, head_commit)
-            write_json(out_dir / "files.json", dump_dataclasses(files))
-            write_json(out_dir / "symbols.json", dump_dataclasses(symbols))
-            write_json(out_dir / "calls.json", dump_dataclasses(calls))
-
-            file_paths = [f.path for f in files if not should_ignore_path(Path(f.path))]
-            chunks = self._index_semantic_snapshot(repo=repo, head_commit=head_commit, file_paths=file_paths)
-            write_json(out_dir / "chunks.json", dump_chunks(chunks))
+            build = build_snapshot_single_pass(
+                repo_path, repo_id=repo.repo_id, head_commit=head_commit, cache=self._extraction_cache
+            )
+            self._write_single_pass_snapshot(repo_id=repo.repo_id, head_commit=head_commit, build=build)
         except Exception as exc:  # noqa: BLE001
             return self.fail_index_run(run_id, error=str(exc))
 
@@ -388,9 +448,6 @@ class CodeKnowlService:
 
         return rev_parse(repo_path, f"refs/heads/{repo.accepted_branch}")
 
-    def _load_snapshot_json(self, repo_id: str, head_commit: str) -> dict[str, Any]:
-        return load_snapshot_artifacts(self._data_dir, repo_id, head_commit)
-
     def _write_snapshot(
         self,
         *,
@@ -399,11 +456,78 @@ class CodeKnowlService:
         files: list[dict[str, Any]],
         symbols: list[dict[str, Any]],
         calls: list[dict[str, Any]],
+        chunks: list[dict[str, Any]],
+        report: dict[str, Any],
+        parent: SnapshotManifest | None = None,
+        changed_paths: set[str] | None = None,
+        deleted_paths: set[str] | None = None,
     ) -> None:
+        """Store the per-file records of the given files and write the snapshot's manifest.
+
+        With a parent manifest and the changed/deleted paths of an update, the sections only hold the changed files;
+        the manifest carries every other entry over from the parent. The binary query artifact is derived from the
+        manifest by its first reader (see `load_snapshot_artifacts`), and the JSON export only when enabled.
+
+        Why this exists:
+        - Writing an update must cost O(changed files): its records, one manifest, and nothing proportional to the
+          repository.
+        """
+        chunks = dehydrate_chunks(ChunkTextStore.for_repo(self._data_dir, repo_id), chunks)
+        scopes = ScopeIndex.from_symbols(symbols)
+        sections = {
+            "files": files,
+            "symbols": symbols,
+            "calls": [scopes.attribute_call(c) for c in calls],
+            "chunks": chunks,
+        }
+        digests, written = write_snapshot_records(
+            FileRecordStore.for_repo(self._data_dir, repo_id),
+            sections=sections,
+            base=parent,
+            changed_paths=changed_paths,
+            deleted_paths=deleted_paths or (),
+        )
+        records = {
+            "written": written.written,
+            "reused": written.reused,
+            "carried_over": written.carried_over,
+            "bytes_written": written.bytes_written,
+        }
+        write_manifest(
+            self._data_dir,
+            SnapshotManifest(
+                repo_id=repo_id,
+                head_commit=head_commit,
+                parent_commit=parent.head_commit if parent else None,
+                records=digests,
+                stats={**report, "records": records},
+            ),
+        )
+        if self._snapshot_json_export:
+            self.export_snapshot_json(repo_id, head_commit)
+
+    @staticmethod
+    def _write_snapshot_json(out_dir: Path, tables: Mapping[str, Any], indexes: Mapping[str, Any]) -> None:
+        for name in ("files", "symbols", "calls", "chunks"):
+            write_json(out_dir / f"{name}.json", tables[name])
+        for name, payload in indexes.items():
+            write_json(out_dir / f"{name}.json", payload)
+
+    def export_snapshot_json(self, repo_id: str, head_commit: str | None = None) -> dict[str, Any]:
+        """Write the JSON export of a snapshot next to its manifest.
+
+        Why this exists:
+        - JSON stays the interchange/debugging format even when `CODEKNOWL_SNAPSHOT_JSON=off` (the default).
+        """
+        head_commit = head_commit or self._get_latest_head_commit(repo_id)
+        artifacts = load_snapshot_artifacts(self._data_dir, repo_id, head_commit)
         out_dir = repo_snapshot_dir(self._data_dir, repo_id, head_commit)
-        write_json(out_dir / "files.json", files)
-        write_json(out_dir / "symbols.json", symbols)
-        write_json(out_dir / "calls.json", calls)
+        indexes = {
+            "scopes": scope_index_from_artifacts(artifacts).to_json(),
+            "symbol_index": SymbolNameIndex.from_symbols(artifacts.get("symbols") or []).to_json(),
+        }
+        self._write_snapshot_json(out_dir, artifacts, indexes)
+        return {"repo_id": repo_id, "head_commit": head_commit, "out_dir": str(out_dir)}
 
     def _index_semantic_for_paths(
         self,
@@ -412,8 +536,9 @@ class CodeKnowlService:
         head_commit: str,
         changed_paths: set[str],
         deleted_paths: set[str],
+        chunks: list[ChunkRecord],
+        stats: StageStats | None = None,
     ) -> None:
-        repo = self.get_repo(repo_id)
         to_delete = sorted({p for p in changed_paths | deleted_paths if p})
         if to_delete:
             try:
@@ -421,8 +546,83 @@ class CodeKnowlService:
             except Exception:  # noqa: BLE001
                 pass
 
-        to_index = sorted({p for p in changed_paths if p})
-        self._index_semantic_snapshot(repo=repo, head_commit=head_commit, file_paths=to_index)
+        # Unchanged chunks of a changed file come back from the embedding cache without an embeddings call.
+        self._embed_and_store_chunks(repo_id=repo_id, head_commit=head_commit, chunks=chunks, stats=stats)
+
+    def _update_worktree(self, repo_path: Path, *, repo_id: str, commit: str) -> Path:
+        """Return the repository's persistent worktree, checked out at `commit`.
+
+        Callers hold the repo's update lock, so a worktree is never advanced while another stage reads it.
+
+        Why this exists:
+        - Filesystem-mode updates share one checkout across stages and runs; advancing it touches only changed files.
+        """
+        wt = self._data_dir / _WORKTREES_DIRNAME / repo_id
+        worktree_checkout(repo_path, wt, commit)
+        return wt
+
+    def _build_full_snapshot_at(self, repo_path: Path, *, repo_id: str, commit: str) -> SnapshotBuild:
+        if inventory_mode_from_env() != "git":
+            repo_path = self._update_worktree(repo_path, repo_id=repo_id, commit=commit)
+        return build_snapshot_single_pass(repo_path, repo_id=repo_id, head_commit=commit, cache=self._extraction_cache)
+
+    def _load_parent_sections(
+        self, repo_id: str, parent: SnapshotManifest, paths: set[str]
+    ) -> dict[str, list[dict[str, Any]]]:
+        """Return the parent snapshot's symbols and calls for `paths`, read from their records only.
+
+        Why this exists:
+        - Incremental re-parsing needs the previous symbols of modified files, not the whole previous snapshot.
+        """
+        store = FileRecordStore.for_repo(self._data_dir, repo_id)
+        records = store.get_many(parent.records[p] for p in sorted(paths) if p in parent.records)
+        return {
+            section: [row for record in records.values() for row in record[section]] for section in ("symbols", "calls")
+        }
+
+    def _build_changed_files(
+        self,
+        repo_path: Path,
+        *,
+        repo_id: str,
+        commit: str,
+        changed_paths: set[str],
+        from_git: bool,
+        old_commit: str,
+        modified_paths: set[str],
+        old_artifacts: dict[str, Any],
+    ) -> tuple[SnapshotBuild, list[dict[str, Any]], list[dict[str, Any]], list[dict[str, Any]]]:
+        if not from_git:
+            # Files, symbols, calls, and chunks all come from one pass over the shared worktree.
+            wt = self._update_worktree(repo_path, repo_id=repo_id, commit=commit)
+            build = build_snapshot_for_paths(
+                wt, changed_paths, repo_id=repo_id, head_commit=commit, cache=self._extraction_cache
+            )
+            return build, dump_dataclasses(build.files), dump_dataclasses(build.symbols), dump_dataclasses(build.calls)
+
+        # Large modified files are re-parsed incrementally from their diff hunks; everything else is streamed from the
+        # object store and extracted normally. No checkout is created.
+        incremental = extract_modified_incrementally(
+            repo_path,
+            old_commit=old_commit,
+            new_commit=commit,
+            modified_paths=modified_paths,
+            old_symbols=list(old_artifacts.get("symbols") or []),
+            old_calls=list(old_artifacts.get("calls") or []),
+            cache=self._extraction_cache,
+        )
+        build = build_snapshot_for_paths(
+            repo_path,
+            changed_paths,
+            repo_id=repo_id,
+            head_commit=commit,
+            cache=self._extraction_cache,
+            skip_extraction_for=incremental.handled_paths,
+            skipped_symbols=incremental.symbols,
+        )
+        symbols = sorted(build.symbols + incremental.symbols, key=lambda r: r.file_path)
+        calls = sorted(build.calls + incremental.calls, key=lambda r: r.file_path)
+        return build, dump_dataclasses(build.files), dump_dataclasses(symbols), dump_dataclasses(calls)
 
     def update_repo_to_accepted_head_sync(self, repo_id: str, *, blocking: bool = True) -> IndexRunRecord:
         """Update repo artifacts to the latest accepted branch head.
@@ -463,128 +663,52 @@ class CodeKnowlService:
                 return self.complete_index_run(run.run_id, head_commit=new_commit)
 
             try:
-                if old_commit is None:
-                    with TemporaryDirectory(prefix=f"codeknowl-wt-{repo_id[:8]}-") as td:
-                        wt = Path(td)
-                        worktree_add_detached(repo_path, wt, new_commit)
-                        try:
-                            files = dump_dataclasses(build_file_inventory(wt))
-                            symbols_dc, calls_dc = extract_symbols_and_calls(wt)
-                            symbols = dump_dataclasses(symbols_dc)
-                            calls = dump_dataclasses(calls_dc)
-                        finally:
-                            worktree_remove(repo_path, wt)
-
-                    self._write_snapshot(
-                        repo_id=repo_id,
-                        head_commit=new_commit,
-                        files=files,
-                        symbols=symbols,
-                        calls=calls,
-                    )
-                    file_paths = [str(f.get("path")) for f in files if isinstance(f, dict) and f.get("path")]
-                    chunks = self._index_semantic_snapshot(repo=repo, head_commit=new_commit, file_paths=file_paths)
-                    out_dir = repo_snapshot_dir(self._data_dir, repo_id, new_commit)
-                    write_json(out_dir / "chunks.json", dump_chunks(chunks))
+                read_from_git = inventory_mode_from_env() == "git"
+                # Snapshots written before manifests existed have no records to build on; they are re-indexed in full.
+                parent = load_manifest(self._data_dir, repo_id, old_commit) if old_commit else None
+                if parent is None:
+                    build = self._build_full_snapshot_at(repo_path, repo_id=repo_id, commit=new_commit)
+                    self._write_single_pass_snapshot(repo_id=repo_id, head_commit=new_commit, build=build)
                     return self.complete_index_run(run.run_id, head_commit=new_commit)
 
                 delta = diff_name_status(repo_path, old_commit, new_commit)
                 changed_paths: set[str] = {p for st, p in delta if st in {"A", "M"}}
                 deleted_paths: set[str] = {p for st, p in delta if st == "D"}
+                modified_paths = {p for st, p in delta if st == "M"}
 
-                old_artifacts = self._load_snapshot_json(repo_id, old_commit)
-                old_files: list[dict[str, Any]] = list(old_artifacts.get("files") or [])
-                old_symbols: list[dict[str, Any]] = list(old_artifacts.get("symbols") or [])
-                old_calls: list[dict[str, Any]] = list(old_artifacts.get("calls") or [])
-
-                keep_files: dict[str, dict[str, Any]] = {
-                    f.get("path"): f
-                    for f in old_files
-                    if isinstance(f, dict)
-                    and f.get("path")
-                    and f.get("path") not in deleted_paths
-                    and f.get("path") not in changed_paths
-                }
-
-                keep_symbols = [
-                    s
-                    for s in old_symbols
-                    if isinstance(s, dict)
-                    and s.get("file_path")
-                    and s.get("file_path") not in deleted_paths
-                    and s.get("file_path") not in changed_paths
-                ]
-
-                keep_calls = [
-                    c
-                    for c in old_calls
-                    if isinstance(c, dict)
-                    and c.get("file_path")
-                    and c.get("file_path") not in deleted_paths
-                    and c.get("file_path") not in changed_paths
-                ]
-
-                with TemporaryDirectory(prefix=f"codeknowl-wt-{repo_id[:8]}-") as td:
-                    wt = Path(td)
-                    worktree_add_detached(repo_path, wt, new_commit)
-                    try:
-                        new_file_recs = dump_dataclasses(build_file_records_for_paths(wt, changed_paths))
-                        new_syms_dc, new_calls_dc = extract_symbols_and_calls_for_paths(wt, changed_paths)
-                        new_symbols = dump_dataclasses(new_syms_dc)
-                        new_calls = dump_dataclasses(new_calls_dc)
-                    finally:
-                        worktree_remove(repo_path, wt)
-
-                for f in new_file_recs:
-                    p = f.get("path") if isinstance(f, dict) else None
-                    if p:
-                        keep_files[p] = f
-
-                merged_files = sorted(keep_files.values(), key=lambda r: str(r.get("path")))
-                merged_symbols = keep_symbols + new_symbols
-                merged_calls = keep_calls + new_calls
-
-                self._write_snapshot(
+                build, new_file_recs, new_symbols, new_calls = self._build_changed_files(
+                    repo_path,
                     repo_id=repo_id,
-                    head_commit=new_commit,
-                    files=merged_files,
-                    symbols=merged_symbols,
-                    calls=merged_calls,
+                    commit=new_commit,
+                    changed_paths=changed_paths,
+                    from_git=read_from_git,
+                    old_commit=old_commit,
+                    modified_paths=modified_paths,
+                    old_artifacts=self._load_parent_sections(repo_id, parent, modified_paths),
                 )
 
-                out_dir = repo_snapshot_dir(self._data_dir, repo_id, new_commit)
-                old_chunks: list[dict[str, Any]] = list(old_artifacts.get("chunks") or [])
-                keep_chunks = [
-                    c
-                    for c in old_chunks
-                    if isinstance(c, dict)
-                    and c.get("file_path")
-                    and c.get("file_path") not in deleted_paths
-                    and c.get("file_path") not in changed_paths
-                ]
-
                 self._index_semantic_for_paths(
                     repo_id=repo_id,
                     head_commit=new_commit,
                     changed_paths=changed_paths,
                     deleted_paths=deleted_paths,
+                    chunks=build.chunks,
+                    stats=build.stats,
                 )
 
-                with TemporaryDirectory(prefix=f"codeknowl-wt-chunks-{repo_id[:8]}-") as td:
-                    wt = Path(td)
-                    worktree_add_detached(repo_path, wt, new_commit)
-                    try:
-                        new_chunks = dump_chunks(
-                            chunk_repo_files(
-                                repo_id=repo_id,
-                                head_commit=new_commit,
-                                repo_path=wt,
-                                file_paths=sorted(changed_paths),
-                            )
-                        )
-                    finally:
-                        worktree_remove(repo_path, wt)
-                write_json(out_dir / "chunks.json", keep_chunks + new_chunks)
+                # The chunks embedded above are the chunks the snapshot records; nothing is chunked twice.
+                self._write_snapshot(
+                    repo_id=repo_id,
+                    head_commit=new_commit,
+                    files=new_file_recs,
+                    symbols=new_symbols,
+                    calls=new_calls,
+                    chunks=dump_chunks(build.chunks),
+                    report=report_stage_stats(build.stats, repo_id=repo_id, head_commit=new_commit),
+                    parent=parent,
+                    changed_paths=changed_paths,
+                    deleted_paths=deleted_paths,
+                )
 
                 return self.complete_index_run(run.run_id, head_commit=new_commit)
             except Exception as exc:  # noqa: BLE001
@@ -617,31 +741,247 @@ class CodeKnowlService:
             },
         }
 
+    def pin_snapshot(self, repo_id: str, head_commit: str) -> dict[str, Any]:
+        """Exempt a repo snapshot from garbage collection.
+
+        Why this exists:
+        - Operators keep snapshots of releases or investigations regardless of how many newer runs follow.
+        """
+        self.get_repo(repo_id)
+        self._conn.execute(
+            "INSERT OR IGNORE INTO snapshot_pins (repo_id, head_commit, pinned_at_utc) VALUES (?, ?, ?)",
+            (repo_id, head_commit, _utc_now_iso()),
+        )
+        self._conn.commit()
+        return {"repo_id": repo_id, "pinned": self.list_pinned_snapshots(repo_id)}
+
+    def unpin_snapshot(self, repo_id: str, head_commit: str) -> dict[str, Any]:
+        """Return a pinned snapshot to normal retention."""
+        self._conn.execute("DELETE FROM snapshot_pins WHERE repo_id = ? AND head_commit = ?", (repo_id, head_commit))
+        self._conn.commit()
+        return {"repo_id": repo_id, "pinned": self.list_pinned_snapshots(repo_id)}
+
+    def list_pinned_snapshots(self, repo_id: str) -> list[str]:
+        rows = self._conn.execute(
+            "SELECT head_commit FROM snapshot_pins WHERE repo_id = ? ORDER BY pinned_at_utc", (repo_id,)
+        ).fetchall()
+        return [row["head_commit"] for row in rows]
+
+    def collect_garbage(self, repo_id: str | None = None, *, dry_run: bool = False) -> dict[str, Any]:
+        """Remove snapshots outside the retention policy, stale run rows, unreferenced records, and orphan vectors.
+
+        Each repo keeps its last `CODEKNOWL_RETENTION_KEEP_LAST` successful snapshots plus pinned ones. A superseded
+        snapshot is only deleted once it has been superseded for longer than the grace period, so readers that
+        resolved it before the newer run completed can finish; repos with an update running in this process are
+        skipped.
+
+        Why this exists:
+        - Every index run leaves a snapshot behind; this keeps the data dir bounded and reports what was reclaimed.
+        """
+        config = RetentionConfig.from_env()
+        repo_ids = [repo_id] if repo_id else [r.repo_id for r in self.list_repos()]
+        reports = []
+        for rid in repo_ids:
+            lock = _get_update_lock(rid)
+            if not lock.acquire(blocking=False):
+                reports.append({"repo_id": rid, "skipped": "update in progress", "bytes_reclaimed": 0})
+                continue
+            try:
+                reports.append(self._collect_repo_garbage(rid, config=config, dry_run=dry_run))
+            finally:
+                lock.release()
+        total = sum(r["bytes_reclaimed"] for r in reports)
+        if not dry_run:
+            METRICS.observe_snapshot_gc("succeeded", bytes_reclaimed=total)
+        return {"dry_run": dry_run, "repos": reports, "bytes_reclaimed": total}
+
+    def _list_index_runs(self, repo_id: str) -> list[IndexRunRecord]:
+        rows = self._conn.execute(
+            "SELECT run_id, repo_id, status, started_at_utc, finished_at_utc, error, head_commit "
+            "FROM index_runs WHERE repo_id = ?",
+            (repo_id,),
+        ).fetchall()
+        return [IndexRunRecord(**dict(row)) for row in rows]
+
+    def _collect_repo_garbage(self, repo_id: str, *, config: RetentionConfig, dry_run: bool) -> dict[str, Any]:
+        runs = self._list_index_runs(repo_id)
+        plan = plan_retention(runs, pinned=self.list_pinned_snapshots(repo_id), keep_last=config.keep_last)
+        cutoff = time.time() - config.grace_seconds
+        repo_root = artifacts_root(self._data_dir) / repo_id
+        known = set(plan.keep) | set(plan.collect)
+        deletable = [c for c in plan.collect if plan.superseded_at.get(c, 0.0) < cutoff]
+        # Directories no successful run refers to (e.g. a run that failed after writing) go once they are idle.
+        orphans = [
+            p.name
+            for p in (repo_root.iterdir() if repo_root.is_dir() else [])
+            if p.is_dir() and p.name not in known and _idle_since(p, cutoff)
+        ]
+        report: dict[str, Any] = {
+            "repo_id": repo_id,
+            "kept": plan.keep,
+            "deleted_snapshots": sorted(deletable + orphans),
+            "deferred_snapshots": [c for c in plan.collect if c not in deletable],
+            "deleted_runs": len(plan.stale_run_ids),
+            "bytes_reclaimed": 0,
+        }
+        for commit in report["deleted_snapshots"]:
+            path = repo_root / commit
+            report["bytes_reclaimed"] += tree_bytes(path) if dry_run else remove_tree(path)
+        if not dry_run and plan.stale_run_ids:
+            self._conn.executemany("DELETE FROM index_runs WHERE run_id = ?", ((r,) for r in plan.stale_run_ids))
+            self._conn.commit()
+
+        remaining = [c for c in known | set(orphans) if c not in report["deleted_snapshots"]]
+        sweeps = {
+            "deleted_records": (FileRecordStore.for_repo(self._data_dir, repo_id), self._referenced_records),
+            "deleted_chunk_texts": (ChunkTextStore.for_repo(self._data_dir, repo_id), self._referenced_chunk_texts),
+        }
+        for key, (store, referenced) in sweeps.items():
+            removed, reclaimed = self._sweep_store(
+                store, lambda ref=referenced: ref(repo_id, remaining), stored_before=cutoff, dry_run=dry_run
+            )
+            report[key] = removed
+            report["bytes_reclaimed"] += reclaimed
+        running = any(r.status == "running" for r in runs)
+        report["pruned_vectors"] = None if dry_run or running else self._prune_vectors(repo_id, plan.keep)
+        return report
+
+    @staticmethod
+    def _sweep_store(
+        store: ContentStore, referenced: Callable[[], set[str] | None], *, stored_before: float, dry_run: bool
+    ) -> tuple[int, int]:
+        if not store.db_path.exists():
+            return 0, 0
+        refs = referenced()
+        if refs is None:
+            return 0, 0
+        try:
+            size_before = store.size_bytes()
+            removed, payload_bytes = store.sweep(refs, stored_before=stored_before, dry_run=dry_run)
+            if dry_run:
+                return removed, payload_bytes
+            if removed:
+                store.compact()
+            return removed, max(0, size_before - store.size_bytes())
+        finally:
+            store.close()
+
+    def _referenced_records(self, repo_id: str, commits: list[str]) -> set[str]:
+        referenced: set[str] = set()
+        for commit in commits:
+            manifest = load_manifest(self._data_dir, repo_id, commit)
+            if manifest is not None:
+                referenced.update(manifest.records.values())
+        return referenced
+
+    def _referenced_chunk_texts(self, repo_id: str, commits: list[str]) -> set[str] | None:
+        try:
+            return self._snapshot_chunk_values(repo_id, commits, "text_ref")
+        except Exception:  # noqa: BLE001
+            # A snapshot that cannot be read may still reference texts; skip the sweep rather than guess.
+            return None
+
+    def _snapshot_chunk_values(self, repo_id: str, commits: list[str], field: str) -> set[Any]:
+        """Return `field` of every chunk in the given snapshots.
+
+        Manifest snapshots are read from their records (each distinct record once) rather than by deriving their
+        binary artifacts.
+        """
+        values: set[Any] = set()
+        digests: set[str] = set()
+        for commit in commits:
+            manifest = load_manifest(self._data_dir, repo_id, commit)
+            if manifest is not None:
+                digests.update(manifest.records.values())
+                continue
+            artifacts = load_snapshot_artifacts(self._data_dir, repo_id, commit)
+            if isinstance(artifacts, LazySnapshotArtifacts):
+                table = artifacts.reader.table("chunks")
+                values.update(table.column(field) if table.has_column(field) else [])
+            else:
+                values.update(c[field] for c in artifacts.get("chunks") or [] if c.get(field))
+        store = FileRecordStore.for_repo(self._data_dir, repo_id)
+        wanted = sorted(digests)
+        try:
+            for start in range(0, len(wanted), 500):
+                batch = wanted[start : start + 500]
+                records = store.get_many(batch)
+                if len(records) != len(batch):
+                    raise ValueError(f"Record store of repo {repo_id} is missing records of retained snapshots")
+                values.update(c[field] for r in records.values() for c in r["chunks"] if c.get(field))
+        finally:
+            store.close()
+        return values
+
+    def _prune_vectors(self, repo_id: str, commits: list[str]) -> int | None:
+        try:
+            keep = self._snapshot_chunk_values(repo_id, commits, "chunk_id")
+            return self._vector_store.prune_chunks(repo_id=repo_id, keep_chunk_ids=keep)
+        except Exception:  # noqa: BLE001
+            # Vector pruning is best effort; a missing snapshot or an unreachable store must not fail the pass.
+            return None
+
     def _get_latest_head_commit(self, repo_id: str) -> str:
+        cached = SNAPSHOT_CACHE.get_head(repo_id)
+        if cached is not None:
+            return cached
         latest = self.get_latest_successful_index_run_for_repo(repo_id)
         if latest is None or not latest.head_commit:
+            self.get_repo(repo_id)  # Unknown repos raise KeyError (404) rather than "not indexed yet" (400).
             raise ValueError("Repo has no successful index run")
+        SNAPSHOT_CACHE.set_head(repo_id, latest.head_commit)
         return latest.head_commit
 
-    def _load_latest_artifacts(self, repo_id: str) -> tuple[str, dict[str, Any]]:
+    def _load_latest_artifacts(self, repo_id: str) -> tuple[str, Mapping[str, Any]]:
         head_commit = self._get_latest_head_commit(repo_id)
-        return head_commit, load_snapshot_artifacts(self._data_dir, repo_id, head_commit)
+        artifacts = SNAPSHOT_CACHE.get_or_load(
+            (repo_id, head_commit),
+            lambda: load_snapshot_artifacts(self._data_dir, repo_id, head_commit),
+            generation=snapshot_generation(self._data_dir, repo_id, head_commit),
+        )
+        return head_commit, artifacts
 
-    def qa_where_is_symbol_defined(self, repo_id: str, symbol_name: str) -> dict[str, Any]:
+    async def _aload_latest_artifacts(self, repo_id: str) -> tuple[str, Mapping[str, Any]]:
+        # The head lookup uses the service's SQLite connection, which is bound to the thread that opened it; it is one
+        # indexed query, so it stays on the event loop and only the snapshot load goes to a worker thread.
+        head_commit = self._get_latest_head_commit(repo_id)
+        artifacts = await asyncio.to_thread(
+            SNAPSHOT_CACHE.get_or_load,
+            (repo_id, head_commit),
+            lambda: load_snapshot_artifacts(self._data_dir, repo_id, head_commit),
+            generation=snapshot_generation(self._data_dir, repo_id, head_commit),
+        )
+        return head_commit, artifacts
+
+    def qa_where_is_symbol_defined(
+        self,
+        repo_id: str,
+        symbol_name: str,
+        *,
+        kinds: list[str] | None = None,
+        ignore_case: bool = False,
+    ) -> dict[str, Any]:
         """Answer a deterministic "where is this symbol defined" question.
 
         Why this exists:
         - This supports IDE navigation and grounds answers in citations without requiring an LLM.
         """
         head_commit, artifacts = self._load_latest_artifacts(repo_id)
+        query: dict[str, Any] = {"type": "where_is_symbol_defined", "symbol_name": symbol_name}
+        if kinds:
+            query["kinds"] = kinds
+        if ignore_case:
+            query["ignore_case"] = True
         return {
             "repo_id": repo_id,
             "head_commit": head_commit,
-            "query": {"type": "where_is_symbol_defined", "symbol_name": symbol_name},
-            "results": where_is_symbol_defined(artifacts, symbol_name),
+            "query": query,
+            "results": where_is_symbol_defined(artifacts, symbol_name, kinds=kinds or None, ignore_case=ignore_case),
         }
 
-    def qa_what_calls_symbol_best_effort(self, repo_id: str, callee_name: str) -> dict[str, Any]:
+    def qa_what_calls_symbol_best_effort(
+        self, repo_id: str, callee_name: str, *, substring: bool = False
+    ) -> dict[str, Any]:
         """Answer a best-effort "what calls this symbol" question.
 
         Why this exists:
@@ -651,8 +991,27 @@ class CodeKnowlService:
         return {
             "repo_id": repo_id,
             "head_commit": head_commit,
-            "query": {"type": "what_calls_symbol", "callee_name": callee_name, "mode": "best_effort"},
-            "results": find_callers_best_effort(artifacts, callee_name),
+            "query": {
+                "type": "what_calls_symbol",
+                "callee_name": callee_name,
+                "mode": "best_effort",
+                "substring": substring,
+            },
+            "results": find_callers_best_effort(artifacts, callee_name, substring=substring),
+        }
+
+    def qa_symbol_at_line(self, repo_id: str, file_path: str, line: int) -> dict[str, Any]:
+        """Return the innermost symbol containing a file line.
+
+        Why this exists:
+        - IDE navigation ("which function am I in?") resolves through the snapshot's scope index.
+        """
+        head_commit, artifacts = self._load_latest_artifacts(repo_id)
+        return {
+            "repo_id": repo_id,
+            "head_commit": head_commit,
+            "query": {"type": "symbol_at_line", "file_path": file_path, "line": line},
+            "result": symbol_at_line(artifacts, file_path, line),
         }
 
     def qa_explain_file_stub(self, repo_id: str, file_path: str) -> dict[str, Any]:
@@ -670,16 +1029,112 @@ class CodeKnowlService:
             "result": explain_file_stub(artifacts, file_path),
         }
 
-    def qa_ask_llm(self, repo_id: str, question: str) -> dict[str, Any]:
-        """Answer a free-form question using evidence retrieval and optional LLM synthesis.
+    def _resolve_hit_texts(self, repo_id: str, hits: list[SemanticHit]) -> list[dict[str, Any]]:
+        semantic_hits = [
+            {
+                "chunk_id": hit.chunk_id,
+                "score": hit.score,
+                "file_path": hit.file_path,
+                "start_line": hit.start_line,
+                "end_line": hit.end_line,
+                "text": hit.text,
+                "text_ref": hit.text_ref,
+            }
+            for hit in hits
+        ]
+        # Payloads carry text references; resolve the texts of all hits with one store lookup.
+        resolve_chunk_texts(ChunkTextStore.for_repo(self._data_dir, repo_id), semantic_hits)
+        for semantic_hit in semantic_hits:
+            semantic_hit.pop("text_ref", None)
+        return semantic_hits
+
+    @staticmethod
+    def _apply_rerank_scores(semantic_hits: list[dict[str, Any]], scores: list[float]) -> list[dict[str, Any]]:
+        if len(scores) != len(semantic_hits):
+            return semantic_hits
+        reranked_hits = []
+        for semantic_hit, score in zip(semantic_hits, scores, strict=True):
+            item = dict(semantic_hit)
+            item["rerank_score"] = float(score)
+            reranked_hits.append(item)
+        return sorted(
+            reranked_hits,
+            key=lambda x: float(x.get("rerank_score") or 0.0),
+            reverse=True,
+        )
 
-        Why this exists:
-        - This is the primary natural-language Q&A surface: retrieve evidence (semantic hits + structured artifacts)
-          and produce an answer grounded in that evidence, optionally using multi-model synthesis.
-        """
-        head_commit, artifacts = self._load_latest_artifacts(repo_id)
+    @staticmethod
+    def _ask_response(
+        repo_id: str,
+        head_commit: str,
+        question: str,
+        *,
+        mode: str,
+        answer: str,
+        citations: Any,
+        evidence: Any,
+        timings: StageTimings,
+        started: float,
+        candidates: dict[str, str] | None = None,
+    ) -> dict[str, Any]:
+        timings.record("total", time.perf_counter() - started)
+        metadata: dict[str, Any] = {"stage_seconds": timings.metadata()}
+        if candidates:
+            metadata["candidates"] = candidates
+        return {
+            "repo_id": repo_id,
+            "head_commit": head_commit,
+            "query": {"type": "ask", "question": question, "mode": mode},
+            "answer": answer,
+            "citations": citations,
+            "evidence": evidence,
+            "metadata": metadata,
+        }
 
-        semantic_hits: list[dict[str, Any]] = []
+    def _fallback_ask_response(
+        self,
+        repo_id: str,
+        head_commit: str,
+        question: str,
+        artifacts: Mapping[str, Any],
+        semantic_hits: list[dict[str, Any]],
+        *,
+        timings: StageTimings,
+        started: float,
+    ) -> dict[str, Any]:
+        with timings.stage("evidence"):
+            evidence, citations = build_evidence_bundle(artifacts, question, semantic_hits=semantic_hits)
+        return self._ask_response(
+            repo_id,
+            head_commit,
+            question,
+            mode="deterministic_fallback",
+            answer="LLM is not configured. Returning best-effort evidence bundle only.",
+            citations=citations,
+            evidence=evidence,
+            timings=timings,
+            started=started,
+        )
+
+    def _synthesis_ask_response(
+        self, repo_id: str, head_commit: str, question: str, result: AskResult, *, timings: StageTimings, started: float
+    ) -> dict[str, Any]:
+        # Synthesis stages were already observed by the synthesis pipeline; only merge them into the breakdown.
+        timings.seconds.update(result.stage_seconds)
+        return self._ask_response(
+            repo_id,
+            head_commit,
+            question,
+            mode="synthesis",
+            answer=result.answer,
+            citations=result.citations,
+            evidence=result.evidence,
+            timings=timings,
+            started=started,
+            candidates=result.candidates,
+        )
+
+    def _semantic_hits(self, repo_id: str, head_commit: str, question: str) -> list[dict[str, Any]]:
         try:
             query_vector = self._embeddings.embed_texts([question])[0]
             hits = self._vector_store.search(
@@ -688,70 +1143,180 @@ class CodeKnowlService:
                 query_vector=query_vector,
                 limit=8,
             )
-            semantic_hits = [
-                {
-                    "chunk_id": hit.chunk_id,
-                    "score": hit.score,
-                    "file_path": hit.file_path,
-                    "start_line": hit.start_line,
-                    "end_line": hit.end_line,
-                    "text": hit.text,
-                }
-                for hit in hits
-            ]
+            return self._resolve_hit_texts(repo_id, hits)
+        except Exception:  # noqa: BLE001
+            return []
+
+    async def _asemantic_hits(self, repo_id: str, head_commit: str, question: str) -> list[dict[str, Any]]:
+        try:
+            query_vector = (await _call_async(self._embeddings, "embed_texts", texts=[question]))[0]
+            hits = await _call_async(
+                self._vector_store,
+                "search",
+                repo_id=repo_id,
+                head_commit=head_commit,
+                query_vector=query_vector,
+                limit=8,
+            )
+            return await asyncio.to_thread(self._resolve_hit_texts, repo_id, hits)
         except Exception:  # noqa: BLE001
-            semantic_hits = []
+            return []
 
+    def _rerank_hits(self, question: str, semantic_hits: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        try:
+            documents = [str(semantic_hit.get("text") or "") for semantic_hit in semantic_hits]
+            scores = self._reranker.rerank(query=question, documents=documents)
+            return self._apply_rerank_scores(semantic_hits, scores)
+        except Exception:  # noqa: BLE001
+            return semantic_hits
+
+    async def _arerank_hits(self, question: str, semantic_hits: list[dict[str, Any]]) -> list[dict[str, Any]]:
+        try:
+            documents = [str(semantic_hit.get("text") or "") for semantic_hit in semantic_hits]
+            scores = await _call_async(self._reranker, "rerank", query=question, documents=documents)
+            return self._apply_rerank_scores(semantic_hits, scores)
+        except Exception:  # noqa: BLE001
+            return semantic_hits
+
+    def qa_ask_llm(self, repo_id: str, question: str) -> dict[str, Any]:
+        """Answer a free-form question using evidence retrieval and optional LLM synthesis.
+
+        The response's `metadata.stage_seconds` breaks the latency down by pipeline stage.
+
+        Why this exists:
+        - This is the primary natural-language Q&A surface: retrieve evidence (semantic hits + structured artifacts)
+          and produce an answer grounded in that evidence, optionally using multi-model synthesis.
+        """
+        started = time.perf_counter()
+        timings = StageTimings()
+        with timings.stage("load"):
+            head_commit, artifacts = self._load_latest_artifacts(repo_id)
+        with timings.stage("retrieve"):
+            semantic_hits = self._semantic_hits(repo_id, head_commit, question)
         if self._reranker is not None and semantic_hits:
-            try:
-                documents = [str(semantic_hit.get("text") or "") for semantic_hit in semantic_hits]
-                scores = self._reranker.rerank(query=question, documents=documents)
-                if len(scores) == len(semantic_hits):
-                    reranked_hits = []
-                    for semantic_hit, score in zip(semantic_hits, scores, strict=True):
-                        item = dict(semantic_hit)
-                        item["rerank_score"] = float(score)
-                        reranked_hits.append(item)
-                    semantic_hits = sorted(
-                        reranked_hits,
-                        key=lambda x: float(x.get("rerank_score") or 0.0),
-                        reverse=True,
-                    )
-            except Exception:  # noqa: BLE001
-                pass
+            with timings.stage("rerank"):
+                semantic_hits = self._rerank_hits(question, semantic_hits)
 
         profiles = LlmProfiles.from_env()
         if profiles is None:
-            evidence, citations = build_evidence_bundle(artifacts, question, semantic_hits=semantic_hits)
-            return {
-                "repo_id": repo_id,
-                "head_commit": head_commit,
-                "query": {"type": "ask", "question": question, "mode": "deterministic_fallback"},
-                "answer": "LLM is not configured. Returning best-effort evidence bundle only.",
-                "citations": citations,
-                "evidence": evidence,
-            }
-
-        coding_llm = OpenAiCompatibleClient(profiles.coding)
-        general_llm = OpenAiCompatibleClient(profiles.general)
-        synth_llm = OpenAiCompatibleClient(profiles.synth)
+            return self._fallback_ask_response(
+                repo_id, head_commit, question, artifacts, semantic_hits, timings=timings, started=started
+            )
 
         result = answer_with_llm_synthesis(
-            coding_llm=coding_llm,
-            general_llm=general_llm,
-            synth_llm=synth_llm,
+            coding_llm=OpenAiCompatibleClient(profiles.coding),
+            general_llm=OpenAiCompatibleClient(profiles.general),
+            synth_llm=OpenAiCompatibleClient(profiles.synth),
             artifacts=artifacts,
             question=question,
             semantic_hits=semantic_hits,
         )
-        return {
+        return self._synthesis_ask_response(repo_id, head_commit, question, result, timings=timings, started=started)
+
+    async def aqa_ask_llm(self, repo_id: str, question: str) -> dict[str, Any]:
+        """Async variant of `qa_ask_llm` that never blocks the event loop.
+
+        Embeddings, vector search, rerank, and LLM calls use the clients' async variants when they have one; snapshot
+        loading, chunk text resolution, and evidence bundling run in worker threads. Nothing that runs in a worker
+        thread touches the service's SQLite connection.
+
+        Why this exists:
+        - One slow LLM call must not stall every other request served by the same event loop.
+        """
+        started = time.perf_counter()
+        timings = StageTimings()
+        with timings.stage("load"):
+            head_commit, artifacts = await self._aload_latest_artifacts(repo_id)
+        with timings.stage("retrieve"):
+            semantic_hits = await self._asemantic_hits(repo_id, head_commit, question)
+        if self._reranker is not None and semantic_hits:
+            with timings.stage("rerank"):
+                semantic_hits = await self._arerank_hits(question, semantic_hits)
+
+        profiles = LlmProfiles.from_env()
+        if profiles is None:
+            return await asyncio.to_thread(
+                self._fallback_ask_response,
+                repo_id,
+                head_commit,
+                question,
+                artifacts,
+                semantic_hits,
+                timings=timings,
+                started=started,
+            )
+
+        result = await aanswer_with_llm_synthesis(
+            coding_llm=OpenAiCompatibleClient(profiles.coding),
+            general_llm=OpenAiCompatibleClient(profiles.general),
+            synth_llm=OpenAiCompatibleClient(profiles.synth),
+            artifacts=artifacts,
+            question=question,
+            semantic_hits=semantic_hits,
+        )
+        return self._synthesis_ask_response(repo_id, head_commit, question, result, timings=timings, started=started)
+
+    async def astream_qa_ask_llm(self, repo_id: str, question: str) -> AsyncIterator[tuple[str, dict[str, Any]]]:
+        """Stream an answer as `(event, data)` pairs: `evidence`, `candidates`, `token`..., then `done`.
+
+        `evidence` carries the repo, head commit, query, citations, and evidence bundle; `done` carries the same
+        metadata as `qa_ask_llm`. Without a configured LLM the fallback answer is sent as a single `token`.
+        Closing the iterator cancels the LLM call in flight.
+
+        Why this exists:
+        - The IDE shows citations immediately and renders the answer as it is generated instead of after 20-60 s.
+        """
+        started = time.perf_counter()
+        timings = StageTimings()
+        with timings.stage("load"):
+            head_commit, artifacts = await self._aload_latest_artifacts(repo_id)
+        with timings.stage("retrieve"):
+            semantic_hits = await self._asemantic_hits(repo_id, head_commit, question)
+        if self._reranker is not None and semantic_hits:
+            with timings.stage("rerank"):
+                semantic_hits = await self._arerank_hits(question, semantic_hits)
+
+        profiles = LlmProfiles.from_env()
+        if profiles is None:
+            response = await asyncio.to_thread(
+                self._fallback_ask_response,
+                repo_id,
+                head_commit,
+                question,
+                artifacts,
+                semantic_hits,
+                timings=timings,
+                started=started,
+            )
+            metadata = response.pop("metadata")
+            answer = response.pop("answer")
+            yield "evidence", response
+            yield "token", {"text": answer}
+            yield "done", metadata
+            return
+
+        header = {
             "repo_id": repo_id,
             "head_commit": head_commit,
             "query": {"type": "ask", "question": question, "mode": "synthesis"},
-            "answer": result.answer,
-            "citations": result.citations,
-            "evidence": result.evidence,
         }
+        metadata: dict[str, Any] = {}
+        async for event, data in astream_answer_with_llm_synthesis(
+            coding_llm=OpenAiCompatibleClient(profiles.coding),
+            general_llm=OpenAiCompatibleClient(profiles.general),
+            synth_llm=OpenAiCompatibleClient(profiles.synth),
+            artifacts=artifacts,
+            question=question,
+            semantic_hits=semantic_hits,
+            timings=timings,
+        ):
+            if event == "evidence":
+                data = {**header, **data}
+            elif event == "candidates":
+                metadata["candidates"] = data
+            yield event, data
+        timings.record("total", time.perf_counter() - started)
+        yield "done", {"stage_seconds": timings.metadata(), **metadata}
 
     def _iter_text_files_for_search(self, repo_path: Path):
         for p in repo_path.rglob("*"):
@@ -0,0 +1,260 @@
+"""File: backend/src/codeknowl/snapshot_cache.py
+Purpose: Keep recently queried snapshot artifacts in memory, bounded by an approximate byte budget.
+Product/business importance: IDE hover and navigation traffic hits the same snapshot repeatedly; serving it from
+memory keeps those queries off SQLite and the artifacts directory.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Mapping
+from dataclasses import dataclass
+from typing import Any
+
+from codeknowl.metrics import METRICS
+from codeknowl.snapshot_format import LazySnapshotArtifacts
+
+SnapshotKey = tuple[str, str]
+# Identifies one write of a snapshot on disk (see `query.snapshot_generation`); None when it cannot be determined.
+SnapshotGeneration = tuple[int, ...] | None
+
+_SIZE_SAMPLE_ROWS = 64
+
+
+@dataclass(frozen=True)
+class SnapshotCacheConfig:
+    """Settings for the process-wide snapshot cache.
+
+    Why this exists:
+    - Operators size the cache to the memory they can spare next to the API workers.
+    """
+
+    enabled: bool
+    max_bytes: int
+    head_ttl_seconds: float
+
+    @staticmethod
+    def from_env(prefix: str = "CODEKNOWL_SNAPSHOT_CACHE_") -> "SnapshotCacheConfig":
+        """Load snapshot cache settings from environment variables.
+
+        Why this exists:
+        - The backend should be configurable via environment without code changes.
+        """
+        enabled = os.environ.get(f"{prefix}ENABLED", "on").strip().lower() not in {"off", "false", "0", "disabled"}
+        return SnapshotCacheConfig(
+            enabled=enabled,
+            max_bytes=max(0, int(os.environ.get(f"{prefix}MAX_MB", "512"))) * 1024 * 1024,
+            head_ttl_seconds=max(0.0, float(os.environ.get(f"{prefix}HEAD_TTL_SECONDS", "5"))),
+        )
+
+
+def _deep_size(value: Any) -> int:
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_deep_size(k) + _deep_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(_deep_size(v) for v in value)
+    return sys.getsizeof(value)
+
+
+def _section_size(section: Any) -> int:
+    if not isinstance(section, list) or len(section) <= _SIZE_SAMPLE_ROWS:
+        return _deep_size(section)
+    step = len(section) // _SIZE_SAMPLE_ROWS
+    sample = section[::step][:_SIZE_SAMPLE_ROWS]
+    per_row = sum(_deep_size(row) for row in sample) / len(sample)
+    return sys.getsizeof(section) + int(per_row * len(section))
+
+
+def estimate_artifacts_bytes(artifacts: Mapping[str, Any]) -> int:
+    """Approximate the memory held by a loaded artifacts mapping.
+
+    Large sections are sized from an evenly spaced sample of rows. For a memory-mapped snapshot only the decoded
+    sections count; mapped pages belong to the OS page cache.
+
+    Why this exists:
+    - Eviction is by memory footprint, and walking every row of a large snapshot on each hit would cost more than
+      the lookup being cached.
+    """
+    if isinstance(artifacts, LazySnapshotArtifacts):
+        return sum(_section_size(section) for section in artifacts.loaded_sections().values())
+    return sum(_section_size(section) for section in artifacts.values())
+
+
+def _section_count(artifacts: Mapping[str, Any]) -> int:
+    if isinstance(artifacts, LazySnapshotArtifacts):
+        return len(artifacts.loaded_sections())
+    return len(artifacts)
+
+
+@dataclass
+class _Entry:
+    artifacts: Mapping[str, Any]
+    generation: SnapshotGeneration = None
+    size_bytes: int = 0
+    sized_sections: int = -1
+
+
+class SnapshotCache:
+    """LRU of loaded snapshot artifacts keyed by `(repo_id, head_commit)` and bounded by bytes.
+
+    The cache also remembers each repository's latest head commit for a short TTL so steady-state queries skip the
+    index-run lookup; `set_head` updates it immediately when an index run completes in this process. Callers pass the
+    snapshot's on-disk generation with each lookup, so a commit re-indexed by another process is reloaded on next use.
+
+    Why this exists:
+    - Re-reading a snapshot for every query dominated hover latency; the newest snapshot of an active repo is reused
+      until a newer index run replaces it.
+    """
+
+    def __init__(self, config: SnapshotCacheConfig) -> None:
+        self.config = config
+        self._entries: OrderedDict[SnapshotKey, _Entry] = OrderedDict()
+        self._heads: dict[str, tuple[str, float]] = {}
+        self._total_bytes = 0
+        self._lock = threading.Lock()
+
+    @property
+    def total_bytes(self) -> int:
+        return self._total_bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._entries
+
+    def get_head(self, repo_id: str) -> str | None:
+        """Return the remembered latest head commit for a repo, if still fresh.
+
+        Why this exists:
+        - Heads written by another process (e.g. a job worker) are picked up once the TTL lapses.
+        """
+        if not self.config.enabled:
+            return None
+        with self._lock:
+            cached = self._heads.get(repo_id)
+        if cached is None or time.monotonic() - cached[1] > self.config.head_ttl_seconds:
+            return None
+        return cached[0]
+
+    def set_head(self, repo_id: str, head_commit: str) -> None:
+        """Record a repo's latest head commit and drop its snapshots for any other commit.
+
+        Why this exists:
+        - A completed index run makes older snapshots unreachable by queries; their memory is released right away.
+        """
+        if not self.config.enabled:
+            return
+        with self._lock:
+            self._heads[repo_id] = (head_commit, time.monotonic())
+            stale = [key for key in self._entries if key[0] == repo_id and key[1] != head_commit]
+            for key in stale:
+                self._remove(key)
+            total_bytes = self._total_bytes
+        for _ in stale:
+            METRICS.inc_snapshot_cache("invalidation")
+        METRICS.set_snapshot_cache_bytes(total_bytes)
+
+    def invalidate_repo(self, repo_id: str) -> None:
+        """Forget every cached snapshot and the remembered head for a repo.
+
+        Why this exists:
+        - Off-boarded repositories must not stay queryable from memory.
+        """
+        with self._lock:
+            self._heads.pop(repo_id, None)
+            stale = [key for key in self._entries if key[0] == repo_id]
+            for key in stale:
+                self._remove(key)
+            total_bytes = self._total_bytes
+        for _ in stale:
+            METRICS.inc_snapshot_cache("invalidation")
+        METRICS.set_snapshot_cache_bytes(total_bytes)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._heads.clear()
+            self._total_bytes = 0
+        METRICS.set_snapshot_cache_bytes(0)
+
+    def get_or_load(
+        self,
+        key: SnapshotKey,
+        loader: Callable[[], Mapping[str, Any]],
+        *,
+        generation: SnapshotGeneration = None,
+    ) -> Mapping[str, Any]:
+        """Return cached artifacts for a key, loading and caching them on a miss.
+
+        An entry cached for a different `generation` of the snapshot (the same commit re-indexed, possibly by another
+        process) is dropped and reloaded. Lazily decoded sections grow an entry after it is cached, so a hit
+        re-estimates its size whenever the number of decoded sections has changed.
+
+        Why this exists:
+        - Every query path shares one load-or-reuse policy and one set of hit/miss/eviction metrics.
+        """
+        if not self.config.enabled:
+            return loader()
+        stale = False
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.generation != generation:
+                self._remove(key)
+                entry, stale = None, True
+            if entry is not None:
+                self._entries.move_to_end(key)
+        if stale:
+            METRICS.inc_snapshot_cache("invalidation")
+        if entry is not None:
+            METRICS.inc_snapshot_cache("hit")
+            if _section_count(entry.artifacts) != entry.sized_sections:
+                self._resize(key, entry)
+            return entry.artifacts
+
+        METRICS.inc_snapshot_cache("miss")
+        artifacts = loader()
+        entry = _Entry(artifacts=artifacts, generation=generation)
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None and existing.generation == generation:
+                return existing.artifacts
+            if existing is not None:
+                self._remove(key)
+            self._entries[key] = entry
+        self._resize(key, entry)
+        return artifacts
+
+    def _resize(self, key: SnapshotKey, entry: _Entry) -> None:
+        sections = _section_count(entry.artifacts)
+        size_bytes = estimate_artifacts_bytes(entry.artifacts)
+        with self._lock:
+            if self._entries.get(key) is not entry:
+                return
+            self._total_bytes += size_bytes - entry.size_bytes
+            entry.size_bytes = size_bytes
+            entry.sized_sections = sections
+            evicted = 0
+            # The entry just used is most recent; it is only evicted if it alone exceeds the budget.
+            while self._total_bytes > self.config.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                evicted += 1
+            total_bytes = self._total_bytes
+        for _ in range(evicted):
+            METRICS.inc_snapshot_cache("eviction")
+        METRICS.set_snapshot_cache_bytes(total_bytes)
+
+    def _remove(self, key: SnapshotKey) -> None:
+        entry = self._entries.pop(key)
+        self._total_bytes -= entry.size_bytes
+
+
+SNAPSHOT_CACHE = SnapshotCache(SnapshotCacheConfig.from_env())
@@ -0,0 +1,532 @@
+"""File: backend/src/codeknowl/snapshot_format.py
+Purpose: Columnar binary snapshot format with an interned string table, fixed-width columns, and a section directory.
+Product/business importance: Queries memory-map one file and decode only the sections they touch instead of parsing
+hundreds of MB of JSON per request on large repositories.
+
+Layout (little-endian):
+    header      magic "CKSNAP\\0\\0", u32 version, u32 section count
+    directory   per section: 32-byte name, u8 kind, u32 rows, u64 offset, u64 length
+    strings     u32 count, u64 offsets[count + 1], UTF-8 blob; sorted, so lookups binary-search without decoding
+    tables      u32 column count, per column: 32-byte name, u8 dtype, u64 offset, u64 length; 8-byte aligned data
+    json        UTF-8 JSON document for small nested sections (scopes)
+
+String references are assigned in sorted order, so a table sorted by a string column can be binary-searched in place.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from collections.abc import Iterable, Iterator, Mapping, Sequence
+from pathlib import Path
+from typing import Any
+
+SNAPSHOT_FILENAME = "snapshot.cks"
+
+_MAGIC = b"CKSNAP\0\0"
+_VERSION = 1
+_HEADER = struct.Struct("<8sII")
+_DIR_ENTRY = struct.Struct("<32sBIQQ")
+_COLUMN_ENTRY = struct.Struct("<32sBQQ")
+
+_KIND_STRINGS = 1
+_KIND_TABLE = 2
+_KIND_JSON = 3
+
+# Column dtypes: string references into the string table (u32, with a sentinel for None) and fixed-width ints.
+_DTYPES = {"str": (1, "I"), "opt_str": (2, "I"), "i32": (3, "i"), "i64": (4, "q")}
+_DTYPE_BY_CODE = {code: (name, typecode) for name, (code, typecode) in _DTYPES.items()}
+_NULL_REF = 0xFFFFFFFF
+
+_RANGE_COLUMNS = (
+    ("range.start_line", "i32"),
+    ("range.start_col", "i32"),
+    ("range.end_line", "i32"),
+    ("range.end_col", "i32"),
+)
+
+# Column layout of each record section. Dotted names are nested fields in the JSON shape.
+TABLE_SCHEMAS: dict[str, tuple[tuple[str, str], ...]] = {
+    "files": (("path", "str"), ("language", "str"), ("size_bytes", "i64"), ("blob_sha", "opt_str")),
+    "symbols": (("symbol_id", "str"), ("kind", "str"), ("name", "str"), ("file_path", "str"), *_RANGE_COLUMNS),
+    "calls": (("caller_symbol_id", "str"), ("callee_name", "str"), ("file_path", "str"), *_RANGE_COLUMNS),
+    "chunks": (
+        ("chunk_id", "str"),
+        ("file_path", "str"),
+        ("start_line", "i32"),
+        ("end_line", "i32"),
+        ("text_ref", "str"),
+    ),
+    # Postings tables sorted by `key`, answered with `SnapshotTable.postings` (see codeknowl.symbol_index and
+    # codeknowl.callee_index).
+    "symbol_names": (("key", "str"), ("row", "i64")),
+    "symbol_names_lower": (("key", "str"), ("row", "i64")),
+    "symbol_names_qualified": (("key", "str"), ("row", "i64")),
+    "symbol_ids": (("key", "str"), ("row", "i64")),
+    "call_segments": (("key", "str"), ("row", "i64")),
+    "call_callee_names": (("name", "str"),),
+    "call_callee_trigrams": (("key", "str"), ("row", "i64")),
+    # Keyed per-file sections (see codeknowl.file_outline).
+    "file_outlines": (
+        ("key", "str"),
+        ("symbol_id", "str"),
+        ("kind", "str"),
+        ("name", "str"),
+        ("depth", "i32"),
+        ("start_line", "i32"),
+        ("end_line", "i32"),
+    ),
+    "file_kind_counts": (("key", "str"), ("kind", "str"), ("count", "i64")),
+    "file_paths": (("key", "str"), ("row", "i64")),
+}
+
+
+def _pad8(n: int) -> int:
+    return (8 - n % 8) % 8
+
+
+def _little_endian(values: array) -> bytes:
+    if sys.byteorder == "big":
+        values = array(values.typecode, values)
+        values.byteswap()
+    return values.tobytes()
+
+
+def _getter(dotted: str):
+    parts = dotted.split(".")
+    if len(parts) == 1:
+        return lambda row: row.get(dotted)
+
+    def get(row: dict[str, Any]) -> Any:
+        value: Any = row
+        for part in parts:
+            value = value.get(part) if isinstance(value, dict) else None
+        return value
+
+    return get
+
+
+TableRows = list[dict[str, Any]] | Mapping[str, Sequence[Any]]
+
+
+def _field_values(rows: TableRows, field: str) -> Iterable[Any]:
+    if isinstance(rows, Mapping):
+        return rows[field]
+    get = _getter(field)
+    return (get(row) for row in rows)
+
+
+def _row_count(name: str, rows: TableRows) -> int:
+    if isinstance(rows, Mapping):
+        return len(rows[TABLE_SCHEMAS[name][0][0]])
+    return len(rows)
+
+
+def postings_columns(postings: Mapping[str, Sequence[int]]) -> dict[str, Sequence[Any]]:
+    """Return a `(key, row)` postings table in columnar form, sorted by key then row.
+
+    Why this exists:
+    - Postings tables run to tens of millions of entries; columns avoid building a dict per entry when writing.
+    """
+    keys: list[str] = []
+    rows = array("q")
+    for key in sorted(postings):
+        values = postings[key]
+        keys.extend([key] * len(values))
+        rows.extend(values)
+    return {"key": keys, "row": rows}
+
+
+def _encode_name(name: str) -> bytes:
+    raw = name.encode("utf-8")
+    if len(raw) > 32:
+        raise ValueError(f"Section or column name too long: {name!r}")
+    return raw
+
+
+class _StringTableBuilder:
+    def __init__(self) -> None:
+        self._values: set[str] = set()
+
+    def update(self, values: Iterable[str]) -> None:
+        self._values.update(values)
+
+    def finish(self) -> tuple[bytes, dict[str, int]]:
+        encoded = sorted((v.encode("utf-8"), v) for v in self._values)
+        refs = {v: i for i, (_, v) in enumerate(encoded)}
+        offsets = array("Q", [0])
+        for raw, _ in encoded:
+            offsets.append(offsets[-1] + len(raw))
+        head = struct.pack("<I", len(encoded)) + b"\0" * 4
+        return head + _little_endian(offsets) + b"".join(raw for raw, _ in encoded), refs
+
+
+def _collect_strings(tables: Mapping[str, TableRows]) -> _StringTableBuilder:
+    builder = _StringTableBuilder()
+    for name, rows in tables.items():
+        for field, dtype in TABLE_SCHEMAS[name]:
+            if dtype not in {"str", "opt_str"}:
+                continue
+            values = _field_values(rows, field)
+            if dtype == "str":
+                builder.update("" if v is None else str(v) for v in values)
+            else:
+                builder.update(str(v) for v in values if v is not None)
+    return builder
+
+
+def _encode_table(name: str, rows: TableRows, refs: dict[str, int]) -> bytes:
+    columns: list[tuple[str, int, bytes]] = []
+    for field, dtype in TABLE_SCHEMAS[name]:
+        code, typecode = _DTYPES[dtype]
+        raw = _field_values(rows, field)
+        if dtype == "str":
+            values = array(typecode, [refs["" if v is None else str(v)] for v in raw])
+        elif dtype == "opt_str":
+            values = array(typecode, [_NULL_REF if v is None else refs[str(v)] for v in raw])
+        elif isinstance(raw, array) and raw.typecode == typecode:
+            values = raw
+        else:
+            values = array(typecode, [int(v or 0) for v in raw])
+        columns.append((field, code, _little_endian(values)))
+
+    header_len = 8 + _COLUMN_ENTRY.size * len(columns)
+    offset = header_len + _pad8(header_len)
+    directory = [struct.pack("<I", len(columns)) + b"\0" * 4]
+    body: list[bytes] = []
+    for field, code, data in columns:
+        directory.append(_COLUMN_ENTRY.pack(_encode_name(field), code, offset, len(data)))
+        body.append(data + b"\0" * _pad8(len(data)))
+        offset += len(body[-1])
+    head = b"".join(directory)
+    return head + b"\0" * _pad8(len(head)) + b"".join(body)
+
+
+def write_snapshot_file(
+    path: Path,
+    tables: Mapping[str, TableRows],
+    json_sections: dict[str, Any] | None = None,
+) -> None:
+    """Write record tables (see `TABLE_SCHEMAS`) and JSON sections into one binary snapshot file.
+
+    A table is given either as row dicts in the JSON artifact shape or, for large generated tables such as postings,
+    as a mapping of column name to values.
+
+    The file is written to a temporary name and renamed into place, so readers never map a partial snapshot.
+
+    Why this exists:
+    - Query paths need a compact, randomly addressable artifact instead of whole-file JSON parsing.
+    """
+    strings, refs = _collect_strings(tables).finish()
+    sections: list[tuple[str, int, int, bytes]] = [("strings", _KIND_STRINGS, len(refs), strings)]
+    for name, rows in tables.items():
+        sections.append((name, _KIND_TABLE, _row_count(name, rows), _encode_table(name, rows, refs)))
+    for name, payload in (json_sections or {}).items():
+        raw = json.dumps(payload, sort_keys=True, separators=(",", ":")).encode("utf-8")
+        sections.append((name, _KIND_JSON, 0, raw))
+
+    offset = _HEADER.size + _DIR_ENTRY.size * len(sections)
+    offset += _pad8(offset)
+    directory = b""
+    for name, kind, rows, data in sections:
+        directory += _DIR_ENTRY.pack(_encode_name(name), kind, rows, offset, len(data))
+        offset += len(data) + _pad8(len(data))
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    with tmp.open("wb") as f:
+        head = _HEADER.pack(_MAGIC, _VERSION, len(sections)) + directory
+        f.write(head + b"\0" * _pad8(len(head)))
+        for _, _, _, data in sections:
+            f.write(data + b"\0" * _pad8(len(data)))
+    os.replace(tmp, path)
+
+
+class _StringTable:
+    def __init__(self, buf: memoryview, offset: int) -> None:
+        (self._count,) = struct.unpack_from("<I", buf, offset)
+        offsets_at = offset + 8
+        self._offsets = _column_view(buf, offsets_at, 8 * (self._count + 1), "Q")
+        self._blob = offsets_at + 8 * (self._count + 1)
+        self._buf = buf
+        self._decoded: dict[int, str] = {}
+
+    def __len__(self) -> int:
+        return self._count
+
+    def _raw(self, ref: int) -> bytes:
+        return bytes(self._buf[self._blob + self._offsets[ref] : self._blob + self._offsets[ref + 1]])
+
+    def get(self, ref: int) -> str | None:
+        if ref == _NULL_REF:
+            return None
+        value = self._decoded.get(ref)
+        if value is None:
+            value = self._raw(ref).decode("utf-8")
+            self._decoded[ref] = value
+        return value
+
+    def get_many(self, refs: Iterable[int]) -> dict[int, str | None]:
+        return {ref: self.get(ref) for ref in refs}
+
+    def find(self, value: str) -> int | None:
+        """Return the reference for `value` by binary search over the sorted table, or None if absent."""
+        target = value.encode("utf-8")
+        lo, hi = 0, self._count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._raw(mid) < target:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < self._count and self._raw(lo) == target else None
+
+
+def _column_view(buf: memoryview, offset: int, length: int, typecode: str):
+    view = buf[offset : offset + length]
+    if sys.byteorder == "little":
+        return view.cast(typecode)
+    values = array(typecode, view.tobytes())
+    values.byteswap()
+    return values
+
+
+class SnapshotTable:
+    """Lazily decoded view over one record section.
+
+    Why this exists:
+    - Callers filter on a single column (a name or path) without materializing every row.
+    """
+
+    def __init__(
+        self, name: str, mm: mmap.mmap, buf: memoryview, offset: int, rows: int, strings: _StringTable
+    ) -> None:
+        self.name = name
+        self._mm = mm
+        self._buf = buf
+        self._rows = rows
+        self._strings = strings
+        (count,) = struct.unpack_from("<I", buf, offset)
+        self._columns: dict[str, tuple[str, int, int]] = {}
+        for i in range(count):
+            raw_name, code, col_offset, length = _COLUMN_ENTRY.unpack_from(buf, offset + 8 + i * _COLUMN_ENTRY.size)
+            dtype, _ = _DTYPE_BY_CODE[code]
+            self._columns[raw_name.rstrip(b"\0").decode("utf-8")] = (dtype, offset + col_offset, length)
+
+    def has_column(self, field: str) -> bool:
+        return field in self._columns
+
+    def __len__(self) -> int:
+        return self._rows
+
+    def _raw_column(self, field: str):
+        dtype, offset, length = self._columns[field]
+        return _column_view(self._buf, offset, length, _DTYPES[dtype][1])
+
+    def key_range(self, key: str) -> range:
+        """Return the row span stored under `key` in a table sorted by its `key` column.
+
+        The key is located by binary search in the string table and then in the key column, so nothing is decoded.
+        """
+        ref = self._strings.find(key)
+        if ref is None:
+            return range(0)
+        keys = self._raw_column("key")
+        lo = bisect_left(keys, ref)
+        return range(lo, bisect_right(keys, ref, lo))
+
+    def postings(self, key: str) -> list[int]:
+        """Return the `row` values stored under `key` in a postings table sorted by its `key` column."""
+        span = self.key_range(key)
+        return list(self._raw_column("row")[span.start : span.stop])
+
+    def rows_for_key(self, key: str) -> list[dict[str, Any]]:
+        """Decode the rows stored under `key` in a table sorted by its `key` column, in stored order."""
+        return [self.row(i) for i in self.key_range(key)]
+
+    def column(self, field: str) -> list[Any]:
+        """Decode one column for all rows."""
+        dtype = self._columns[field][0]
+        raw = self._raw_column(field)
+        if dtype in {"str", "opt_str"}:
+            decoded = self._strings.get_many(set(raw))
+            return [decoded[ref] for ref in raw]
+        return list(raw)
+
+    def rows_where(self, field: str, value: str) -> list[dict[str, Any]]:
+        """Return rows whose string column `field` equals `value`, decoding only those rows."""
+        ref = self._strings.find(value)
+        if ref is None:
+            return []
+        _, offset, length = self._columns[field]
+        needle = struct.pack("<I", ref)
+        matches: list[int] = []
+        # mmap.find scans in C; hits off the 4-byte grid straddle two values and are skipped.
+        pos = self._mm.find(needle, offset, offset + length)
+        while pos >= 0:
+            if (pos - offset) % 4 == 0:
+                matches.append((pos - offset) // 4)
+                pos = self._mm.find(needle, pos + 4, offset + length)
+            else:
+                pos = self._mm.find(needle, pos + 1, offset + length)
+        return [self.row(i) for i in matches]
+
+    def row(self, index: int) -> dict[str, Any]:
+        """Decode a single row into its JSON artifact shape."""
+        out: dict[str, Any] = {}
+        for field, (dtype, offset, _) in self._columns.items():
+            typecode = _DTYPES[dtype][1]
+            size = array(typecode).itemsize
+            (value,) = struct.unpack_from(f"<{typecode}", self._buf, offset + index * size)
+            if dtype in {"str", "opt_str"}:
+                value = self._strings.get(value)
+            _assign(out, field, value)
+        return out
+
+    def rows(self) -> list[dict[str, Any]]:
+        """Decode every row into its JSON artifact shape."""
+        flat_keys: list[str] = []
+        flat_values: list[list[Any]] = []
+        nested: dict[str, tuple[list[str], list[list[Any]]]] = {}
+        for field in self._columns:
+            head, _, tail = field.partition(".")
+            if tail:
+                keys, values = nested.setdefault(head, ([], []))
+                keys.append(tail)
+                values.append(self.column(field))
+            else:
+                flat_keys.append(field)
+                flat_values.append(self.column(field))
+
+        out = (
+            [dict(zip(flat_keys, values, strict=True)) for values in zip(*flat_values, strict=True)]
+            if flat_keys
+            else []
+        )
+        for group, (keys, values) in nested.items():
+            if not out:
+                out = [{} for _ in range(self._rows)]
+            for row, group_values in zip(out, zip(*values, strict=True), strict=True):
+                row[group] = dict(zip(keys, group_values, strict=True))
+        return out
+
+
+def _assign(row: dict[str, Any], dotted: str, value: Any) -> None:
+    parts = dotted.split(".")
+    for part in parts[:-1]:
+        row = row.setdefault(part, {})
+    row[parts[-1]] = value
+
+
+class SnapshotReader:
+    """Memory-mapped reader over a binary snapshot file.
+
+    Why this exists:
+    - Opening a snapshot costs one header parse; section data is paged in by the OS only when read.
+    """
+
+    def __init__(self, path: Path) -> None:
+        with path.open("rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buf = memoryview(self._mm)
+        magic, version, count = _HEADER.unpack_from(self._buf, 0)
+        if magic != _MAGIC or version != _VERSION:
+            raise ValueError(f"Not a supported snapshot file: {path}")
+        self._sections: dict[str, tuple[int, int, int, int]] = {}
+        for i in range(count):
+            raw_name, kind, rows, offset, length = _DIR_ENTRY.unpack_from(self._buf, _HEADER.size + i * _DIR_ENTRY.size)
+            self._sections[raw_name.rstrip(b"\0").decode("utf-8")] = (kind, rows, offset, length)
+        _, _, strings_offset, _ = self._sections["strings"]
+        self._strings = _StringTable(self._buf, strings_offset)
+
+    def section_names(self) -> list[str]:
+        return [name for name in self._sections if name != "strings"]
+
+    def has_section(self, name: str) -> bool:
+        return name in self._sections and name != "strings"
+
+    def table(self, name: str) -> SnapshotTable:
+        kind, rows, offset, _ = self._sections[name]
+        if kind != _KIND_TABLE:
+            raise KeyError(f"Section is not a table: {name}")
+        return SnapshotTable(name, self._mm, self._buf, offset, rows, self._strings)
+
+    def read_json(self, name: str) -> Any:
+        kind, _, offset, length = self._sections[name]
+        if kind != _KIND_JSON:
+            raise KeyError(f"Section is not JSON: {name}")
+        return json.loads(bytes(self._buf[offset : offset + length]).decode("utf-8"))
+
+    def read(self, name: str) -> Any:
+        """Return a section in its JSON artifact shape (rows for tables, the document for JSON sections)."""
+        kind = self._sections[name][0]
+        return self.table(name).rows() if kind == _KIND_TABLE else self.read_json(name)
+
+
+class LazySnapshotArtifacts(Mapping[str, Any]):
+    """Read-only artifacts mapping that decodes each section on first access.
+
+    Why this exists:
+    - Query helpers take an artifacts mapping; a where-defined lookup should never decode chunk text.
+    """
+
+    def __init__(self, reader: SnapshotReader) -> None:
+        self._reader = reader
+        self._loaded: dict[str, Any] = {}
+
+    @property
+    def reader(self) -> SnapshotReader:
+        return self._reader
+
+    def __getitem__(self, key: str) -> Any:
+        if key not in self._loaded:
+            if not self._reader.has_section(key):
+                raise KeyError(key)
+            self._loaded[key] = self._reader.read(key)
+        return self._loaded[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._reader.section_names())
+
+    def __len__(self) -> int:
+        return len(self._reader.section_names())
+
+    def loaded_sections(self) -> dict[str, Any]:
+        """Return the sections decoded so far (a snapshot copy of the mapping)."""
+        return dict(self._loaded)
+
+    def rows_where(self, section: str, field: str, value: str) -> list[dict[str, Any]]:
+        """Return rows of a table section whose string `field` equals `value`."""
+        loaded = self._loaded.get(section)
+        if loaded is not None:
+            return [r for r in loaded if r.get(field) == value]
+        if not self._reader.has_section(section):
+            return []
+        return self._reader.table(section).rows_where(field, value)
+
+    def rows_at(self, section: str, indices: Iterable[int]) -> list[dict[str, Any]]:
+        """Return rows of a table section by position, decoding only those rows."""
+        loaded = self._loaded.get(section)
+        if loaded is not None:
+            return [loaded[i] for i in indices]
+        if not self._reader.has_section(section):
+            return []
+        table = self._reader.table(section)
+        return [table.row(i) for i in indices]
+
+
+def snapshot_json_export_from_env() -> bool:
+    """Return True if every index run should also write the snapshot's JSON export (default off).
+
+    Why this exists:
+    - The export is proportional to the repository, not to the change; tooling that wants it on every run opts in.
+    """
+    return os.environ.get("CODEKNOWL_SNAPSHOT_JSON", "off").strip().lower() in {"1", "on", "true", "yes"}
@@ -0,0 +1,157 @@
+"""File: backend/src/codeknowl/symbol_index.py
+Purpose: Name-to-row index over a snapshot's symbols (exact, case-insensitive, `file:name`, and symbol ID keys).
+Product/business importance: Where-defined lookups back IDE navigation and must stay constant-time no matter how many
+symbols a repository defines.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+from collections.abc import Iterable, Mapping, Sequence
+from dataclasses import dataclass
+from typing import Any, Protocol
+
+from codeknowl.snapshot_format import LazySnapshotArtifacts, SnapshotReader, postings_columns
+
+SYMBOL_INDEX_FORMAT_VERSION = 1
+
+# Binary snapshot postings tables holding each key family, sorted by key.
+SYMBOL_INDEX_TABLES = {
+    "exact": "symbol_names",
+    "lower": "symbol_names_lower",
+    "qualified": "symbol_names_qualified",
+    "id": "symbol_ids",
+}
+
+
+class SymbolLookup(Protocol):
+    """Name lookups shared by the in-memory and memory-mapped symbol indexes."""
+
+    def rows_for(self, family: str, key: str) -> list[int]: ...
+
+
+def lookup_symbol_rows(index: SymbolLookup, name: str, *, ignore_case: bool = False) -> list[int]:
+    """Return the symbol rows matching a name.
+
+    An exact name match wins; otherwise a `path/to/file.py:name` query is resolved through the qualified keys. With
+    `ignore_case`, names are compared case-insensitively (qualified keys stay exact).
+
+    Why this exists:
+    - Both index forms must resolve names with exactly the same precedence.
+    """
+    rows = index.rows_for("lower", name.lower()) if ignore_case else index.rows_for("exact", name)
+    if rows:
+        return rows
+    if ":" in name:
+        return index.rows_for("qualified", name)
+    return []
+
+
+@dataclass(frozen=True)
+class SymbolNameIndex:
+    """Posting lists of symbol row numbers keyed by exact name, lowercase name, `file_path:name`, and symbol ID.
+
+    Row numbers refer to the order of the snapshot's symbols section, so a lookup is one dict probe followed by
+    decoding only the matching rows.
+
+    Why this exists:
+    - Scanning every symbol per request made where-defined latency grow with repository size.
+    """
+
+    exact: dict[str, list[int]]
+    lower: dict[str, list[int]]
+    qualified: dict[str, list[int]]
+    id: dict[str, list[int]]
+
+    @staticmethod
+    def from_symbols(symbols: Iterable[Mapping[str, Any]]) -> "SymbolNameIndex":
+        """Build the index from symbol dicts in snapshot order."""
+        exact: dict[str, list[int]] = {}
+        lower: dict[str, list[int]] = {}
+        qualified: dict[str, list[int]] = {}
+        ids: dict[str, list[int]] = {}
+        for row, sym in enumerate(symbols):
+            symbol_id = sym.get("symbol_id")
+            if symbol_id:
+                ids.setdefault(symbol_id, []).append(row)
+            name = sym.get("name") or ""
+            if not name:
+                continue
+            exact.setdefault(name, []).append(row)
+            lower.setdefault(name.lower(), []).append(row)
+            qualified.setdefault(f"{sym.get('file_path') or ''}:{name}", []).append(row)
+        return SymbolNameIndex(exact=exact, lower=lower, qualified=qualified, id=ids)
+
+    def rows_for(self, family: str, key: str) -> list[int]:
+        return list(getattr(self, family).get(key) or [])
+
+    def lookup(self, name: str, *, ignore_case: bool = False) -> list[int]:
+        return lookup_symbol_rows(self, name, ignore_case=ignore_case)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.exact
+
+    def to_tables(self) -> dict[str, dict[str, Sequence[Any]]]:
+        """Return the binary snapshot postings tables in columnar form."""
+        return {table: postings_columns(getattr(self, family)) for family, table in SYMBOL_INDEX_TABLES.items()}
+
+    def to_json(self) -> dict[str, Any]:
+        """Serialize the index for the JSON export (`symbol_index.json`)."""
+        return {
+            "version": SYMBOL_INDEX_FORMAT_VERSION,
+            "exact": self.exact,
+            "lower": self.lower,
+            "qualified": self.qualified,
+            "id": self.id,
+        }
+
+    @staticmethod
+    def from_json(payload: Mapping[str, Any]) -> "SymbolNameIndex":
+        """Wrap a decoded `symbol_index.json` document without copying it."""
+        if payload.get("version") != SYMBOL_INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported symbol index version: {payload.get('version')}")
+        return SymbolNameIndex(
+            exact=payload["exact"], lower=payload["lower"], qualified=payload["qualified"], id=payload["id"]
+        )
+
+
+class SnapshotSymbolIndex:
+    """Symbol name index answered in place from a memory-mapped snapshot's postings tables.
+
+    Why this exists:
+    - Decoding a whole name index on a snapshot's first query would cost seconds on large repositories; binary
+      searching the sorted tables costs microseconds from the first query on.
+    """
+
+    def __init__(self, reader: SnapshotReader) -> None:
+        self._tables = {family: reader.table(name) for family, name in SYMBOL_INDEX_TABLES.items()}
+
+    def rows_for(self, family: str, key: str) -> list[int]:
+        return self._tables[family].postings(key)
+
+    def lookup(self, name: str, *, ignore_case: bool = False) -> list[int]:
+        return lookup_symbol_rows(self, name, ignore_case=ignore_case)
+
+    def __contains__(self, name: object) -> bool:
+        return isinstance(name, str) and bool(self.rows_for("exact", name))
+
+
+def symbol_index_from_artifacts(artifacts: Mapping[str, Any]) -> SymbolNameIndex | SnapshotSymbolIndex:
+    """Return the persisted symbol name index of a loaded snapshot, rebuilding it from symbols for older snapshots.
+
+    Why this exists:
+    - Snapshots written before the index existed must still answer where-defined queries.
+    """
+    if isinstance(artifacts, LazySnapshotArtifacts):
+        reader = artifacts.reader
+        if all(reader.has_section(name) for name in SYMBOL_INDEX_TABLES.values()):
+            return SnapshotSymbolIndex(reader)
+    payload = artifacts.get("symbol_index")
+    if isinstance(payload, dict):
+        try:
+            return SymbolNameIndex.from_json(payload)
+        except (KeyError, TypeError, ValueError):
+            pass
+    return SymbolNameIndex.from_symbols(artifacts.get("symbols") or [])
@@ -10,7 +10,9 @@ License: MIT (see LICENSE)
 from __future__ import annotations
 
 import logging
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+
+from codeknowl.scope_index import IntervalIndex, build_interval_index
 
 logger = logging.getLogger(__name__)
 
@@ -35,22 +37,56 @@ class SymbolResolver:
         self.class_symbols: Dict[str, str] = {}     # name -> id
         self.file_symbols: Dict[str, str] = {}      # path -> id
         self.module_to_file: Dict[str, str] = {}     # module -> file_id
-
-    def add_function(self, func_id: str, name: str, file_id: str) -> None:
+        self.function_ranges: Dict[str, List[Tuple[int, int, str]]] = {}  # file_id -> [(start, end + 1, id)]
+        self._function_scopes: Dict[str, IntervalIndex[int]] = {}  # file_id -> built interval index
+
+    def add_function(
+        self,
+        func_id: str,
+        name: str,
+        file_id: str,
+        line_start: int | None = None,
+        line_end: int | None = None,
+    ) -> None:
         """Register a function symbol.
 
         Why this exists:
         - Builds symbol table for function resolution.
+        - Line ranges feed the per-file interval index used to attribute calls to their enclosing function.
         
         Args:
             func_id: Graph vertex ID
             name: Function name
             file_id: File ID where function is defined
+            line_start: First line of the definition (1-based), if known
+            line_end: Last line of the definition (1-based), if known
         """
         # Use qualified name to avoid conflicts
         qualified_name = f"{file_id}:{name}"
         self.function_symbols[qualified_name] = func_id
         self.function_symbols[name] = func_id  # Also store simple name for fallback
+        if line_start is not None and line_end is not None:
+            self.function_ranges.setdefault(file_id, []).append((line_start, line_end + 1, func_id))
+            self._function_scopes.pop(file_id, None)
+
+    def function_at_line(self, file_id: str, line: int) -> Optional[str]:
+        """Return the innermost function whose definition spans a line.
+
+        Why this exists:
+        - Call relationships need the calling function; the per-file interval index answers in O(log n).
+        
+        Args:
+            file_id: File ID
+            line: 1-based line number
+            
+        Returns:
+            Function vertex ID or None if the line is outside every function
+        """
+        scopes = self._function_scopes.get(file_id)
+        if scopes is None:
+            scopes = build_interval_index(self.function_ranges.get(file_id, []))
+            self._function_scopes[file_id] = scopes
+        return scopes.lookup(line)
 
     def add_class(self, class_id: str, name: str, file_id: str) -> None:
         """Register a class symbol.
@@ -192,6 +228,8 @@ class SymbolResolver:
         self.class_symbols.clear()
         self.file_symbols.clear()
         self.module_to_file.clear()
+        self.function_ranges.clear()
+        self._function_scopes.clear()
 
 
 def create_symbol_resolver() -> SymbolResolver:
@@ -17,13 +17,18 @@ from typing import Any, Protocol
 
 import httpx
 
+from codeknowl.chunk_text import chunk_text_ref
 from codeknowl.chunking import ChunkRecord
+from codeknowl.http_pool import http_pool
 
 
 @dataclass(frozen=True)
 class SemanticHit:
     """Represents a single semantic search result with citation metadata.
 
+    Stores write a `text_ref` into the chunk text store instead of the text, so `text` is empty unless the point was
+    written before chunk text moved out of vector payloads; callers resolve references in batch.
+
     Why this exists:
     - Callers need a stable structure to render search results with file/line citations and scores.
     """
@@ -34,6 +39,7 @@ class SemanticHit:
     start_line: int
     end_line: int
     text: str
+    text_ref: str = ""
 
 
 class VectorStore(Protocol):
@@ -60,6 +66,14 @@ class VectorStore(Protocol):
         """
         raise NotImplementedError
 
+    def prune_chunks(self, *, repo_id: str, keep_chunk_ids: set[str]) -> int:
+        """Remove a repository's vectors whose chunk IDs are not in `keep_chunk_ids`; return how many were removed.
+
+        Why this exists:
+        - Snapshot garbage collection drops vectors no retained snapshot references (e.g. after a failed delete).
+        """
+        raise NotImplementedError
+
     def search(
         self, *, repo_id: str, head_commit: str, query_vector: list[float], limit: int = 8
     ) -> list[SemanticHit]:
@@ -136,6 +150,10 @@ class QdrantVectorStore:
     def __init__(self, config: QdrantConfig):
         self._config = config
 
+    def _request(self, method: str, url: str, **kwargs: Any) -> httpx.Response:
+        client = http_pool().sync_client(url)
+        return client.request(method, url, headers=self._headers(), timeout=self._config.timeout_seconds, **kwargs)
+
     def _headers(self) -> dict[str, str]:
         headers: dict[str, str] = {"Content-Type": "application/json"}
         if self._config.api_key:
@@ -144,18 +162,17 @@ class QdrantVectorStore:
 
     def _ensure_collection(self, dim: int) -> None:
         url = f"{self._config.base_url}/collections/{self._config.collection}"
-        with httpx.Client(timeout=self._config.timeout_seconds) as client:
-            response = client.get(url, headers=self._headers())
-            if response.status_code == 200:
-                return
-            if response.status_code != 404:
-                response.raise_for_status()
-
-            payload = {
-                "vectors": {"size": dim, "distance": "Cosine"},
-            }
-            create = client.put(url, headers=self._headers(), json=payload)
-            create.raise_for_status()
+        response = self._request("GET", url)
+        if response.status_code == 200:
+            return
+        if response.status_code != 404:
+            response.raise_for_status()
+
+        payload = {
+            "vectors": {"size": dim, "distance": "Cosine"},
+        }
+        create = self._request("PUT", url, json=payload)
+        create.raise_for_status()
 
     def upsert(self, *, repo_id: str, head_commit: str, chunks: list[ChunkRecord], vectors: list[list[float]]) -> None:
         """Store or update chunks with vectors in Qdrant.
@@ -181,15 +198,14 @@ class QdrantVectorStore:
                         "file_path": chunk_record.file_path,
                         "start_line": chunk_record.start_line,
                         "end_line": chunk_record.end_line,
-                        "text": chunk_record.text,
+                        "text_ref": chunk_text_ref(chunk_record.text),
                     },
                 }
             )
 
         url = f"{self._config.base_url}/collections/{self._config.collection}/points?wait=true"
-        with httpx.Client(timeout=self._config.timeout_seconds) as client:
-            response = client.put(url, headers=self._headers(), json={"points": points})
-            response.raise_for_status()
+        response = self._request("PUT", url, json={"points": points})
+        response.raise_for_status()
 
     def delete_by_file_paths(self, *, repo_id: str, file_paths: list[str]) -> None:
         """Remove vectors for specific file paths in Qdrant.
@@ -201,46 +217,66 @@ class QdrantVectorStore:
             return
 
         url = f"{self._config.base_url}/collections/{self._config.collection}/points/delete?wait=true"
-        with httpx.Client(timeout=self._config.timeout_seconds) as client:
-            response = client.post(
-                url,
-                headers=self._headers(),
-                json={
-                    "filter": {
-                        "must": [
-                            {"key": "repo_id", "match": {"value": repo_id}},
-                            {"key": "file_path", "match": {"any": file_paths}},
-                        ]
-                    }
-                },
-            )
-            response.raise_for_status()
+        response = self._request(
+            "POST",
+            url,
+            json={
+                "filter": {
+                    "must": [
+                        {"key": "repo_id", "match": {"value": repo_id}},
+                        {"key": "file_path", "match": {"any": file_paths}},
+                    ]
+                }
+            },
+        )
+        response.raise_for_status()
 
-    def search(self, *, repo_id: str, head_commit: str, query_vector: list[float], limit: int = 8) -> list[SemanticHit]:
-        """Retrieve the most similar chunks for a query vector from Qdrant.
+    def prune_chunks(self, *, repo_id: str, keep_chunk_ids: set[str]) -> int:
+        """Remove a repository's points whose chunk IDs are not in `keep_chunk_ids`.
 
         Why this exists:
-        - QA and IDE workflows need to retrieve evidence chunks to ground answers.
+        - Snapshot garbage collection drops vectors no retained snapshot references.
         """
-        url = f"{self._config.base_url}/collections/{self._config.collection}/points/search"
-        with httpx.Client(timeout=self._config.timeout_seconds) as client:
-            response = client.post(
-                url,
-                headers=self._headers(),
-                json={
-                    "vector": query_vector,
-                    "limit": limit,
-                    "with_payload": True,
-                    "filter": {
-                        "must": [
-                            {"key": "repo_id", "match": {"value": repo_id}},
-                        ]
-                    },
-                },
-            )
+        base = f"{self._config.base_url}/collections/{self._config.collection}/points"
+        stale: list[Any] = []
+        offset: Any = None
+        while True:
+            body: dict[str, Any] = {
+                "limit": 1000,
+                "with_payload": False,
+                "with_vector": False,
+                "filter": {"must": [{"key": "repo_id", "match": {"value": repo_id}}]},
+            }
+            if offset is not None:
+                body["offset"] = offset
+            response = self._request("POST", f"{base}/scroll", json=body)
+            if response.status_code == 404:
+                return 0
+            response.raise_for_status()
+            result = response.json().get("result") or {}
+            stale.extend(p["id"] for p in result.get("points") or [] if str(p.get("id")) not in keep_chunk_ids)
+            offset = result.get("next_page_offset")
+            if offset is None:
+                break
+        for start in range(0, len(stale), 1000):
+            response = self._request("POST", f"{base}/delete?wait=true", json={"points": stale[start : start + 1000]})
             response.raise_for_status()
-            data = response.json()
+        return len(stale)
+
+    def _search_body(self, *, repo_id: str, query_vector: list[float], limit: int) -> dict[str, Any]:
+        return {
+            "vector": query_vector,
+            "limit": limit,
+            "with_payload": True,
+            "filter": {
+                "must": [
+                    {"key": "repo_id", "match": {"value": repo_id}},
+                ]
+            },
+        }
 
+    @staticmethod
+    def _hits(data: dict[str, Any]) -> list[SemanticHit]:
         result = data.get("result")
         if not isinstance(result, list):
             return []
@@ -258,10 +294,42 @@ class QdrantVectorStore:
                     start_line=int(payload.get("start_line") or 1),
                     end_line=int(payload.get("end_line") or 1),
                     text=str(payload.get("text") or ""),
+                    text_ref=str(payload.get("text_ref") or ""),
                 )
             )
         return hits
 
+    def search(self, *, repo_id: str, head_commit: str, query_vector: list[float], limit: int = 8) -> list[SemanticHit]:
+        """Retrieve the most similar chunks for a query vector from Qdrant.
+
+        Why this exists:
+        - QA and IDE workflows need to retrieve evidence chunks to ground answers.
+        """
+        url = f"{self._config.base_url}/collections/{self._config.collection}/points/search"
+        body = self._search_body(repo_id=repo_id, query_vector=query_vector, limit=limit)
+        response = self._request("POST", url, json=body)
+        response.raise_for_status()
+        return self._hits(response.json())
+
+    async def asearch(
+        self, *, repo_id: str, head_commit: str, query_vector: list[float], limit: int = 8
+    ) -> list[SemanticHit]:
+        """Async variant of `search` on the shared async connection pool.
+
+        Why this exists:
+        - The API server retrieves evidence without blocking its event loop.
+        """
+        url = f"{self._config.base_url}/collections/{self._config.collection}/points/search"
+        client = http_pool().async_client(url)
+        response = await client.post(
+            url,
+            headers=self._headers(),
+            json=self._search_body(repo_id=repo_id, query_vector=query_vector, limit=limit),
+            timeout=self._config.timeout_seconds,
+        )
+        response.raise_for_status()
+        return self._hits(response.json())
+
 
 class FileVectorStore:
     """Local file-based fallback implementation of VectorStore.
@@ -296,7 +364,7 @@ class FileVectorStore:
                 "file_path": c.file_path,
                 "start_line": c.start_line,
                 "end_line": c.end_line,
-                "text": c.text,
+                "text_ref": chunk_text_ref(c.text),
                 "vector": v,
             }
 
@@ -322,6 +390,23 @@ class FileVectorStore:
                 f.write(json.dumps(rec, ensure_ascii=False, sort_keys=True))
                 f.write("\n")
 
+    def prune_chunks(self, *, repo_id: str, keep_chunk_ids: set[str]) -> int:
+        """Remove a repository's records whose chunk IDs are not in `keep_chunk_ids`.
+
+        Why this exists:
+        - Snapshot garbage collection drops vectors no retained snapshot references.
+        """
+        records = self._load(repo_id)
+        kept = [rec for rec in records if rec.get("chunk_id") in keep_chunk_ids]
+        if len(kept) == len(records):
+            return 0
+        path = self._path(repo_id)
+        with path.open("w", encoding="utf-8") as f:
+            for rec in kept:
+                f.write(json.dumps(rec, ensure_ascii=False, sort_keys=True))
+                f.write("\n")
+        return len(records) - len(kept)
+
     def search(self, *, repo_id: str, head_commit: str, query_vector: list[float], limit: int = 8) -> list[SemanticHit]:
         """Retrieve the most similar chunks for a query vector from the local JSONL file.
 
@@ -347,6 +432,7 @@ class FileVectorStore:
                     start_line=int(rec.get("start_line") or 1),
                     end_line=int(rec.get("end_line") or 1),
                     text=str(rec.get("text") or ""),
+                    text_ref=str(rec.get("text_ref") or ""),
                 )
             )
         return hits
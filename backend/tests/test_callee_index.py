@@ -0,0 +1,98 @@
+"""File: backend/tests/test_callee_index.py
+Purpose: Verify callee postings answer what-calls queries by whole trailing segments and by substring.
+Product/business importance: What-calls results must stay precise (no spurious substring hits) while avoiding a scan
+of every call record.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+import sys
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+_ROOT = Path(__file__).resolve().parents[1]
+_SRC = _ROOT / "src"
+sys.path.insert(0, str(_SRC))
+
+from codeknowl.callee_index import CalleeIndex, callee_segment  # noqa: E402
+from codeknowl.query import find_callers_best_effort  # noqa: E402
+from codeknowl.snapshot_format import LazySnapshotArtifacts, SnapshotReader, write_snapshot_file  # noqa: E402
+from codeknowl.symbol_index import SymbolNameIndex  # noqa: E402
+
+
+def _call(callee: str, line: int, caller: str = "") -> dict:
+    r = {"start_line": line, "start_col": 1, "end_line": line, "end_col": 9}
+    return {"caller_symbol_id": caller, "callee_name": callee, "file_path": "a.py", "range": r}
+
+
+_SYMBOLS = [
+    {
+        "symbol_id": "s1",
+        "kind": "function",
+        "name": "main",
+        "file_path": "a.py",
+        "range": {"start_line": 1, "start_col": 1, "end_line": 9, "end_col": 1},
+    }
+]
+_CALLS = [
+    _call("greet", 1, "s1"),
+    _call("self.greet", 2, "s1"),
+    _call("mod::greet", 3),
+    _call("pkg/greet", 4),
+    _call("greeting", 5),
+    _call("regreet", 6),
+    _call("obj.greet_all", 7),
+    _call("a.b.greet", 8),
+]
+
+
+def _lines(results: list[dict]) -> list[int]:
+    return [r["citation"]["start_line"] for r in results]
+
+
+class TestCalleeIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        self.plain = {"files": [], "symbols": _SYMBOLS, "calls": _CALLS, "chunks": []}
+        self._tmp = TemporaryDirectory(prefix="codeknowl-test-callee-index-")
+        self.addCleanup(self._tmp.cleanup)
+        path = Path(self._tmp.name) / "snapshot.cks"
+        tables = {
+            **self.plain,
+            **SymbolNameIndex.from_symbols(_SYMBOLS).to_tables(),
+            **CalleeIndex.from_calls(_CALLS).to_tables(),
+        }
+        write_snapshot_file(path, tables)
+        self.lazy = LazySnapshotArtifacts(SnapshotReader(path))
+
+    def test_segment_split(self) -> None:
+        self.assertEqual(callee_segment("a.b::c/d"), "d")
+        self.assertEqual(callee_segment("greet"), "greet")
+
+    def test_whole_segment_matches_on_both_snapshot_forms(self) -> None:
+        for artifacts in (self.plain, self.lazy):
+            with self.subTest(kind=type(artifacts).__name__):
+                results = find_callers_best_effort(artifacts, "greet")
+                self.assertEqual(_lines(results), [1, 2, 3, 4, 8])
+                self.assertEqual(results[0]["caller"]["name"], "main")
+                self.assertIsNone(results[2]["caller_symbol_id"])
+                self.assertEqual(_lines(find_callers_best_effort(artifacts, "b.greet")), [8])
+                self.assertEqual(find_callers_best_effort(artifacts, "missing"), [])
+        self.assertEqual(self.lazy._loaded, {})
+
+    def test_substring_uses_trigrams_and_short_queries(self) -> None:
+        without_trigrams = {**self.plain, "callee_index": CalleeIndex.from_calls(_CALLS, trigrams=False)}
+        for artifacts in (self.plain, self.lazy, without_trigrams):
+            with self.subTest(kind=type(artifacts).__name__):
+                self.assertEqual(
+                    _lines(find_callers_best_effort(artifacts, "greet", substring=True)), list(range(1, 9))
+                )
+                self.assertEqual(_lines(find_callers_best_effort(artifacts, "_all", substring=True)), [7])
+                self.assertEqual(_lines(find_callers_best_effort(artifacts, "::", substring=True)), [3])
+
+
+if __name__ == "__main__":
+    unittest.main()
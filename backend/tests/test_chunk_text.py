@@ -0,0 +1,71 @@
+"""File: backend/tests/test_chunk_text.py
+Purpose: Verify chunk text is stored once by reference and resolved in batch for query-time hits.
+Product/business importance: Snapshots and vector payloads hold only references, so every reader must get the text
+back from the shared store.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+import json
+import sys
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+_ROOT = Path(__file__).resolve().parents[1]
+_SRC = _ROOT / "src"
+sys.path.insert(0, str(_SRC))
+
+from codeknowl.chunk_text import ChunkTextStore, chunk_text_ref, dehydrate_chunks, resolve_chunk_texts  # noqa: E402
+from codeknowl.chunking import ChunkRecord  # noqa: E402
+from codeknowl.vector_store import FileVectorStore  # noqa: E402
+
+
+class TestChunkTextStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = TemporaryDirectory(prefix="codeknowl-test-chunk-text-")
+        self.addCleanup(self._tmp.cleanup)
+        self.data_dir = Path(self._tmp.name)
+        self.store = ChunkTextStore.for_repo(self.data_dir, "r")
+        self.addCleanup(self.store.close)
+
+    def test_dehydrate_stores_each_text_once(self) -> None:
+        chunks = [
+            {"chunk_id": "a", "text": "def run():\n    pass\n"},
+            {"chunk_id": "b", "text": "def run():\n    pass\n"},
+            {"chunk_id": "c", "text_ref": "carried"},
+        ]
+        out = dehydrate_chunks(self.store, chunks)
+
+        self.assertEqual([c.get("text") for c in out], [None, None, None])
+        self.assertEqual(out[0]["text_ref"], out[1]["text_ref"])
+        self.assertEqual(out[2]["text_ref"], "carried")
+        self.assertEqual(len(self.store.existing([out[0]["text_ref"], "carried"])), 1)
+        self.assertIn("text", chunks[0])
+
+    def test_resolve_fills_text_of_hits(self) -> None:
+        self.store.put_texts(["alpha", "beta"])
+        hits = [
+            {"chunk_id": "a", "text": "", "text_ref": chunk_text_ref("alpha")},
+            {"chunk_id": "b", "text": "legacy inline", "text_ref": ""},
+            {"chunk_id": "c", "text": "", "text_ref": "missing"},
+        ]
+        resolve_chunk_texts(self.store, hits)
+        self.assertEqual([h["text"] for h in hits], ["alpha", "legacy inline", ""])
+
+    def test_file_vector_payloads_reference_text(self) -> None:
+        vectors = FileVectorStore(self.data_dir)
+        chunk = ChunkRecord(chunk_id="a", file_path="a.py", start_line=1, end_line=2, text="def run():\n")
+        vectors.upsert(repo_id="r", head_commit="c1", chunks=[chunk], vectors=[[1.0, 0.0]])
+
+        record = json.loads((self.data_dir / "vector_store" / "r.jsonl").read_text(encoding="utf-8"))
+        self.assertNotIn("text", record)
+        hit = vectors.search(repo_id="r", head_commit="c1", query_vector=[1.0, 0.0], limit=1)[0]
+        self.assertEqual((hit.text, hit.text_ref), ("", chunk_text_ref(chunk.text)))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+"""File: backend/tests/test_embedding_cache.py
+Purpose: Verify chunk embeddings are reused by content hash and keyed by embedding model.
+Product/business importance: Updates must only call the embeddings service for chunk text it has never embedded.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+import sys
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+_ROOT = Path(__file__).resolve().parents[1]
+_SRC = _ROOT / "src"
+sys.path.insert(0, str(_SRC))
+
+from codeknowl.embedding_cache import EmbeddingCache, embed_with_cache  # noqa: E402
+from codeknowl.embeddings import HashEmbeddingsClient  # noqa: E402
+
+
+class _CountingClient(HashEmbeddingsClient):
+    def __init__(self, *, dim: int) -> None:
+        super().__init__(dim=dim)
+        self.calls: list[list[str]] = []
+
+    def embed_texts(self, texts: list[str]) -> list[list[float]]:
+        self.calls.append(list(texts))
+        return super().embed_texts(texts)
+
+
+class TestEmbeddingCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = TemporaryDirectory(prefix="codeknowl-test-embedding-cache-")
+        self.addCleanup(self._tmp.cleanup)
+        self.cache = EmbeddingCache.for_data_dir(Path(self._tmp.name))
+        self.addCleanup(self.cache.close)
+
+    def test_only_new_text_is_embedded(self) -> None:
+        client = _CountingClient(dim=8)
+        first = embed_with_cache(client, ["a", "b", "a"], cache=self.cache)
+        self.assertEqual((first.hits, first.misses), (0, 2))
+        self.assertEqual(client.calls, [["a", "b"]])
+
+        second = embed_with_cache(client, ["b", "c", "a"], cache=self.cache)
+        self.assertEqual((second.hits, second.misses), (2, 1))
+        self.assertEqual(client.calls[-1], ["c"])
+        self.assertEqual(second.vectors, client.embed_texts(["b", "c", "a"]))
+
+    def test_vectors_are_keyed_by_model(self) -> None:
+        embed_with_cache(_CountingClient(dim=8), ["a"], cache=self.cache)
+        other = _CountingClient(dim=16)
+        result = embed_with_cache(other, ["a"], cache=self.cache)
+        self.assertEqual((result.hits, result.misses), (0, 1))
+        self.assertEqual(len(result.vectors[0]), 16)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+"""File: backend/tests/test_embeddings.py
+Purpose: Verify the embeddings client batches requests, retries only failed batches, and keeps vector order.
+Product/business importance: Large repositories must embed reliably against a local embeddings server.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import sys
+import threading
+import unittest
+from pathlib import Path
+
+import httpx
+
+_ROOT = Path(__file__).resolve().parents[1]
+_SRC = _ROOT / "src"
+sys.path.insert(0, str(_SRC))
+
+from codeknowl.embeddings import EmbeddingsConfig, OpenAiCompatibleEmbeddingsClient, plan_batches  # noqa: E402
+from codeknowl.http_pool import HttpPool  # noqa: E402
+
+
+def _config(**overrides: object) -> EmbeddingsConfig:
+    base: dict[str, object] = {
+        "base_url": "http://embed.test",
+        "model": "m",
+        "api_key": None,
+        "timeout_seconds": 5.0,
+        "embeddings_path": "/v1/embeddings",
+        "batch_size": 3,
+        "max_concurrency": 2,
+        "retry_backoff_seconds": 0.0,
+    }
+    base.update(overrides)
+    return EmbeddingsConfig(**base)  # type: ignore[arg-type]
+
+
+class _Server:
+    """Embeds each text as `[float(text)]` and answers in reverse order with explicit indexes."""
+
+    def __init__(self, failures: dict[str, list[int]] | None = None) -> None:
+        self.requests: list[list[str]] = []
+        self._failures = failures or {}
+        self._lock = threading.Lock()
+
+    def __call__(self, request: httpx.Request) -> httpx.Response:
+        texts = json.loads(request.content)["input"]
+        with self._lock:
+            self.requests.append(texts)
+            queued = self._failures.get(texts[0], [])
+            status = queued.pop(0) if queued else 200
+        if status != 200:
+            return httpx.Response(status, json={"error": "unavailable"})
+        data = [{"index": i, "embedding": [float(t)]} for i, t in enumerate(texts)]
+        return httpx.Response(200, json={"data": list(reversed(data))})
+
+
+class TestEmbeddingsClient(unittest.TestCase):
+    def test_batches_by_count_and_tokens(self) -> None:
+        texts = ["a" * 4, "b" * 4, "c" * 48, "d" * 4, "e" * 4, "f" * 4, "g" * 4]
+        self.assertEqual(plan_batches(texts, max_items=3, max_tokens=12), [(0, 2), (2, 3), (3, 6), (6, 7)])
+
+    def test_vectors_are_reassembled_in_order_and_failed_batch_retried(self) -> None:
+        server = _Server(failures={"3": [503]})
+        pool = HttpPool(transport=httpx.MockTransport(server))
+        self.addCleanup(pool.close)
+        client = OpenAiCompatibleEmbeddingsClient(_config(), pool=pool)
+
+        texts = [str(i) for i in range(8)]
+        vectors = client.embed_texts(texts)
+
+        self.assertEqual(vectors, [[float(i)] for i in range(8)])
+        # Three batches, plus one retry of the batch that failed.
+        self.assertEqual(sorted(r[0] for r in server.requests), ["0", "3", "3", "6"])
+
+    def test_async_path_matches_sync_batching_and_retries(self) -> None:
+        server = _Server(failures={"3": [503]})
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            return server(request)
+
+        pool = HttpPool(async_transport=httpx.MockTransport(handler))
+        client = OpenAiCompatibleEmbeddingsClient(_config(), pool=pool)
+
+        vectors = asyncio.run(client.aembed_texts([str(i) for i in range(8)]))
+
+        self.assertEqual(vectors, [[float(i)] for i in range(8)])
+        self.assertEqual(sorted(r[0] for r in server.requests), ["0", "3", "3", "6"])
+
+    def test_client_errors_are_not_retried(self) -> None:
+        server = _Server(failures={"0": [400]})
+        pool = HttpPool(transport=httpx.MockTransport(server))
+        self.addCleanup(pool.close)
+        client = OpenAiCompatibleEmbeddingsClient(_config(), pool=pool)
+
+        with self.assertRaises(httpx.HTTPStatusError):
+            client.embed_texts(["0", "1"])
+        self.assertEqual(len(server.requests), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
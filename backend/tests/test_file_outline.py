@@ -0,0 +1,73 @@
+"""File: backend/tests/test_file_outline.py
+Purpose: Verify precomputed file outlines order symbols by position and nesting and read back from keyed sections.
+Product/business importance: Explain-file answers come straight from these outlines, so they must match the symbols.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+import sys
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+_ROOT = Path(__file__).resolve().parents[1]
+_SRC = _ROOT / "src"
+sys.path.insert(0, str(_SRC))
+
+from codeknowl.file_outline import FileOutlineIndex, outline_entries  # noqa: E402
+from codeknowl.query import explain_file_stub  # noqa: E402
+from codeknowl.snapshot_format import LazySnapshotArtifacts, SnapshotReader, write_snapshot_file  # noqa: E402
+
+
+def _sym(symbol_id: str, kind: str, name: str, start: tuple[int, int], end: tuple[int, int], path: str = "m.py"):
+    r = {"start_line": start[0], "start_col": start[1], "end_line": end[0], "end_col": end[1]}
+    return {"symbol_id": symbol_id, "kind": kind, "name": name, "file_path": path, "range": r}
+
+
+_FILES = [
+    {"path": "m.py", "language": "python", "size_bytes": 300, "blob_sha": None},
+    {"path": "empty.py", "language": "python", "size_bytes": 0, "blob_sha": None},
+]
+# Deliberately out of order: a class with two methods (one holding a nested function), then a top-level function.
+_SYMBOLS = [
+    _sym("f", "function", "helper", (20, 1), (22, 10)),
+    _sym("m2", "function", "stop", (12, 5), (18, 20)),
+    _sym("c", "class", "Engine", (1, 1), (18, 20)),
+    _sym("inner", "function", "cleanup", (14, 9), (16, 12)),
+    _sym("m1", "function", "start", (3, 5), (10, 12)),
+    _sym("x", "function", "other", (1, 1), (2, 1), path="other.py"),
+]
+
+
+class TestFileOutline(unittest.TestCase):
+    def test_entries_are_ordered_with_depth(self) -> None:
+        entries = outline_entries([s for s in _SYMBOLS if s["file_path"] == "m.py"])
+        self.assertEqual(
+            [(e["name"], e["depth"]) for e in entries],
+            [("Engine", 0), ("start", 1), ("stop", 1), ("cleanup", 2), ("helper", 0)],
+        )
+
+    def test_keyed_sections_match_in_memory_outlines(self) -> None:
+        index = FileOutlineIndex.from_records(_FILES, _SYMBOLS)
+        with TemporaryDirectory(prefix="codeknowl-test-outline-") as tmp:
+            path = Path(tmp) / "snapshot.cks"
+            write_snapshot_file(path, {"files": _FILES, "symbols": _SYMBOLS, **index.to_tables()})
+            lazy = LazySnapshotArtifacts(SnapshotReader(path))
+            plain = {"files": _FILES, "symbols": _SYMBOLS}
+            for file_path in ("m.py", "empty.py"):
+                self.assertEqual(explain_file_stub(lazy, file_path), explain_file_stub(plain, file_path))
+            self.assertEqual(lazy._loaded, {})
+
+        stub = explain_file_stub(plain, "m.py")
+        self.assertEqual(stub["symbol_counts"], {"class": 1, "function": 4})
+        self.assertEqual(stub["top_symbols"][3]["citation"], {"file_path": "m.py", "start_line": 14, "end_line": 16})
+        self.assertEqual(explain_file_stub(plain, "empty.py")["top_symbols"], [])
+        with self.assertRaises(KeyError):
+            explain_file_stub(plain, "other.py")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,100 @@
+"""File: backend/tests/test_http_pool.py
+Purpose: Verify outbound HTTP clients are shared per endpoint and keep-alive connections are reused and counted.
+Product/business importance: Every LLM, embeddings, reranker, Qdrant, and OIDC call relies on the shared pool.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import patch
+
+import httpx
+
+_ROOT = Path(__file__).resolve().parents[1]
+_SRC = _ROOT / "src"
+sys.path.insert(0, str(_SRC))
+
+from codeknowl.http_pool import HttpPool, HttpPoolConfig, endpoint_key  # noqa: E402
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        return
+
+
+class TestHttpPool(unittest.TestCase):
+    def setUp(self) -> None:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), _KeepAliveHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        self.base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        self.pool = HttpPool(HttpPoolConfig(http2=False))
+        self.addCleanup(self.pool.close)
+        metrics = patch("codeknowl.http_pool.METRICS")
+        self.metrics = metrics.start()
+        self.addCleanup(metrics.stop)
+
+    def _connections(self) -> list[bool]:
+        return [c.kwargs["reused"] for c in self.metrics.inc_http_client_request.call_args_list]
+
+    def test_endpoint_key_normalizes_default_ports(self) -> None:
+        self.assertEqual(endpoint_key("https://qdrant.test/collections/x"), "https://qdrant.test:443")
+        self.assertEqual(endpoint_key("http://llm.test:8002/api/v1/models"), "http://llm.test:8002")
+
+    def test_sync_client_is_shared_and_reuses_connections(self) -> None:
+        client = self.pool.sync_client(f"{self.base_url}/a")
+        self.assertIs(client, self.pool.sync_client(f"{self.base_url}/b?x=1"))
+
+        for path in ("a", "b", "c"):
+            client.get(f"{self.base_url}/{path}", timeout=5).raise_for_status()
+
+        self.assertEqual(self._connections(), [False, True, True])
+
+    def test_async_client_is_shared_per_loop_and_reuses_connections(self) -> None:
+        async def run() -> None:
+            client = self.pool.async_client(self.base_url)
+            self.assertIs(client, self.pool.async_client(f"{self.base_url}/other"))
+            for _ in range(2):
+                (await client.get(f"{self.base_url}/a", timeout=5)).raise_for_status()
+            await self.pool.aclose()
+
+        asyncio.run(run())
+        self.assertEqual(self._connections(), [False, True])
+
+    def test_aclose_closes_sync_and_async_clients(self) -> None:
+        sync_client = self.pool.sync_client(self.base_url)
+
+        async def run() -> httpx.AsyncClient:
+            async_client = self.pool.async_client(self.base_url)
+            (await async_client.get(f"{self.base_url}/a", timeout=5)).raise_for_status()
+            await self.pool.aclose()
+            return async_client
+
+        async_client = asyncio.run(run())
+        self.assertTrue(sync_client.is_closed)
+        self.assertTrue(async_client.is_closed)
+        # The pool stays usable after shutdown hooks ran (e.g. a CLI command after a closed app).
+        self.assertIsNot(self.pool.sync_client(self.base_url), sync_client)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+"""File: backend/tests/test_incremental.py
+Purpose: Verify incremental re-parsing of modified files from git diff hunks.
+Product/business importance: Incremental updates must produce exactly the records a full re-extraction would.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+_ROOT = Path(__file__).resolve().parents[1]
+_SRC = _ROOT / "src"
+sys.path.insert(0, str(_SRC))
+
+from codeknowl.artifacts import dump_dataclasses  # noqa: E402
+from codeknowl.incremental import (  # noqa: E402
+    IncrementalParseConfig,
+    TreeCache,
+    extract_modified_incrementally,
+)
+from codeknowl.indexing import extract_file_symbols_and_calls  # noqa: E402
+from codeknowl.repo import diff_hunks  # noqa: E402
+
+_CONFIG = IncrementalParseConfig(enabled=True, min_file_bytes=0, tree_cache_entries=8)
+
+
+def _git(repo: Path, *args: str) -> str:
+    result = subprocess.run(
+        ["git", "-C", str(repo), *args],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={
+            **os.environ,
+            "GIT_AUTHOR_NAME": "t",
+            "GIT_AUTHOR_EMAIL": "t@example.invalid",
+            "GIT_COMMITTER_NAME": "t",
+            "GIT_COMMITTER_EMAIL": "t@example.invalid",
+        },
+    )
+    return result.stdout.strip()
+
+
+def _commit(repo: Path, rel: str, text: str) -> str:
+    (repo / rel).write_text(text, encoding="utf-8")
+    _git(repo, "add", "-A")
+    _git(repo, "commit", "-q", "--allow-empty", "-m", "edit")
+    return _git(repo, "rev-parse", "HEAD")
+
+
+def _python_source(count: int) -> list[str]:
+    lines: list[str] = []
+    for i in range(count):
+        lines += [f"class Widget{i}:\n", "    def run(self):\n", f"        return helper_{i}(self)\n", "\n"]
+        lines += [f"def helper_{i}(x):\n", "    print(x)\n", "    return x\n", "\n"]
+    return lines
+
+
+_EDITS = {
+    "modify_body": lambda lines: lines[:5] + ["    log(x, 1)\n"] + lines[6:],
+    "insert_function": lambda lines: lines[:8] + ["def added(y):\n", "    return y.strip()\n", "\n"] + lines[8:],
+    "delete_block": lambda lines: lines[:4] + lines[12:],
+    "rename_class": lambda lines: [lines[0].replace("Widget0", "Gadget0")] + lines[1:],
+    "several_hunks": lambda lines: ["import os\n"] + lines[:20] + lines[22:40] + ["    os.sync()\n"] + lines[40:],
+    "unbalanced_paren": lambda lines: lines[:9] + ["    x = (1,\n"] + lines[9:],
+    "drop_trailing_newline": lambda lines: lines[:-2] + [lines[-2].rstrip("\n")],
+}
+
+
+class TestIncrementalReparse(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = TemporaryDirectory(prefix="codeknowl-test-incremental-")
+        self.addCleanup(self._tmp.cleanup)
+        self.repo = Path(self._tmp.name)
+        _git(self.repo, "init", "-q", "-b", "main")
+
+    def _assert_matches_full(self, before: str, after: str, tree_cache: TreeCache) -> None:
+        old_commit = _commit(self.repo, "big.py", before)
+        old_symbols, old_calls = extract_file_symbols_and_calls("big.py", before.encode("utf-8"), "python")
+        new_commit = _commit(self.repo, "big.py", after)
+
+        result = extract_modified_incrementally(
+            self.repo,
+            old_commit=old_commit,
+            new_commit=new_commit,
+            modified_paths={"big.py"},
+            old_symbols=dump_dataclasses(old_symbols),
+            old_calls=dump_dataclasses(old_calls),
+            config=_CONFIG,
+            tree_cache=tree_cache,
+        )
+        full_symbols, full_calls = extract_file_symbols_and_calls("big.py", after.encode("utf-8"), "python")
+
+        self.assertEqual(result.handled_paths, {"big.py"})
+        self.assertEqual(dump_dataclasses(result.symbols), dump_dataclasses(full_symbols))
+        self.assertEqual(dump_dataclasses(result.calls), dump_dataclasses(full_calls))
+
+    def test_incremental_matches_full_extraction(self) -> None:
+        base = _python_source(12)
+        for name, edit in _EDITS.items():
+            with self.subTest(edit=name):
+                self._assert_matches_full("".join(base), "".join(edit(list(base))), TreeCache(0))
+
+    def test_tree_cache_carries_trees_across_updates(self) -> None:
+        cache = TreeCache(4)
+        base = _python_source(6)
+        first = _EDITS["insert_function"](list(base))
+        self._assert_matches_full("".join(base), "".join(first), cache)
+        self.assertEqual(len(cache._trees), 1)
+        self._assert_matches_full("".join(first), "".join(_EDITS["modify_body"](list(first))), cache)
+        self.assertEqual(len(cache._trees), 1)
+
+    def test_small_files_are_left_to_full_extraction(self) -> None:
+        old_commit = _commit(self.repo, "small.py", "def a():\n    b()\n")
+        new_commit = _commit(self.repo, "small.py", "def a():\n    c()\n")
+        result = extract_modified_incrementally(
+            self.repo,
+            old_commit=old_commit,
+            new_commit=new_commit,
+            modified_paths={"small.py"},
+            old_symbols=[],
+            old_calls=[],
+            config=IncrementalParseConfig(enabled=True, min_file_bytes=1024, tree_cache_entries=0),
+        )
+        self.assertEqual(result.handled_paths, set())
+
+    def test_diff_hunks_report_zero_context_ranges(self) -> None:
+        old_commit = _commit(self.repo, "f.txt", "a\nb\nc\nd\n")
+        new_commit = _commit(self.repo, "f.txt", "a\nB\nc\nd\ne\n")
+        hunks = diff_hunks(self.repo, old_commit, new_commit, ["f.txt"])["f.txt"]
+        self.assertEqual(
+            [(h.old_start, h.old_count, h.new_start, h.new_count) for h in hunks], [(2, 1, 2, 1), (4, 0, 5, 1)]
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
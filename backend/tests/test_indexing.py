@@ -0,0 +1,407 @@
+"""File: backend/tests/test_indexing.py
+Purpose: Verify Tree-sitter symbol/call extraction and the parallel extraction engine.
+Product/business importance: Snapshot artifacts must be deterministic regardless of how extraction is scheduled.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+import sys
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+_ROOT = Path(__file__).resolve().parents[1]
+_SRC = _ROOT / "src"
+sys.path.insert(0, str(_SRC))
+
+from codeknowl.artifacts import dump_dataclasses  # noqa: E402
+from codeknowl.chunking import (  # noqa: E402
+    ChunkingConfig,
+    chunk_file_text,
+    chunk_repo_files,
+    dump_chunks,
+    estimate_tokens,
+    symbol_aligned_spans,
+)
+from codeknowl.extraction_cache import ExtractionCache  # noqa: E402
+from codeknowl.extraction_pool import ExtractionPoolConfig, shard_items  # noqa: E402
+from codeknowl.indexing import (  # noqa: E402
+    build_file_inventory,
+    extract_file_symbols_and_calls,
+    extract_symbols_and_calls,
+    extract_symbols_and_calls_for_paths,
+)
+from codeknowl.pipeline import build_snapshot_single_pass  # noqa: E402
+from codeknowl.scope_index import ScopeIndex  # noqa: E402
+from codeknowl.symbol_resolver import SymbolResolver  # noqa: E402
+
+
+def _write_sample_repo(root: Path, file_count: int) -> None:
+    for i in range(file_count):
+        pkg = root / f"pkg{i % 3}"
+        pkg.mkdir(parents=True, exist_ok=True)
+        (pkg / f"mod_{i}.py").write_text(
+            f"class Widget{i}:\n    def run(self):\n        return helper_{i}(self)\n\n\ndef helper_{i}(x):\n"
+            f"    print(x)\n    return x\n",
+            encoding="utf-8",
+        )
+        (pkg / f"view_{i}.js").write_text(
+            f"function render{i}(el) {{\n  return el.appendChild(make{i}());\n}}\n", encoding="utf-8"
+        )
+    ignored = root / "node_modules" / "dep"
+    ignored.mkdir(parents=True, exist_ok=True)
+    (ignored / "index.js").write_text("function ignored() { skip(); }\n", encoding="utf-8")
+
+
+def _serial() -> ExtractionPoolConfig:
+    return ExtractionPoolConfig(workers=1, min_files_for_parallel=1, shards_per_worker=1, start_method="spawn")
+
+
+def _parallel() -> ExtractionPoolConfig:
+    return ExtractionPoolConfig(workers=2, min_files_for_parallel=1, shards_per_worker=3, start_method="spawn")
+
+
+class TestExtraction(unittest.TestCase):
+    def test_parallel_extraction_matches_serial_output(self) -> None:
+        with TemporaryDirectory(prefix="codeknowl-test-indexing-") as td:
+            repo = Path(td)
+            _write_sample_repo(repo, 7)
+
+            serial_symbols, serial_calls = extract_symbols_and_calls(repo, pool_config=_serial())
+            parallel_symbols, parallel_calls = extract_symbols_and_calls(repo, pool_config=_parallel())
+
+        self.assertEqual(dump_dataclasses(serial_symbols), dump_dataclasses(parallel_symbols))
+        self.assertEqual(dump_dataclasses(serial_calls), dump_dataclasses(parallel_calls))
+        self.assertEqual(len(serial_symbols), 7 * 4)
+        self.assertFalse(any(s.file_path.startswith("node_modules") for s in serial_symbols))
+
+        paths = [s.file_path for s in serial_symbols]
+        self.assertEqual(paths, sorted(paths))
+
+    def test_extraction_for_paths_skips_unknown_and_missing(self) -> None:
+        with TemporaryDirectory(prefix="codeknowl-test-indexing-") as td:
+            repo = Path(td)
+            _write_sample_repo(repo, 2)
+            (repo / "README.md").write_text("# readme\n", encoding="utf-8")
+
+            symbols, calls = extract_symbols_and_calls_for_paths(
+                repo, {"pkg0/mod_0.py", "README.md", "gone.py"}, pool_config=_parallel()
+            )
+
+        self.assertEqual({s.name for s in symbols}, {"Widget0", "run", "helper_0"})
+        self.assertEqual({c.callee_name for c in calls}, {"helper_0", "print"})
+
+    def test_shards_are_contiguous_and_cover_all_items(self) -> None:
+        items = list(range(10))
+        shards = shard_items(items, 4)
+        self.assertEqual(len(shards), 4)
+        self.assertEqual([x for shard in shards for x in shard], items)
+        self.assertEqual(shard_items([], 3), [])
+        self.assertEqual(len(shard_items([1, 2], 8)), 2)
+
+
+_ENGINE_SAMPLES: dict[str, tuple[str, bytes]] = {
+    "python": (
+        "a.py",
+        b"import os\n\nclass Outer:\n    class Inner:\n        def m(self):\n            return f(g(1))(2)\n\n"
+        b"    async def run(self):\n        await self.m()\n\n@decorator(x)\ndef top():\n    os.path.join('a')\n",
+    ),
+    "javascript": (
+        "a.js",
+        b"function outer() {\n  function inner() { return a.b(c()); }\n  return inner()();\n}\n"
+        b"class View { render() { return h('div'); } }\nconst f = () => g();\n",
+    ),
+    "typescript": (
+        "a.ts",
+        b"export function typed(x: number): string { return String(x); }\n"
+        b"class Box<T> { get(): T { return this.load<T>(); } }\nnew Box<number>().get();\n",
+    ),
+    "java": (
+        "A.java",
+        b"class A {\n  class B { void inner() { foo(bar()); } }\n  int m(int x) { return this.helper(x).size(); }\n}\n",
+    ),
+}
+
+
+class TestQueryEngine(unittest.TestCase):
+    def test_query_engine_matches_walker(self) -> None:
+        for lang, (rel, code) in _ENGINE_SAMPLES.items():
+            with self.subTest(lang=lang):
+                walker_symbols, walker_calls = extract_file_symbols_and_calls(rel, code, lang, engine="walker")
+                query_symbols, query_calls = extract_file_symbols_and_calls(rel, code, lang, engine="query")
+                self.assertTrue(walker_symbols)
+                self.assertTrue(walker_calls)
+                self.assertEqual(dump_dataclasses(query_symbols), dump_dataclasses(walker_symbols))
+                self.assertEqual(dump_dataclasses(query_calls), dump_dataclasses(walker_calls))
+
+
+_NESTED_PYTHON = (
+    "setup()\n"
+    "class Outer:\n"
+    "    marker = tag()\n"
+    "    def method(self):\n"
+    "        def inner():\n"
+    "            return leaf()\n"
+    "        return inner()\n"
+    "\n"
+    "def one(): a()\n"
+    "b()\n"
+)
+
+
+class TestCallerAttribution(unittest.TestCase):
+    def test_calls_are_attributed_to_innermost_definition(self) -> None:
+        for engine in ("query", "walker"):
+            with self.subTest(engine=engine):
+                symbols, calls = extract_file_symbols_and_calls(
+                    "m.py", _NESTED_PYTHON.encode("utf-8"), "python", engine=engine
+                )
+                names = {s.symbol_id: s.name for s in symbols}
+                callers = {c.callee_name: names.get(c.caller_symbol_id) for c in calls}
+                self.assertEqual(
+                    callers,
+                    {"setup": None, "tag": "Outer", "leaf": "inner", "inner": "method", "a": "one", "b": None},
+                )
+
+    def test_scope_index_matches_extraction_and_round_trips(self) -> None:
+        symbols, calls = extract_file_symbols_and_calls("m.py", _NESTED_PYTHON.encode("utf-8"), "python")
+        index = ScopeIndex.from_json(ScopeIndex.from_symbols(dump_dataclasses(symbols)).to_json())
+        for call in dump_dataclasses(calls):
+            self.assertEqual(index.attribute_call({**call, "caller_symbol_id": ""}), call)
+
+        names = {s.symbol_id: s.name for s in symbols}
+        by_line = [names.get(index.symbol_at_line("m.py", line)) for line in range(1, 12)]
+        self.assertEqual(
+            by_line, [None, "Outer", "Outer", "method", "inner", "inner", "method", None, "one", None, None]
+        )
+        self.assertIsNone(index.symbol_at_line("other.py", 3))
+
+    def test_resolver_finds_enclosing_function_by_line(self) -> None:
+        resolver = SymbolResolver()
+        resolver.add_function("f:outer", "outer", "f", 1, 20)
+        resolver.add_function("f:inner", "inner", "f", 5, 8)
+        resolver.add_function("f:next", "after", "f", 22, 30)
+        self.assertEqual(
+            [resolver.function_at_line("f", line) for line in (1, 6, 9, 21, 25, 31)],
+            ["f:outer", "f:inner", "f:outer", None, "f:next", None],
+        )
+
+
+class TestSinglePassPipeline(unittest.TestCase):
+    def test_single_pass_matches_separate_stages(self) -> None:
+        with TemporaryDirectory(prefix="codeknowl-test-pipeline-") as td:
+            repo = Path(td)
+            _write_sample_repo(repo, 5)
+            (repo / "notes.txt").write_text("line one\r\nline two\n", encoding="utf-8")
+
+            build = build_snapshot_single_pass(repo, repo_id="r1", head_commit="c1", pool_config=_parallel())
+
+            files = build_file_inventory(repo)
+            symbols, calls = extract_symbols_and_calls(repo, pool_config=_serial())
+            chunks = chunk_repo_files(
+                repo_id="r1", head_commit="c1", repo_path=repo, file_paths=[f.path for f in files]
+            )
+
+        self.assertEqual(dump_dataclasses(build.files), dump_dataclasses(files))
+        self.assertEqual(dump_dataclasses(build.symbols), dump_dataclasses(symbols))
+        self.assertEqual(dump_dataclasses(build.calls), dump_dataclasses(calls))
+        self.assertEqual(dump_chunks(build.chunks), dump_chunks(chunks))
+
+        report = build.stats.as_dict()
+        self.assertEqual(report["walk"]["items"], len(files))
+        self.assertEqual(report["read"]["items"], len(files))
+        self.assertEqual(report["extract"]["items"], 10)
+        self.assertGreater(report["read"]["bytes"], 0)
+
+
+class TestExtractionCache(unittest.TestCase):
+    def test_second_build_is_served_from_cache_with_identical_output(self) -> None:
+        with TemporaryDirectory(prefix="codeknowl-test-cache-") as td:
+            repo = Path(td) / "repo"
+            _write_sample_repo(repo, 3)
+            cache = ExtractionCache(Path(td) / "cache.sqlite")
+
+            first = build_snapshot_single_pass(repo, repo_id="r1", head_commit="c1", pool_config=_serial(), cache=cache)
+            second = build_snapshot_single_pass(
+                repo, repo_id="r1", head_commit="c2", pool_config=_parallel(), cache=cache
+            )
+
+        self.assertEqual(dump_dataclasses(first.symbols), dump_dataclasses(second.symbols))
+        self.assertEqual(dump_dataclasses(first.calls), dump_dataclasses(second.calls))
+        self.assertEqual(dump_chunks(first.chunks), dump_chunks(second.chunks))
+        self.assertEqual(first.stats.cache["extract"], {"hits": 0, "misses": 6})
+        self.assertEqual(second.stats.cache["extract"], {"hits": 6, "misses": 0})
+        self.assertEqual(second.stats.cache["chunk"]["misses"], 0)
+
+    def test_cached_blob_is_rebound_to_its_new_path(self) -> None:
+        with TemporaryDirectory(prefix="codeknowl-test-cache-") as td:
+            repo = Path(td) / "repo"
+            _write_sample_repo(repo, 1)
+            cache = ExtractionCache(Path(td) / "cache.sqlite")
+            extract_symbols_and_calls(repo, pool_config=_serial(), cache=cache)
+
+            (repo / "pkg0" / "mod_0.py").rename(repo / "moved.py")
+            cached_symbols, cached_calls = extract_symbols_and_calls_for_paths(
+                repo, {"moved.py"}, pool_config=_serial(), cache=cache
+            )
+            fresh_symbols, fresh_calls = extract_symbols_and_calls_for_paths(repo, {"moved.py"}, pool_config=_serial())
+            chunks = chunk_repo_files(
+                repo_id="r1", head_commit="c1", repo_path=repo, file_paths=["moved.py"], cache=cache
+            )
+            cached_chunks = chunk_repo_files(
+                repo_id="r1", head_commit="c1", repo_path=repo, file_paths=["moved.py"], cache=cache
+            )
+
+        self.assertEqual(dump_dataclasses(cached_symbols), dump_dataclasses(fresh_symbols))
+        self.assertEqual(dump_dataclasses(cached_calls), dump_dataclasses(fresh_calls))
+        self.assertEqual({s.file_path for s in cached_symbols}, {"moved.py"})
+        self.assertEqual(dump_chunks(chunks), dump_chunks(cached_chunks))
+
+
+def _numbered_source(count: int) -> list[str]:
+    return [f"def step_{i}(x):\n    return x * {i} + offset({i % 7})\n" for i in range(count)]
+
+
+class TestContentDefinedChunking(unittest.TestCase):
+    def test_insert_near_top_keeps_later_chunk_ids(self) -> None:
+        before = "".join(_numbered_source(400))
+        after = "# inserted\n" + before
+        content = ChunkingConfig(mode="content")
+
+        def chunks(text: str, config: ChunkingConfig | None) -> set[tuple[str, str]]:
+            records = chunk_file_text(repo_id="r", head_commit="c", file_path="a.py", text=text, config=config)
+            return {(c.chunk_id, c.text) for c in records}
+
+        old_chunks, new_chunks = chunks(before, content), chunks(after, content)
+        self.assertGreater(len(old_chunks), 4)
+        self.assertLessEqual(len(old_chunks - new_chunks), 2)
+        # Fixed windows shift with the inserted line, so every chunk's text (and embedding) changes.
+        self.assertEqual(chunks(before, None) & chunks(after, None), set())
+
+    def test_chunks_respect_bounds_and_cover_file(self) -> None:
+        config = ChunkingConfig(mode="content", min_lines=10, target_lines=30, max_lines=50)
+        text = "".join(_numbered_source(300))
+        chunks = chunk_file_text(repo_id="r", head_commit="c", file_path="a.py", text=text, config=config)
+
+        self.assertEqual(chunks[0].start_line, 1)
+        self.assertEqual(chunks[-1].end_line, 600)
+        for prev, nxt in zip(chunks, chunks[1:], strict=False):
+            self.assertEqual(nxt.start_line, prev.end_line + 1)
+        self.assertTrue(all(c.end_line - c.start_line + 1 <= 50 for c in chunks))
+        self.assertTrue(all(c.end_line - c.start_line + 1 >= 10 for c in chunks[:-1]))
+
+    def test_cache_keeps_modes_apart(self) -> None:
+        with TemporaryDirectory(prefix="codeknowl-test-cache-") as td:
+            repo = Path(td) / "repo"
+            repo.mkdir()
+            (repo / "a.py").write_text("".join(_numbered_source(200)), encoding="utf-8")
+            cache = ExtractionCache(Path(td) / "cache.sqlite")
+            content = ChunkingConfig(mode="content")
+
+            def chunk(config: ChunkingConfig | None, with_cache: ExtractionCache | None = cache) -> list[dict]:
+                return dump_chunks(
+                    chunk_repo_files(
+                        repo_id="r",
+                        head_commit="c",
+                        repo_path=repo,
+                        file_paths=["a.py"],
+                        cache=with_cache,
+                        config=config,
+                    )
+                )
+
+            fixed_first, content_first = chunk(None), chunk(content)
+            self.assertEqual(chunk(content), content_first)
+            self.assertEqual(chunk(content, None), content_first)
+            self.assertEqual(chunk(None), fixed_first)
+            self.assertNotEqual(fixed_first, content_first)
+
+
+class TestSymbolAlignedChunking(unittest.TestCase):
+    def test_definitions_are_packed_or_split_within_budget(self) -> None:
+        lines = ["import os", ""]
+        ranges: list[tuple[int, int]] = []
+        for i in range(6):
+            ranges.append((len(lines) + 1, len(lines) + 3))
+            lines += [f"def small_{i}(x):", f"    y = x + {i}", "    return y", ""]
+        class_start = len(lines) + 1
+        lines.append("class Big:")
+        for i in range(4):
+            ranges.append((len(lines) + 1, len(lines) + 12))
+            lines += [f"    def method_{i}(self):"] + [f"        self.value_{j} = compute({j}, {i})" for j in range(11)]
+        ranges.append((class_start, len(lines)))
+
+        spans = symbol_aligned_spans(lines, ranges, max_tokens=150)
+
+        self.assertEqual(spans[0][0], 1)
+        self.assertEqual(spans[-1][1], len(lines))
+        for (_, end, _), (start, _, _) in zip(spans, spans[1:], strict=False):
+            self.assertTrue(all(not line.strip() for line in lines[end : start - 1]))
+        for _, _, text in spans:
+            self.assertLessEqual(estimate_tokens(text), 150)
+        boundaries = {end for _, end, _ in spans}
+        # No chunk ends inside a definition; the oversized class is split between its methods.
+        for s, e in ranges:
+            if (s, e) != ranges[-1]:
+                self.assertFalse(any(s <= b < e for b in boundaries), (s, e))
+        self.assertLess(len(spans), len(ranges))
+
+    def test_single_pass_aligns_chunks_to_extracted_symbols(self) -> None:
+        config = ChunkingConfig(mode="symbol", max_tokens=24)
+        with TemporaryDirectory(prefix="codeknowl-test-symbol-chunks-") as td:
+            repo = Path(td)
+            _write_sample_repo(repo, 1)
+            build = build_snapshot_single_pass(
+                repo, repo_id="r1", head_commit="c1", pool_config=_serial(), chunking=config
+            )
+
+        chunks = [c for c in build.chunks if c.file_path.endswith(".py")]
+        symbols = {(s.range.start_line, s.range.end_line) for s in build.symbols if s.file_path.endswith(".py")}
+        self.assertEqual([(c.start_line, c.end_line) for c in chunks], [(1, 3), (6, 8)])
+        self.assertTrue({(1, 3), (6, 8)} <= symbols)
+
+    def test_cache_keeps_symbol_chunks_of_one_blob_apart_by_path(self) -> None:
+        # The same blob chunks along its definitions as a.py and content-defined as a.txt (not extractable).
+        config = ChunkingConfig(mode="symbol")
+        with TemporaryDirectory(prefix="codeknowl-test-symbol-chunks-") as td:
+            repo = Path(td) / "repo"
+            repo.mkdir()
+            text = "".join(_numbered_source(200))
+            (repo / "a.py").write_text(text, encoding="utf-8")
+            (repo / "a.txt").write_text(text, encoding="utf-8")
+            cache = ExtractionCache(Path(td) / "cache.sqlite")
+
+            def spans(with_cache: ExtractionCache | None) -> dict[str, list[tuple[int, int]]]:
+                build = build_snapshot_single_pass(
+                    repo, repo_id="r1", head_commit="c1", pool_config=_serial(), cache=with_cache, chunking=config
+                )
+                return {
+                    path: [(c.start_line, c.end_line) for c in build.chunks if c.file_path == path]
+                    for path in ("a.py", "a.txt")
+                }
+
+            def chunk_without_ranges(with_cache: ExtractionCache | None) -> list[dict]:
+                return dump_chunks(
+                    chunk_repo_files(
+                        repo_id="r",
+                        head_commit="c",
+                        repo_path=repo,
+                        file_paths=["a.py"],
+                        cache=with_cache,
+                        config=config,
+                    )
+                )
+
+            fresh = spans(None)
+            self.assertNotEqual(fresh["a.py"], fresh["a.txt"])
+            self.assertEqual(spans(cache), fresh)
+            self.assertEqual(spans(cache), fresh)
+            self.assertEqual(chunk_without_ranges(cache), chunk_without_ranges(None))
+            self.assertEqual(spans(cache), fresh)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,278 @@
+"""File: backend/tests/test_qa_ask_async.py
+Purpose: Verify the async ask path overlaps concurrent requests instead of serialising them on the event loop, and
+that streamed answers arrive incrementally and stop when the client goes away.
+Product/business importance: One slow LLM call must not stall every other API request, and abandoned answers must
+not keep the LLM busy.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import AsyncMock, patch
+
+import httpx
+from blacksheep.testing import JSONContent, TestClient
+
+_ROOT = Path(__file__).resolve().parents[1]
+_SRC = _ROOT / "src"
+sys.path.insert(0, str(_SRC))
+
+from codeknowl.app import _ClientDisconnected, _until_disconnected, create_app  # noqa: E402
+from codeknowl.config import AppConfig  # noqa: E402
+from codeknowl.http_pool import HttpPool  # noqa: E402
+from codeknowl.llm import parse_stream_line  # noqa: E402
+from codeknowl.service import CodeKnowlService  # noqa: E402
+from codeknowl.snapshot_cache import SNAPSHOT_CACHE  # noqa: E402
+
+_LLM_DELAY_SECONDS = 0.2
+_CONCURRENT_ASKS = 4
+
+_ENV = {
+    "CODEKNOWL_EMBED_MODE": "hash",
+    "CODEKNOWL_VECTOR_MODE": "file",
+    "CODEKNOWL_INDEX_WORKERS": "1",
+    "CODEKNOWL_LLM_BASE_URL": "http://llm.test",
+    "CODEKNOWL_LLM_MODEL": "m",
+}
+
+
+def _git(repo: Path, *args: str) -> None:
+    env = {
+        **os.environ,
+        "GIT_AUTHOR_NAME": "t",
+        "GIT_AUTHOR_EMAIL": "t@example.invalid",
+        "GIT_COMMITTER_NAME": "t",
+        "GIT_COMMITTER_EMAIL": "t@example.invalid",
+    }
+    subprocess.run(["git", "-C", str(repo), *args], capture_output=True, check=True, env=env)
+
+
+class _TokenStream(httpx.AsyncByteStream):
+    """OpenAI-style SSE body that emits `tokens` (forever when `endless`) and records whether it was closed."""
+
+    def __init__(self, tokens: list[str], *, endless: bool) -> None:
+        self.tokens = tokens
+        self.endless = endless
+        self.closed = False
+
+    async def __aiter__(self):
+        yield b'data: {"choices":[{"delta":{"role":"assistant"}}]}\n\n'
+        while True:
+            for token in self.tokens:
+                yield f"data: {json.dumps({'choices': [{'delta': {'content': token}}]})}\n\n".encode()
+                await asyncio.sleep(0.01)
+            if not self.endless:
+                break
+        yield b"data: [DONE]\n\n"
+
+    async def aclose(self) -> None:
+        self.closed = True
+
+
+class _SlowLlm:
+    def __init__(self) -> None:
+        self.endless = False
+        self.streams: list[_TokenStream] = []
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        await asyncio.sleep(_LLM_DELAY_SECONDS)
+        payload = json.loads(request.content)
+        if payload.get("stream"):
+            stream = _TokenStream(["fin", "al"], endless=self.endless)
+            self.streams.append(stream)
+            return httpx.Response(200, headers={"Content-Type": "text/event-stream"}, stream=stream)
+        answer = "final" if "Candidate answer" in payload["messages"][1]["content"] else "candidate"
+        return httpx.Response(200, json={"choices": [{"message": {"content": answer}}]})
+
+
+def _sse_events(body: str) -> list[tuple[str, object]]:
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+        events.append((fields.get("event", "message"), json.loads(fields["data"]) if "data" in fields else None))
+    return events
+
+
+class _DisconnectingRequest:
+    def __init__(self) -> None:
+        self.disconnected = False
+
+    async def is_disconnected(self) -> bool:
+        return self.disconnected
+
+
+class TestAsyncAsk(unittest.TestCase):
+    def setUp(self) -> None:
+        tmp = TemporaryDirectory(prefix="codeknowl-test-ask-")
+        self.addCleanup(tmp.cleanup)
+        repo = Path(tmp.name) / "repo"
+        repo.mkdir()
+        _git(repo, "init", "-q", "-b", "main")
+        (repo / "app.py").write_text("def greet(name):\n    return name.title()\n", encoding="utf-8")
+        _git(repo, "add", "-A")
+        _git(repo, "commit", "-q", "-m", "initial")
+
+        env_patch = patch.dict(os.environ, _ENV, clear=False)
+        env_patch.start()
+        self.addCleanup(env_patch.stop)
+        self.llm = _SlowLlm()
+        pool = HttpPool(async_transport=httpx.MockTransport(self.llm))
+        self.addCleanup(pool.close)
+        pool_patch = patch("codeknowl.llm.http_pool", return_value=pool)
+        pool_patch.start()
+        self.addCleanup(pool_patch.stop)
+
+        with patch("codeknowl.service.create_graph_store", side_effect=RuntimeError("no graph in tests")):
+            self.data_dir = Path(tmp.name) / "data"
+            self.service = CodeKnowlService(data_dir=self.data_dir)
+        self.repo_id = self.service.register_repo_local_path(
+            repo, accepted_branch="main", preferred_remote=None
+        ).repo_id
+        run = self.service.start_index_run(self.repo_id)
+        self.assertEqual(self.service.run_indexing_sync(run.run_id).status, "succeeded")
+
+    def test_concurrent_asks_overlap_and_loop_stays_responsive(self) -> None:
+        async def run() -> tuple[list[dict], float, float]:
+            ticks: list[float] = []
+
+            async def ticker() -> None:
+                while True:
+                    ticks.append(time.perf_counter())
+                    await asyncio.sleep(0.01)
+
+            tick_task = asyncio.create_task(ticker())
+            started = time.perf_counter()
+            answers = await asyncio.gather(
+                *(self.service.aqa_ask_llm(self.repo_id, "What does greet do?") for _ in range(_CONCURRENT_ASKS))
+            )
+            elapsed = time.perf_counter() - started
+            tick_task.cancel()
+            max_gap = max(b - a for a, b in zip(ticks, ticks[1:], strict=False))
+            return answers, elapsed, max_gap
+
+        answers, elapsed, max_gap = asyncio.run(run())
+
+        self.assertEqual([a["answer"] for a in answers], ["final"] * _CONCURRENT_ASKS)
+        self.assertEqual(answers[0]["query"]["mode"], "synthesis")
+        metadata = answers[0]["metadata"]
+        self.assertEqual(metadata["candidates"], {"coding": "ok", "general": "ok"})
+        self.assertLessEqual({"load", "retrieve", "candidates", "synth", "total"}, set(metadata["stage_seconds"]))
+        self.assertTrue(any(c["file_path"] == "app.py" for c in answers[0]["citations"]))
+        # Serialised, each ask costs three LLM calls; overlapping asks finish in roughly one ask's time (two rounds).
+        serial_seconds = _CONCURRENT_ASKS * 3 * _LLM_DELAY_SECONDS
+        self.assertLess(elapsed, serial_seconds / 2)
+        # The loop kept running other work while LLM calls were in flight.
+        self.assertLess(max_gap, _LLM_DELAY_SECONDS)
+
+    def test_ask_with_cold_snapshot_cache(self) -> None:
+        # The API process rarely indexes itself, so the head commit is usually resolved from SQLite on the loop thread.
+        SNAPSHOT_CACHE.clear()
+        answer = asyncio.run(self.service.aqa_ask_llm(self.repo_id, "What does greet do?"))
+        self.assertEqual(answer["answer"], "final")
+        self.assertEqual(
+            answer["head_commit"], self.service.get_latest_successful_index_run_for_repo(self.repo_id).head_commit
+        )
+
+    def test_stream_sends_evidence_then_candidates_then_tokens(self) -> None:
+        async def run() -> list[tuple[str, dict]]:
+            return [event async for event in self.service.astream_qa_ask_llm(self.repo_id, "What does greet do?")]
+
+        events = asyncio.run(run())
+
+        names = [name for name, _ in events]
+        self.assertEqual(names[:2], ["evidence", "candidates"])
+        self.assertEqual(names[-1], "done")
+        self.assertEqual(set(names[2:-1]), {"token"})
+        self.assertEqual("".join(data["text"] for name, data in events if name == "token"), "final")
+        evidence = events[0][1]
+        self.assertEqual(evidence["query"]["mode"], "synthesis")
+        self.assertTrue(any(c["file_path"] == "app.py" for c in evidence["citations"]))
+        self.assertEqual(events[1][1], {"coding": "ok", "general": "ok"})
+        done = events[-1][1]
+        self.assertEqual(done["candidates"], {"coding": "ok", "general": "ok"})
+        self.assertLessEqual(
+            {"retrieve", "candidates", "synth_first_token", "synth", "total"}, set(done["stage_seconds"])
+        )
+
+    def test_client_disconnect_cancels_generation(self) -> None:
+        self.llm.endless = True
+        request = _DisconnectingRequest()
+
+        async def run() -> list[str]:
+            seen: list[str] = []
+            stream = self.service.astream_qa_ask_llm(self.repo_id, "What does greet do?")
+            with self.assertRaises(_ClientDisconnected):
+                async for name, _ in _until_disconnected(request, stream, poll_seconds=0.02):
+                    seen.append(name)
+                    if name == "token":
+                        request.disconnected = True
+            return seen
+
+        seen = asyncio.run(asyncio.wait_for(run(), timeout=5))
+
+        self.assertEqual(seen[:2], ["evidence", "candidates"])
+        self.assertNotIn("done", seen)
+        self.assertEqual(len(self.llm.streams), 1)
+        self.assertTrue(self.llm.streams[0].closed)
+
+    async def _post_stream(self, path: str, body: dict) -> tuple[int, str]:
+        # The app's service opens its own SQLite connection on the loop thread, like the API server does.
+        with (
+            patch("codeknowl.async_service.create_queue", new=AsyncMock()),
+            patch("codeknowl.service.create_graph_store", side_effect=RuntimeError("no graph in tests")),
+        ):
+            app = await create_app(AppConfig(data_dir=self.data_dir))
+        await app.start()
+        try:
+            response = await TestClient(app).post(path, content=JSONContent(body))
+            return response.status, (await response.read() or b"").decode("utf-8")
+        finally:
+            await app.stop()
+
+    def test_stream_route_with_cold_snapshot_cache(self) -> None:
+        SNAPSHOT_CACHE.clear()
+        status, body = asyncio.run(
+            self._post_stream(f"/repos/{self.repo_id}/qa/ask/stream", {"question": "What does greet do?"})
+        )
+
+        self.assertEqual(status, 200)
+        events = _sse_events(body)
+        names = [name for name, _ in events]
+        self.assertEqual(names[:2], ["evidence", "candidates"])
+        self.assertEqual(names[-1], "done")
+        self.assertEqual(set(names[2:-1]), {"token"})
+        self.assertEqual("".join(data["text"] for name, data in events if name == "token"), "final")
+        self.assertTrue(any(c["file_path"] == "app.py" for c in events[0][1]["citations"]))
+
+    def test_stream_route_rejects_unknown_repo_and_missing_question(self) -> None:
+        SNAPSHOT_CACHE.clear()
+        status, body = asyncio.run(self._post_stream("/repos/nope/qa/ask/stream", {"question": "Anything?"}))
+        self.assertEqual((status, json.loads(body)), (404, {"error": "repo not found"}))
+
+        status, body = asyncio.run(self._post_stream(f"/repos/{self.repo_id}/qa/ask/stream", {}))
+        self.assertEqual((status, json.loads(body)), (400, {"error": "question is required"}))
+
+
+class TestParseStreamLine(unittest.TestCase):
+    def test_extracts_delta_content_and_detects_done(self) -> None:
+        self.assertEqual(parse_stream_line('data: {"choices":[{"delta":{"content":"Hi"}}]}'), "Hi")
+        self.assertIsNone(parse_stream_line("data: [DONE]"))
+
+    def test_ignores_lines_without_content(self) -> None:
+        for line in ("", ": keep-alive", 'data: {"choices":[{"delta":{"role":"assistant"}}]}', "event: ping"):
+            self.assertEqual(parse_stream_line(line), "")
+
+
+if __name__ == "__main__":
+    unittest.main()
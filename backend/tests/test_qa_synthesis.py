@@ -1,5 +1,7 @@
+import asyncio
 import os
 import sys
+import time
 import unittest
 from pathlib import Path
 from unittest.mock import patch
@@ -8,7 +10,7 @@ _ROOT = Path(__file__).resolve().parents[1]
 _SRC = _ROOT / "src"
 sys.path.insert(0, str(_SRC))
 
-from codeknowl.ask import answer_with_llm_synthesis  # noqa: E402
+from codeknowl.ask import aanswer_with_llm_synthesis, answer_with_llm_synthesis  # noqa: E402
 
 
 class _StubLlm:
@@ -22,6 +24,34 @@ class _StubLlm:
         return self._reply
 
 
+class _SlowLlm:
+    """Answers after `delay` seconds, or raises `error`."""
+
+    def __init__(self, reply: str, *, delay: float = 0.0, error: bool = False):
+        self._reply = reply
+        self._delay = delay
+        self._error = error
+        self.users: list[str] = []
+
+    def chat(self, *, system: str, user: str) -> str:
+        self.users.append(user)
+        time.sleep(self._delay)
+        if self._error:
+            raise RuntimeError("model unavailable")
+        return self._reply
+
+    async def achat(self, *, system: str, user: str) -> str:
+        self.users.append(user)
+        await asyncio.sleep(self._delay)
+        if self._error:
+            raise RuntimeError("model unavailable")
+        return self._reply
+
+
+_NO_ARTIFACTS = {"files": [], "symbols": [], "calls": []}
+_GENERAL_DEADLINE = {"CODEKNOWL_ASK_GENERAL_CANDIDATE_DEADLINE_SECONDS": "0.05"}
+
+
 class TestQaSynthesis(unittest.TestCase):
     def test_synthesis_calls_responders_and_synth(self) -> None:
         coding = _StubLlm("coding", "CODING_ANSWER")
@@ -96,6 +126,81 @@ class TestQaSynthesis(unittest.TestCase):
         evidence_json = responder_user.split("Evidence bundle (JSON):\n", 1)[1].split("\n\nReturn", 1)[0]
         self.assertLessEqual(len(evidence_json), 200)
 
+    def test_candidates_run_concurrently_and_report_stage_timings(self) -> None:
+        coding = _SlowLlm("CODING_ANSWER", delay=0.2)
+        general = _SlowLlm("GENERAL_ANSWER", delay=0.2)
+        synth = _SlowLlm("FINAL_ANSWER")
+
+        started = time.perf_counter()
+        result = answer_with_llm_synthesis(
+            coding_llm=coding, general_llm=general, synth_llm=synth, artifacts=_NO_ARTIFACTS, question="q"
+        )
+
+        self.assertLess(time.perf_counter() - started, 0.35)
+        self.assertEqual(result.answer, "FINAL_ANSWER")
+        self.assertEqual(result.candidates, {"coding": "ok", "general": "ok"})
+        self.assertEqual(
+            set(result.stage_seconds), {"evidence", "candidates", "candidate_coding", "candidate_general", "synth"}
+        )
+        self.assertGreaterEqual(result.stage_seconds["candidate_coding"], 0.2)
+
+    def test_synthesis_runs_when_a_candidate_fails_or_times_out(self) -> None:
+        cases = {
+            "failed": _SlowLlm("GENERAL_ANSWER", error=True),
+            "timeout": _SlowLlm("GENERAL_ANSWER", delay=0.5),
+        }
+        for status, general in cases.items():
+            with self.subTest(status=status), patch.dict(os.environ, _GENERAL_DEADLINE):
+                synth = _SlowLlm("FINAL_ANSWER")
+                started = time.perf_counter()
+                result = answer_with_llm_synthesis(
+                    coding_llm=_SlowLlm("CODING_ANSWER"),
+                    general_llm=general,
+                    synth_llm=synth,
+                    artifacts=_NO_ARTIFACTS,
+                    question="q",
+                )
+                self.assertLess(time.perf_counter() - started, 0.4)
+                self.assertEqual(result.answer, "FINAL_ANSWER")
+                self.assertEqual(result.candidates, {"coding": "ok", "general": status})
+                self.assertIn("CODING_ANSWER", synth.users[0])
+                self.assertNotIn("GENERAL_ANSWER", synth.users[0])
+
+    def test_async_candidates_honour_profile_deadlines(self) -> None:
+        coding = _SlowLlm("CODING_ANSWER", delay=0.1)
+        general = _SlowLlm("GENERAL_ANSWER", delay=1.0)
+        synth = _SlowLlm("FINAL_ANSWER")
+
+        started = time.perf_counter()
+        with patch.dict(os.environ, _GENERAL_DEADLINE):
+            result = asyncio.run(
+                aanswer_with_llm_synthesis(
+                    coding_llm=coding, general_llm=general, synth_llm=synth, artifacts=_NO_ARTIFACTS, question="q"
+                )
+            )
+
+        self.assertLess(time.perf_counter() - started, 0.5)
+        self.assertEqual(result.candidates, {"coding": "ok", "general": "timeout"})
+        self.assertLess(result.stage_seconds["candidate_general"], 0.5)
+        self.assertIn("CODING_ANSWER", synth.users[0])
+
+    def test_slow_candidate_is_dropped_at_the_shared_deadline(self) -> None:
+        coding = _SlowLlm("CODING_ANSWER", delay=0.02)
+        general = _SlowLlm("GENERAL_ANSWER", delay=1.0)
+        synth = _SlowLlm("FINAL_ANSWER")
+        env = {"CODEKNOWL_ASK_CANDIDATE_DEADLINE_SECONDS": "0.2"}
+
+        started = time.perf_counter()
+        with patch.dict(os.environ, env):
+            result = answer_with_llm_synthesis(
+                coding_llm=coding, general_llm=general, synth_llm=synth, artifacts=_NO_ARTIFACTS, question="q"
+            )
+
+        self.assertLess(time.perf_counter() - started, 0.6)
+        self.assertEqual(result.candidates, {"coding": "ok", "general": "timeout"})
+        self.assertIn("CODING_ANSWER", synth.users[0])
+        self.assertNotIn("GENERAL_ANSWER", synth.users[0])
+
 
 if __name__ == "__main__":
     unittest.main()
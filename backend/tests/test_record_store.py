@@ -0,0 +1,94 @@
+"""File: backend/tests/test_record_store.py
+Purpose: Verify per-file records are stored once by content and that manifests share them between snapshots.
+Product/business importance: Updates must store only the records of changed files while every snapshot stays fully
+reconstructible from its manifest.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+import sys
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+_ROOT = Path(__file__).resolve().parents[1]
+_SRC = _ROOT / "src"
+sys.path.insert(0, str(_SRC))
+
+from codeknowl.record_store import (  # noqa: E402
+    FileRecordStore,
+    SnapshotManifest,
+    materialize_manifest,
+    write_snapshot_records,
+)
+
+
+def _sections(files: dict[str, str]) -> dict[str, list[dict]]:
+    r = {"start_line": 1, "start_col": 1, "end_line": 2, "end_col": 1}
+    return {
+        "files": [
+            {"path": p, "language": "python", "size_bytes": len(body), "blob_sha": None} for p, body in files.items()
+        ],
+        "symbols": [
+            {"symbol_id": f"{p}:{body}", "kind": "function", "name": body, "file_path": p, "range": r}
+            for p, body in files.items()
+        ],
+        "calls": [],
+        "chunks": [
+            {"chunk_id": p, "file_path": p, "start_line": 1, "end_line": 2, "text": body} for p, body in files.items()
+        ],
+    }
+
+
+class TestRecordStore(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = TemporaryDirectory(prefix="codeknowl-test-record-store-")
+        self.addCleanup(self._tmp.cleanup)
+        self.store = FileRecordStore(Path(self._tmp.name) / "records.sqlite")
+        self.addCleanup(self.store.close)
+
+    def test_update_stores_only_changed_records(self) -> None:
+        first = _sections({"a.py": "alpha", "b.py": "beta", "c.py": "gamma"})
+        digests, stats = write_snapshot_records(self.store, sections=first, base=None, changed_paths=None)
+        self.assertEqual((stats.written, stats.reused), (3, 0))
+        base = SnapshotManifest(repo_id="r", head_commit="c1", parent_commit=None, records=digests)
+
+        second = _sections({"a.py": "alpha", "b.py": "beta2"})
+        updated, stats = write_snapshot_records(
+            self.store, sections=second, base=base, changed_paths={"b.py"}, deleted_paths={"c.py"}
+        )
+        self.assertEqual((stats.written, stats.carried_over), (1, 1))
+        self.assertEqual(updated["a.py"], digests["a.py"])
+        self.assertNotEqual(updated["b.py"], digests["b.py"])
+        self.assertNotIn("c.py", updated)
+
+        # Reverting a file reuses the record stored for its earlier contents.
+        manifest = SnapshotManifest(repo_id="r", head_commit="c2", parent_commit="c1", records=updated)
+        reverted, stats = write_snapshot_records(
+            self.store, sections=_sections({"a.py": "alpha", "b.py": "beta"}), base=manifest, changed_paths={"b.py"}
+        )
+        self.assertEqual((stats.written, stats.reused), (0, 1))
+        self.assertEqual(reverted["b.py"], digests["b.py"])
+
+    def test_manifest_materializes_sections_in_path_order(self) -> None:
+        sections = _sections({"b.py": "beta", "a.py": "alpha"})
+        digests, _ = write_snapshot_records(self.store, sections=sections, base=None, changed_paths=None)
+        manifest = SnapshotManifest.from_json(
+            SnapshotManifest(repo_id="r", head_commit="c1", parent_commit=None, records=digests).to_json()
+        )
+
+        rebuilt = materialize_manifest(self.store, manifest)
+        self.assertEqual([f["path"] for f in rebuilt["files"]], ["a.py", "b.py"])
+        self.assertEqual([s["name"] for s in rebuilt["symbols"]], ["alpha", "beta"])
+        self.assertEqual([c["text"] for c in rebuilt["chunks"]], ["alpha", "beta"])
+
+        broken = SnapshotManifest(repo_id="r", head_commit="c2", parent_commit=None, records={"x.py": "0" * 64})
+        with self.assertRaises(ValueError):
+            materialize_manifest(self.store, broken)
+
+
+if __name__ == "__main__":
+    unittest.main()
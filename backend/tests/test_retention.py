@@ -0,0 +1,64 @@
+"""File: backend/tests/test_retention.py
+Purpose: Verify snapshot retention planning keeps the last N and pinned snapshots and drops stale run rows.
+Product/business importance: Garbage collection must never remove the snapshot queries are served from.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+import sys
+import unittest
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+_ROOT = Path(__file__).resolve().parents[1]
+_SRC = _ROOT / "src"
+sys.path.insert(0, str(_SRC))
+
+from codeknowl.retention import plan_retention  # noqa: E402
+
+
+@dataclass(frozen=True)
+class _Run:
+    run_id: str
+    status: str
+    started_at_utc: str
+    finished_at_utc: str | None
+    head_commit: str | None
+
+
+def _run(n: int, status: str, commit: str | None) -> _Run:
+    return _Run(f"r{n}", status, f"2026-01-01T00:00:{n:02d}+00:00", f"2026-01-01T00:00:{n:02d}.5+00:00", commit)
+
+
+class TestRetentionPlan(unittest.TestCase):
+    def test_keeps_last_n_and_pinned_heads(self) -> None:
+        runs = [
+            _run(1, "succeeded", "c1"),
+            _run(2, "succeeded", "c2"),
+            _run(3, "succeeded", "c2"),
+            _run(4, "failed", None),
+            _run(5, "succeeded", "c3"),
+            _run(6, "succeeded", "c4"),
+            _run(7, "running", None),
+        ]
+        plan = plan_retention(runs, pinned=["c1", "unknown"], keep_last=2)
+
+        self.assertEqual(plan.keep, ["c4", "c3", "c1"])
+        self.assertEqual(plan.collect, ["c2"])
+        # c2 was superseded when the run for c3 finished.
+        self.assertEqual(plan.superseded_at["c2"], datetime(2026, 1, 1, 0, 0, 5, 500000, timezone.utc).timestamp())
+        self.assertNotIn("c4", plan.superseded_at)
+        self.assertEqual(sorted(plan.stale_run_ids), ["r2", "r3", "r4"])
+
+    def test_latest_run_survives_even_when_failed(self) -> None:
+        plan = plan_retention([_run(1, "succeeded", "c1"), _run(2, "failed", None)], pinned=[], keep_last=1)
+        self.assertEqual(plan.keep, ["c1"])
+        self.assertEqual(plan.stale_run_ids, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,366 @@
+"""File: backend/tests/test_service_indexing.py
+Purpose: End-to-end tests for full indexing and accepted-branch updates through the service layer.
+Product/business importance: Confirms snapshot artifacts stay correct and reproducible across index and update runs.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+_ROOT = Path(__file__).resolve().parents[1]
+_SRC = _ROOT / "src"
+sys.path.insert(0, str(_SRC))
+
+from codeknowl.artifacts import repo_snapshot_dir  # noqa: E402
+from codeknowl.chunk_text import ChunkTextStore  # noqa: E402
+from codeknowl.indexing import build_file_inventory_from_git, build_file_records_for_paths_from_git  # noqa: E402
+from codeknowl.query import load_snapshot_artifacts  # noqa: E402
+from codeknowl.record_store import MANIFEST_FILENAME, FileRecordStore  # noqa: E402
+from codeknowl.repo import GitBlobReader, worktree_add_detached  # noqa: E402
+from codeknowl.service import CodeKnowlService  # noqa: E402
+from codeknowl.snapshot_cache import SNAPSHOT_CACHE  # noqa: E402
+from codeknowl.symbol_index import symbol_index_from_artifacts  # noqa: E402
+
+_ENV = {
+    "CODEKNOWL_EMBED_MODE": "hash",
+    "CODEKNOWL_VECTOR_MODE": "file",
+    "CODEKNOWL_INDEX_WORKERS": "1",
+}
+
+
+def _git(repo: Path, *args: str) -> str:
+    result = subprocess.run(
+        ["git", "-C", str(repo), *args],
+        capture_output=True,
+        text=True,
+        check=True,
+        env={
+            **os.environ,
+            "GIT_AUTHOR_NAME": "t",
+            "GIT_AUTHOR_EMAIL": "t@example.invalid",
+            "GIT_COMMITTER_NAME": "t",
+            "GIT_COMMITTER_EMAIL": "t@example.invalid",
+        },
+    )
+    return result.stdout.strip()
+
+
+def _init_repo(repo: Path) -> None:
+    repo.mkdir(parents=True, exist_ok=True)
+    _git(repo, "init", "-q", "-b", "main")
+    (repo / "app.py").write_text(
+        "def greet(name):\n    return format_name(name)\n\n\ndef format_name(name):\n    return name.title()\n",
+        encoding="utf-8",
+    )
+    (repo / "web").mkdir()
+    (repo / "web" / "ui.js").write_text("function render() {\n  return greet('x');\n}\n", encoding="utf-8")
+    _git(repo, "add", "-A")
+    _git(repo, "commit", "-q", "-m", "initial")
+
+
+def _load(snapshot_dir: Path, name: str):
+    return json.loads((snapshot_dir / name).read_text(encoding="utf-8"))
+
+
+class TestServiceIndexing(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = TemporaryDirectory(prefix="codeknowl-test-service-")
+        self.addCleanup(self._tmp.cleanup)
+        self.repo = Path(self._tmp.name) / "repo"
+        self.data_dir = Path(self._tmp.name) / "data"
+        _init_repo(self.repo)
+        env_patch = patch.dict(os.environ, _ENV, clear=False)
+        env_patch.start()
+        self.addCleanup(env_patch.stop)
+        with patch("codeknowl.service.create_graph_store", side_effect=RuntimeError("no graph in tests")):
+            self.service = CodeKnowlService(data_dir=self.data_dir)
+        self.repo_record = self.service.register_repo_local_path(
+            self.repo, accepted_branch="main", preferred_remote=None
+        )
+
+    def _artifacts(self, head_commit: str):
+        return load_snapshot_artifacts(self.data_dir, self.repo_record.repo_id, head_commit)
+
+    def _record_count(self) -> int:
+        store = FileRecordStore.for_repo(self.data_dir, self.repo_record.repo_id)
+        self.addCleanup(store.close)
+        return store._connection().execute(f"SELECT COUNT(*) FROM {store.table}").fetchone()[0]
+
+    def test_full_index_writes_artifacts_and_stage_report(self) -> None:
+        (self.repo / "scratch.py").write_text("def untracked():\n    pass\n", encoding="utf-8")
+        run = self.service.start_index_run(self.repo_record.repo_id)
+        completed = self.service.run_indexing_sync(run.run_id)
+        self.assertEqual(completed.status, "succeeded", completed.error)
+
+        snapshot = repo_snapshot_dir(self.data_dir, self.repo_record.repo_id, completed.head_commit)
+        self.assertEqual(sorted(p.name for p in snapshot.iterdir()), [MANIFEST_FILENAME])
+        artifacts = self._artifacts(completed.head_commit)
+        files = artifacts["files"]
+        self.assertEqual([f["path"] for f in files], ["app.py", "web/ui.js"])
+        self.assertEqual(files[0]["blob_sha"], _git(self.repo, "rev-parse", "HEAD:app.py"))
+        self.assertEqual({s["name"] for s in artifacts["symbols"]}, {"greet", "format_name", "render"})
+        chunks = artifacts["chunks"]
+        self.assertTrue(chunks)
+        # Snapshots and vector payloads reference chunk text; the text itself lives in the repo's text store.
+        self.assertTrue(all("text" not in c and c["text_ref"] for c in chunks))
+        store = ChunkTextStore.for_repo(self.data_dir, self.repo_record.repo_id)
+        self.addCleanup(store.close)
+        self.assertEqual(set(store.get_texts(c["text_ref"] for c in chunks)), {c["text_ref"] for c in chunks})
+
+        report = _load(snapshot, MANIFEST_FILENAME)["stats"]
+        self.assertEqual(report["records"]["written"], 2)
+        for stage in ("walk", "read", "inventory", "extract", "chunk"):
+            self.assertIn(stage, report["stages"])
+            self.assertIn("cpu_seconds", report["stages"][stage])
+        self.assertEqual(report["cache"]["extract"], {"hits": 0, "misses": 2})
+        self.assertEqual(report["cache"]["embed"], {"hits": 0, "misses": len(chunks)})
+        self.assertEqual(report["cache_hit_rate"]["embed"], 0.0)
+        self.assertIn("embed", report["stages"])
+        self.assertTrue((self.data_dir / "cache" / "extraction.sqlite").is_file())
+
+        where = self.service.qa_where_is_symbol_defined(self.repo_record.repo_id, "format_name")
+        self.assertEqual(where["results"][0]["citation"]["file_path"], "app.py")
+        self.assertIn("format_name", symbol_index_from_artifacts(artifacts))
+        qualified = self.service.qa_where_is_symbol_defined(
+            self.repo_record.repo_id, "web/ui.js:RENDER", ignore_case=True
+        )
+        self.assertEqual([r["name"] for r in qualified["results"]], [])
+        render = self.service.qa_where_is_symbol_defined(
+            self.repo_record.repo_id, "web/ui.js:render", kinds=["function"]
+        )
+        self.assertEqual([r["citation"]["file_path"] for r in render["results"]], ["web/ui.js"])
+
+        self.assertEqual(artifacts["scopes"]["version"], 1)
+        callers = self.service.qa_what_calls_symbol_best_effort(self.repo_record.repo_id, "format_name")
+        self.assertEqual([r["caller"]["name"] for r in callers["results"]], ["greet"])
+        self.assertEqual(
+            self.service.qa_what_calls_symbol_best_effort(self.repo_record.repo_id, "format")["results"], []
+        )
+        partial = self.service.qa_what_calls_symbol_best_effort(self.repo_record.repo_id, "format", substring=True)
+        self.assertEqual([r["callee_expr_preview"] for r in partial["results"]], ["format_name"])
+        at_line = self.service.qa_symbol_at_line(self.repo_record.repo_id, "app.py", 6)
+        self.assertEqual(at_line["result"]["name"], "format_name")
+
+    def test_update_applies_changed_and_deleted_files(self) -> None:
+        no_worktree = patch("codeknowl.service.worktree_checkout", side_effect=AssertionError("no checkout"))
+        no_worktree.start()
+        self.addCleanup(no_worktree.stop)
+
+        first = self.service.update_repo_to_accepted_head_sync(self.repo_record.repo_id)
+        self.assertEqual(first.status, "succeeded", first.error)
+
+        (self.repo / "app.py").write_text(
+            "def greet(name):\n    return shout(name)\n\n\ndef shout(name):\n    return name.upper()\n",
+            encoding="utf-8",
+        )
+        (self.repo / "web" / "ui.js").unlink()
+        _git(self.repo, "add", "-A")
+        _git(self.repo, "commit", "-q", "-m", "change")
+
+        second = self.service.update_repo_to_accepted_head_sync(self.repo_record.repo_id)
+        self.assertEqual(second.status, "succeeded", second.error)
+        self.assertNotEqual(first.head_commit, second.head_commit)
+
+        snapshot = repo_snapshot_dir(self.data_dir, self.repo_record.repo_id, second.head_commit)
+        manifest = _load(snapshot, MANIFEST_FILENAME)
+        old_records = _load(
+            repo_snapshot_dir(self.data_dir, self.repo_record.repo_id, first.head_commit), MANIFEST_FILENAME
+        )
+        self.assertEqual(manifest["parent_commit"], first.head_commit)
+        self.assertEqual(list(manifest["records"]), ["app.py"])
+        self.assertNotEqual(manifest["records"]["app.py"], old_records["records"]["app.py"])
+        self.assertEqual(manifest["stats"]["stages"]["read"]["items"], 1)
+
+        # The binary artifact is derived from the manifest and the record store by the first reader.
+        artifacts = self._artifacts(second.head_commit)
+        self.assertEqual([f["path"] for f in artifacts["files"]], ["app.py"])
+        self.assertEqual({s["name"] for s in artifacts["symbols"]}, {"greet", "shout"})
+        symbol_names = {s["symbol_id"]: s["name"] for s in artifacts["symbols"]}
+        self.assertEqual(
+            {c["callee_name"]: symbol_names[c["caller_symbol_id"]] for c in artifacts["calls"]},
+            {"shout": "greet", "name.upper": "shout"},
+        )
+        self.assertEqual({c["file_path"] for c in artifacts["chunks"]}, {"app.py"})
+        self.assertTrue((snapshot / "snapshot.cks").is_file())
+
+    def test_update_touching_one_file_writes_its_record_and_the_manifest_only(self) -> None:
+        first = self.service.update_repo_to_accepted_head_sync(self.repo_record.repo_id)
+        self.assertEqual(first.status, "succeeded", first.error)
+        self._artifacts(first.head_commit)  # A derived artifact of the parent must not be copied or rebuilt.
+        records_before = self._record_count()
+
+        (self.repo / "app.py").write_text("def greet(name):\n    return name\n", encoding="utf-8")
+        _git(self.repo, "commit", "-q", "-am", "change")
+        with patch("codeknowl.query.write_snapshot_file") as derive:
+            second = self.service.update_repo_to_accepted_head_sync(self.repo_record.repo_id)
+        self.assertEqual(second.status, "succeeded", second.error)
+        derive.assert_not_called()
+
+        snapshot = repo_snapshot_dir(self.data_dir, self.repo_record.repo_id, second.head_commit)
+        self.assertEqual(sorted(p.name for p in snapshot.iterdir()), [MANIFEST_FILENAME])
+        self.assertEqual(self._record_count(), records_before + 1)
+        records = _load(snapshot, MANIFEST_FILENAME)["stats"]["records"]
+        self.assertEqual((records["written"], records["reused"], records["carried_over"]), (1, 0, 1))
+        self.assertEqual({s["name"] for s in self._artifacts(second.head_commit)["symbols"]}, {"greet", "render"})
+
+    def test_queries_reuse_cached_snapshot_until_new_head(self) -> None:
+        repo_id = self.repo_record.repo_id
+        first = self.service.update_repo_to_accepted_head_sync(repo_id)
+        self.assertEqual(first.status, "succeeded", first.error)
+
+        with patch("codeknowl.service.load_snapshot_artifacts", wraps=load_snapshot_artifacts) as loads:
+            with patch.object(self.service, "get_latest_successful_index_run_for_repo", wraps=lambda r: None) as runs:
+                self.service.qa_where_is_symbol_defined(repo_id, "greet")
+                self.service.qa_symbol_at_line(repo_id, "app.py", 2)
+                self.service.qa_what_calls_symbol_best_effort(repo_id, "format_name")
+            self.assertEqual(loads.call_count, 1)
+            self.assertEqual(runs.call_count, 0)
+
+            (self.repo / "app.py").write_text("def hello():\n    pass\n", encoding="utf-8")
+            _git(self.repo, "commit", "-q", "-am", "change")
+            second = self.service.update_repo_to_accepted_head_sync(repo_id)
+            self.assertNotIn((repo_id, first.head_commit), SNAPSHOT_CACHE)
+            loads.reset_mock()
+
+            where = self.service.qa_where_is_symbol_defined(repo_id, "hello")
+            self.assertEqual(where["head_commit"], second.head_commit)
+            self.assertEqual(where["results"][0]["citation"]["file_path"], "app.py")
+            self.assertEqual(loads.call_count, 1)
+
+        self.service.offboard_repo(repo_id)
+        self.assertNotIn((repo_id, second.head_commit), SNAPSHOT_CACHE)
+
+    def test_reindex_of_same_head_by_another_process_invalidates_cache(self) -> None:
+        repo_id = self.repo_record.repo_id
+        first = self.service.update_repo_to_accepted_head_sync(repo_id)
+        self.assertEqual(first.status, "succeeded", first.error)
+        self.service.qa_where_is_symbol_defined(repo_id, "greet")
+
+        # Another process (job worker, CLI) indexes the same head again; its head memo stays valid here.
+        with patch("codeknowl.service.create_graph_store", side_effect=RuntimeError("no graph in tests")):
+            worker = CodeKnowlService(data_dir=self.data_dir)
+        with (
+            patch("codeknowl.service.SNAPSHOT_CACHE.set_head"),
+            patch("codeknowl.service.SNAPSHOT_CACHE.invalidate_repo"),
+        ):
+            rerun = worker.run_indexing_sync(worker.start_index_run(repo_id).run_id)
+        self.assertEqual((rerun.status, rerun.head_commit), ("succeeded", first.head_commit))
+
+        with patch("codeknowl.service.load_snapshot_artifacts", wraps=load_snapshot_artifacts) as loads:
+            where = self.service.qa_where_is_symbol_defined(repo_id, "greet")
+            self.service.qa_where_is_symbol_defined(repo_id, "greet")
+        self.assertEqual(where["results"][0]["citation"]["file_path"], "app.py")
+        self.assertEqual(loads.call_count, 1)
+
+    def test_gc_keeps_last_and_pinned_snapshots(self) -> None:
+        repo_id = self.repo_record.repo_id
+        heads = []
+        for body in ("pass", "return 1", "return 2"):
+            (self.repo / "app.py").write_text(f"def greet(name):\n    {body}\n", encoding="utf-8")
+            _git(self.repo, "commit", "-q", "-am", body)
+            run = self.service.update_repo_to_accepted_head_sync(repo_id)
+            self.assertEqual(run.status, "succeeded", run.error)
+            heads.append(run.head_commit)
+        self.service.update_repo_to_accepted_head_sync(repo_id)  # No-op run for an unchanged head.
+        self.service.pin_snapshot(repo_id, heads[0])
+        snapshot = lambda commit: repo_snapshot_dir(self.data_dir, repo_id, commit)  # noqa: E731
+
+        with patch.dict(os.environ, {"CODEKNOWL_RETENTION_KEEP_LAST": "1", "CODEKNOWL_RETENTION_GRACE_SECONDS": "0"}):
+            preview = self.service.collect_garbage(repo_id, dry_run=True)
+            self.assertTrue(snapshot(heads[1]).is_dir())
+            report = self.service.collect_garbage(repo_id)
+
+        repo_report = report["repos"][0]
+        self.assertEqual(preview["repos"][0]["deleted_snapshots"], [heads[1]])
+        self.assertEqual(repo_report["kept"], [heads[2], heads[0]])
+        self.assertEqual(repo_report["deleted_snapshots"], [heads[1]])
+        self.assertEqual(repo_report["deleted_runs"], 2)
+        self.assertEqual(repo_report["deleted_records"], 1)
+        self.assertGreater(report["bytes_reclaimed"], 0)
+        self.assertFalse(snapshot(heads[1]).exists())
+        self.assertTrue(snapshot(heads[0]).is_dir())
+        self.assertEqual(self.service.repo_status(repo_id)["latest_index_run"]["head_commit"], heads[2])
+        where = self.service.qa_where_is_symbol_defined(repo_id, "greet")
+        self.assertEqual(where["head_commit"], heads[2])
+        # The pinned snapshot is still complete after its unreferenced neighbours' records were swept.
+        self.assertFalse((snapshot(heads[0]) / "snapshot.cks").exists())
+        rebuilt = load_snapshot_artifacts(self.data_dir, repo_id, heads[0])
+        self.assertEqual({s["name"] for s in rebuilt["symbols"]}, {"greet", "render"})
+
+    def test_json_export_is_opt_in_and_can_be_regenerated(self) -> None:
+        run = self.service.update_repo_to_accepted_head_sync(self.repo_record.repo_id)
+        self.assertEqual(run.status, "succeeded", run.error)
+
+        snapshot = repo_snapshot_dir(self.data_dir, self.repo_record.repo_id, run.head_commit)
+        self.assertFalse((snapshot / "symbols.json").exists())
+        where = self.service.qa_where_is_symbol_defined(self.repo_record.repo_id, "render")
+        self.assertEqual(where["results"][0]["citation"]["file_path"], "web/ui.js")
+
+        self.service.export_snapshot_json(self.repo_record.repo_id)
+        self.assertEqual({s["name"] for s in _load(snapshot, "symbols.json")}, {"greet", "format_name", "render"})
+        self.assertEqual(_load(snapshot, "scopes.json")["version"], 1)
+
+        (self.repo / "app.py").write_text("def greet(name):\n    return name\n", encoding="utf-8")
+        _git(self.repo, "commit", "-q", "-am", "change")
+        with patch.dict(os.environ, {"CODEKNOWL_SNAPSHOT_JSON": "on"}):
+            with patch("codeknowl.service.create_graph_store", side_effect=RuntimeError("no graph in tests")):
+                service = CodeKnowlService(data_dir=self.data_dir)
+        second = service.update_repo_to_accepted_head_sync(self.repo_record.repo_id)
+        snapshot = repo_snapshot_dir(self.data_dir, self.repo_record.repo_id, second.head_commit)
+        self.assertEqual({s["name"] for s in _load(snapshot, "symbols.json")}, {"greet", "render"})
+
+    def test_update_in_filesystem_mode_uses_worktrees(self) -> None:
+        added = patch("codeknowl.repo.worktree_add_detached", wraps=worktree_add_detached)
+        with patch.dict(os.environ, {"CODEKNOWL_INDEX_INVENTORY": "filesystem"}), added as add:
+            first = self.service.update_repo_to_accepted_head_sync(self.repo_record.repo_id)
+            (self.repo / "app.py").write_text("def greet(name):\n    return name\n", encoding="utf-8")
+            _git(self.repo, "commit", "-q", "-am", "change")
+            second = self.service.update_repo_to_accepted_head_sync(self.repo_record.repo_id)
+
+        self.assertEqual(first.status, "succeeded", first.error)
+        self.assertEqual(second.status, "succeeded", second.error)
+        artifacts = self._artifacts(second.head_commit)
+        self.assertEqual({s["name"] for s in artifacts["symbols"]}, {"greet", "render"})
+        self.assertEqual({c["file_path"] for c in artifacts["chunks"]}, {"app.py", "web/ui.js"})
+
+        # One worktree serves both runs; the second run only advances it.
+        self.assertEqual(add.call_count, 1)
+        worktree = add.call_args.args[1]
+        self.assertEqual(_git(worktree, "rev-parse", "HEAD"), second.head_commit)
+        self.service.offboard_repo(self.repo_record.repo_id)
+        self.assertFalse(worktree.exists())
+
+    def test_blob_reader_streams_committed_contents(self) -> None:
+        (self.repo / "app.py").write_text("uncommitted\n", encoding="utf-8")
+        blob = _git(self.repo, "rev-parse", "HEAD:app.py")
+        with GitBlobReader(self.repo) as reader:
+            self.assertTrue(reader.read(blob).startswith(b"def greet(name):"))
+            self.assertEqual(reader.read("HEAD:web/ui.js"), b"function render() {\n  return greet('x');\n}\n")
+            self.assertIsNone(reader.read("0" * 40))
+            self.assertIsNone(reader.read("HEAD"))
+
+    def test_git_inventory_for_paths_matches_commit_tree(self) -> None:
+        head = _git(self.repo, "rev-parse", "HEAD")
+        (self.repo / "node_modules").mkdir()
+        (self.repo / "node_modules" / "dep.js").write_text("x\n", encoding="utf-8")
+
+        full = build_file_inventory_from_git(self.repo, head)
+        subset = build_file_records_for_paths_from_git(self.repo, head, {"web/ui.js", "missing.py"})
+
+        self.assertEqual([f.path for f in full], ["app.py", "web/ui.js"])
+        self.assertEqual([(f.path, f.language) for f in subset], [("web/ui.js", "javascript")])
+        self.assertEqual(subset[0].size_bytes, (self.repo / "web" / "ui.js").stat().st_size)
+
+
+if __name__ == "__main__":
+    unittest.main()
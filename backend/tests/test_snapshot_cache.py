@@ -0,0 +1,119 @@
+"""File: backend/tests/test_snapshot_cache.py
+Purpose: Verify the in-memory snapshot cache reuses, evicts, and invalidates snapshots correctly.
+Product/business importance: A stale or unbounded cache would serve outdated answers or exhaust API worker memory.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+import sys
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest.mock import patch
+
+_ROOT = Path(__file__).resolve().parents[1]
+_SRC = _ROOT / "src"
+sys.path.insert(0, str(_SRC))
+
+from codeknowl.snapshot_cache import SnapshotCache, SnapshotCacheConfig, estimate_artifacts_bytes  # noqa: E402
+from codeknowl.snapshot_format import LazySnapshotArtifacts, SnapshotReader, write_snapshot_file  # noqa: E402
+
+
+def _artifacts(rows: int) -> dict[str, list[dict[str, str]]]:
+    return {"symbols": [{"symbol_id": f"s{i}", "name": f"name_{i}"} for i in range(rows)]}
+
+
+class TestSnapshotCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.events: list[str] = []
+        metrics = patch("codeknowl.snapshot_cache.METRICS")
+        mocked = metrics.start()
+        mocked.inc_snapshot_cache.side_effect = self.events.append
+        self.addCleanup(metrics.stop)
+
+    def _cache(self, max_bytes: int = 10**9, head_ttl_seconds: float = 60.0) -> SnapshotCache:
+        return SnapshotCache(SnapshotCacheConfig(enabled=True, max_bytes=max_bytes, head_ttl_seconds=head_ttl_seconds))
+
+    def test_hits_reuse_loaded_artifacts(self) -> None:
+        cache = self._cache()
+        loads: list[str] = []
+
+        def loader() -> dict:
+            loads.append("x")
+            return _artifacts(3)
+
+        first = cache.get_or_load(("r", "c1"), loader)
+        second = cache.get_or_load(("r", "c1"), loader)
+        self.assertIs(first, second)
+        self.assertEqual(loads, ["x"])
+        self.assertEqual(self.events, ["miss", "hit"])
+        self.assertEqual(cache.total_bytes, estimate_artifacts_bytes(first))
+
+    def test_evicts_least_recently_used_by_size(self) -> None:
+        one = estimate_artifacts_bytes(_artifacts(100))
+        cache = self._cache(max_bytes=int(one * 2.5))
+        cache.get_or_load(("a", "c"), lambda: _artifacts(100))
+        cache.get_or_load(("b", "c"), lambda: _artifacts(100))
+        cache.get_or_load(("a", "c"), lambda: _artifacts(100))
+        cache.get_or_load(("c", "c"), lambda: _artifacts(100))
+        self.assertNotIn(("b", "c"), cache)
+        self.assertIn(("a", "c"), cache)
+        self.assertIn(("c", "c"), cache)
+        self.assertEqual(self.events.count("eviction"), 1)
+        self.assertLessEqual(cache.total_bytes, cache.config.max_bytes)
+
+    def test_new_generation_of_same_commit_is_reloaded(self) -> None:
+        cache = self._cache()
+        first = cache.get_or_load(("r", "c1"), lambda: _artifacts(2), generation=(1, 100, 10))
+        self.assertIs(cache.get_or_load(("r", "c1"), lambda: _artifacts(3), generation=(1, 100, 10)), first)
+
+        # The commit was indexed again (e.g. by the job worker): the cached artifacts must not be served.
+        second = cache.get_or_load(("r", "c1"), lambda: _artifacts(3), generation=(2, 200, 10))
+        self.assertIsNot(second, first)
+        self.assertEqual(len(second["symbols"]), 3)
+        self.assertEqual(self.events, ["miss", "hit", "invalidation", "miss"])
+        self.assertEqual(cache.total_bytes, estimate_artifacts_bytes(second))
+
+    def test_new_head_invalidates_older_commits_only(self) -> None:
+        cache = self._cache()
+        cache.get_or_load(("r", "c1"), lambda: _artifacts(2))
+        cache.get_or_load(("other", "c1"), lambda: _artifacts(2))
+        cache.set_head("r", "c2")
+        self.assertNotIn(("r", "c1"), cache)
+        self.assertIn(("other", "c1"), cache)
+        self.assertEqual(cache.get_head("r"), "c2")
+        self.assertIn("invalidation", self.events)
+
+        cache.invalidate_repo("r")
+        self.assertIsNone(cache.get_head("r"))
+
+    def test_head_memo_expires(self) -> None:
+        cache = self._cache(head_ttl_seconds=0.0)
+        cache.set_head("r", "c1")
+        with patch("codeknowl.snapshot_cache.time.monotonic", return_value=10**9):
+            self.assertIsNone(cache.get_head("r"))
+
+    def test_lazy_sections_grow_entry_size(self) -> None:
+        with TemporaryDirectory(prefix="codeknowl-test-snapshot-cache-") as tmp:
+            path = Path(tmp) / "snapshot.cks"
+            write_snapshot_file(path, {"symbols": [], "files": [], "calls": [], "chunks": []}, {"scopes": {"a": 1}})
+            cache = self._cache()
+            artifacts = cache.get_or_load(("r", "c"), lambda: LazySnapshotArtifacts(SnapshotReader(path)))
+            self.assertEqual(cache.total_bytes, 0)
+            _ = artifacts["scopes"]
+            cache.get_or_load(("r", "c"), lambda: self.fail("should be cached"))
+            self.assertGreater(cache.total_bytes, 0)
+
+    def test_disabled_cache_always_loads(self) -> None:
+        cache = SnapshotCache(SnapshotCacheConfig(enabled=False, max_bytes=10**9, head_ttl_seconds=60.0))
+        first = cache.get_or_load(("r", "c"), lambda: _artifacts(1))
+        second = cache.get_or_load(("r", "c"), lambda: _artifacts(1))
+        self.assertIsNot(first, second)
+        self.assertEqual(len(cache), 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
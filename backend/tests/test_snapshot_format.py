@@ -0,0 +1,89 @@
+"""File: backend/tests/test_snapshot_format.py
+Purpose: Verify the columnar binary snapshot format round-trips artifacts and loads sections lazily.
+Product/business importance: Query correctness depends on the binary snapshot matching the JSON artifacts exactly.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+import sys
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+_ROOT = Path(__file__).resolve().parents[1]
+_SRC = _ROOT / "src"
+sys.path.insert(0, str(_SRC))
+
+from codeknowl.file_outline import FileOutlineIndex  # noqa: E402
+from codeknowl.query import explain_file_stub, where_is_symbol_defined  # noqa: E402
+from codeknowl.snapshot_format import LazySnapshotArtifacts, SnapshotReader, write_snapshot_file  # noqa: E402
+from codeknowl.symbol_index import SymbolNameIndex  # noqa: E402
+
+
+def _range(start: int, end: int) -> dict[str, int]:
+    return {"start_line": start, "start_col": 1, "end_line": end, "end_col": 2}
+
+
+_TABLES = {
+    "files": [
+        {"path": "a.py", "language": "python", "size_bytes": 120, "blob_sha": "b" * 40},
+        {"path": "docs/ü.md", "language": "markdown", "size_bytes": 2**33, "blob_sha": None},
+    ],
+    "symbols": [
+        {"symbol_id": "s1", "kind": "function", "name": "run", "file_path": "a.py", "range": _range(1, 4)},
+        {"symbol_id": "s2", "kind": "class", "name": "Runner", "file_path": "a.py", "range": _range(6, 9)},
+        {"symbol_id": "s3", "kind": "function", "name": "run", "file_path": "b.py", "range": _range(2, 3)},
+    ],
+    "calls": [
+        {"caller_symbol_id": "s1", "callee_name": "helper", "file_path": "a.py", "range": _range(2, 2)},
+        {"caller_symbol_id": "", "callee_name": "main", "file_path": "a.py", "range": _range(11, 11)},
+    ],
+    "chunks": [{"chunk_id": "c1", "file_path": "a.py", "start_line": 1, "end_line": 9, "text_ref": "ab12"}],
+}
+
+
+class TestSnapshotFormat(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp = TemporaryDirectory(prefix="codeknowl-test-snapshot-")
+        self.addCleanup(self._tmp.cleanup)
+        self.path = Path(self._tmp.name) / "snapshot.cks"
+        write_snapshot_file(self.path, _TABLES, {"scopes": {"version": 1, "files": {}}})
+
+    def test_sections_round_trip_to_json_shape(self) -> None:
+        reader = SnapshotReader(self.path)
+        self.assertEqual(reader.section_names(), ["files", "symbols", "calls", "chunks", "scopes"])
+        for name, rows in _TABLES.items():
+            self.assertEqual(reader.read(name), rows)
+        self.assertEqual(reader.read("scopes"), {"version": 1, "files": {}})
+        self.assertEqual(reader.table("symbols").column("name"), ["run", "Runner", "run"])
+
+    def test_filters_decode_only_matching_rows(self) -> None:
+        tables = {
+            **_TABLES,
+            **SymbolNameIndex.from_symbols(_TABLES["symbols"]).to_tables(),
+            **FileOutlineIndex.from_records(_TABLES["files"], _TABLES["symbols"]).to_tables(),
+        }
+        write_snapshot_file(self.path, tables, {"scopes": {"version": 1, "files": {}}})
+        artifacts = LazySnapshotArtifacts(SnapshotReader(self.path))
+        self.assertEqual(
+            [m["citation"]["file_path"] for m in where_is_symbol_defined(artifacts, "run")], ["a.py", "b.py"]
+        )
+        self.assertEqual(where_is_symbol_defined(artifacts, "missing"), [])
+        stub = explain_file_stub(artifacts, "a.py")
+        self.assertEqual([s["name"] for s in stub["top_symbols"]], ["run", "Runner"])
+        self.assertEqual(stub["symbol_counts"], {"function": 1, "class": 1})
+        self.assertEqual(stub["file"], _TABLES["files"][0])
+        with self.assertRaises(KeyError):
+            explain_file_stub(artifacts, "nope.py")
+        self.assertEqual(artifacts._loaded, {})
+
+        self.assertEqual(artifacts["calls"], _TABLES["calls"])
+        self.assertEqual(set(artifacts._loaded), {"calls"})
+        self.assertIsNone(artifacts.get("unknown"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+"""File: backend/tests/test_symbol_index.py
+Purpose: Verify the persisted symbol name index answers exact, case-insensitive, qualified, and kind-filtered lookups.
+Product/business importance: Where-defined answers must stay identical to a full scan while avoiding one.
+
+Copyright (c) 2026 John K Johansen
+License: MIT (see LICENSE)
+"""
+
+from __future__ import annotations
+
+import re
+import sys
+import unittest
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+_ROOT = Path(__file__).resolve().parents[1]
+_SRC = _ROOT / "src"
+sys.path.insert(0, str(_SRC))
+
+from codeknowl.ask import build_evidence_bundle  # noqa: E402
+from codeknowl.query import where_is_symbol_defined  # noqa: E402
+from codeknowl.snapshot_format import LazySnapshotArtifacts, SnapshotReader, write_snapshot_file  # noqa: E402
+from codeknowl.symbol_index import SymbolNameIndex  # noqa: E402
+
+
+def _sym(symbol_id: str, kind: str, name: str, file_path: str, line: int) -> dict:
+    r = {"start_line": line, "start_col": 1, "end_line": line + 1, "end_col": 1}
+    return {"symbol_id": symbol_id, "kind": kind, "name": name, "file_path": file_path, "range": r}
+
+
+_SYMBOLS = [
+    _sym("s1", "function", "load", "a.py", 1),
+    _sym("s2", "class", "Loader", "a.py", 5),
+    _sym("s3", "function", "load", "b.py", 2),
+    _sym("s4", "method", "LOAD", "c.py", 9),
+]
+
+
+def _paths(results: list[dict]) -> list[str]:
+    return [r["citation"]["file_path"] for r in results]
+
+
+class TestSymbolIndex(unittest.TestCase):
+    def setUp(self) -> None:
+        index = SymbolNameIndex.from_symbols(_SYMBOLS).to_json()
+        self.plain = {"files": [], "symbols": _SYMBOLS, "calls": [], "chunks": [], "symbol_index": index}
+        self._tmp = TemporaryDirectory(prefix="codeknowl-test-symbol-index-")
+        self.addCleanup(self._tmp.cleanup)
+        path = Path(self._tmp.name) / "snapshot.cks"
+        tables = {"files": [], "symbols": _SYMBOLS, "calls": [], "chunks": []}
+        write_snapshot_file(path, {**tables, **SymbolNameIndex.from_symbols(_SYMBOLS).to_tables()})
+        self.lazy = LazySnapshotArtifacts(SnapshotReader(path))
+
+    def test_lookups_match_on_both_snapshot_forms(self) -> None:
+        for artifacts in (self.plain, self.lazy):
+            with self.subTest(kind=type(artifacts).__name__):
+                self.assertEqual(_paths(where_is_symbol_defined(artifacts, "load")), ["a.py", "b.py"])
+                self.assertEqual(_paths(where_is_symbol_defined(artifacts, "b.py:load")), ["b.py"])
+                self.assertEqual(
+                    _paths(where_is_symbol_defined(artifacts, "load", ignore_case=True)), ["a.py", "b.py", "c.py"]
+                )
+                self.assertEqual(
+                    _paths(where_is_symbol_defined(artifacts, "LOAD", ignore_case=True, kinds=["method"])), ["c.py"]
+                )
+                self.assertEqual(where_is_symbol_defined(artifacts, "load", kinds=["class"]), [])
+                self.assertEqual(where_is_symbol_defined(artifacts, "missing"), [])
+        self.assertEqual(self.lazy._loaded, {})
+
+    def test_missing_index_falls_back_to_symbols(self) -> None:
+        artifacts = {key: value for key, value in self.plain.items() if key != "symbol_index"}
+        self.assertEqual(_paths(where_is_symbol_defined(artifacts, "Loader")), ["a.py"])
+
+    def test_ask_picks_the_same_definitions_as_a_symbol_scan(self) -> None:
+        questions = [
+            "Where is Loader defined?",
+            "where is the definition of load",
+            "Where's the definition for Loader or load",
+            "where is LOAD defined, in load",
+            "Where is missing defined? definition of",
+        ]
+        for artifacts in (self.plain, self.lazy):
+            for question in questions:
+                with self.subTest(kind=type(artifacts).__name__, question=question):
+                    # Baseline routing: the last identifier token of the question, matched by a scan over symbols.
+                    name = re.findall(r"[A-Za-z_][A-Za-z0-9_]*", question)[-1]
+                    expected = [(s["name"], s["file_path"]) for s in _SYMBOLS if s["name"] == name]
+                    evidence, _ = build_evidence_bundle(artifacts, question)
+                    picked = [(d["name"], d["citation"]["file_path"]) for d in evidence["where_defined"]]
+                    self.assertEqual(picked, expected)
+
+
+if __name__ == "__main__":
+    unittest.main()